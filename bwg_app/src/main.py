@@ -216,6 +216,100 @@ def _parse_features(payload) -> list:
     return feats
 
 
+class _Coords:
+    """A line's [lon, lat] pairs as a view over the binary layer's int32
+    coordinate array: nothing per vertex exists until the renderer walks it,
+    and lines the coordinate budget drops are never expanded at all."""
+
+    __slots__ = ("_coords", "_start", "_stop", "_scale")
+
+    def __init__(self, coords, start: int, stop: int, scale: float):
+        self._coords, self._start, self._stop, self._scale = coords, start, stop, scale
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[k] for k in range(start, stop, step)]
+            stop = max(stop, start)
+            return _Coords(self._coords, self._start + start, self._start + stop, self._scale)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        k = 2 * (self._start + i)
+        return (self._coords[k] * self._scale, self._coords[k + 1] * self._scale)
+
+    def __iter__(self):
+        coords, scale = self._coords, self._scale
+        for k in range(2 * self._start, 2 * self._stop, 2):
+            yield (coords[k] * scale, coords[k + 1] * scale)
+
+
+def _parse_binary_features(content: bytes) -> list:
+    """`_parse_features` for a layer's `.bin` export (see
+    `_encode_layer_binary` in plugins/map-layers.py): the same flat list,
+    with coordinates read in one `frombytes` instead of a JSON token each.
+    Polygons are skipped, as they are in GeoJSON."""
+    import json
+    import struct
+    import sys
+    from array import array
+
+    if content[:4] != b"BWGL":
+        raise ValueError("Not a binary layer.")
+    version, header_len = struct.unpack_from("<B3xI", content, 4)
+    if version != 1:
+        raise ValueError(f"Unsupported binary layer version {version}.")
+    pos = 12
+    header = json.loads(content[pos:pos + header_len])
+    pos += header_len + (-header_len % 4)
+
+    def take(code: str, count: int):
+        nonlocal pos
+        values = array(code)
+        values.frombytes(content[pos:pos + count * values.itemsize])
+        pos += count * values.itemsize
+        if code != "B" and sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    n = header["features"]
+    types = take("B", n)
+    pos += -n % 4
+    part_offsets = take("I", n + 1)
+    ring_offsets = take("I", header["parts"] + 1)
+    coord_offsets = take("I", header["rings"] + 1)
+    coords = take("i", header["coords"] * 2)
+    scale = header["scale"]
+    columns = header["props"].items()
+
+    feats = []
+    for i in range(n):
+        if types[i] not in (1, 2):
+            continue
+        props = {key: column[i] for key, column in columns if column[i] is not None}
+        for p in range(part_offsets[i], part_offsets[i + 1]):
+            r = ring_offsets[p]
+            start, stop = coord_offsets[r], coord_offsets[r + 1]
+            if types[i] == 1:
+                feats.append({
+                    "type": "point",
+                    "coords": [coords[2 * start] * scale, coords[2 * start + 1] * scale],
+                    "props": props,
+                })
+            else:
+                feats.append({
+                    "type": "line",
+                    "coords": _Coords(coords, start, stop, scale),
+                    "props": props,
+                })
+    return feats
+
+
 # Dev fallback: with `adb reverse tcp:8000 tcp:8000`, a tethered phone reaches
 # the local `mrsm stack` API before the endpoints are deployed to production.
 PROD_API_BASE = "https://bwg.mrsm.io"
@@ -254,6 +348,25 @@ async def load_geojson_features(url: str) -> list | None:
     return None
 
 
+async def load_layer_features(url: str) -> list | None:
+    """A whole map layer's features: from its binary export when the server
+    has one (a fraction of the bytes, and no JSON parse), else the GeoJSON."""
+    import asyncio
+    import httpx
+    if url.startswith(PROD_API_BASE + "/map-layers/") and url.endswith(".geojson"):
+        bin_url = url[:-len(".geojson")] + ".bin"
+        for u in _dev_fallback_urls(bin_url):
+            try:
+                async with httpx.AsyncClient(timeout=60) as client:
+                    resp = await client.get(u)
+                    resp.raise_for_status()
+                    content = resp.content
+                return await asyncio.to_thread(_parse_binary_features, content)
+            except Exception:
+                continue
+    return await load_geojson_features(url)
+
+
 STRESS_LABELS = {
     "H": "High",
     "MH": "Medium-high",
@@ -672,7 +785,7 @@ async def _app(page: ft.Page):
             layers_loading.visible = True
             _update(layers_loading)
             try:
-                feats = await load_geojson_features(st["cfg"]["data_url"])
+                feats = await load_layer_features(st["cfg"]["data_url"])
                 cfg = st["cfg"]
                 # Building tens of thousands of coordinate/marker objects is
                 # CPU-bound: keep it off the event loop.
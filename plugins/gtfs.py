@@ -10,6 +10,15 @@ Metrics (see projects/transit.yaml):
   routes        -> transit.routes         (one row per route, color included)
   stops         -> transit.stops          (stop + the route short names serving it)
   route_shapes  -> transit.route_shapes   (one WKT LINESTRING per shape, route props)
+  trips         -> transit.trips          (route, service and shape of each trip)
+  stop_times    -> transit.stop_times     (one row per trip: its stop sequence and
+                                           arrival/departure seconds as arrays)
+  calendar      -> transit.calendar       (weekly service pattern + date range)
+  calendar_dates -> transit.calendar_dates (service added/removed on a date)
+
+The schedule metrics are what `map-layers` builds its RAPTOR timetable from.
+Times are seconds after midnight of the service day and may run past 86400
+for trips that finish after midnight, as in GTFS.
 """
 
 import csv
@@ -18,7 +27,7 @@ import zipfile
 
 import meerschaum as mrsm
 
-__version__ = '0.1.0'
+__version__ = '0.2.0'
 
 required = ['requests']
 
@@ -30,6 +39,61 @@ def _read(zf: zipfile.ZipFile, name: str) -> list[dict]:
         return list(csv.DictReader(io.TextIOWrapper(f, 'utf-8-sig')))
 
 
+def _seconds(value: str) -> int | None:
+    """GTFS `HH:MM:SS` (hours may exceed 24) -> seconds, or None if blank."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    h, m, sec = value.split(':')
+    return int(h) * 3600 + int(m) * 60 + int(sec)
+
+
+def _fill_times(times: list) -> list[int]:
+    """Interpolate the blank times of untimed stops linearly (by stop count)
+    between the timepoints either side; GTFS only requires the first and
+    last stop of a trip to be timed."""
+    known = [i for i, t in enumerate(times) if t is not None]
+    if not known:
+        return []
+    out = list(times)
+    for a, b in zip(known, known[1:]):
+        for i in range(a + 1, b):
+            out[i] = round(times[a] + (times[b] - times[a]) * (i - a) / (b - a))
+    for i in range(known[0]):
+        out[i] = times[known[0]]
+    for i in range(known[-1] + 1, len(out)):
+        out[i] = times[known[-1]]
+    return out
+
+
+def _trip_timetables(zf: zipfile.ZipFile) -> list[dict]:
+    """stop_times.txt folded to one row per trip, stops in sequence order."""
+    by_trip: dict[str, list] = {}
+    with zf.open('stop_times.txt') as f:
+        for row in csv.DictReader(io.TextIOWrapper(f, 'utf-8-sig')):
+            by_trip.setdefault(row['trip_id'], []).append((
+                int(row['stop_sequence']),
+                row['stop_id'],
+                _seconds(row.get('arrival_time')),
+                _seconds(row.get('departure_time')),
+            ))
+    docs = []
+    for trip_id, rows in by_trip.items():
+        rows.sort()
+        arrivals = [a if a is not None else d for _, _, a, d in rows]
+        departures = [d if d is not None else a for _, _, a, d in rows]
+        arrivals, departures = _fill_times(arrivals), _fill_times(departures)
+        if len(rows) < 2 or not arrivals:
+            continue
+        docs.append({
+            'trip_id': trip_id,
+            'stop_ids': [stop_id for _, stop_id, _, _ in rows],
+            'arrivals': arrivals,
+            'departures': departures,
+        })
+    return docs
+
+
 def fetch(pipe: mrsm.Pipe, debug: bool = False, **kwargs):
     import requests
     resp = requests.get(GTFS_URL, timeout=120)
@@ -51,8 +115,48 @@ def fetch(pipe: mrsm.Pipe, debug: bool = False, **kwargs):
     if pipe.metric_key == 'routes':
         return [route_doc(rid) for rid in routes]
 
+    if pipe.metric_key == 'calendar':
+        days = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+        return [
+            {
+                'service_id': c['service_id'],
+                **{day: int(c.get(day) or 0) for day in days},
+                'start_date': c['start_date'],
+                'end_date': c['end_date'],
+            }
+            for c in (_read(zf, 'calendar.txt') if 'calendar.txt' in zf.namelist() else [])
+        ]
+
+    if pipe.metric_key == 'calendar_dates':
+        if 'calendar_dates.txt' not in zf.namelist():
+            return []
+        return [
+            {
+                'service_id': c['service_id'],
+                'date': c['date'],
+                'exception_type': int(c['exception_type']),
+            }
+            for c in _read(zf, 'calendar_dates.txt')
+        ]
+
+    if pipe.metric_key == 'stop_times':
+        return _trip_timetables(zf)
+
     trips = _read(zf, 'trips.txt')
 
+    if pipe.metric_key == 'trips':
+        return [
+            {
+                'trip_id': t['trip_id'],
+                'route_id': t['route_id'],
+                'service_id': t['service_id'],
+                'shape_id': t.get('shape_id') or None,
+                'direction_id': t.get('direction_id') or None,
+                'headsign': t.get('trip_headsign') or '',
+            }
+            for t in trips
+        ]
+
     if pipe.metric_key == 'route_shapes':
         shape_points: dict[str, list] = {}
         for p in _read(zf, 'shapes.txt'):
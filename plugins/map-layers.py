@@ -10,16 +10,42 @@ Routes (mounted on the Meerschaum API FastAPI app, i.e. https://bwg.mrsm.io):
   GET /map-layers/index.json        -> catalog of available layers + style hints
   GET /map-layers/{layer}.geojson   -> FeatureCollection (pregenerated file if
                                        present, else generated on demand)
+  GET /map-layers/{layer}.bin       -> the exported layer in the binary format
+                                       of `_encode_layer_binary`
+  GET /map-layers/tiles/{layer}/{z}/{x}/{y}.mvt
+                                    -> Mapbox Vector Tile (pre-seeded MBTiles
+                                       if present, else ST_AsMVT on demand)
   GET /map-layers/route             -> multi-modal directions; see
                                        `map_layers_route` for the parameters
                                        and `_route_multimodal` for the plans
+  GET /map-layers/matrix            -> travel times between many origins and
+                                       destinations (`map_layers_matrix`)
+  GET /map-layers/isochrone         -> area reachable within N minutes, in
+                                       time bands (`map_layers_isochrone`)
+  GET /map-layers/cache-stats.json  -> route/isochrone/tile cache hit, miss and
+                                       eviction counters (per worker)
 
 Pregeneration (run nightly after the source pipes sync):
 
   mrsm compose exec export map_layers
 
 writes `<data>/output/geojson/app/<layer>.geojson` alongside the existing
-`export geojson` output tree.
+`export geojson` output tree, and
+
+  mrsm compose exec export route_graph
+
+writes the routing graph snapshot the API workers map at startup
+(`<data>/output/route-graph/`), and
+
+  mrsm compose exec export map_tiles
+
+pre-seeds every layer's vector tiles (z10-z16) into
+`<data>/output/tiles/<layer>.mbtiles`. Run
+
+  mrsm compose exec export elevation_grid
+
+after the contours change (rarely) to rasterize them into the elevation grid
+the graph build samples (`<data>/output/elevation/`).
 
 Geometries are simplified in their native SC state-plane CRS (ft units) before
 reprojection to WGS84 to keep payloads small enough for flet_map on-device.
@@ -28,7 +54,7 @@ reprojection to WGS84 to keep payloads small enough for flet_map on-device.
 import math
 import threading
 import time
-from typing import Any
+from typing import Any, Iterator
 
 import meerschaum as mrsm
 from meerschaum.actions import make_action
@@ -46,6 +72,9 @@ FT_PER_M = 3.28084
 #: `props`: output property name -> DB column name.
 #: `tolerance_m`: Douglas-Peucker tolerance in meters (lines only; applied in
 #:   the native ft-based CRS before reprojection).
+#: `depends_on` / `curated` (builder layers): the layers whose pipes the
+#:   builder reads, or the hand-kept list it serves, so `export map_layers`
+#:   can tell when its output would change (see `_layer_fingerprint`).
 LAYERS: dict[str, dict[str, Any]] = {
     'bus-routes': {
         'label': 'Bus Routes',
@@ -110,6 +139,7 @@ LAYERS: dict[str, dict[str, Any]] = {
         'label': 'Sidewalks',
         'kind': 'line',
         'builder': '_build_merged_sidewalks',
+        'depends_on': ['sidewalks-county', 'sidewalks-city'],
         'props': {},
         'color': '#1565C0',
     },
@@ -136,6 +166,7 @@ LAYERS: dict[str, dict[str, Any]] = {
         'label': 'Shortcuts & Tunnels',
         'kind': 'line',
         'builder': '_build_custom_paths',
+        'curated': 'CUSTOM_PATHS',
         'props': {'name': 'name', 'note': 'note'},
         'color': '#AD1457',
     },
@@ -145,6 +176,7 @@ LAYERS: dict[str, dict[str, Any]] = {
         'label': 'Trail Landmarks',
         'kind': 'point',
         'builder': '_build_landmarks',
+        'curated': 'LANDMARKS',
         'props': {'name': 'name', 'note': 'note'},
         'color': '#5D4037',
         'icon': 'flag',
@@ -154,6 +186,7 @@ LAYERS: dict[str, dict[str, Any]] = {
         'label': 'Bike Friendly Businesses',
         'kind': 'point',
         'builder': '_build_bike_businesses',
+        'curated': 'BIKE_BUSINESSES',
         'props': {'name': 'name', 'address': 'address', 'url': 'url', 'note': 'note'},
         'color': '#00897B',
         'icon': 'storefront',
@@ -725,6 +758,21 @@ def _layer_srid(layer_id: str, conn, schema: str, target: str) -> int:
     return _SRIDS[layer_id]
 
 
+def _zoom_tolerance(srid: int, zoom: int) -> float:
+    """~1 px worth of simplification at `zoom` (Greenville latitude), in the
+    native units of `srid` (US-ft state plane, or degrees for 4326 layers)."""
+    m_per_px = 156543.03 * math.cos(math.radians(34.85)) / (2 ** zoom)
+    if srid == 4326:
+        return m_per_px / 111320
+    return max(m_per_px * FT_PER_M, 1.0)
+
+
+#: Features fetched per round trip when streaming a viewport query
+#: (`_build_bbox_geojson`): enough to keep the socket busy, few enough that
+#: the worker never holds more than a sliver of the response.
+BBOX_STREAM_ROWS = 500
+
+
 def _build_bbox_geojson(
     layer_id: str,
     minlon: float,
@@ -732,14 +780,23 @@ def _build_bbox_geojson(
     maxlon: float,
     maxlat: float,
     zoom: int,
-) -> str:
+) -> Iterator[str]:
     """Viewport query: bbox-filtered, zoom-simplified features WITH per-feature
     detail properties (the full-layer path dissolves those away). Pure PostGIS —
     no geopandas round-trip. All numeric inputs are coerced before
     interpolation; `layer_id` is validated against LAYERS by the caller.
+
+    PostGIS renders each row as a finished GeoJSON Feature, and the rows are
+    read off a server-side cursor BBOX_STREAM_ROWS at a time, so the result
+    is an iterator of FeatureCollection text chunks to stream as they come:
+    nothing is parsed or re-serialized here. As before streaming, rows
+    without a geometry are skipped and NaN properties become null (in SQL
+    now). The query runs (and its errors raise) before this returns, so a
+    failure is still a clean 500. Closing the iterator releases the cursor
+    and its connection; the endpoint does that once the response is over,
+    sent or not.
     """
-    import json
-    import math
+    import itertools
 
     layer = LAYERS[layer_id]
     pipe = _layer_pipe(layer)
@@ -753,57 +810,86 @@ def _build_bbox_geojson(
     zoom = max(1, min(int(zoom), 22))
 
     props = {**layer.get('props', {}), **layer.get('detail_props', {})}
+    # JSON has no NaN: a float NaN property goes out as null, as it did when
+    # pandas read these rows.
     prop_cols = ''.join(
-        f', "{db_col}" AS "{out_name}"'
+        f''',
+            CASE WHEN pg_typeof("{db_col}") IN (
+                'real'::regtype, 'double precision'::regtype, 'numeric'::regtype
+            ) AND "{db_col}"::text = 'NaN' THEN NULL ELSE "{db_col}" END
+            AS "{out_name}"'''
         for out_name, db_col in props.items()
     )
+    prop_args = ', '.join(
+        f"'{out_name}', \"{out_name}\""
+        for out_name in props
+    )
 
-    # ~1 px worth of simplification at this zoom (Greenville latitude), in the
-    # layer's native units (US-ft state plane, or degrees for 4326 layers).
-    m_per_px = 156543.03 * math.cos(math.radians(34.85)) / (2 ** zoom)
     srid = _layer_srid(layer_id, conn, schema, target)
-    if srid == 4326:
-        tolerance = m_per_px / 111320
-    else:
-        tolerance = max(m_per_px * FT_PER_M, 1.0)
+    tolerance = _zoom_tolerance(srid, zoom)
 
     envelope = (
         f"ST_Transform(ST_MakeEnvelope({minlon}, {minlat}, {maxlon}, {maxlat}, 4326), {srid})"
     )
     bbox_limit = int(layer.get('bbox_limit', 4000))
     query = f'''
-    SELECT
-        ST_AsGeoJSON(
-            ST_Force2D(
-                ST_Transform(ST_SimplifyPreserveTopology("geometry", {tolerance}), 4326)
-            ),
-            5
-        ) AS "gj"
-        {prop_cols}
-    FROM "{schema}"."{target}"
-    WHERE ST_Intersects("geometry", {envelope})
-    ORDER BY ST_Length("geometry") DESC
-    LIMIT {bbox_limit}
+    SELECT json_build_object(
+        'type', 'Feature',
+        'geometry', "gj"::json,
+        'properties', json_build_object({prop_args})
+    )::text AS "feature"
+    FROM (
+        SELECT
+            ST_AsGeoJSON(
+                ST_Force2D(
+                    ST_Transform(ST_SimplifyPreserveTopology("geometry", {tolerance}), 4326)
+                ),
+                5
+            ) AS "gj",
+            ST_Length("geometry") AS "gj_length"{prop_cols}
+        FROM "{schema}"."{target}"
+        WHERE ST_Intersects("geometry", {envelope})
+        ORDER BY ST_Length("geometry") DESC
+        LIMIT {bbox_limit}
+    ) AS "rows"
+    WHERE "gj" IS NOT NULL
+    ORDER BY "gj_length" DESC
     '''
-    def _clean(v):
-        if hasattr(v, 'item'):
-            v = v.item()
-        if isinstance(v, float) and v != v:  # NaN -> null
-            return None
-        return v
+    batches = _stream_rows(conn, query, BBOX_STREAM_ROWS)
+    first = next(batches, [])
 
-    df = conn.read(query)
-    features = []
-    for row in df.to_dict(orient='records'):
-        gj = row.pop('gj', None)
-        if not gj:
-            continue
-        features.append({
-            'type': 'Feature',
-            'geometry': json.loads(gj),
-            'properties': {k: _clean(v) for k, v in row.items()},
-        })
-    return json.dumps({'type': 'FeatureCollection', 'features': features})
+    def _chunks():
+        try:
+            yield '{"type":"FeatureCollection","features":['
+            sep = ''
+            for batch in itertools.chain([first], batches):
+                if batch:
+                    yield sep + ','.join(batch)
+                    sep = ','
+            yield ']}'
+        finally:
+            batches.close()
+
+    return _chunks()
+
+
+def _stream_rows(conn, query: str, size: int) -> Iterator[list]:
+    """The first column of `query`'s rows, in lists of up to `size`, off a
+    server-side cursor (the connection is held until the iterator is
+    exhausted or closed). The query executes on the first `next()`."""
+    sqlalchemy = mrsm.attempt_import('sqlalchemy', lazy=False)
+    db = conn.engine.connect()
+    result = None
+    try:
+        result = db.execution_options(stream_results=True).execute(
+            sqlalchemy.text(query)
+        )
+        for rows in result.partitions(size):
+            yield [row[0] for row in rows]
+    finally:
+        if result is not None:
+            result.close()
+        db.close()
 
 
 #: Greenville County-ish bounds for search (minlon, minlat, maxlon, maxlat).
@@ -1127,6 +1213,24 @@ CONTOUR_BATCH = 4000
 #: the spatial index (unbounded, a point outside the data walks the whole
 #: index -- a single such lookup was measured at over two minutes).
 CONTOUR_MAX_M = 2000.0
+#: Elevation grid (`mrsm export elevation_grid`): the contours burned into a
+#: grid of this cell size (m) and filled smoothly between them, so node and
+#: mid-edge elevations are bilinear lookups instead of a nearest-contour query
+#: each, and no longer stair-step by the contour interval. Bump the version
+#: when the file layout changes; an older grid is then ignored.
+ELEVATION_GRID_M = 15.0
+ELEVATION_FILL_SWEEPS = 60
+ELEVATION_GRID_VERSION = 1
+#: Every edge's elevation profile is sampled from that grid at build time, at
+#: most this far apart (m), so a hill in the middle of a chunk is climbed
+#: instead of hidden between two flat endpoints. Stored as uint16 tenths of
+#: a foot; ELEVATION_PROFILE_NODATA marks a sample with no elevation.
+ELEVATION_PROFILE_STEP_M = ELEVATION_GRID_M
+ELEVATION_PROFILE_NODATA = 65535
+#: The grid is the GROUND: under a bridge it is the river. A profile that
+#: sags further than this below both of its endpoints is read as a structure
+#: spanning a dip, and falls back to the straight line between them.
+ELEVATION_PROFILE_MAX_SAG_FT = 20.0
 
 #: Bike profiles are composite mode keys -- `bike:quiet` ... `ebike:direct` --
 #: so every existing `MODE_FACTORS[mode]` lookup keeps working unchanged. Plain
@@ -1175,6 +1279,23 @@ ROUTE_GRID_M = 12.0         # endpoint snap cell (stitches segment breaks)
 ROUTE_STITCH_M = 60.0       # max connector length between components
 ROUTE_CONNECT_M = 120.0     # max trail/lane -> street junction connector
 
+#: `/map-layers/route`, `/matrix` and `/isochrone` compute on their own pool
+#: of ROUTE_WORKERS threads, not FastAPI's shared one, so a pathological trip
+#: can't starve search and tile traffic. ROUTE_QUEUE_MAX more may wait for a worker; past that the
+#: endpoint answers 503 with Retry-After: ROUTE_RETRY_AFTER_S.
+ROUTE_WORKERS = 4
+ROUTE_QUEUE_MAX = 8
+ROUTE_RETRY_AFTER_S = 5
+#: Each request's compute budget: seconds from arrival (queue wait included)
+#: and nodes/labels settled across every search it runs -- plans, fallback,
+#: alternates and options together. Searches charge it every
+#: ROUTE_BUDGET_STRIDE settles, which is also how soon a request notices
+#: that its client went away (polled every ROUTE_DISCONNECT_POLL_S).
+ROUTE_DEADLINE_S = 20.0
+ROUTE_MAX_EXPANSIONS = 4_000_000
+ROUTE_BUDGET_STRIDE = 1024
+ROUTE_DISCONNECT_POLL_S = 0.25
+
 #: How close a sidewalk has to run to a street centerline to count as that
 #: street's sidewalk. Both sidewalk CRSes are `+units=ft` (3361 and 6570 alike
 #: -- verified against spatial_ref_sys, DON'T assume 3361 is meters), so this
@@ -1288,6 +1409,55 @@ _TRAIL_PREF: _contextvars.ContextVar = _contextvars.ContextVar(
 )
 
 
+#: Per-request transit time: None for "leave now", else (local datetime,
+#: arrive_by) from `?depart_at=` / `?arrive_by=`.
+_TRANSIT_WHEN: _contextvars.ContextVar = _contextvars.ContextVar(
+    'bwg_transit_when', default=None,
+)
+
+#: This request's BCycle station fetch, started ahead of the plans by
+#: `_route_multimodal` (a Future of `_bcycle_stations()`), or None.
+_BCYCLE_PREFETCH: _contextvars.ContextVar = _contextvars.ContextVar(
+    'bwg_bcycle_prefetch', default=None,
+)
+
+#: The phase log of the graph build in progress on this thread
+#: (`_build_lap`), or None outside one.
+_BUILD_LOG: _contextvars.ContextVar = _contextvars.ContextVar(
+    'bwg_build_log', default=None,
+)
+
+#: Per-request compute budget (`_RouteBudget`); None (scripts, warm-up,
+#: background builds) means unlimited.
+_ROUTE_BUDGET: _contextvars.ContextVar = _contextvars.ContextVar(
+    'bwg_route_budget', default=None,
+)
+
+
+def _transit_when():
+    """(local datetime, arrive_by) the transit search is for."""
+    when = _TRANSIT_WHEN.get()
+    if when is not None:
+        return when
+    from datetime import datetime
+    from zoneinfo import ZoneInfo
+    return datetime.now(ZoneInfo('America/New_York')), False
+
+
+def _parse_when(value: str):
+    """`?depart_at=`/`?arrive_by=`: ISO 8601 (local time unless it says
+    otherwise) or a bare `HH:MM` for today. Raises ValueError."""
+    from datetime import datetime
+    from zoneinfo import ZoneInfo
+    tz = ZoneInfo('America/New_York')
+    value = value.strip()
+    if len(value) <= 5 and ':' in value:
+        hour, minute = (int(part) for part in value.split(':'))
+        return datetime.now(tz).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    moment = datetime.fromisoformat(value)
+    return moment.replace(tzinfo=tz) if moment.tzinfo is None else moment.astimezone(tz)
+
+
 def _is_night(now=None) -> bool:
     """Is it dark in Greenville right now (or per the request override)?"""
     override = _NIGHT_OVERRIDE.get()
@@ -1528,8 +1698,9 @@ def _osm_path_rows(debug: bool = False) -> list[tuple[list, str, str | None, boo
     ]
 
 # Transit tuning: how far someone will walk to/from a stop, how close a stop
-# must sit to its route shape to count as "on" it, minimum useful ride, an
-# average in-service bus speed, and a flat wait estimate (no stop_times yet).
+# must sit to its route shape to count as "on" it, minimum useful ride, and,
+# for when the schedule isn't loaded, an average in-service bus speed and a
+# flat wait estimate.
 TRANSIT_WALK_MAX_M = 1500.0
 TRANSIT_STOP_SNAP_M = 100.0
 TRANSIT_MIN_RIDE_M = 250.0
@@ -1538,12 +1709,34 @@ TRANSIT_WAIT_MIN = 8.0
 #: Greenlink buses carry front-load racks, so a bike widens the catchment
 #: around a stop a long way past walking distance.
 TRANSIT_BIKE_MAX_M = 5000.0
+#: Scheduled (RAPTOR) search: at most this many buses per journey, be at
+#: the stop this long before any bus you board, and count each transfer as
+#: this many minutes of travel when weighing an earlier arrival against
+#: fewer changes.
+TRANSIT_MAX_RIDES = 3
+TRANSIT_BOARD_SLACK_S = 60
+TRANSIT_TRANSFER_PENALTY_MIN = 5.0
+#: Stops this close (straight line) are a walkable transfer; the walk is
+#: timed at this detour over the straight line.
+TRANSIT_TRANSFER_MAX_M = 300.0
+TRANSIT_TRANSFER_DETOUR = 1.3
+#: Service-day views (`_timetable_day`) kept per timetable, least recently
+#: used dropped first: today and tomorrow, each both ways, with room to spare.
+TRANSIT_DAY_VIEWS = 8
 
 #: With several modes selected, the combined (transit) itinerary is preferred
 #: over the fastest single-mode plan as long as it isn't slower than this
 #: factor — picking bike + bus means "use them together", not "race them".
 MULTIMODAL_MAX_SLOWDOWN = 1.6
 
+#: Threads every request shares for its GBFS prefetch: `_route_multimodal`
+#: starts the BCycle fetch ahead of its plans so the round trip overlaps
+#: them (the plans themselves run one after another: pure-Python searches
+#: take turns on the GIL). A fetch the pool hasn't started by the time the
+#: bike-share plan needs it is taken back and run on the request's own
+#: thread (`_prefetch_result`), so a busy pool costs overlap, never a wait.
+ROUTE_PREFETCH_WORKERS = 4
+
 #: Alternate routes (`?alt=N`): edges the previous route used cost this much
 #: extra on the next pass. High enough to prefer a real parallel option,
 #: low enough that when none exists the same route comes back (which the
@@ -1551,6 +1744,30 @@ MULTIMODAL_MAX_SLOWDOWN = 1.6
 ALT_AVOID_FACTOR = 1.5
 ALT_MAX = 3
 
+#: Route options (`?alternatives=k`): one multi-criteria search over cost,
+#: distance and climb (`_pareto_paths`) instead of k penalized passes. It's
+#: a bounded approximation of the trade-off front, not the front itself. Two
+#: routes within PARETO_EPSILON of each other on distance and on climb
+#: (or PARETO_CLIMB_TOL_M of climb) are the same option to a rider, so the
+#: search keeps only one of them -- the cheaper.
+PARETO_MAX_OPTIONS = ALT_MAX + 1
+PARETO_EPSILON = 0.05
+PARETO_CLIMB_TOL_M = 1.5
+#: Labels (partial routes) kept per node, cheapest first. Bounds the search
+#: on a grid, where every block offers another near-identical way across.
+PARETO_NODE_LABELS = 4
+#: Options costing more than this multiple of the recommended route are not
+#: offered: a flatter way that runs down an arterial is not a choice.
+PARETO_COST_SLACK = 1.5
+#: An option shares at most this fraction of its length with each option
+#: already picked; past that it is the same route with a jog.
+PARETO_MAX_OVERLAP = 0.7
+#: Labels popped before the search settles for the options it has.
+#: `scripts/graph_bench.py` on its 120x120 lattice (~15k nodes): p99 13.5k
+#: pops for a bike, 17k at most, at ~23 us each, so this leaves 3x room and
+#: caps a search at about a second.
+PARETO_MAX_POPS = 50_000
+
 # Bike share (Greenville BCycle): how far someone will walk to a dock, how
 # long a ride has to be to justify the trip to one, and the unlock overhead.
 BIKESHARE_WALK_MAX_M = 1200.0
@@ -1560,8 +1777,9 @@ BIKESHARE_UNLOCK_MIN = 3.0
 M_PER_DEG_LAT = 111320.0
 _COSLAT = math.cos(math.radians(34.85))  # Greenville-latitude lon scale
 
-_GRAPH: dict[str, Any] = {'epoch': 0.0, 'nodes': None, 'adj': None}
+_GRAPH: dict[str, Any] = {'epoch': 0.0, 'offsets': None}
 _GRAPH_LOCK = threading.Lock()
+_GRAPH_REFRESHING = threading.Event()
 _GRAPH_TTL_SECONDS = 24 * 60 * 60
 
 
@@ -1571,25 +1789,348 @@ def _equirect_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return (dx * dx + dy * dy) ** 0.5
 
 
-def _sidewalk_exists_sql(alias: str, srid: int) -> str:
-    """SQL boolean: does a sidewalk run alongside this segment?
+#: Per-segment safety context (posted speed, crash score, streetlights, the
+#: stress under a painted lane, sidewalk presence) lives in a materialized
+#: table keyed by a hash of each segment's geometry and name. Computing it
+#: inline -- five correlated subqueries per row over ~28k segments -- was most
+#: of a graph build. `_refresh_route_context` keeps it current with set-based
+#: spatial joins, and only for segments that are new, or near an input point
+#: or line that changed since the last refresh: every input's rows are
+#: fingerprinted into ROUTE_CONTEXT_INPUTS_TABLE and diffed each time.
+ROUTE_CONTEXT_SCHEMA = 'public'
+ROUTE_CONTEXT_TABLE = 'map_layers_route_context'
+ROUTE_CONTEXT_INPUTS_TABLE = 'map_layers_route_context_inputs'
+
+
+def _route_segment_sources(conn) -> list[tuple[str, str, str, int, str, str | None]]:
+    """(kind, schema, table, srid, SQL name expression, WHERE) for every
+    segment that carries context. Street segments only: the trail and the
+    path layers are their own car-free surface."""
+    sources = []
+    for layer_id, name_expr, where in (
+        ('bike-stress', 'src."street_name"', None),
+        # PROPOSED lanes are paint that does not exist yet — pricing them as
+        # real bike lanes routed riders onto bare arterials (133 rows). And a
+        # SHARROW is paint saying "share the road", not infrastructure (322
+        # rows priced like real lanes made scary streets read cheap); the
+        # street itself is already in the stress data.
+        ('bike-lanes', 'src."STREET_NAM"',
+         'COALESCE(src."STATUS", \'\') != \'PROPOSED\' '
+         'AND COALESCE(src."BIKE_TYPE", \'\') != \'SHARROW\''),
+    ):
+        pipe = _layer_pipe(LAYERS[layer_id])
+        schema = pipe.parameters.get('schema') or 'public'
+        srid = _layer_srid(layer_id, conn, schema, pipe.target)
+        sources.append((layer_id, schema, pipe.target, srid, name_expr, where))
+    # County centerlines PCC never rated (~3.2k of 35k): without them the
+    # graph has holes exactly where quiet residential streets live — the
+    # Springer St bug: PCC carries only an 8 m stub east of the Church St
+    # tunnel, so the tunnel dead-ended and routes escaped over Church St.
+    # Interstates/US highways excluded: PCC skipping those was a decision,
+    # not a gap.
+    sp_schema, sp_table, sp_srid = SPEED_SOURCE
+    sources.append((
+        'gap', sp_schema, sp_table, sp_srid, 'src."LABEL"',
+        '''COALESCE(src."FEAT_CODE", 0) NOT IN (1370, 1371)
+        AND NOT EXISTS (
+            SELECT 1 FROM "pcc"."stress_levels" AS s
+            -- Midpoint test, not whole-line: a street whose ENDPOINT touches
+            -- a rated junction is still unrated along its length (Springer
+            -- St east of the tunnel was excluded by its own 8 m PCC stub).
+            WHERE ST_DWithin(s."geometry", ST_PointOnSurface(src."geometry"), 80)
+        )''',
+    ))
+    return sources
+
+
+def _seg_key_sql(kind: str, name_expr: str) -> str:
+    """SQL for a segment's context key. Context depends on nothing but where
+    the segment is and what it's called, so an edited row is simply a new
+    key and a deleted one an orphan."""
+    return (
+        f"md5('{kind}' || encode(ST_AsEWKB(src.\"geometry\"), 'hex') "
+        f"|| COALESCE(({name_expr})::text, ''))"
+    )
 
-    One indexed `ST_DWithin` per sidewalk source. The street geometry is what
-    gets transformed (never the sidewalk column) so each source's GiST index
-    still applies -- without that this is a 28k x 24k nested loop.
-    """
-    tests = []
-    for i, (sw_schema, sw_table, sw_srid) in enumerate(SIDEWALK_SOURCES):
-        street_geom = (
-            f'{alias}."geometry"'
-            if srid == sw_srid
-            else f'ST_Transform({alias}."geometry", {sw_srid})'
+
+def _route_context_script(conn) -> str:
+    """The statements that bring ROUTE_CONTEXT_TABLE up to date, to run as
+    one transaction (`_refresh_route_context`)."""
+    ctx = f'"{ROUTE_CONTEXT_SCHEMA}"."{ROUTE_CONTEXT_TABLE}"'
+    inputs = f'"{ROUTE_CONTEXT_SCHEMA}"."{ROUTE_CONTEXT_INPUTS_TABLE}"'
+    sp_schema, sp_table, sp_srid = SPEED_SOURCE
+    cr_schema, cr_table = CRASH_SOURCE
+    li_schema, li_table = LIGHT_SOURCE
+    # Both point sources are 4326: a degree radius against the segment's 4326
+    # copy. Slightly anisotropic at this latitude; fine for scoring.
+    crash_deg = CRASH_NEAR_FT / FT_PER_M / M_PER_DEG_LAT
+    light_deg = LIGHT_NEAR_FT / FT_PER_M / M_PER_DEG_LAT
+
+    sql = [
+        # Concurrent refreshes queue instead of racing.
+        f"SELECT pg_advisory_xact_lock(hashtext('{ROUTE_CONTEXT_TABLE}'))",
+        f'''CREATE TABLE IF NOT EXISTS {ctx} (
+            "seg_key" TEXT PRIMARY KEY,
+            "seg_kind" TEXT NOT NULL,
+            "seg_name" TEXT,
+            "geom_4326" geometry,
+            "geom_sp" geometry,
+            "mid_sp" geometry,
+            "speed_mph" DOUBLE PRECISION,
+            "crash_score" DOUBLE PRECISION,
+            "lights" INTEGER,
+            "lane_stress" TEXT,
+            "has_sidewalk" BOOLEAN,
+            "computed_at" TIMESTAMPTZ
+        )''',
+        f'CREATE INDEX IF NOT EXISTS "{ROUTE_CONTEXT_TABLE}_geom_4326" '
+        f'ON {ctx} USING GIST ("geom_4326")',
+        f'CREATE INDEX IF NOT EXISTS "{ROUTE_CONTEXT_TABLE}_geom_sp" '
+        f'ON {ctx} USING GIST ("geom_sp")',
+        f'CREATE INDEX IF NOT EXISTS "{ROUTE_CONTEXT_TABLE}_mid_sp" '
+        f'ON {ctx} USING GIST ("mid_sp")',
+        f'''CREATE TABLE IF NOT EXISTS {inputs} (
+            "source" TEXT NOT NULL,
+            "input_key" TEXT NOT NULL,
+            "geometry" geometry,
+            PRIMARY KEY ("source", "input_key")
+        )''',
+        f'CREATE INDEX IF NOT EXISTS "{ROUTE_CONTEXT_INPUTS_TABLE}_geometry" '
+        f'ON {inputs} USING GIST ("geometry")',
+    ]
+
+    # 1. Segments: drop context for rows that no longer exist, queue new ones.
+    sql.append(
+        'CREATE TEMP TABLE "_route_segments" ('
+        '"seg_key" TEXT, "seg_kind" TEXT, "seg_name" TEXT, "geom_4326" geometry, '
+        '"geom_sp" geometry, "mid_sp" geometry) ON COMMIT DROP'
+    )
+    for kind, schema, table, _srid, name_expr, where in _route_segment_sources(conn):
+        sql.append(f'''INSERT INTO "_route_segments"
+        SELECT
+            {_seg_key_sql(kind, name_expr)},
+            '{kind}',
+            ({name_expr})::text,
+            ST_Transform(src."geometry", 4326),
+            ST_Transform(src."geometry", {sp_srid}),
+            -- ST_PointOnSurface: a point ON the line for any geometry type
+            -- (MultiLineString included, where interpolation would throw).
+            ST_Transform(ST_PointOnSurface(src."geometry"), {sp_srid})
+        FROM "{schema}"."{table}" AS src
+        WHERE src."geometry" IS NOT NULL
+        {f'AND {where}' if where else ''}''')
+    sql += [
+        f'''DELETE FROM {ctx} AS c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM "_route_segments" AS s WHERE s."seg_key" = c."seg_key"
+        )''',
+        f'''INSERT INTO {ctx} ("seg_key", "seg_kind", "seg_name", "geom_4326",
+            "geom_sp", "mid_sp")
+        SELECT DISTINCT ON (s."seg_key") s."seg_key", s."seg_kind", s."seg_name",
+            s."geom_4326", s."geom_sp", s."mid_sp"
+        FROM "_route_segments" AS s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {ctx} AS c WHERE c."seg_key" = s."seg_key"
+        )''',
+    ]
+
+    # 2. Inputs: diff each against its fingerprints from the last refresh and
+    #    requeue the segments within reach of anything added or removed.
+    #    (source, schema.table, SRID, fingerprinted columns, WHERE,
+    #     context geometry column + radius, kinds it feeds)
+    input_sources = [
+        ('speed', f'"{sp_schema}"."{sp_table}"', sp_srid, '"SPEED"',
+         '"SPEED" IS NOT NULL', '"mid_sp"', SPEED_NEAR_FT,
+         ('bike-stress', 'bike-lanes')),
+        ('crash', f'"{cr_schema}"."{cr_table}"', 4326,
+         '"persons_killed", "persons_injured"', None, '"geom_4326"', crash_deg,
+         None),
+        ('light', f'"{li_schema}"."{li_table}"', 4326, 'NULL', None,
+         '"geom_4326"', light_deg, None),
+        ('stress', '"pcc"."stress_levels"', sp_srid,
+         '"stress_level", "street_name"', None, '"mid_sp"', 200,
+         ('bike-lanes',)),
+    ] + [
+        (f'sidewalk:{sw_schema}.{sw_table}', f'"{sw_schema}"."{sw_table}"',
+         sw_srid, 'NULL', None, '"geom_sp"', SIDEWALK_NEAR_FT, None)
+        for sw_schema, sw_table, sw_srid in SIDEWALK_SOURCES
+    ]
+    for source, table, srid, columns, where, ctx_geom, radius, kinds in input_sources:
+        # Ordinal among identical rows keeps duplicates counted (two crashes
+        # at one point are two crashes; losing one must change the set).
+        digest = (
+            f"md5(encode(ST_AsEWKB(\"geometry\"), 'hex') "
+            f"|| COALESCE(ROW({columns})::text, ''))"
+        )
+        # The changed geometry is moved into the context column's CRS (not
+        # the other way round) so the GiST index on the context side applies.
+        ctx_srid = 4326 if ctx_geom == '"geom_4326"' else sp_srid
+        changed_geom = (
+            'ch."geometry"' if srid == ctx_srid
+            else f'ST_Transform(ch."geometry", {ctx_srid})'
         )
-        tests.append(
-            f'EXISTS (SELECT 1 FROM "{sw_schema}"."{sw_table}" AS sw{i} '
-            f'WHERE ST_DWithin(sw{i}."geometry", {street_geom}, {SIDEWALK_NEAR_FT}))'
+        sql += [
+            f'''CREATE TEMP TABLE "_route_input" ON COMMIT DROP AS
+            SELECT
+                {digest} || ':' || ROW_NUMBER() OVER (PARTITION BY {digest})
+                    AS "input_key",
+                "geometry"
+            FROM {table}
+            WHERE "geometry" IS NOT NULL {f'AND {where}' if where else ''}''',
+            f'''CREATE TEMP TABLE "_route_changed" ON COMMIT DROP AS
+            SELECT cur."geometry" FROM "_route_input" AS cur
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {inputs} AS i
+                WHERE i."source" = '{source}' AND i."input_key" = cur."input_key"
+            )
+            UNION ALL
+            SELECT i."geometry" FROM {inputs} AS i
+            WHERE i."source" = '{source}'
+              AND NOT EXISTS (
+                SELECT 1 FROM "_route_input" AS cur
+                WHERE cur."input_key" = i."input_key"
+            )''',
+            f'''UPDATE {ctx} AS c SET "computed_at" = NULL
+            WHERE c."computed_at" IS NOT NULL
+              {f"AND c.seg_kind IN ({', '.join(repr(k) for k in kinds)})" if kinds else ''}
+              AND EXISTS (
+                SELECT 1 FROM "_route_changed" AS ch
+                WHERE ST_DWithin(c.{ctx_geom}, {changed_geom}, {radius})
+            )''',
+            f'''DELETE FROM {inputs} AS i
+            WHERE i."source" = '{source}'
+              AND NOT EXISTS (
+                SELECT 1 FROM "_route_input" AS cur
+                WHERE cur."input_key" = i."input_key"
+            )''',
+            f'''INSERT INTO {inputs} ("source", "input_key", "geometry")
+            SELECT '{source}', cur."input_key", cur."geometry"
+            FROM "_route_input" AS cur
+            ON CONFLICT DO NOTHING''',
+            'DROP TABLE "_route_input"',
+            'DROP TABLE "_route_changed"',
+        ]
+
+    # 3. Recompute the queue, one set-based join per column.
+    pending = 'p."computed_at" IS NULL'
+    streets = "p.\"seg_kind\" IN ('bike-stress', 'bike-lanes')"
+    sql += [
+        f'''UPDATE {ctx} AS p SET "speed_mph" = NULL, "crash_score" = 0,
+            "lights" = 0, "lane_stress" = NULL, "has_sidewalk" = FALSE
+        WHERE {pending}''',
+        # Posted speed of the nearest centerline to the segment's midpoint.
+        # Midpoint-nearest, not ST_DWithin against the whole segment: every
+        # side street touches an arterial at the intersection, and
+        # MAX-within-80ft would escalate them all. (Gap rows ARE centerlines
+        # and read their own speed.)
+        f'''UPDATE {ctx} AS c SET "speed_mph" = n."speed_mph"
+        FROM (
+            SELECT DISTINCT ON (p."seg_key") p."seg_key",
+                NULLIF(cl."SPEED", 0) AS "speed_mph"
+            FROM {ctx} AS p
+            JOIN "{sp_schema}"."{sp_table}" AS cl
+              ON cl."SPEED" IS NOT NULL
+             AND ST_DWithin(cl."geometry", p."mid_sp", {SPEED_NEAR_FT})
+            WHERE {pending} AND {streets}
+            ORDER BY p."seg_key", cl."geometry" <-> p."mid_sp"
+        ) AS n
+        WHERE c."seg_key" = n."seg_key"''',
+        f'''UPDATE {ctx} AS c SET "crash_score" = n."crash_score"
+        FROM (
+            SELECT p."seg_key", SUM(CASE
+                WHEN cr."persons_killed" > 0 THEN {CRASH_W_FATAL}
+                WHEN cr."persons_injured" > 0 THEN {CRASH_W_INJURY}
+                ELSE {CRASH_W_OTHER}
+            END) AS "crash_score"
+            FROM {ctx} AS p
+            JOIN "{cr_schema}"."{cr_table}" AS cr
+              ON cr."geometry" IS NOT NULL
+             AND ST_DWithin(cr."geometry", p."geom_4326", {crash_deg})
+            WHERE {pending}
+            GROUP BY p."seg_key"
+        ) AS n
+        WHERE c."seg_key" = n."seg_key"''',
+        f'''UPDATE {ctx} AS c SET "lights" = n."lights"
+        FROM (
+            SELECT p."seg_key", COUNT(*) AS "lights"
+            FROM {ctx} AS p
+            JOIN "{li_schema}"."{li_table}" AS sl
+              ON ST_DWithin(sl."geometry", p."geom_4326", {light_deg})
+            WHERE {pending}
+            GROUP BY p."seg_key"
+        ) AS n
+        WHERE c."seg_key" = n."seg_key"''',
+        # The stress rating of the street a bike lane is painted on. Prefer
+        # the nearest stress segment with the SAME street name — a short lane
+        # piece at a junction sits closer to the cross-street's rating
+        # (Church St's lane matched Springer's L at the tunnel portal) — then
+        # fall back to plain nearest.
+        f'''UPDATE {ctx} AS c SET "lane_stress" = n."lane_stress"
+        FROM (
+            SELECT DISTINCT ON (p."seg_key") p."seg_key",
+                s."stress_level" AS "lane_stress"
+            FROM {ctx} AS p
+            JOIN "pcc"."stress_levels" AS s
+              ON ST_DWithin(s."geometry", p."mid_sp", 200)
+             AND (
+                s."street_name" = p."seg_name"
+                OR ST_DWithin(s."geometry", p."mid_sp", {SPEED_NEAR_FT})
+             )
+            WHERE {pending} AND p."seg_kind" = 'bike-lanes'
+            ORDER BY p."seg_key",
+                COALESCE(s."street_name" = p."seg_name", FALSE) DESC,
+                s."geometry" <-> p."mid_sp"
+        ) AS n
+        WHERE c."seg_key" = n."seg_key"''',
+    ]
+    # Sidewalks: the STREET side is transformed (never the sidewalk column)
+    # so each source's GiST index still applies -- without that this is a
+    # 28k x 24k nested loop.
+    for sw_schema, sw_table, sw_srid in SIDEWALK_SOURCES:
+        street_geom = (
+            'p."geom_sp"' if sw_srid == sp_srid
+            else f'ST_Transform(p."geom_sp", {sw_srid})'
         )
-    return '(' + ' OR '.join(tests) + ')'
+        sql.append(f'''UPDATE {ctx} AS c SET "has_sidewalk" = TRUE
+        FROM (
+            SELECT DISTINCT p."seg_key"
+            FROM {ctx} AS p
+            JOIN "{sw_schema}"."{sw_table}" AS sw
+              ON ST_DWithin(sw."geometry", {street_geom}, {SIDEWALK_NEAR_FT})
+            WHERE {pending}
+        ) AS n
+        WHERE c."seg_key" = n."seg_key"''')
+    sql.append(f'UPDATE {ctx} AS p SET "computed_at" = now() WHERE {pending}')
+    return ';\n'.join(sql) + ';'
+
+
+def _refresh_route_context(debug: bool = False) -> bool:
+    """Bring ROUTE_CONTEXT_TABLE up to date (see `_route_context_script`).
+    Run by `export route_context` and `export route_graph`, never by a graph
+    build. On failure the table keeps the last refresh."""
+    conn = _layer_pipe(LAYERS['bike-stress']).instance_connector
+    started = time.time()
+    try:
+        script = _route_context_script(conn)
+        # One transaction, committed or rolled back whole: the temp tables
+        # are ON COMMIT DROP and the advisory lock is held until the end.
+        with conn.engine.begin() as db:
+            db.exec_driver_sql(script)
+    except Exception as e:
+        warn(f"Route context refresh failed: {e}")
+        return False
+    if debug:
+        info(f"Route context refreshed in {time.time() - started:.1f} s.")
+    return True
+
+
+def _route_context_ready(conn) -> bool:
+    """Whether ROUTE_CONTEXT_TABLE has been created (by a refresh)."""
+    df = conn.read(
+        f"SELECT to_regclass('\"{ROUTE_CONTEXT_SCHEMA}\".\"{ROUTE_CONTEXT_TABLE}\"') "
+        'IS NOT NULL AS "ready"'
+    )
+    return df is not None and len(df) > 0 and bool(df['ready'][0])
 
 
 def _route_source_rows(debug: bool = False) -> list[tuple[list, str, str, bool]]:
@@ -1598,127 +2139,65 @@ def _route_source_rows(debug: bool = False) -> list[tuple[list, str, str, bool]]
     simplification preserves endpoints, so connectivity is unaffected. The
     name feeds turn-by-turn instructions ("Turn right onto Main St"); the
     sidewalk flag feeds walk/roll weighting and the "this stretch may have no
-    sidewalk" disclosure.
+    sidewalk" disclosure. Street rows also carry their safety context, read
+    from the route context table as `export route_context` last left it.
     """
     import json
 
+    ctx = f'"{ROUTE_CONTEXT_SCHEMA}"."{ROUTE_CONTEXT_TABLE}"'
+    conn = _layer_pipe(LAYERS['bike-stress']).instance_connector
+    has_context = _route_context_ready(conn)
+    if not has_context:
+        warn(
+            "The route context table is missing: building without speed, crash, "
+            "lighting and sidewalk context. Run `mrsm export route_context`."
+        )
+    segment_sources = {
+        kind: (schema, table, srid, name_expr, where)
+        for kind, schema, table, srid, name_expr, where
+        in _route_segment_sources(conn)
+    }
+    srt_pipe = _layer_pipe(LAYERS['srt'])
+    srt_schema = srt_pipe.parameters.get('schema') or 'public'
+    srt_srid = _layer_srid('srt', conn, srt_schema, srt_pipe.target)
     sources = [
-        # (layer, category, SQL name expression, check sidewalks?, WHERE)
-        # category = stress_level per row for bike-stress:
-        ('bike-stress', None, '"street_name"', True, None),
-        # PROPOSED lanes are paint that does not exist yet — pricing them as
-        # real bike lanes routed riders onto bare arterials (133 rows). And a
-        # SHARROW is paint saying "share the road", not infrastructure (322
-        # rows priced like real lanes made scary streets read cheap); the
-        # street itself is already in the stress data.
-        ('bike-lanes', 'bike-lane', '"STREET_NAM"', True,
-         'COALESCE(src."STATUS", \'\') != \'PROPOSED\' '
-         'AND COALESCE(src."BIKE_TYPE", \'\') != \'SHARROW\''),
+        # (kind, category SQL, schema, table, srid, name SQL, WHERE)
+        # category = stress_level per row for bike-stress; gap centerlines
+        # start at 'L' (PCC rates most residentials L) and are floored by
+        # posted speed like every other street.
+        ('bike-stress', 'src."stress_level"', *segment_sources['bike-stress']),
+        ('bike-lanes', "'bike-lane'", *segment_sources['bike-lanes']),
+        ('gap', "'L'", *segment_sources['gap']),
         # The trail IS the walking surface; asking whether it has a sidewalk
-        # is a category error.
-        ('srt', 'srt', "'Prisma Health Swamp Rabbit Trail'", False, None),
+        # is a category error. No context: it's its own car-free surface.
+        ('srt', "'srt'", srt_schema, srt_pipe.target, srt_srid,
+         "'Prisma Health Swamp Rabbit Trail'", None),
     ]
     rows = []
-    for layer_id, category, name_expr, check_sidewalks, where in sources:
-        layer = LAYERS[layer_id]
-        pipe = _layer_pipe(layer)
-        conn = pipe.instance_connector
-        schema = pipe.parameters.get('schema') or 'public'
-        target = pipe.target
-        srid = _layer_srid(layer_id, conn, schema, target)
+    for kind, cat_sql, schema, table, srid, name_expr, where in sources:
         tolerance = (5 / M_PER_DEG_LAT) if srid == 4326 else (5 * FT_PER_M)
-        cat_col = (
-            '"stress_level" AS "category"'
-            if layer_id == 'bike-stress'
-            else f"'{category}' AS \"category\""
-        )
-        sidewalk_col = (
-            f'{_sidewalk_exists_sql("src", srid)} AS "has_sidewalk"'
-            if check_sidewalks
-            else 'TRUE AS "has_sidewalk"'
-        )
-        # Posted speed of the nearest centerline to the segment's midpoint
-        # (stress rows only). Midpoint-nearest, not ST_DWithin against the
-        # whole segment: every side street touches an arterial at the
-        # intersection, and MAX-within-80ft would escalate them all.
-        sp_schema, sp_table, sp_srid = SPEED_SOURCE
-        # ST_PointOnSurface: a point ON the line for any geometry type
-        # (MultiLineString included, where interpolation would throw).
-        mid = f'ST_Transform(ST_PointOnSurface(src."geometry"), {sp_srid})'
-        # Streets and painted lanes carry the safety context columns; the
-        # trail is its own car-free surface and skips all of them.
-        is_street = layer_id in ('bike-stress', 'bike-lanes')
-        speed_col = (
-            f'''(
-                SELECT NULLIF(cl."SPEED", 0)
-                FROM "{sp_schema}"."{sp_table}" AS cl
-                WHERE cl."SPEED" IS NOT NULL
-                  AND ST_DWithin(cl."geometry", {mid}, {SPEED_NEAR_FT})
-                ORDER BY cl."geometry" <-> {mid}
-                LIMIT 1
-            ) AS "speed_mph"'''
-            if is_street
-            else 'NULL AS "speed_mph"'
-        )
-        cr_schema, cr_table = CRASH_SOURCE
-        li_schema, li_table = LIGHT_SOURCE
-        # Both point sources are 4326: transform the STREET side (never the
-        # indexed point column — same lesson as the sidewalk join) and use a
-        # degree radius. Slightly anisotropic at this latitude; fine for
-        # scoring.
-        street_4326 = 'ST_Transform(src."geometry", 4326)'
-        crash_deg = CRASH_NEAR_FT / FT_PER_M / M_PER_DEG_LAT
-        light_deg = LIGHT_NEAR_FT / FT_PER_M / M_PER_DEG_LAT
-        crash_col = (
-            f'''(
-                SELECT COALESCE(SUM(CASE
-                    WHEN c."persons_killed" > 0 THEN {CRASH_W_FATAL}
-                    WHEN c."persons_injured" > 0 THEN {CRASH_W_INJURY}
-                    ELSE {CRASH_W_OTHER}
-                END), 0)
-                FROM "{cr_schema}"."{cr_table}" AS c
-                WHERE c."geometry" IS NOT NULL
-                  AND ST_DWithin(c."geometry", {street_4326}, {crash_deg})
-            ) AS "crash_score"'''
-            if is_street
-            else '0 AS "crash_score"'
-        )
-        light_col = (
-            f'''(
-                SELECT COUNT(*)
-                FROM "{li_schema}"."{li_table}" AS sl
-                WHERE ST_DWithin(sl."geometry", {street_4326}, {light_deg})
-            ) AS "lights"'''
-            if is_street
-            else 'NULL AS "lights"'
-        )
-        # The stress rating of the street a bike lane is painted on. Prefer
-        # the nearest stress segment with the SAME street name — a short
-        # lane piece at a junction sits closer to the cross-street's rating
-        # (Church St's lane matched Springer's L at the tunnel portal) —
-        # then fall back to plain nearest.
-        lane_stress_col = (
-            f'''COALESCE(
-                (
-                    SELECT s."stress_level"
-                    FROM "pcc"."stress_levels" AS s
-                    WHERE s."street_name" = src."STREET_NAM"
-                      AND ST_DWithin(s."geometry", {mid}, 200)
-                    ORDER BY s."geometry" <-> {mid}
-                    LIMIT 1
-                ),
-                (
-                    SELECT s."stress_level"
-                    FROM "pcc"."stress_levels" AS s
-                    WHERE ST_DWithin(s."geometry", {mid}, {SPEED_NEAR_FT})
-                    ORDER BY s."geometry" <-> {mid}
-                    LIMIT 1
-                )
-            ) AS "lane_stress"'''
-            if layer_id == 'bike-lanes'
-            else 'NULL AS "lane_stress"'
-        )
-        len_col = 'ST_Length(ST_Transform(src."geometry", 4326)::geography) AS "len_m"'
+        if kind == 'srt':
+            context_cols = '''TRUE AS "has_sidewalk", NULL AS "speed_mph",
+            0 AS "crash_score", NULL AS "lights", NULL AS "lane_stress"'''
+            context_join = ''
+        elif not has_context:
+            context_cols = f'''FALSE AS "has_sidewalk",
+            {'NULLIF(src."SPEED", 0)' if kind == 'gap' else 'NULL'} AS "speed_mph",
+            0 AS "crash_score", NULL AS "lights", NULL AS "lane_stress"'''
+            context_join = ''
+        else:
+            speed_col = (
+                'NULLIF(src."SPEED", 0)' if kind == 'gap' else 'ctx."speed_mph"'
+            )
+            context_cols = f'''COALESCE(ctx."has_sidewalk", FALSE) AS "has_sidewalk",
+            {speed_col} AS "speed_mph",
+            COALESCE(ctx."crash_score", 0) AS "crash_score",
+            ctx."lights" AS "lights",
+            ctx."lane_stress" AS "lane_stress"'''
+            context_join = (
+                f'LEFT JOIN {ctx} AS ctx '
+                f'ON ctx."seg_key" = {_seg_key_sql(kind, name_expr)}'
+            )
         query = f'''
         SELECT
             ST_AsGeoJSON(
@@ -1730,18 +2209,18 @@ def _route_source_rows(debug: bool = False) -> list[tuple[list, str, str, bool]]
                 ),
                 5
             ) AS "gj",
-            {cat_col},
+            {cat_sql} AS "category",
             {name_expr} AS "name",
-            {sidewalk_col},
-            {speed_col},
-            {crash_col},
-            {light_col},
-            {lane_stress_col},
-            {len_col}
-        FROM "{schema}"."{target}" AS src
-        {f'WHERE {where}' if where else ''}
+            {context_cols},
+            ST_Length(ST_Transform(src."geometry", 4326)::geography) AS "len_m"
+        FROM "{schema}"."{table}" AS src
+        {context_join}
+        WHERE src."geometry" IS NOT NULL
+        {f'AND {where}' if where else ''}
         '''
         df = conn.read(query, debug=debug)
+        _build_lap(f'rows.sql.{kind}', rows=len(df))
+        is_street = kind != 'srt'
 
         def _num(rec, key):
             value = rec.get(key)
@@ -1795,91 +2274,11 @@ def _route_source_rows(debug: bool = False) -> list[tuple[list, str, str, bool]]
                         (sub, category, name, has_sidewalk, danger, lit,
                          lane_stress)
                     )
-    # County centerlines PCC never rated (~3.2k of 35k): without them the
-    # graph has holes exactly where quiet residential streets live — the
-    # Springer St bug: PCC carries only an 8 m stub east of the Church St
-    # tunnel, so the tunnel dead-ended and routes escaped over Church St.
-    # Base rating 'L' (PCC rates most residentials L), floored by posted
-    # speed like every other street. Interstates/US highways excluded: PCC
-    # skipping those was a decision, not a gap.
-    sp_schema, sp_table, sp_srid = SPEED_SOURCE
-    street_4326 = 'ST_Transform(src."geometry", 4326)'
-    crash_deg = CRASH_NEAR_FT / FT_PER_M / M_PER_DEG_LAT
-    light_deg = LIGHT_NEAR_FT / FT_PER_M / M_PER_DEG_LAT
-    cr_schema, cr_table = CRASH_SOURCE
-    li_schema, li_table = LIGHT_SOURCE
-    gap_query = f'''
-    SELECT
-        ST_AsGeoJSON(
-            ST_Force2D(
-                ST_Transform(
-                    ST_SimplifyPreserveTopology(src."geometry", {5 * FT_PER_M}),
-                    4326
-                )
-            ),
-            5
-        ) AS "gj",
-        src."LABEL" AS "name",
-        NULLIF(src."SPEED", 0) AS "speed_mph",
-        {_sidewalk_exists_sql("src", sp_srid)} AS "has_sidewalk",
-        (
-            SELECT COALESCE(SUM(CASE
-                WHEN c."persons_killed" > 0 THEN {CRASH_W_FATAL}
-                WHEN c."persons_injured" > 0 THEN {CRASH_W_INJURY}
-                ELSE {CRASH_W_OTHER}
-            END), 0)
-            FROM "{cr_schema}"."{cr_table}" AS c
-            WHERE c."geometry" IS NOT NULL
-              AND ST_DWithin(c."geometry", {street_4326}, {crash_deg})
-        ) AS "crash_score",
-        (
-            SELECT COUNT(*)
-            FROM "{li_schema}"."{li_table}" AS sl
-            WHERE ST_DWithin(sl."geometry", {street_4326}, {light_deg})
-        ) AS "lights",
-        ST_Length(ST_Transform(src."geometry", 4326)::geography) AS "len_m"
-    FROM "{sp_schema}"."{sp_table}" AS src
-    WHERE COALESCE(src."FEAT_CODE", 0) NOT IN (1370, 1371)
-      AND NOT EXISTS (
-        SELECT 1 FROM "pcc"."stress_levels" AS s
-        -- Midpoint test, not whole-line: a street whose ENDPOINT touches a
-        -- rated junction is still unrated along its length (Springer St
-        -- east of the tunnel was excluded by its own 8 m PCC stub).
-        WHERE ST_DWithin(s."geometry", ST_PointOnSurface(src."geometry"), 80)
-      )
-    '''
-    conn = _layer_pipe(LAYERS['bike-stress']).instance_connector
-    gap_df = conn.read(gap_query, debug=debug)
-    for rec in gap_df.to_dict(orient='records'):
-        gj = rec.get('gj')
-        if not gj:
-            continue
-        geom = json.loads(gj)
-        parts = (
-            geom['coordinates']
-            if geom['type'] == 'MultiLineString'
-            else [geom['coordinates']]
-        )
-        name = rec.get('name')
-        name = None if not name or str(name).strip() in ('', 'N/A', 'None') else _gis_rename(str(name).strip())
-        speed = rec.get('speed_mph')
-        speed = None if speed is None or speed != speed else float(speed)
-        category = _stress_floor('L', speed)
-        len_m = rec.get('len_m') or 0.0
-        crash_score = rec.get('crash_score') or 0.0
-        danger = _danger_factor(crash_score / len_m * 100.0) if len_m > 0 else 1.0
-        lights = rec.get('lights')
-        lit = (
-            True if lights is None or len_m <= 0
-            else float(lights) * LIT_SPACING_M >= len_m
-        )
-        for part in parts:
-            if len(part) < 2 or _tunnel_roof(name, part):
-                continue
-            for sub in _clip_grade_separated(name, part):
-                rows.append((sub, category, name, bool(rec.get('has_sidewalk')), danger, lit))
+    _build_lap('rows.parse', rows=len(rows))
     # OSM cycleways, paths and tunnels: the shortcuts no county layer maps.
-    rows.extend(_osm_path_rows(debug=debug))
+    osm_rows = _osm_path_rows(debug=debug)
+    rows.extend(osm_rows)
+    _build_lap('rows.osm', rows=len(osm_rows))
     # Curated off-grid connectors (tunnels, cut-throughs): straight from the
     # CUSTOM_PATHS constant, no database involved. Category 'path' is its own
     # surface, so no sidewalk check applies.
@@ -1914,23 +2313,90 @@ def _subdivide(coords: list) -> list[list]:
     return chunks
 
 
-def _build_route_graph(debug: bool = False) -> dict[str, Any]:
-    """nodes: cell -> (lat, lon); adj: cell -> list of
-    (nbr, weight, length_m, category, coords, reversed?, name, has_sidewalk).
-    `has_sidewalk` is None for synthetic connectors (unknown, and too short to
-    be worth warning about). Largest connected component only, so off-island
-    termini snap to routable nodes."""
-    nodes: dict = {}
-    adj: dict = {}
-    street_nodes: set = set()
-    path_nodes: set = set()
-    # Street name (suffix-stripped) -> chunk-endpoint nodes, for wiring
-    # tunnel portals back to their own street below.
-    name_nodes: dict = {}
-    # (portal node, street name) for every tunnel row's two ends.
-    tunnel_portals: list = []
-
-    def _node(lon: float, lat: float, tunnel: bool = False):
+def _normalize_route_row(row: tuple) -> tuple:
+    """A `_route_source_rows` row as (coords, category, name, has_sidewalk,
+    extras, tunnel), with the category the graph will actually use."""
+    # Rows may be legacy 4-tuples (tests, custom paths) or carry the
+    # (danger, lit, lane_stress, tunnel) context as elements 5-8.
+    coords, category, name, has_sidewalk = row[:4]
+    extras = (
+        (float(row[4]) if len(row) > 4 else 1.0),
+        (bool(row[5]) if len(row) > 5 else True),
+        (row[6] if len(row) > 6 else None),
+    )
+    tunnel = bool(row[7]) if len(row) > 7 else False
+    # Car-free trail-access streets ride at trail price (Furman College
+    # Way) — every mode and stress level, since _astar prices by category.
+    if category != 'srt' and _street_base(name) in TRAIL_TIER_STREETS:
+        category = 'srt'
+    return coords, category, name, has_sidewalk, extras, tunnel
+
+
+def _row_fingerprints(rows: list) -> tuple[list[int], list[int]]:
+    """(topology, attributes) digests per normalized row. Rows with equal
+    topology digests build the same nodes, chunks and connectors; only the
+    attributes (danger, lighting, stress, sidewalk, a category within its
+    class) can then differ, and those `_update_route_graph` patches in place.
+    Stable across processes, unlike `hash()` of a str."""
+    import hashlib
+
+    def _digest(value) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), 'big',
+        )
+
+    topo, attr = [], []
+    for coords, category, name, has_sidewalk, extras, tunnel in rows:
+        # What the build's stitching reads from a category: path vs street
+        # node, and whether connectors may land on it.
+        if category in ('srt', 'bike-lane'):
+            cls = category
+        elif category in ('path', 'footway'):
+            cls = 'path'
+        else:
+            cls = 'street'
+        topo.append(_digest((coords, cls, name, tunnel)))
+        attr.append(_digest((category, has_sidewalk, extras)))
+    return topo, attr
+
+
+#: `edge_row` of a connector the stitch pass made (other connectors: -1),
+#: so a patch can tell components apart the way the stitch pass saw them.
+ROUTE_ROW_STITCH = -2
+
+
+class _RouteNet:
+    """The routing graph in its build-time working form, before
+    `_compact_graph`, with the build's passes as methods so
+    `_update_route_graph` can run them over just the part of a built graph a
+    re-sync touches.
+
+    nodes: cell -> (lat, lon); adj: cell -> list of (nbr, weight, length_m,
+    category, coords, reversed?, name, has_sidewalk, extras). Both directions
+    of an edge share one `coords` list (stored forward). `has_sidewalk` is
+    None for synthetic connectors (unknown, and too short to be worth warning
+    about).
+
+    Provenance for `_update_route_graph`: `row_of` maps id(coords) -> the row
+    an edge came from (-1 for connectors, ROUTE_ROW_STITCH for the stitch
+    pass's) and `contested` holds the rows that
+    competed for a node pair with another row (which one wins depends on
+    weight, so their attributes can't be patched without a rebuild)."""
+
+    def __init__(self):
+        self.nodes: dict = {}
+        self.adj: dict = {}
+        self.street_nodes: set = set()
+        self.path_nodes: set = set()
+        # Street name (suffix-stripped) -> chunk-endpoint nodes, for wiring
+        # tunnel portals back to their own street.
+        self.name_nodes: dict = {}
+        # (portal node, street name) for every tunnel row's two ends.
+        self.tunnel_portals: list = []
+        self.row_of: dict = {}
+        self.contested: set = set()
+
+    def node(self, lon: float, lat: float, tunnel: bool = False):
         cell = _grid_node(lat, lon)
         # The graph is 2D and the 12 m grid snap FUSES grade-separated
         # geometry: the Springer St tunnel's alignment passes within a cell
@@ -1941,66 +2407,63 @@ def _build_route_graph(debug: bool = False) -> dict[str, Any]:
         # only through explicit portal connectors to their own street.
         if tunnel:
             cell = ('T', *cell)
-        if cell not in nodes:
-            nodes[cell] = (lat, lon)
-            adj[cell] = []
+        if cell not in self.nodes:
+            self.nodes[cell] = (lat, lon)
+            self.adj[cell] = []
         return cell
 
-    bike_factors = MODE_FACTORS['bike']
-    for row in _route_source_rows(debug=debug):
-        # Rows may be legacy 4-tuples (tests, custom paths) or carry the
-        # (danger, lit, lane_stress, tunnel) context as elements 5-8.
-        coords, category, name, has_sidewalk = row[:4]
-        extras = (
-            (float(row[4]) if len(row) > 4 else 1.0),
-            (bool(row[5]) if len(row) > 5 else True),
-            (row[6] if len(row) > 6 else None),
-        )
-        tunnel = bool(row[7]) if len(row) > 7 else False
-        # Car-free trail-access streets ride at trail price (Furman College
-        # Way) — every mode and stress level, since _astar prices by category.
-        if category != 'srt' and _street_base(name) in TRAIL_TIER_STREETS:
-            category = 'srt'
-        factor = bike_factors.get(category, MODE_DEFAULT_FACTOR['bike'])
-        is_path = category in ('srt', 'bike-lane', 'path', 'footway')
-        if tunnel and len(coords) >= 2:
-            tunnel_portals.append((_node(*coords[0], tunnel=True), name))
-            tunnel_portals.append((_node(*coords[-1], tunnel=True), name))
-        for chunk in _subdivide(coords):
-            length_m = sum(
-                _equirect_m(a[1], a[0], b[1], b[0])
-                for a, b in zip(chunk, chunk[1:])
-            )
-            if length_m <= 0:
-                continue
-            u = _node(chunk[0][0], chunk[0][1], tunnel=tunnel)
-            v = _node(chunk[-1][0], chunk[-1][1], tunnel=tunnel)
-            (path_nodes if is_path else street_nodes).update((u, v))
-            if not tunnel:
-                base = _street_base(name)
-                if base:
-                    name_nodes.setdefault(base, set()).update((u, v))
-            if u == v:
-                continue  # self-loop after snapping
-            weight = length_m * factor * extras[0]
-            # Keep the cheapest edge per node pair (bike lane painted on a
-            # stressful street should win).
-            existing = next(
-                (e for e in adj[u] if e[0] == v), None,
-            )
-            if existing is not None and existing[1] <= weight:
-                continue
-            if existing is not None:
-                adj[u] = [e for e in adj[u] if e[0] != v]
-                adj[v] = [e for e in adj[v] if e[0] != u]
-            adj[u].append(
-                (v, weight, length_m, category, chunk, False, name, has_sidewalk, extras)
-            )
-            adj[v].append(
-                (u, weight, length_m, category, chunk, True, name, has_sidewalk, extras)
-            )
+    def add_rows(self, rows: list, ids: list | None = None):
+        """Chunk `_normalize_route_row` rows into edges; `ids` are their
+        row numbers (default: their positions)."""
+        adj, row_of = self.adj, self.row_of
+        bike_factors = MODE_FACTORS['bike']
+        for ri, (coords, category, name, has_sidewalk, extras, tunnel) in zip(
+            ids if ids is not None else range(len(rows)), rows,
+        ):
+            factor = bike_factors.get(category, MODE_DEFAULT_FACTOR['bike'])
+            is_path = category in ('srt', 'bike-lane', 'path', 'footway')
+            if tunnel and len(coords) >= 2:
+                self.tunnel_portals.append((self.node(*coords[0], tunnel=True), name))
+                self.tunnel_portals.append((self.node(*coords[-1], tunnel=True), name))
+            for chunk in _subdivide(coords):
+                length_m = sum(
+                    _equirect_m(a[1], a[0], b[1], b[0])
+                    for a, b in zip(chunk, chunk[1:])
+                )
+                if length_m <= 0:
+                    continue
+                u = self.node(chunk[0][0], chunk[0][1], tunnel=tunnel)
+                v = self.node(chunk[-1][0], chunk[-1][1], tunnel=tunnel)
+                (self.path_nodes if is_path else self.street_nodes).update((u, v))
+                if not tunnel:
+                    base = _street_base(name)
+                    if base:
+                        self.name_nodes.setdefault(base, set()).update((u, v))
+                if u == v:
+                    continue  # self-loop after snapping
+                weight = length_m * factor * extras[0]
+                # Keep the cheapest edge per node pair (bike lane painted on
+                # a stressful street should win).
+                existing = next(
+                    (e for e in adj[u] if e[0] == v and e[3] != 'connector'), None,
+                )
+                if existing is not None:
+                    self.contested.update((ri, row_of[id(existing[4])]))
+                if existing is not None and existing[1] <= weight:
+                    continue
+                if existing is not None:
+                    adj[u] = [e for e in adj[u] if e[0] != v]
+                    adj[v] = [e for e in adj[v] if e[0] != u]
+                row_of[id(chunk)] = ri
+                adj[u].append(
+                    (v, weight, length_m, category, chunk, False, name, has_sidewalk, extras)
+                )
+                adj[v].append(
+                    (u, weight, length_m, category, chunk, True, name, has_sidewalk, extras)
+                )
 
-    def _add_connector(u, v):
+    def add_connector(self, u, v, row: int = -1):
+        nodes, adj = self.nodes, self.adj
         # A connector between nodes a real edge already joins is worse than
         # useless: it weighs 1.0x its length, so the straight line undercuts
         # the road it duplicates and the router cuts the corner.
@@ -2021,111 +2484,93 @@ def _build_route_graph(debug: bool = False) -> dict[str, Any]:
             [nodes[v][1], nodes[v][0]],
         ]
         length = max(d, 1.0)
+        self.row_of[id(coords)] = row
         adj[u].append((v, length, length, 'connector', coords, False, None, None, (1.0, True, None)))
         adj[v].append((u, length, length, 'connector', coords, True, None, None, (1.0, True, None)))
 
-    # Tunnel portals rejoin the surface network HERE and only here: each
-    # portal connects to the nearest chunk endpoint of a street with the
-    # SAME (suffix-stripped) name — Springer Street's tunnel may meet
-    # SPRINGER ST and the Springer St custom path, never the S Church St
-    # edges crossing above its bore.
-    for portal, portal_name in tunnel_portals:
-        base = _street_base(portal_name)
-        candidates = name_nodes.get(base) if base else None
-        if not candidates:
-            continue
-        plat, plon = nodes[portal]
-        best = min(candidates, key=lambda n: _equirect_m(plat, plon, *nodes[n]))
-        if _equirect_m(plat, plon, *nodes[best]) <= ROUTE_CONNECT_M:
-            _add_connector(portal, best)
-
-    def _spatial_hash(cells, cell_m):
-        cell_lat = cell_m / M_PER_DEG_LAT
-        cell_lon = cell_lat / _COSLAT
-        spatial: dict = {}
-        for cell in cells:
-            lat, lon = nodes[cell]
-            key = (int(lat / cell_lat), int(lon / cell_lon))
-            spatial.setdefault(key, []).append(cell)
-        return spatial, cell_lat, cell_lon
-
-    def _nearest_in_hash(spatial, cell_lat, cell_lon, lat, lon, want=None):
-        key = (int(lat / cell_lat), int(lon / cell_lon))
-        best, best_d = None, None
-        for dy in (-1, 0, 1):
-            for dx in (-1, 0, 1):
-                for v in spatial.get((key[0] + dy, key[1] + dx), []):
-                    if want is not None and not want(v):
-                        continue
-                    d = _equirect_m(lat, lon, *nodes[v])
-                    if best_d is None or d < best_d:
-                        best, best_d = v, d
-        return best, best_d
-
-    # Junctions: the trail (and off-street greenway lanes) crosses dozens of
-    # streets without ever sharing an endpoint with one -- left alone it's a
-    # long tube with one door, and routes can't get on or off. So every
-    # trail/lane-only node gets a connector to the street network
-    # (component-agnostic).
-    #
-    # The connector lands on the nearest point ON a street chunk, splitting
-    # that chunk there, NOT on the nearest street *node*. Nodes only exist
-    # where `_subdivide` happened to end a ~120 m chunk, so a node-targeted
-    # connector routinely points backwards: the Cleveland St bike lane's south
-    # end connected 48 m south down Jones Ave rather than to the junction 12 m
-    # away, and a bike route arriving at that junction had to ride south and
-    # U-turn to get on the lane. Splitting puts the door where the path
-    # actually meets the street. Same idea as `_snap_terminus`, applied at
-    # build time instead of per request.
-    street_chunks = [
-        (u, e)
-        for u, lst in adj.items()
-        for e in lst
-        if not e[5] and e[3] not in ('srt', 'bike-lane', 'connector')
-        # Never target a tunnel chunk: a surface path near the bore would
-        # otherwise get a connector diving underground.
-        and u[0] != 'T'
-    ]
-    orphan_nodes = path_nodes - street_nodes
-    if street_chunks and orphan_nodes:
-        cell_lat = ROUTE_CONNECT_M / M_PER_DEG_LAT
-        cell_lon = cell_lat / _COSLAT
-        buckets: dict = {}
-        for ci, (_u, e) in enumerate(street_chunks):
-            cells: set = set()
-            for a, b in zip(e[4], e[4][1:]):
-                r0 = int(min(a[1], b[1]) / cell_lat)
-                r1 = int(max(a[1], b[1]) / cell_lat)
-                c0 = int(min(a[0], b[0]) / cell_lon)
-                c1 = int(max(a[0], b[0]) / cell_lon)
-                for r in range(r0, r1 + 1):
-                    for c in range(c0, c1 + 1):
-                        cells.add((r, c))
-            for cell in cells:
-                buckets.setdefault(cell, []).append(ci)
+    def join_tunnels(self):
+        """Tunnel portals rejoin the surface network HERE and only here:
+        each portal connects to the nearest chunk endpoint of a street with
+        the SAME (suffix-stripped) name — Springer Street's tunnel may meet
+        SPRINGER ST and the Springer St custom path, never the S Church St
+        edges crossing above its bore."""
+        for portal, portal_name in self.tunnel_portals:
+            base = _street_base(portal_name)
+            candidates = self.name_nodes.get(base) if base else None
+            if not candidates:
+                continue
+            plat, plon = self.nodes[portal]
+            best = min(
+                candidates, key=lambda n: _equirect_m(plat, plon, *self.nodes[n]),
+            )
+            if _equirect_m(plat, plon, *self.nodes[best]) <= ROUTE_CONNECT_M:
+                self.add_connector(portal, best)
+
+    def add_junctions(self, orphan_nodes: set):
+        """Junctions: the trail (and off-street greenway lanes) crosses
+        dozens of streets without ever sharing an endpoint with one -- left
+        alone it's a long tube with one door, and routes can't get on or
+        off. So every trail/lane-only node in `orphan_nodes` gets a connector
+        to the street network (component-agnostic).
+
+        The connector lands on the nearest point ON a street chunk, splitting
+        that chunk there, NOT on the nearest street *node*. Nodes only exist
+        where `_subdivide` happened to end a ~120 m chunk, so a node-targeted
+        connector routinely points backwards: the Cleveland St bike lane's
+        south end connected 48 m south down Jones Ave rather than to the
+        junction 12 m away, and a bike route arriving at that junction had to
+        ride south and U-turn to get on the lane. Splitting puts the door
+        where the path actually meets the street. Same idea as
+        `_snap_terminus`, applied at build time instead of per request."""
+        import numpy as np
+
+        nodes, adj, row_of = self.nodes, self.adj, self.row_of
+        bike_factors = MODE_FACTORS['bike']
+        street_chunks = [
+            (u, e)
+            for u, lst in adj.items()
+            for e in lst
+            if not e[5] and e[3] not in ('srt', 'bike-lane', 'connector')
+            # Never target a tunnel chunk: a surface path near the bore
+            # would otherwise get a connector diving underground.
+            and u[0] != 'T'
+        ]
+        if not street_chunks or not orphan_nodes:
+            return
+        segments = [
+            (ci, si)
+            for ci, (_u, e) in enumerate(street_chunks)
+            for si in range(len(e[4]) - 1)
+        ]
+        ends = np.array([
+            street_chunks[ci][1][4][si] + street_chunks[ci][1][4][si + 1]
+            for ci, si in segments
+        ], dtype=np.float64).reshape(-1, 4)
+        x0, y0 = _local_xy(ends[:, 1], ends[:, 0])
+        x1, y1 = _local_xy(ends[:, 3], ends[:, 2])
+        tree = _pack_rtree(np.column_stack([
+            np.minimum(x0, x1), np.minimum(y0, y1),
+            np.maximum(x0, x1), np.maximum(y0, y1),
+        ]))
 
         # chunk index -> [(position along chunk, seg_i, t, point, path node)]
         splits: dict = {}
         for u in orphan_nodes:
             lat, lon = nodes[u]
-            home = (int(lat / cell_lat), int(lon / cell_lon))
-            best = None
-            seen: set = set()
-            for dy in (-1, 0, 1):
-                for dx in (-1, 0, 1):
-                    for ci in buckets.get((home[0] + dy, home[1] + dx), ()):
-                        if ci in seen:
-                            continue
-                        seen.add(ci)
-                        coords = street_chunks[ci][1][4]
-                        for si, (a, b) in enumerate(zip(coords, coords[1:])):
-                            d, t, pt = _project_seg(lat, lon, a, b)
-                            if best is None or d < best[0]:
-                                best = (d, ci, si, t, pt)
-            if best is None or best[0] > ROUTE_CONNECT_M:
+
+            def _exact(item, lat=lat, lon=lon):
+                ci, si = segments[item]
+                coords = street_chunks[ci][1][4]
+                return _project_seg(lat, lon, coords[si], coords[si + 1])[0]
+
+            hits = _rtree_nearest(
+                tree, *_local_xy(lat, lon), max_m=ROUTE_CONNECT_M, exact=_exact,
+            )
+            if not hits:
                 continue
-            _d, ci, si, t, pt = best
+            ci, si = segments[hits[0][1]]
             coords = street_chunks[ci][1][4]
+            _d, t, pt = _project_seg(lat, lon, coords[si], coords[si + 1])
             splits.setdefault(ci, []).append(
                 (_chunk_pos_m(coords, si, t), si, t, pt, u)
             )
@@ -2157,12 +2602,13 @@ def _build_route_graph(debug: bool = False) -> dict[str, Any]:
                 length_m = _poly_len_m(piece)
                 if length_m <= 0:
                     continue
-                pu = _node(piece[0][0], piece[0][1])
-                pv = _node(piece[-1][0], piece[-1][1])
-                street_nodes.update((pu, pv))
+                pu = self.node(piece[0][0], piece[0][1])
+                pv = self.node(piece[-1][0], piece[-1][1])
+                self.street_nodes.update((pu, pv))
                 if pu == pv:
                     continue
                 weight = length_m * factor * extras[0]
+                row_of[id(piece)] = row_of[id(coords)]
                 adj[pu].append(
                     (pv, weight, length_m, category, piece, False, name, has_sidewalk, extras)
                 )
@@ -2170,9 +2616,62 @@ def _build_route_graph(debug: bool = False) -> dict[str, Any]:
                     (pu, weight, length_m, category, piece, True, name, has_sidewalk, extras)
                 )
             for _pos, _si, _t, pt, u in requests:
-                _add_connector(u, _node(pt[0], pt[1]))
-
-    def _components() -> list[set]:
+                self.add_connector(u, self.node(pt[0], pt[1]))
+
+    def unsplit(self, cells, chunks: dict):
+        """Undo `add_junctions`' cut at each of `cells` whose connector is
+        gone (a patch dropped it to redo the junction): a node that is no
+        chunk's end, left with just the two pieces of one chunk, goes, and
+        the pieces join up again. `chunks` maps (start cell, end cell) to the
+        chunk's coords, for the rows concerned; the join takes them whole
+        when it spans one, as a cut may have shaved a self-loop off its end."""
+        nodes, adj, row_of = self.nodes, self.adj, self.row_of
+        ends = {c for pair in chunks for c in pair}
+        bike_factors = MODE_FACTORS['bike']
+        for s in cells:
+            edges = adj.get(s)
+            if s in ends or edges is None or len(edges) != 2:
+                continue
+            first, second = sorted(edges, key=lambda e: not e[5])
+            a, b = first[0], second[0]
+            row = row_of.get(id(first[4]), -1)
+            if (
+                # The first piece runs a -> s, the second s -> b.
+                not first[5] or second[5] or a == b
+                or row < 0 or row_of.get(id(second[4])) != row
+                or first[3] != second[3]
+                or any(e[0] == b for e in adj[a])
+            ):
+                continue
+            adj[a] = [e for e in adj[a] if e[4] is not first[4]]
+            adj[b] = [e for e in adj[b] if e[4] is not second[4]]
+            coords = chunks.get((a, b))
+            if coords is None and (b, a) in chunks:
+                a, b = b, a
+                coords = chunks[(a, b)]
+            if coords is None:
+                coords = first[4] + second[4][1:]
+            category, name, has_sidewalk, extras = first[3], first[6], first[7], first[8]
+            length_m = _poly_len_m(coords)
+            weight = length_m * bike_factors.get(
+                category, MODE_DEFAULT_FACTOR['bike'],
+            ) * extras[0]
+            row_of[id(coords)] = row
+            adj[a].append(
+                (b, weight, length_m, category, coords, False, name, has_sidewalk, extras)
+            )
+            adj[b].append(
+                (a, weight, length_m, category, coords, True, name, has_sidewalk, extras)
+            )
+            del nodes[s], adj[s]
+            self.street_nodes.discard(s)
+            self.path_nodes.discard(s)
+            for named in self.name_nodes.values():
+                named.discard(s)
+
+    def components(self) -> list[set]:
+        """Connected components, largest first."""
+        adj = self.adj
         seen: set = set()
         comps = []
         for start in adj:
@@ -2191,66 +2690,1166 @@ def _build_route_graph(debug: bool = False) -> dict[str, Any]:
             comps.append(comp)
         return sorted(comps, key=len, reverse=True)
 
-    # The SRT (and some bike lanes) never share endpoints with the street
-    # grid: the trail breaks at every road crossing, so it arrives as many
-    # disconnected fragments. For THROUGH-travel the fragments must bridge to
-    # each other (and to the streets) at every close approach -- one
-    # connector per component is a dead end. So: every node gets a straight
-    # connector to its nearest node in a DIFFERENT component, if within
-    # ROUTE_STITCH_M.
-    comps = _components()
-    if comps and len(comps) > 1:
-        comp_of: dict = {}
-        for i, comp in enumerate(comps):
-            for c in comp:
-                comp_of[c] = i
-        spatial, cl, cn = _spatial_hash(
-            list(adj), max(ROUTE_STITCH_M, ROUTE_GRID_M),
+    def stitch(self, comp_of: dict, sources: list | None = None):
+        """The SRT (and some bike lanes) never share endpoints with the
+        street grid: the trail breaks at every road crossing, so it arrives
+        as many disconnected fragments. For THROUGH-travel the fragments must
+        bridge to each other (and to the streets) at every close approach --
+        one connector per component is a dead end. So: every node of
+        `sources` (default all) gets a straight connector to its nearest node
+        in a DIFFERENT component (`comp_of`), if within ROUTE_STITCH_M."""
+        import numpy as np
+
+        cells = list(self.adj)
+        x, y = _local_xy(
+            np.array([self.nodes[c][0] for c in cells], dtype=np.float64),
+            np.array([self.nodes[c][1] for c in cells], dtype=np.float64),
         )
-        for u in list(adj):
-            best, best_d = _nearest_in_hash(
-                spatial, cl, cn, *nodes[u],
-                want=lambda v, _u=u: comp_of[v] != comp_of[_u],
+        tree = _pack_rtree(np.column_stack([x, y, x, y]))
+        comp_ids = [comp_of[c] for c in cells]
+        if sources is None:
+            todo = zip(cells, x.tolist(), y.tolist(), comp_ids)
+        else:
+            sx, sy = _local_xy(
+                np.array([self.nodes[c][0] for c in sources], dtype=np.float64),
+                np.array([self.nodes[c][1] for c in sources], dtype=np.float64),
+            )
+            todo = zip(sources, sx.tolist(), sy.tolist(), [comp_of[c] for c in sources])
+        for u, ux, uy, own in todo:
+            hits = _rtree_nearest(
+                tree, ux, uy, max_m=ROUTE_STITCH_M,
+                want=lambda j, own=own: comp_ids[j] != own,
             )
-            if best is not None and best_d <= ROUTE_STITCH_M:
-                _add_connector(u, best)
+            if hits:
+                self.add_connector(u, cells[hits[0][1]], row=ROUTE_ROW_STITCH)
+
+
+def _build_route_adjacency(rows: list) -> tuple[dict, dict, dict]:
+    """The build-time working form of the graph (`_RouteNet`'s nodes and
+    adj), largest connected component only, so off-island termini snap to
+    routable nodes.
+
+    `rows` are `_normalize_route_row` rows. The third value is provenance for
+    `_update_route_graph`: `row_of` and `contested` (see `_RouteNet`)."""
+    net = _RouteNet()
+    net.add_rows(rows)
+    _build_lap('adjacency.subdivide', nodes=len(net.nodes))
+    net.join_tunnels()
+    _build_lap('adjacency.tunnels', portals=len(net.tunnel_portals))
+    orphan_nodes = net.path_nodes - net.street_nodes
+    net.add_junctions(orphan_nodes)
+    _build_lap('adjacency.junctions', orphans=len(orphan_nodes))
+
+    comps = net.components()
+    if comps and len(comps) > 1:
+        net.stitch({c: i for i, comp in enumerate(comps) for c in comp})
+    _build_lap('adjacency.stitch', components=len(comps))
 
     # Keep the largest component (recomputed after stitching).
-    comps = _components()
+    comps = net.components()
     best_comp = comps[0] if comps else set()
-    nodes = {c: nodes[c] for c in best_comp}
-    adj = {c: adj[c] for c in best_comp}
+    dropped = len(net.nodes) - len(best_comp)
+    nodes = {c: net.nodes[c] for c in best_comp}
+    adj = {c: net.adj[c] for c in best_comp}
+    _build_lap('adjacency.components', nodes=len(nodes), dropped=dropped)
+    return nodes, adj, {'row_of': net.row_of, 'contested': net.contested}
+
+
+#: Category codes for the compact graph's `cat` array. A category a source
+#: row invents beyond these is appended per graph (see `_compact_graph`), so
+#: a new one routes without touching this table.
+ROUTE_CATEGORIES = (
+    'connector', 'srt', 'path', 'footway', 'bike-lane',
+    'L', 'ML', 'M', 'MH', 'H',
+)
+
+
+def _build_route_graph(debug: bool = False, rows: list | None = None) -> dict[str, Any]:
+    """Build the routing graph from PostGIS (or the given source `rows`) and
+    compact it (see `_compact_graph` for the layout). The phases land in
+    `graph['build']` (see `_build_report`)."""
+    log = _BUILD_LOG.get()
+    token = _BUILD_LOG.set(_new_build_log()) if log is None else None
+    try:
+        if rows is None:
+            rows = _route_source_rows(debug=debug)
+        rows = [_normalize_route_row(row) for row in rows]
+        _build_lap('normalize', rows=len(rows))
+        nodes, adj, provenance = _build_route_adjacency(rows)
+        elevations = _node_elevations(nodes, debug=debug)
+        _build_lap('elevations', nodes=len(elevations))
+        graph = _compact_graph(nodes, adj, elevations)
+        _build_lap('compact', nodes=_node_count(graph), edges=len(graph['nbr']) // 2)
+        _attach_relief(graph, _elevation_grid())
+        _build_lap('relief')
+        _attach_spatial_index(graph)
+        _build_lap('spatial_index')
+        _attach_provenance(graph, adj, rows, provenance)
+        _build_lap('provenance')
+        graph['build'] = _build_report('build')
+    finally:
+        if token is not None:
+            _BUILD_LOG.reset(token)
+    return graph
+
+
+def _new_build_log() -> dict[str, Any]:
+    now = time.perf_counter()
+    return {'started': now, 'mark': (now, _rss_bytes()), 'phases': []}
+
+
+def _rss_bytes() -> int | None:
+    """This process's resident set size (Linux), or None where /proc isn't."""
+    import os
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _build_lap(phase: str, **counts):
+    """Close `phase` of the graph build in progress: the seconds and the RSS
+    change since the previous lap, plus `counts` (rows, nodes...). A no-op
+    outside a build (`_BUILD_LOG`)."""
+    log = _BUILD_LOG.get()
+    if log is None:
+        return
+    now, rss = time.perf_counter(), _rss_bytes()
+    then, rss_then = log['mark']
+    entry = {'phase': phase, 'seconds': round(now - then, 3), **counts}
+    if rss is not None and rss_then is not None:
+        entry['rss_mb'] = round((rss - rss_then) / 1e6, 1)
+    log['phases'].append(entry)
+    log['mark'] = (now, rss)
+
+
+def _build_report(source: str, **extra) -> dict[str, Any]:
+    """The build in progress as it goes into `graph['build']`: how the graph
+    came to be (`build`, `patch` or `snapshot`), when, how long it took, and
+    every lap."""
+    log = _BUILD_LOG.get() or _new_build_log()
+    rss = _rss_bytes()
     return {
-        'epoch': time.time(),
-        'nodes': nodes,
-        'adj': adj,
-        'elev': _node_elevations(nodes, debug=debug),
+        'source': source,
+        'built_at': time.time(),
+        'seconds': round(time.perf_counter() - log['started'], 3),
+        'phases': list(log['phases']),
+        'rss_mb': round(rss / 1e6, 1) if rss is not None else None,
+        **extra,
     }
 
 
-def _srid_units_per_m(conn, srid: int, debug: bool = False) -> float:
-    """How many of `srid`'s linear units make a metre, MEASURED rather than
-    assumed.
+def _attach_provenance(graph: dict, adj: dict, rows: list, provenance: dict):
+    """Per-edge source row (`edge_row`: -1 for connectors, ROUTE_ROW_STITCH
+    for stitch connectors) and per-row digests, contention and bounding box
+    (`row_bbox`: min lon, min lat, max lon, max lat), in `_compact_graph`
+    edge order."""
+    import numpy as np
+    row_of = provenance['row_of']
+    graph['edge_row'] = np.array(
+        [row_of.get(id(e[4]), -1) for u in adj for e in adj[u]],
+        dtype=np.int32,
+    )
+    topo, attr = _row_fingerprints(rows)
+    graph['row_topo'] = np.array(topo, dtype=np.uint64)
+    graph['row_attr'] = np.array(attr, dtype=np.uint64)
+    contested = np.zeros(len(rows), dtype=bool)
+    contested[list(provenance['contested'])] = True
+    graph['row_contested'] = contested
+    graph['row_bbox'] = _row_bboxes([row[0] for row in rows])
+
+
+def _row_bboxes(coord_lists: list):
+    """(n, 4) min lon, min lat, max lon, max lat of each [lon, lat] list."""
+    import numpy as np
+    return np.array([
+        (
+            min(c[0] for c in coords), min(c[1] for c in coords),
+            max(c[0] for c in coords), max(c[1] for c in coords),
+        )
+        for coords in coord_lists
+    ], dtype=np.float64).reshape(-1, 4)
+
+
+def _boxes_meet(items, boxes, pad_m: float):
+    """Which of `items` (`_row_bboxes` rows; a point is a box with no
+    extent) meet any of `boxes` padded by `pad_m` metres."""
+    import numpy as np
+    dlat = pad_m / M_PER_DEG_LAT
+    dlon = pad_m / (M_PER_DEG_LAT * _COSLAT)
+    meet = np.zeros(len(items), dtype=bool)
+    for minlon, minlat, maxlon, maxlat in boxes.tolist():
+        meet |= (
+            (items[:, 2] >= minlon - dlon) & (items[:, 0] <= maxlon + dlon)
+            & (items[:, 3] >= minlat - dlat) & (items[:, 1] <= maxlat + dlat)
+        )
+    return meet
 
-    The county's layers are a mix of feet (3361, 6570) and degrees (4326), and
-    getting this backwards silently scales every threshold by 3.28. So: take
-    two points a known distance apart on the ground, transform both into the
-    target CRS, and see how long the line came out.
+
+#: Largest share of the graph's edges a topology patch may lift back into
+#: working form before `_update_route_graph` leaves it to the full build
+#: (about as cheap by then, and it leaves no dead nodes behind).
+ROUTE_PATCH_MAX_SHARE = 0.25
+
+#: Share of the graph the spatial-index overlays of successive patches may
+#: grow to before `_patch_spatial_index` repacks the trees whole.
+ROUTE_PATCH_REINDEX_SHARE = 0.05
+
+
+def _update_route_graph(graph: dict, rows: list, debug: bool = False) -> dict | None:
+    """`graph` with the re-synced source `rows` applied, without a full
+    build, or None when only `_build_route_graph` will do.
+
+    Rows are matched to the graph's by topology digest. Matched rows whose
+    attributes changed are patched onto copies of their edges' arrays; rows
+    added or removed (a new custom path, the daily osm_paths sync) are
+    chunked in or taken out around where they lie (`_patch_route_topology`)
+    when that comes out exactly as a build would. Falls back to the build
+    for an attribute change on identical twins or a contested row, and
+    wherever `_patch_route_topology` does.
+
+    Returns `graph` itself when nothing changed. Otherwise a new graph dict
+    sharing every array the change doesn't touch, with the weight and
+    landmark caches empty.
     """
-    probe = conn.read(
-        f'''
-        SELECT
-            ST_Distance(
-                ST_Transform(ST_SetSRID(ST_MakePoint(-82.4, 34.85), 4326), {srid}),
-                ST_Transform(ST_SetSRID(ST_MakePoint(-82.4, 34.86), 4326), {srid})
-            ) AS "ns",
-            ST_Distance(
-                ST_Transform(ST_SetSRID(ST_MakePoint(-82.4, 34.85), 4326), {srid}),
-                ST_Transform(ST_SetSRID(ST_MakePoint(-82.39, 34.85), 4326), {srid})
-            ) AS "ew"
-        ''',
-        debug=debug,
-    )
+    if graph.get('row_topo') is None:
+        return None
+    rows = [_normalize_route_row(row) for row in rows]
+    topo, attr = _row_fingerprints(rows)
+    old_attr = graph['row_attr'].tolist()
+    by_topo: dict = {}
+    for i, t in enumerate(graph['row_topo'].tolist()):
+        by_topo.setdefault(t, []).append(i)
+    twins = {t for t, olds in by_topo.items() if len(olds) > 1}
+    contested = graph['row_contested']
+    old_of: dict = {}
+    added, changed = [], []
+    for j, t in enumerate(topo):
+        olds = by_topo.get(t)
+        if not olds:
+            added.append(j)
+            continue
+        i = olds.pop()
+        old_of[j] = i
+        if attr[j] == old_attr[i]:
+            continue
+        # Identical twins can't be told apart, and a contested row's edges
+        # may change hands: both need the real build.
+        if t in twins or contested[i]:
+            return None
+        changed.append((i, j))
+    removed = [i for olds in by_topo.values() for i in olds]
+    if not (added or removed or changed):
+        return graph
+    _build_lap('patch.diff', added=len(added), removed=len(removed), changed=len(changed))
+
+    updated = _patch_row_attributes(graph, rows, changed, attr)
+    if added or removed:
+        return _patch_route_topology(
+            updated, rows, topo, attr, old_of, added, removed, debug=debug,
+        )
+    return updated
+
+
+def _patch_row_attributes(graph: dict, rows: list, changed: list, attr: list) -> dict:
+    """A copy of `graph` with the edges of each changed (old row, new row)
+    pair re-attributed from the new row, on copies of the arrays touched."""
+    import numpy as np
+
+    updated = {
+        key: value for key, value in graph.items()
+        if key not in ('weights', 'landmarks', 'checked')
+    }
+    updated['epoch'] = time.time()
+    if not changed:
+        return updated
+    categories = list(graph['categories'])
+    patched = {
+        key: np.array(graph[key])
+        for key in ('cat', 'danger', 'lit', 'lane_stress', 'sidewalk', 'weight')
+    }
+    row_attr = np.array(graph['row_attr'])
+    edge_row = graph['edge_row']
+    order = np.argsort(edge_row, kind='stable')
+    sorted_rows = edge_row[order]
+    bike_factors = MODE_FACTORS['bike']
+    for i, j in changed:
+        _coords, category, _name, has_sidewalk, extras, _tunnel = rows[j]
+        if category not in categories:
+            categories.append(category)
+        ks = order[
+            np.searchsorted(sorted_rows, i, 'left'):
+            np.searchsorted(sorted_rows, i, 'right')
+        ]
+        lane = extras[2]
+        patched['cat'][ks] = categories.index(category)
+        patched['danger'][ks] = extras[0]
+        patched['lit'][ks] = bool(extras[1])
+        patched['lane_stress'][ks] = (
+            STRESS_ORDER.index(lane) if lane in STRESS_ORDER else -1
+        )
+        patched['sidewalk'][ks] = (
+            -1 if has_sidewalk is None else int(bool(has_sidewalk))
+        )
+        patched['weight'][ks] = (
+            graph['length'][ks]
+            * bike_factors.get(category, MODE_DEFAULT_FACTOR['bike'])
+            * extras[0]
+        )
+        row_attr[i] = attr[j]
+    updated.update(patched)
+    updated.update({'categories': tuple(categories), 'row_attr': row_attr})
+    return updated
+
+
+def _graph_cell(graph: dict, u: int):
+    """Node `u`'s grid cell, keyed as `_RouteNet.node` keys it."""
+    cell = (int(graph['cell_r'][u]), int(graph['cell_c'][u]))
+    return ('T', *cell) if graph['tunnel'][u] else cell
+
+
+def _row_ends(coords: list, tunnel: bool) -> list:
+    """(cell, (lat, lon)) of every node `_RouteNet.add_rows` makes for a
+    row: each chunk's two ends."""
+    ends = []
+    for chunk in _subdivide(coords):
+        for lon, lat in (chunk[0], chunk[-1]):
+            cell = _grid_node(lat, lon)
+            ends.append((('T', *cell) if tunnel else cell, (lat, lon)))
+    return ends
+
+
+def _patch_route_topology(
+    graph: dict,
+    rows: list,
+    topo: list,
+    attr: list,
+    old_of: dict,
+    added: list,
+    removed: list,
+    debug: bool = False,
+) -> dict | None:
+    """`graph` (attribute changes already applied) with the `added` rows
+    chunked in and the `removed` ones taken out, or None when that needs the
+    full build: a removed row was contested (the chunks it beat are gone),
+    the graph predates `row_bbox`, the change reaches more than
+    ROUTE_PATCH_MAX_SHARE of the graph's edges, or the result could differ
+    from a build's in any way (see below). `old_of` maps each kept row to
+    its old number; `added` are new numbers, `removed` old ones.
+
+    The build's passes rerun only around the change. The zone is every
+    added and removed row's bounding box padded by ROUTE_CONNECT_M. Every
+    edge with an end or geometry within junction or stitch reach of it is
+    lifted back into a `_RouteNet`, less the removed rows' edges and the
+    zone's connectors; the added rows are chunked in, and junctions and
+    stitching are redone for the zone's nodes and the far ends of its
+    dropped connectors, with components labelled over the whole graph so
+    "a different component" means what it does in a build.
+
+    The patch is kept only where it is exactly what a build would make: no
+    lifted edge may come out different (a junction cut or connector made,
+    moved or unmade), no component may be joined or split (the build's
+    stitch pass would then bridge other places too) or cut off, and no
+    node may be placed differently within its cell (where it sits depends on
+    which row reaches the cell first).
+
+    The lifted part is compacted and reliefed on its own and spliced back:
+    old node ids and geometry rows stay put (a node left without edges is
+    marked in `node_dead`), new ones are appended, and the spatial indexes
+    are extended rather than repacked (`_patch_spatial_index`)."""
+    from collections import Counter
+    import numpy as np
+
+    if graph.get('row_bbox') is None:
+        return None
+    if removed and graph['row_contested'][removed].any():
+        return None
+    n = _node_count(graph)
+    lat, lon = graph['lat'], graph['lon']
+    offsets, nbr, edge_row = graph['offsets'], graph['nbr'], graph['edge_row']
+    src = np.repeat(np.arange(n), np.diff(offsets))
+    live = ~graph['node_dead'] if 'node_dead' in graph else np.ones(n, dtype=bool)
+    boxes = np.concatenate([
+        _row_bboxes([rows[j][0] for j in added]), graph['row_bbox'][removed],
+    ])
+    points = np.column_stack([lon, lat, lon, lat])
+    in_zone = live & _boxes_meet(points, boxes, ROUTE_CONNECT_M)
+    near_m = ROUTE_CONNECT_M + max(ROUTE_CONNECT_M, ROUTE_STITCH_M) + 2 * ROUTE_GRID_M
+    in_near = live & _boxes_meet(points, boxes, near_m)
+    # A chunk can run far past its ends (one long segment), so an edge whose
+    # geometry passes near is lifted too: a junction may split it.
+    geom_off, xy = graph['geom_off'], graph['geom_xy']
+    starts = geom_off[:-1]
+    geom_box = np.column_stack([
+        np.minimum.reduceat(xy, starts), np.maximum.reduceat(xy, starts),
+    ]) if len(starts) else np.empty((0, 4))
+    lifted = (
+        in_near[src] | in_near[nbr]
+        | _boxes_meet(geom_box, boxes, near_m)[graph['geom']]
+    )
+    if lifted.sum() > ROUTE_PATCH_MAX_SHARE * len(nbr):
+        return None
+    gone = np.isin(edge_row, removed)
+    new_of_old = np.full(len(graph['row_topo']), -1, dtype=np.int64)
+    for j, i in old_of.items():
+        new_of_old[i] = j
+    row_new = np.where(edge_row >= 0, new_of_old[np.maximum(edge_row, 0)], edge_row)
+    # Rows the build kept nothing of (a fragment outside the largest
+    # component) are chunked in again near the change: if one now joins the
+    # graph, the patch falls back rather than miss it.
+    edgeless = np.bincount(
+        edge_row[edge_row >= 0], minlength=len(graph['row_topo']),
+    ) == 0
+    rechunk = [
+        j for j in new_of_old[np.flatnonzero(
+            edgeless & _boxes_meet(graph['row_bbox'], boxes, near_m)
+        )].tolist() if j >= 0
+    ]
+    connector = graph['categories'].index('connector')
+    relinked = (graph['cat'] == connector) & (in_zone[src] | in_zone[nbr])
+    # Stitching is redone for every node in reach, whose components the
+    # change may have split or joined.
+    restitched = (edge_row == ROUTE_ROW_STITCH) & in_near[src] & in_near[nbr]
+    lift = lifted & ~gone & ~relinked & ~restitched
+    # The zone's nodes, and whatever its dropped connectors hung off, get
+    # their junctions and stitches redone.
+    redo_mask = in_zone.copy()
+    redo_mask[src[relinked]] = True
+
+    net = _RouteNet()
+    old_id: dict = {}
+
+    def _lift_node(u: int):
+        cell = _graph_cell(graph, u)
+        if cell not in net.nodes:
+            net.nodes[cell] = (float(lat[u]), float(lon[u]))
+            net.adj[cell] = []
+            old_id[cell] = u
+        return cell
+
+    for u in np.flatnonzero(in_near).tolist():
+        _lift_node(u)
+    coords_of: dict = {}
+    categories, names = graph['categories'], graph['names']
+    for k in np.flatnonzero(lift).tolist():
+        g = int(graph['geom'][k])
+        coords = coords_of.get(g)
+        if coords is None:
+            coords = coords_of[g] = xy[geom_off[g]:geom_off[g + 1]].tolist()
+            net.row_of[id(coords)] = int(row_new[k])
+        category = categories[graph['cat'][k]]
+        code, sidewalk, lane = (
+            int(graph['name'][k]), int(graph['sidewalk'][k]), int(graph['lane_stress'][k]),
+        )
+        name = names[code] if code >= 0 else None
+        u, v = _lift_node(int(src[k])), _lift_node(int(nbr[k]))
+        net.adj[u].append((
+            v, float(graph['weight'][k]), float(graph['length'][k]), category,
+            coords, bool(graph['rev'][k]), name,
+            None if sidewalk < 0 else bool(sidewalk),
+            (
+                float(graph['danger'][k]), bool(graph['lit'][k]),
+                STRESS_ORDER[lane] if lane >= 0 else None,
+            ),
+        ))
+        if category == 'connector':
+            continue
+        is_path = category in ('srt', 'bike-lane', 'path', 'footway')
+        (net.path_nodes if is_path else net.street_nodes).update((u, v))
+        base = _street_base(name) if u[0] != 'T' else None
+        if base:
+            net.name_nodes.setdefault(base, set()).update((u, v))
+    # What the removed rows and dropped connectors leave behind: nodes
+    # without edges, and street chunks cut for a junction that's now redone.
+    for c in [c for c, edges in net.adj.items() if not edges]:
+        del net.nodes[c], net.adj[c]
+    cut = [
+        c for c, edges in net.adj.items()
+        if len(edges) == 2 and redo_mask[old_id[c]]
+    ]
+    chunks: dict = {}
+    for row in {net.row_of.get(id(e[4]), -1) for c in cut for e in net.adj[c]}:
+        if row < 0:
+            continue
+        coords, tunnel = rows[row][0], rows[row][5]
+        for chunk in _subdivide(coords):
+            pair = [_grid_node(point[1], point[0]) for point in (chunk[0], chunk[-1])]
+            if tunnel:
+                pair = [('T', *cell) for cell in pair]
+            chunks[tuple(pair)] = chunk
+    net.unsplit(cut, chunks)
+    _build_lap('patch.lift', nodes=len(net.nodes), edges=int(lift.sum()) // 2)
+
+    # A node sits where the first row to reach its cell put it, and a patch
+    # can't tell which row a build would take first: so an added row must
+    # meet an old node (dead ones included) exactly where it sits, and a
+    # node a removed row may have placed must have every other edge end
+    # there too.
+    old_at = {_graph_cell(graph, u): u for u in np.flatnonzero(~live).tolist()}
+    old_at.update(old_id)
+    for j in added:
+        for cell, (y, x) in _row_ends(rows[j][0], rows[j][5]):
+            u = old_at.get(cell)
+            if u is not None and (lat[u], lon[u]) != (y, x):
+                return None
+    for k in np.flatnonzero(gone & ~graph['rev']).tolist():
+        g = int(graph['geom'][k])
+        for u, (x, y) in (
+            (int(src[k]), xy[geom_off[g]].tolist()),
+            (int(nbr[k]), xy[geom_off[g + 1] - 1].tolist()),
+        ):
+            cell = _graph_cell(graph, u)
+            if net.nodes.get(cell) != (y, x):
+                continue
+            if any(
+                e[3] != 'connector' and tuple(e[4][-1 if e[5] else 0]) != (x, y)
+                for e in net.adj[cell]
+            ):
+                return None
+    net.add_rows([rows[j] for j in added + rechunk], ids=added + rechunk)
+    net.join_tunnels()
+    redo = {c for c in net.nodes if c not in old_id or redo_mask[old_id[c]]}
+    orphans = (net.path_nodes - net.street_nodes) & redo
+    net.add_junctions(orphans)
+    _build_lap('patch.junctions', rows=len(added), orphans=len(orphans))
+
+    # Components over the whole graph: what wasn't lifted is labelled in one
+    # vectorized pass, and the lifted part joins those labels through the
+    # frontier nodes it shares with them. Stitching sees the components as
+    # the build's stitch pass does, before any stitch connector.
+    def _components(stitched: bool):
+        edges = ~lifted if stitched else ~lifted & (edge_row != ROUTE_ROW_STITCH)
+        outside, sizes = _edge_components(graph, edges, live & ~in_near)
+        parent = list(range(len(sizes)))
+
+        def _find(a: int) -> int:
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+
+        comp = {}
+        for c in net.nodes:
+            u = old_id.get(c)
+            if u is not None and outside[u] >= 0:
+                comp[c] = int(outside[u])
+            else:
+                comp[c] = len(parent)
+                parent.append(comp[c])
+                sizes.append(1)
+        for c, adj in net.adj.items():
+            for e in adj:
+                if not stitched and net.row_of.get(id(e[4])) == ROUTE_ROW_STITCH:
+                    continue
+                a, b = _find(comp[c]), _find(comp[e[0]])
+                if a != b:
+                    parent[b] = a
+                    sizes[a] += sizes[b]
+        roots = [r for r in range(len(parent)) if _find(r) == r]
+        best = max(roots, key=sizes.__getitem__)
+        # Every old node's component, by id (-1 for a node in neither the
+        # lifted part nor the rest).
+        labelled = outside >= 0
+        label = np.full(n, -1, dtype=np.int64)
+        if labelled.any():
+            root_of = np.array([_find(r) for r in range(outside.max() + 1)])
+            label[labelled] = root_of[outside[labelled]]
+        comp_of = {c: _find(x) for c, x in comp.items()}
+        for c, x in comp_of.items():
+            if c in old_id:
+                label[old_id[c]] = x
+        return comp_of, best, label
+
+    sources = [c for c in net.nodes if c not in old_id or in_near[old_id[c]]]
+    pre_comp, _best, pre_label = _components(stitched=False)
+    net.stitch(pre_comp, sources)
+    _build_lap('patch.stitch', sources=len(sources))
+
+    # Keep the largest component (recomputed after stitching).
+    comp_of, best, label = _components(stitched=True)
+    # The build's components before stitching, over the old nodes still
+    # there, must be as they were: joining or splitting one changes what
+    # the stitch pass bridges, anywhere along it. Nothing may be cut off.
+    before, _sizes = _edge_components(graph, edge_row != ROUTE_ROW_STITCH, live)
+    both = pre_label >= 0
+    pairs = np.unique(np.column_stack([before[both], pre_label[both]]), axis=0)
+    if (
+        len(pairs) != len(np.unique(pairs[:, 0]))
+        or len(pairs) != len(np.unique(pairs[:, 1]))
+        or (label[live & ~in_near] != best).any()
+        or any(comp_of.get(c, best) != best for c in old_id)
+    ):
+        return None
+    # Every lifted edge must come out of the redone passes as it went in:
+    # the same ends, geometry and source row (so no junction cut or
+    # connector was made, moved or unmade), the added rows' edges aside.
+    new_rows = set(added)
+    went_in, came_out = Counter(), Counter()
+    for c, edges in net.adj.items():
+        for e in edges:
+            row = net.row_of.get(id(e[4]), -1)
+            if not e[5] and comp_of[c] == best and row not in new_rows:
+                came_out[(c, e[0], row, tuple(map(tuple, e[4])))] += 1
+    for k in np.flatnonzero(lifted & ~gone & ~graph['rev']).tolist():
+        g = int(graph['geom'][k])
+        went_in[(
+            _graph_cell(graph, int(src[k])), _graph_cell(graph, int(nbr[k])),
+            int(row_new[k]), tuple(map(tuple, xy[geom_off[g]:geom_off[g + 1]].tolist())),
+        )] += 1
+    if came_out != went_in:
+        return None
+    for c in [c for c in net.nodes if comp_of[c] != best]:
+        del net.nodes[c]
+        del net.adj[c]
+    _build_lap('patch.components', nodes=len(net.nodes))
+
+    # A cell whose node an earlier patch left dead gets that node back.
+    dead_of = {_graph_cell(graph, u): u for u in np.flatnonzero(~live).tolist()}
+    for c in net.nodes:
+        u = dead_of.get(c) if c not in old_id else None
+        if u is not None:
+            old_id[c] = u
+            net.nodes[c] = (float(lat[u]), float(lon[u]))
+
+    # The lifted part, compacted and reliefed like a graph of its own.
+    appended_cells = [c for c in net.nodes if c not in old_id]
+    elev = {
+        c: float(graph['elev'][u]) for c, u in old_id.items()
+        if c in net.nodes and not math.isnan(graph['elev'][u])
+    }
+    elev.update(_node_elevations(
+        {c: net.nodes[c] for c in appended_cells}, debug=debug,
+    ))
+    part = _compact_graph(net.nodes, net.adj, elev)
+    _attach_relief(part, _elevation_grid())
+    part_rows = [net.row_of.get(id(e[4]), -1) for c in net.nodes for e in net.adj[c]]
+    _build_lap('patch.relief', nodes=len(appended_cells))
+
+    # Splice: the graph's edges that weren't lifted and the part's, sorted
+    # back into CSR order by source node.
+    ids = np.array([old_id.get(c, -1) for c in net.nodes], dtype=np.int64)
+    appended = np.flatnonzero(ids < 0)
+    ids[appended] = n + np.arange(len(appended))
+    keep = ~lifted
+    categories = list(graph['categories'])
+    categories += [c for c in part['categories'] if c not in categories]
+    cat_map = np.array([categories.index(c) for c in part['categories']], dtype=np.uint8)
+    names = list(graph['names'])
+    name_code = {name: i for i, name in enumerate(names)}
+    for name in part['names']:
+        if name not in name_code:
+            name_code[name] = len(names)
+            names.append(name)
+    # A trailing -1 so the part's "no name" (-1) maps to itself.
+    name_map = np.array([name_code[name] for name in part['names']] + [-1], dtype=np.int32)
+    n_geom = len(graph['geom_off']) - 1
+    per_edge = {
+        'nbr': ids[part['nbr']],
+        'cat': cat_map[part['cat']],
+        'name': name_map[part['name']],
+        'geom': part['geom'] + n_geom,
+        'edge_row': np.array(part_rows, dtype=np.int64),
+    }
+    per_edge.update({
+        key: part[key] for key in (
+            'length', 'weight', 'danger', 'lit', 'lane_stress', 'sidewalk',
+            'rev', 'ascent', 'descent',
+        )
+    })
+    old_edges = {**{key: graph[key] for key in per_edge}, 'edge_row': row_new}
+    part_src = np.repeat(np.arange(len(ids)), np.diff(part['offsets']))
+    edge_src = np.concatenate([src[keep], ids[part_src]])
+    order = np.argsort(edge_src, kind='stable')
+    counts = np.bincount(edge_src, minlength=n + len(appended))
+
+    updated = {
+        key: value for key, value in graph.items()
+        if key not in ('reverse_csr', 'cell_index')
+    }
+    for key, value in per_edge.items():
+        updated[key] = np.concatenate([
+            old_edges[key][keep], value,
+        ]).astype(graph[key].dtype)[order]
+    updated['offsets'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    for key in ('lat', 'lon', 'elev', 'cell_r', 'cell_c', 'tunnel'):
+        updated[key] = np.concatenate([graph[key], part[key][appended]])
+    updated['node_dead'] = counts == 0
+    updated['geom_off'] = np.concatenate([
+        graph['geom_off'], part['geom_off'][1:] + len(graph['geom_xy']),
+    ])
+    updated['geom_xy'] = np.concatenate([graph['geom_xy'], part['geom_xy']])
+    updated['prof_off'] = np.concatenate([
+        graph['prof_off'], part['prof_off'][1:] + len(graph['prof_ft']),
+    ])
+    updated['prof_ft'] = np.concatenate([graph['prof_ft'], part['prof_ft']])
+    updated['geom_grade'] = np.concatenate([graph['geom_grade'], part['geom_grade']])
+
+    contested = np.zeros(len(rows), dtype=bool)
+    bbox = np.empty((len(rows), 4), dtype=np.float64)
+    kept = np.array(list(old_of.items()), dtype=np.int64).reshape(-1, 2)
+    contested[kept[:, 0]] = graph['row_contested'][kept[:, 1]]
+    bbox[kept[:, 0]] = graph['row_bbox'][kept[:, 1]]
+    bbox[added] = boxes[:len(added)]
+    contested[[r for r in net.contested if r >= 0]] = True
+    updated.update({
+        'epoch': time.time(),
+        'categories': tuple(categories),
+        'names': names,
+        'row_topo': np.array(topo, dtype=np.uint64),
+        'row_attr': np.array(attr, dtype=np.uint64),
+        'row_contested': contested,
+        'row_bbox': bbox,
+    })
+    _patch_spatial_index(updated, n, n_geom)
+    _build_lap('patch.splice', nodes=len(appended), edges=len(order) // 2)
+    return updated
+
+
+def _edge_components(graph: dict, edges, nodes) -> tuple:
+    """Connected components of the graph restricted to the `edges` and
+    `nodes` masks: a label per node (-1 outside `nodes`) and each label's
+    size. Vectorized: every round hooks each root onto the smallest root
+    across its edges, then pointer jumping flattens the labels."""
+    import numpy as np
+    n = _node_count(graph)
+    src = np.repeat(np.arange(n), np.diff(graph['offsets']))
+    nbr = graph['nbr'].astype(np.int64)
+    take = edges & nodes[src] & nodes[nbr]
+    s, t = src[take], nbr[take]
+    label = np.arange(n)
+    while True:
+        ls, lt = label[s], label[t]
+        hook = ls != lt
+        if not hook.any():
+            break
+        np.minimum.at(label, np.maximum(ls, lt)[hook], np.minimum(ls, lt)[hook])
+        while True:
+            jumped = label[label]
+            if np.array_equal(jumped, label):
+                break
+            label = jumped
+    _roots, inverse, counts = np.unique(
+        label[nodes], return_inverse=True, return_counts=True,
+    )
+    out = np.full(n, -1, dtype=np.int64)
+    out[nodes] = inverse
+    return out, counts.tolist()
+
+
+def _compact_graph(nodes: dict, adj: dict, elev: dict) -> dict[str, Any]:
+    """Pack the dict-of-tuples adjacency into CSR arrays.
+
+    The dict form costs hundreds of MB per API worker at ~37k nodes: every
+    direction of every edge is a 9-tuple holding its own references to the
+    chunk coords, name and extras. Here nodes are integer ids `0..n-1` and
+    the out-edges of node `u` are `offsets[u]:offsets[u + 1]` in the per-edge
+    arrays:
+
+      nbr, length, weight (the bike weight, for stats/dedup), cat (code into
+      `categories`), danger, lit, lane_stress (index into STRESS_ORDER, -1
+      none), sidewalk (1/0, -1 unknown), rev (edge runs against its geometry),
+      name (index into `names`, -1 none), geom (index into the geometry
+      table: `geom_xy[geom_off[g]:geom_off[g + 1]]`, [lon, lat] rows).
+
+    Both directions of an edge share one geometry row and every street name
+    is stored once. Per node: `lat`, `lon`, `elev` (feet, NaN = unknown) and
+    the grid cell it was keyed by (`cell_r`, `cell_c`, `tunnel`). The
+    elevation along each edge is added by `_attach_relief`.
+    """
+    import numpy as np
+
+    cells = list(nodes)
+    ids = {cell: i for i, cell in enumerate(cells)}
+    categories = list(ROUTE_CATEGORIES)
+    cat_codes = {c: i for i, c in enumerate(categories)}
+    names: list = []
+    name_codes: dict = {}
+    geom_codes: dict = {}
+    geom_off = [0]
+    geom_xy: list = []
+
+    offsets = [0]
+    nbr, length, weight, cat, danger, lit = [], [], [], [], [], []
+    lane_stress, sidewalk, rev, name, geom = [], [], [], [], []
+    for cell in cells:
+        for e in adj[cell]:
+            category = e[3]
+            if category not in cat_codes:
+                cat_codes[category] = len(categories)
+                categories.append(category)
+            street = e[6]
+            if street is None:
+                name.append(-1)
+            else:
+                if street not in name_codes:
+                    name_codes[street] = len(names)
+                    names.append(street)
+                name.append(name_codes[street])
+            # Both directions hold the same coords list, so identity is
+            # enough to intern it (adj keeps every list alive meanwhile).
+            coords = e[4]
+            g = geom_codes.get(id(coords))
+            if g is None:
+                g = geom_codes[id(coords)] = len(geom_off) - 1
+                geom_xy.extend(coords)
+                geom_off.append(len(geom_xy))
+            geom.append(g)
+            extras = e[8] if len(e) > 8 else (1.0, True, None)
+            ls = extras[2] if len(extras) > 2 else None
+            nbr.append(ids[e[0]])
+            weight.append(e[1])
+            length.append(e[2])
+            cat.append(cat_codes[category])
+            rev.append(bool(e[5]))
+            sidewalk.append(-1 if e[7] is None else int(bool(e[7])))
+            danger.append(extras[0])
+            lit.append(bool(extras[1]))
+            lane_stress.append(STRESS_ORDER.index(ls) if ls in STRESS_ORDER else -1)
+        offsets.append(len(nbr))
+
+    plain = [c[1:] if c[0] == 'T' else c for c in cells]
+    return {
+        'epoch': time.time(),
+        'lat': np.array([nodes[c][0] for c in cells], dtype=np.float64),
+        'lon': np.array([nodes[c][1] for c in cells], dtype=np.float64),
+        'elev': np.array(
+            [elev.get(c, np.nan) for c in cells], dtype=np.float64,
+        ),
+        'cell_r': np.array([c[0] for c in plain], dtype=np.int32),
+        'cell_c': np.array([c[1] for c in plain], dtype=np.int32),
+        'tunnel': np.array([c[0] == 'T' for c in cells], dtype=bool),
+        'offsets': np.array(offsets, dtype=np.int64),
+        'nbr': np.array(nbr, dtype=np.int32),
+        'length': np.array(length, dtype=np.float64),
+        'weight': np.array(weight, dtype=np.float64),
+        'cat': np.array(cat, dtype=np.uint8),
+        'danger': np.array(danger, dtype=np.float64),
+        'lit': np.array(lit, dtype=bool),
+        'lane_stress': np.array(lane_stress, dtype=np.int8),
+        'sidewalk': np.array(sidewalk, dtype=np.int8),
+        'rev': np.array(rev, dtype=bool),
+        'name': np.array(name, dtype=np.int32),
+        'geom': np.array(geom, dtype=np.int32),
+        'geom_off': np.array(geom_off, dtype=np.int64),
+        'geom_xy': np.array(geom_xy, dtype=np.float64).reshape(-1, 2),
+        'categories': tuple(categories),
+        'names': names,
+    }
+
+
+def _attach_relief(graph: dict, grid: dict | None = None):
+    """Elevation along every edge, computed once per build.
+
+    Per geometry row, in its own direction: `prof_ft[prof_off[g]:prof_off[g
+    + 1]]` are evenly spaced samples from the row's first vertex to its last
+    (uint16 tenths of a foot, ELEVATION_PROFILE_NODATA unknown), and
+    `geom_grade` is its steepest sustained grade -- the steepest stretch of
+    at least STEEP_MIN_RUN_M rising or falling at least STEEP_MIN_RISE_FT,
+    0 if none. Per edge, in its direction of travel: `ascent` and `descent`
+    (metres).
+
+    The end samples are the end nodes' own elevations, so an edge always
+    climbs at least the rise between its endpoints (the A* heuristic relies
+    on that). Between them the row is sampled from `grid` every
+    ELEVATION_PROFILE_STEP_M; without a grid, and for connectors, tunnels and
+    rows the grid has gaps along or that sag like a bridge, the profile is
+    just its two ends, which prices exactly like the old node-pair climb.
+    """
+    import numpy as np
+
+    geom_off = graph['geom_off']
+    xy = graph['geom_xy']
+    n_rows = len(geom_off) - 1
+    offsets = graph['offsets']
+    nbr, rev, geom = graph['nbr'], graph['rev'], graph['geom']
+    src = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    head = np.zeros(n_rows, dtype=np.int64)
+    tail = np.zeros(n_rows, dtype=np.int64)
+    head[geom] = np.where(rev, nbr, src)
+    tail[geom] = np.where(rev, src, nbr)
+    elev = graph['elev']
+    z0, z1 = elev[head], elev[tail]
+
+    seg = np.zeros(len(xy), dtype=np.float64)
+    if len(xy) > 1:
+        seg[1:] = np.hypot(
+            np.diff(xy[:, 0]) * M_PER_DEG_LAT * _COSLAT,
+            np.diff(xy[:, 1]) * M_PER_DEG_LAT,
+        )
+    # No segment joins the last vertex of one row to the first of the next.
+    seg[geom_off[:-1]] = 0.0
+    cum = np.cumsum(seg)
+    start = cum[geom_off[:-1]]
+    row_len = cum[np.maximum(geom_off[1:] - 1, geom_off[:-1])] - start
+
+    detailed = np.zeros(n_rows, dtype=bool)
+    if grid is not None:
+        connector = graph['categories'].index('connector')
+        plain = np.ones(n_rows, dtype=bool)
+        plain[geom[graph['cat'] == connector]] = False
+        tunnel = graph['tunnel']
+        detailed = (
+            plain & ~tunnel[head] & ~tunnel[tail]
+            & ~np.isnan(z0) & ~np.isnan(z1)
+            & (row_len > ELEVATION_PROFILE_STEP_M)
+        )
+
+    def _sample(detailed):
+        intervals = np.where(
+            detailed, np.ceil(row_len / ELEVATION_PROFILE_STEP_M), 1,
+        ).astype(np.int64)
+        prof_off = np.zeros(n_rows + 1, dtype=np.int64)
+        prof_off[1:] = np.cumsum(intervals + 1)
+        row_of = np.repeat(np.arange(n_rows), intervals + 1)
+        i = np.arange(prof_off[-1]) - prof_off[row_of]
+        feet = np.full(len(row_of), np.nan)
+        if detailed.any():
+            inner = detailed[row_of]
+            rows = row_of[inner]
+            target = start[rows] + row_len[rows] * i[inner] / intervals[rows]
+            j = np.clip(
+                np.searchsorted(cum, target, 'right') - 1,
+                geom_off[rows], geom_off[rows + 1] - 2,
+            )
+            span = cum[j + 1] - cum[j]
+            t = np.clip(
+                np.divide(
+                    target - cum[j], span,
+                    out=np.zeros_like(span), where=span > 0,
+                ),
+                0.0, 1.0,
+            )[:, None]
+            pts = xy[j] * (1 - t) + xy[j + 1] * t
+            feet[inner] = _sample_elevation(grid, pts[:, 1], pts[:, 0])
+        feet[prof_off[:-1]] = z0
+        feet[prof_off[1:] - 1] = z1
+        return intervals, prof_off, row_of, feet
+
+    intervals, prof_off, row_of, feet = _sample(detailed)
+    if detailed.any():
+        firsts = prof_off[:-1]
+        gaps = np.logical_or.reduceat(np.isnan(feet), firsts)
+        low = np.fmin.reduceat(feet, firsts)
+        bad = detailed & (
+            gaps | (low < np.minimum(z0, z1) - ELEVATION_PROFILE_MAX_SAG_FT)
+        )
+        if bad.any():
+            intervals, prof_off, row_of, feet = _sample(detailed & ~bad)
+
+    same = row_of[1:] == row_of[:-1]
+    diff = np.where(same, np.diff(feet), np.nan)
+    ascent = np.bincount(
+        row_of[1:], weights=np.where(diff > 0, diff, 0.0), minlength=n_rows,
+    ) / FT_PER_M
+    descent = np.bincount(
+        row_of[1:], weights=np.where(diff < 0, -diff, 0.0), minlength=n_rows,
+    ) / FT_PER_M
+
+    # Steepest window per row. Any window longer than twice the minimum run
+    # splits into two at least that long, one of them as steep as the whole,
+    # so samples (>= half a step apart) never need a wider window than this.
+    spacing = row_len / intervals
+    grade = np.zeros(n_rows, dtype=np.float64)
+    widest = min(
+        int(intervals.max()) if n_rows else 0,
+        int(math.ceil(4 * STEEP_MIN_RUN_M / ELEVATION_PROFILE_STEP_M)) + 1,
+    )
+    for w in range(1, widest + 1):
+        rows = row_of[:-w]
+        rise = np.abs(feet[w:] - feet[:-w])
+        run = w * spacing[rows]
+        ok = (
+            (rows == row_of[w:]) & (run >= STEEP_MIN_RUN_M)
+            & (rise >= STEEP_MIN_RISE_FT)
+        )
+        np.maximum.at(grade, rows[ok], rise[ok] / FT_PER_M / run[ok])
+
+    graph['prof_off'] = prof_off
+    graph['prof_ft'] = np.where(
+        np.isnan(feet), ELEVATION_PROFILE_NODATA,
+        np.clip(np.rint(feet * 10), 0, ELEVATION_PROFILE_NODATA - 1),
+    ).astype(np.uint16)
+    graph['geom_grade'] = grade.astype(np.float32)
+    graph['ascent'] = np.where(rev, descent[geom], ascent[geom]).astype(np.float32)
+    graph['descent'] = np.where(rev, ascent[geom], descent[geom]).astype(np.float32)
+
+
+def _node_count(graph: dict) -> int:
+    lat = graph.get('lat')
+    return 0 if lat is None else len(lat)
+
+
+def _node_latlon(graph: dict, u: int) -> tuple[float, float]:
+    return float(graph['lat'][u]), float(graph['lon'][u])
+
+
+def _edge_coords(graph: dict, k: int) -> list:
+    """Forward [lon, lat] coords of edge `k`'s geometry."""
+    g = graph['geom'][k]
+    return graph['geom_xy'][graph['geom_off'][g]:graph['geom_off'][g + 1]].tolist()
+
+
+def _row_profile(graph: dict, k: int) -> list[tuple[float, float]]:
+    """(fraction of the way along, feet) down edge `k`'s geometry row, in the
+    row's direction; NaN where unknown. The ends are read off the end nodes
+    at full precision rather than the uint16 samples."""
+    g = int(graph['geom'][k])
+    raw = graph['prof_ft'][graph['prof_off'][g]:graph['prof_off'][g + 1]]
+    feet = [
+        float('nan') if value == ELEVATION_PROFILE_NODATA else value / 10.0
+        for value in raw.tolist()
+    ]
+    u = _edge_source(graph, k)
+    v = int(graph['nbr'][k])
+    head, tail = (v, u) if graph['rev'][k] else (u, v)
+    feet[0], feet[-1] = float(graph['elev'][head]), float(graph['elev'][tail])
+    n = len(feet) - 1
+    return [(i / n, ft) for i, ft in enumerate(feet)]
+
+
+def _relief(points: list) -> tuple:
+    """(ascent_m, descent_m, grade, points) of an elevation series given as
+    (offset_m, feet) in travel order, NaN samples dropped; `grade` as in
+    `_attach_relief`. For the partial edges a request splits off; whole
+    edges read the aggregates stored at build time (`_edge_relief`)."""
+    points = [(d, ft) for d, ft in points if ft == ft]
+    ascent = descent = grade = 0.0
+    for (_d0, a), (_d1, b) in zip(points, points[1:]):
+        if b > a:
+            ascent += b - a
+        else:
+            descent += a - b
+    for i, (d0, a) in enumerate(points):
+        for d1, b in points[i + 1:]:
+            run, rise = d1 - d0, abs(b - a)
+            if run >= STEEP_MIN_RUN_M and rise >= STEEP_MIN_RISE_FT:
+                grade = max(grade, rise / FT_PER_M / run)
+    return ascent / FT_PER_M, descent / FT_PER_M, grade, points
+
+
+def _edge_relief(graph: dict, k: int) -> tuple:
+    """Edge `k`'s (ascent_m, descent_m, grade, [(offset_m, feet), ...]) in
+    its direction of travel, unknown samples left out."""
+    length = float(graph['length'][k])
+    points = [(f * length, ft) for f, ft in _row_profile(graph, k) if ft == ft]
+    if graph['rev'][k]:
+        points = [(length - d, ft) for d, ft in reversed(points)]
+    return (
+        float(graph['ascent'][k]),
+        float(graph['descent'][k]),
+        float(graph['geom_grade'][graph['geom'][k]]),
+        points,
+    )
+
+
+def _profile_slice(profile: list, f0: float, f1: float, length_m: float) -> list:
+    """The part of a `_row_profile` between fractions `f0` and `f1` of the
+    row, as (offset_m, feet) over `length_m`, travelling from `f0` to `f1`
+    (backwards along the row when `f1 < f0`); the cut ends interpolated."""
+    lo, hi = min(f0, f1), max(f0, f1)
+    inside = [(f, ft) for f, ft in profile if lo < f < hi]
+    cut = [(lo, _profile_at(profile, lo))] + inside + [(hi, _profile_at(profile, hi))]
+    span = hi - lo
+    points = [
+        ((f - lo) / span * length_m if span > 0 else 0.0, ft) for f, ft in cut
+    ]
+    if f1 < f0:
+        points = [(length_m - d, ft) for d, ft in reversed(points)]
+    return points
+
+
+def _profile_at(profile: list, f: float) -> float:
+    """Feet at fraction `f` along a `_row_profile` (NaN if unknown there)."""
+    for (fa, a), (fb, b) in zip(profile, profile[1:]):
+        if f <= fb:
+            return a if fb <= fa else a + (b - a) * (f - fa) / (fb - fa)
+    return profile[-1][1]
+
+
+def _edge_ascent_m(graph: dict, edge) -> float:
+    """Metres climbed along `edge`: a compact edge id, or an adjacency tuple
+    (whose relief, when it carries one, is its tenth field)."""
+    if isinstance(edge, tuple):
+        return edge[9][0] if len(edge) > 9 else 0.0
+    return float(graph['ascent'][edge])
+
+
+def _edge_tuple(graph: dict, k: int) -> tuple:
+    """Edge `k` as the adjacency tuple the route assembly speaks: (nbr,
+    weight, length_m, category, coords, reversed?, name, has_sidewalk,
+    (danger, lit, lane_stress), relief) -- relief as `_edge_relief` gives
+    it. Materialized on demand, only for the edges a route actually takes or
+    a terminus snaps onto."""
+    street = int(graph['name'][k])
+    sidewalk = int(graph['sidewalk'][k])
+    lane = int(graph['lane_stress'][k])
+    return (
+        int(graph['nbr'][k]),
+        float(graph['weight'][k]),
+        float(graph['length'][k]),
+        graph['categories'][graph['cat'][k]],
+        _edge_coords(graph, k),
+        bool(graph['rev'][k]),
+        graph['names'][street] if street >= 0 else None,
+        None if sidewalk < 0 else bool(sidewalk),
+        (
+            float(graph['danger'][k]),
+            bool(graph['lit'][k]),
+            STRESS_ORDER[lane] if lane >= 0 else None,
+        ),
+        _edge_relief(graph, k),
+    )
+
+
+def _node_edges(graph: dict, u: int) -> list[tuple]:
+    """Every out-edge of node `u`, materialized (see `_edge_tuple`)."""
+    offsets = graph['offsets']
+    return [
+        _edge_tuple(graph, k) for k in range(offsets[u], offsets[u + 1])
+    ]
+
+
+def _cell_index(graph: dict) -> dict:
+    """Grid cell (as `_grid_node` keys it) -> node id, memoized on the
+    graph. Routing never needs it; it maps a place back to its node."""
+    index = graph.get('cell_index')
+    if index is not None:
+        return index
+    index = {
+        (('T', r, c) if t else (r, c)): i
+        for i, (r, c, t) in enumerate(zip(
+            graph['cell_r'].tolist(), graph['cell_c'].tolist(),
+            graph['tunnel'].tolist(),
+        ))
+    }
+    graph['cell_index'] = index
+    return index
+
+
+def _srid_units_per_m(conn, srid: int, debug: bool = False) -> float:
+    """How many of `srid`'s linear units make a metre, MEASURED rather than
+    assumed.
+
+    The county's layers are a mix of feet (3361, 6570) and degrees (4326), and
+    getting this backwards silently scales every threshold by 3.28. So: take
+    two points a known distance apart on the ground, transform both into the
+    target CRS, and see how long the line came out.
+    """
+    probe = conn.read(
+        f'''
+        SELECT
+            ST_Distance(
+                ST_Transform(ST_SetSRID(ST_MakePoint(-82.4, 34.85), 4326), {srid}),
+                ST_Transform(ST_SetSRID(ST_MakePoint(-82.4, 34.86), 4326), {srid})
+            ) AS "ns",
+            ST_Distance(
+                ST_Transform(ST_SetSRID(ST_MakePoint(-82.4, 34.85), 4326), {srid}),
+                ST_Transform(ST_SetSRID(ST_MakePoint(-82.39, 34.85), 4326), {srid})
+            ) AS "ew"
+        ''',
+        debug=debug,
+    )
     #: 0.01 degrees of latitude on the ground, and 0.01 degrees of longitude at
     #: this latitude -- the same ground distance in each direction only for a
     #: projected CRS. In a geographic one a degree of longitude is the shorter
@@ -2267,27 +3866,53 @@ def _srid_units_per_m(conn, srid: int, debug: bool = False) -> float:
 def _node_elevations(nodes: dict, debug: bool = False) -> dict:
     """cell -> elevation in FEET, from the county's 4 ft contours.
 
+    Sampled (bilinear, one NumPy call for the whole graph) from the elevation
+    grid `mrsm export elevation_grid` rasterizes the contours into; until that
+    exists, looked up contour by contour (`_contour_elevations`). Contours
+    cover Greenville County only; a node outside it simply gets no entry and
+    every leg touching it is treated as flat.
+
+    These pin the ends of every edge's profile; `_attach_relief` fills in
+    the ground between them.
+    """
+    if not nodes:
+        return {}
+    grid = _elevation_grid()
+    if grid is None:
+        return _contour_elevations(nodes, debug=debug)
+    cells = list(nodes)
+    feet = _sample_elevation(
+        grid, [nodes[c][0] for c in cells], [nodes[c][1] for c in cells],
+    )
+    return {c: value for c, value in zip(cells, feet.tolist()) if value == value}
+
+
+def _contour_srid_radius(conn, debug: bool = False) -> tuple[int, float]:
+    """(SRID of the contour table, CONTOUR_MAX_M in its units)."""
+    schema, table = CONTOUR_SOURCE
+    srid_df = conn.read(
+        f'SELECT ST_SRID("geometry") AS "srid" '
+        f'FROM "{schema}"."{table}" LIMIT 1',
+        debug=debug,
+    )
+    srid = int(srid_df['srid'].iloc[0])
+    return srid, CONTOUR_MAX_M * _srid_units_per_m(conn, srid, debug=debug)
+
+
+def _contour_elevations(nodes: dict, debug: bool = False) -> dict:
+    """cell -> elevation in FEET, from the county's 4 ft contours directly.
+
     One indexed nearest-neighbour lookup per node (`<->` against the GiST index
     on the contour geometry), batched so no single statement carries the whole
-    graph. Contours cover Greenville County only; a node outside it simply gets
-    no entry and every leg touching it is treated as flat.
-
-    Elevation is stored per NODE rather than per edge on purpose: `_astar`
-    already holds both endpoints of the edge it is relaxing, so climb costs
-    need no change to the edge tuple and nothing downstream is re-indexed.
+    graph. What `_node_elevations` falls back to before the elevation grid has
+    been exported.
     """
     if not nodes:
         return {}
     schema, table = CONTOUR_SOURCE
     try:
         conn = _layer_pipe(LAYERS['bike-stress']).instance_connector
-        srid_df = conn.read(
-            f'SELECT ST_SRID("geometry") AS "srid" '
-            f'FROM "{schema}"."{table}" LIMIT 1',
-            debug=debug,
-        )
-        srid = int(srid_df['srid'].iloc[0])
-        radius = CONTOUR_MAX_M * _srid_units_per_m(conn, srid, debug=debug)
+        srid, radius = _contour_srid_radius(conn, debug=debug)
     except Exception as e:
         warn(f"No contour data ({schema}.{table}): routing will ignore hills ({e})")
         return {}
@@ -2331,110 +3956,797 @@ def _node_elevations(nodes: dict, debug: bool = False) -> dict:
     return elev
 
 
+_ELEVATION_GRID: dict[str, Any] = {'grid': None, 'mtime': None, 'checked': 0.0}
+_ELEVATION_GRID_LOCK = threading.Lock()
+
+
+def _elevation_grid_dir():
+    return _output_dir().parent.parent / 'elevation'
+
+
+def _elevation_grid() -> dict[str, Any] | None:
+    """The exported elevation grid, memory-mapped, or None if there is none.
+    Re-checked for a newer export every _GRAPH_CHECK_SECONDS."""
+    with _ELEVATION_GRID_LOCK:
+        now = time.time()
+        if now - _ELEVATION_GRID['checked'] < _GRAPH_CHECK_SECONDS:
+            return _ELEVATION_GRID['grid']
+        _ELEVATION_GRID['checked'] = now
+        root = _elevation_grid_dir()
+        try:
+            mtime = (root / 'meta.json').stat().st_mtime
+        except OSError:
+            _ELEVATION_GRID.update({'grid': None, 'mtime': None})
+            return None
+        if mtime != _ELEVATION_GRID['mtime']:
+            try:
+                grid = _load_elevation_grid(root)
+            except Exception as e:
+                warn(f"Could not load the elevation grid: {e}")
+                grid = None
+            _ELEVATION_GRID.update({'grid': grid, 'mtime': mtime})
+        return _ELEVATION_GRID['grid']
+
+
+def _load_elevation_grid(root) -> dict[str, Any] | None:
+    """Map the grid under `root` (None for another layout version)."""
+    import json
+    import numpy as np
+    from pathlib import Path
+
+    root = Path(root)
+    with open(root / 'meta.json') as f:
+        meta = json.load(f)
+    if meta.get('version') != ELEVATION_GRID_VERSION:
+        return None
+    return {**meta, 'feet': np.load(root / meta['file'], mmap_mode='r')}
+
+
+def _write_elevation_grid(feet, meta: dict, root=None):
+    """Write the grid (float32 feet, NaN where unknown) next to a `meta.json`
+    naming it; the meta is replaced atomically, so a reader maps the old grid
+    or the new one. Returns the grid's path."""
+    import json
+    import os
+    import numpy as np
+    from pathlib import Path
+
+    root = Path(root) if root is not None else _elevation_grid_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    name = f'feet-{int(time.time() * 1000)}.npy'
+    np.save(root / name, np.ascontiguousarray(feet, dtype=np.float32))
+    tmp = root / f'meta.json.{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump({**meta, 'version': ELEVATION_GRID_VERSION, 'file': name}, f)
+    os.replace(tmp, root / 'meta.json')
+    # Workers that mapped an older grid keep their mapping after the unlink.
+    for stale in root.glob('feet-*.npy'):
+        if stale.name != name:
+            stale.unlink(missing_ok=True)
+    return root / name
+
+
+def _sample_elevation(grid: dict, lats, lons):
+    """Feet at each (lat, lon), bilinear between the four surrounding grid
+    points; NaN off the grid or next to a gap in it."""
+    import numpy as np
+    feet = grid['feet']
+    rows, cols = feet.shape
+    fy = (np.asarray(lats, dtype=np.float64) - grid['lat0']) / grid['dlat']
+    fx = (np.asarray(lons, dtype=np.float64) - grid['lon0']) / grid['dlon']
+    r = np.floor(fy).astype(np.int64)
+    c = np.floor(fx).astype(np.int64)
+    inside = (r >= 0) & (r < rows - 1) & (c >= 0) & (c < cols - 1)
+    r, c = np.where(inside, r, 0), np.where(inside, c, 0)
+    ty, tx = fy - r, fx - c
+    value = (
+        feet[r, c] * (1 - ty) * (1 - tx) + feet[r, c + 1] * (1 - ty) * tx
+        + feet[r + 1, c] * ty * (1 - tx) + feet[r + 1, c + 1] * ty * tx
+    )
+    return np.where(inside, value, np.nan)
+
+
+def _fill_grid(values, known, sweeps: int = ELEVATION_FILL_SWEEPS):
+    """A smooth surface through the `known` cells of `values`: the rest are
+    solved for the discrete Laplace equation (each cell the mean of its four
+    neighbours), by Jacobi sweeps started from the same fill one level
+    coarser, so the sweeps only have to fix up local detail."""
+    import numpy as np
+    values = np.where(known, values, 0.0).astype(np.float32)
+    h, w = values.shape
+    if not known.any():
+        return np.full((h, w), np.nan, dtype=np.float32)
+    if min(h, w) > 4:
+        H, W = (h + 1) // 2, (w + 1) // 2
+        padded_v = np.zeros((H * 2, W * 2), dtype=np.float32)
+        padded_k = np.zeros((H * 2, W * 2), dtype=np.float32)
+        padded_v[:h, :w] = values
+        padded_k[:h, :w] = known
+        sums = padded_v.reshape(H, 2, W, 2).sum(axis=(1, 3))
+        counts = padded_k.reshape(H, 2, W, 2).sum(axis=(1, 3))
+        coarse = _fill_grid(
+            np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0),
+            counts > 0, sweeps,
+        )
+        guess = np.repeat(np.repeat(coarse, 2, axis=0), 2, axis=1)[:h, :w]
+    else:
+        guess = np.full((h, w), values[known].mean(), dtype=np.float32)
+    z = np.where(known, values, guess)
+    for _ in range(sweeps):
+        p = np.pad(z, 1, mode='edge')
+        z = np.where(
+            known, values,
+            (p[:-2, 1:-1] + p[2:, 1:-1] + p[1:-1, :-2] + p[1:-1, 2:]) * 0.25,
+        )
+    return z
+
+
+def _build_elevation_grid(debug: bool = False) -> tuple[Any, dict]:
+    """Rasterize the contours: every vertex (densified to half a cell) is
+    burned into the nearest grid point, points between contours are filled
+    smoothly (`_fill_grid`), and points farther than CONTOUR_MAX_M from any
+    contour are left unknown (NaN), as the per-node lookup left them.
+    Returns (feet, meta)."""
+    import numpy as np
+
+    schema, table = CONTOUR_SOURCE
+    conn = _layer_pipe(LAYERS['bike-stress']).instance_connector
+    srid, _radius = _contour_srid_radius(conn, debug=debug)
+    units_per_m = _srid_units_per_m(conn, srid, debug=debug)
+    extent = conn.read(f'''
+        SELECT ST_YMin(e) AS "south", ST_XMin(e) AS "west",
+               ST_YMax(e) AS "north", ST_XMax(e) AS "east"
+        FROM (
+            SELECT ST_Transform(
+                ST_SetSRID(ST_Extent("geometry")::geometry, {srid}), 4326
+            ) AS e
+            FROM "{schema}"."{table}"
+        ) x
+    ''', debug=debug).to_dict(orient='records')[0]
+    dlat = ELEVATION_GRID_M / M_PER_DEG_LAT
+    dlon = dlat / _COSLAT
+    lat0, lon0 = float(extent['south']), float(extent['west'])
+    rows = int((float(extent['north']) - lat0) / dlat) + 2
+    cols = int((float(extent['east']) - lon0) / dlon) + 2
+    info(f"Rasterizing {schema}.{table} into a {rows} x {cols} grid...")
+    sums = np.zeros((rows, cols), dtype=np.float64)
+    counts = np.zeros((rows, cols), dtype=np.int32)
+
+    def _burn(df):
+        r = np.rint((df['lat'].to_numpy() - lat0) / dlat).astype(np.int64)
+        c = np.rint((df['lon'].to_numpy() - lon0) / dlon).astype(np.int64)
+        ok = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+        np.add.at(sums, (r[ok], c[ok]), df['feet'].to_numpy()[ok])
+        np.add.at(counts, (r[ok], c[ok]), 1)
+
+    conn.read(f'''
+        SELECT ST_Y(p.geom) AS "lat", ST_X(p.geom) AS "lon", src."ELEVATION" AS "feet"
+        FROM "{schema}"."{table}" src,
+        LATERAL ST_DumpPoints(ST_Transform(
+            ST_Segmentize(src."geometry", {ELEVATION_GRID_M * units_per_m / 2}), 4326
+        )) p
+        WHERE src."ELEVATION" IS NOT NULL
+    ''', chunksize=500_000, chunk_hook=_burn, as_hook_results=True, debug=debug)
+
+    known = counts > 0
+    values = np.divide(sums, counts, out=np.zeros_like(sums), where=known)
+    feet = _fill_grid(values, known)
+    # Known within CONTOUR_MAX_M (a box, via a summed-area table) or unknown.
+    reach = int(CONTOUR_MAX_M / ELEVATION_GRID_M)
+    table_sum = np.pad(known.astype(np.int32).cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+    r = np.arange(rows)
+    c = np.arange(cols)
+    r0, r1 = np.clip(r - reach, 0, rows)[:, None], np.clip(r + reach + 1, 0, rows)[:, None]
+    c0, c1 = np.clip(c - reach, 0, cols)[None, :], np.clip(c + reach + 1, 0, cols)[None, :]
+    near = (table_sum[r1, c1] - table_sum[r0, c1] - table_sum[r1, c0] + table_sum[r0, c0]) > 0
+    feet[~near] = np.nan
+    meta = {
+        'lat0': lat0, 'lon0': lon0, 'dlat': dlat, 'dlon': dlon,
+        'cell_m': ELEVATION_GRID_M, 'source': f'{schema}.{table}',
+        'built_at': time.time(),
+    }
+    return feet, meta
+
+
+#: On-disk snapshot of the compact graph, written by `mrsm export route_graph`
+#: after the nightly sync: one `.npy` per array plus `meta.json`, loaded with
+#: `mmap_mode='r'` so every API worker maps the same page-cache copy instead
+#: of each rebuilding (~25 s of PostGIS) and holding its own. Bump the version
+#: whenever the `_compact_graph` layout changes; older snapshots are ignored.
+ROUTE_SNAPSHOT_VERSION = 4
+#: Snapshot directories kept besides the current one (a worker that mapped an
+#: older one keeps reading it; the files only go once nobody holds them).
+ROUTE_SNAPSHOT_KEEP = 2
+#: How often a worker asks the source pipes whether they've synced since its
+#: graph was built. The wall-clock TTL only applies when that's unknowable.
+_GRAPH_CHECK_SECONDS = 10 * 60
+
+
+def _route_snapshot_dir():
+    return _output_dir().parent.parent / 'route-graph'
+
+
+def _route_source_pipes() -> list[mrsm.Pipe]:
+    """The pipes the routing graph is built from."""
+    return [
+        _layer_pipe(LAYERS[layer_id])
+        for layer_id in ('bike-stress', 'bike-lanes', 'srt')
+    ] + [OSM_PATHS_PIPE]
+
+
+def _route_source_sync_time(debug: bool = False) -> float | None:
+    """Latest sync time (epoch seconds) across `_route_source_pipes`, or None
+    when none of them can say."""
+    latest = None
+    for pipe in _route_source_pipes():
+        stamp = _pipe_sync_time(pipe, debug=debug)
+        if stamp is None:
+            continue
+        latest = stamp if latest is None else max(latest, stamp)
+    return latest
+
+
+def _pipe_sync_time(pipe: mrsm.Pipe, debug: bool = False) -> float | None:
+    """The pipe's last sync time (epoch seconds), or None when it can't say."""
+    from datetime import timezone
+    try:
+        dt = pipe.get_sync_time(debug=debug)
+    except Exception as e:
+        warn(f"Could not read the sync time of {pipe}: {e}")
+        return None
+    if dt is None or not hasattr(dt, 'timestamp'):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _write_route_snapshot(
+    graph: dict,
+    sync_time: float | None,
+    root=None,
+):
+    """Write `graph`'s arrays to a fresh directory under `root` and point
+    `current.json` at it (atomically, so readers see the old snapshot or the
+    new one, never half of one). Returns the snapshot directory."""
+    import json
+    import os
+    import shutil
+    import numpy as np
+    from pathlib import Path
+
+    root = Path(root) if root is not None else _route_snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    name = f"v{ROUTE_SNAPSHOT_VERSION}-{int(time.time() * 1000)}"
+    path = root / name
+    path.mkdir()
+    arrays = sorted(k for k, v in graph.items() if isinstance(v, np.ndarray))
+    for key in arrays:
+        np.save(path / f'{key}.npy', np.ascontiguousarray(graph[key]))
+    meta = {
+        'version': ROUTE_SNAPSHOT_VERSION,
+        'built_at': graph['epoch'],
+        'sync_time': sync_time,
+        'arrays': arrays,
+        'categories': list(graph['categories']),
+        'names': list(graph['names']),
+        'build': graph.get('build'),
+    }
+    with open(path / 'meta.json', 'w') as f:
+        json.dump(meta, f)
+    tmp = root / f'current.json.{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump({'path': name}, f)
+    os.replace(tmp, root / 'current.json')
+
+    old = sorted(
+        (p for p in root.iterdir() if p.is_dir() and p.name != name),
+        key=lambda p: p.stat().st_mtime,
+    )
+    for stale in old[:max(len(old) - ROUTE_SNAPSHOT_KEEP, 0)]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return path
+
+
+def _load_route_snapshot(sync_time: float | None = None, root=None) -> dict | None:
+    """Map the current snapshot, or None when there is none, it's from another
+    layout version, or the sources have synced since it was written."""
+    import json
+    import numpy as np
+    from pathlib import Path
+
+    root = Path(root) if root is not None else _route_snapshot_dir()
+    try:
+        with open(root / 'current.json') as f:
+            path = root / json.load(f)['path']
+        with open(path / 'meta.json') as f:
+            meta = json.load(f)
+    except (OSError, ValueError, KeyError):
+        return None
+    if meta.get('version') != ROUTE_SNAPSHOT_VERSION:
+        return None
+    if (
+        sync_time is not None
+        and (meta.get('sync_time') is None or meta['sync_time'] < sync_time)
+    ):
+        return None
+    try:
+        graph = {
+            key: np.load(path / f'{key}.npy', mmap_mode='r')
+            for key in meta['arrays']
+        }
+    except (OSError, ValueError) as e:
+        warn(f"Could not map the routing graph snapshot '{path}': {e}")
+        return None
+    graph.update({
+        'epoch': time.time(),
+        'sync_time': meta.get('sync_time'),
+        'categories': tuple(meta['categories']),
+        'names': meta['names'],
+        # How the snapshot's graph was built, as the export logged it.
+        'build': {
+            **(meta.get('build') or {}),
+            'source': 'snapshot',
+            'snapshot': path.name,
+            'mapped_at': time.time(),
+        },
+    })
+    return graph
+
+
 def _get_route_graph(debug: bool = False) -> dict[str, Any]:
+    """The shared routing graph: the export's snapshot when it's current,
+    else built here. Once the source pipes sync, a background refresh swaps
+    in a new graph dict while requests keep routing on the old one."""
+    global _GRAPH
     with _GRAPH_LOCK:
+        graph = _GRAPH
+        if graph.get('offsets') is None:
+            graph = _next_route_graph(
+                graph, _route_source_sync_time(debug=debug), debug=debug,
+            )
+            graph['checked'] = time.time()
+            _GRAPH = graph
+            return graph
+        now = time.time()
         if (
-            _GRAPH['nodes'] is None
-            or (time.time() - _GRAPH['epoch']) > _GRAPH_TTL_SECONDS
+            now - graph.get('checked', 0.0) < _GRAPH_CHECK_SECONDS
+            or _GRAPH_REFRESHING.is_set()
         ):
+            return graph
+        graph['checked'] = now
+        _GRAPH_REFRESHING.set()
+    threading.Thread(
+        target=_refresh_route_graph, args=(graph, debug), daemon=True,
+    ).start()
+    return graph
+
+
+def _next_route_graph(graph: dict, sync_time: float | None, debug: bool = False) -> dict:
+    """The graph to replace `graph` with: the snapshot if it's current, else
+    `graph` patched with the re-synced rows, else a full build. May return
+    `graph` itself when the rows haven't changed. Either way the new graph's
+    `build` entry logs how it came to be, phase by phase."""
+    token = _BUILD_LOG.set(_new_build_log())
+    try:
+        fresh = _load_route_snapshot(sync_time)
+        if fresh is not None:
+            info("Mapped the routing graph snapshot.")
+            return fresh
+        rows = _route_source_rows(debug=debug)
+        fresh = _update_route_graph(graph, rows, debug=debug)
+        if fresh is not None:
+            if fresh is not graph:
+                _build_lap('patch')
+                fresh['build'] = _build_report(
+                    'patch', built_from=(graph.get('build') or {}).get('built_at'),
+                )
+                info(
+                    f"Patched the routing graph in "
+                    f"{fresh['build']['seconds']:.1f} s "
+                    f"({_slowest_phases(fresh['build'])})."
+                )
+        else:
             info("Building routing graph...")
-            built = _build_route_graph(debug=debug)
-            _GRAPH.pop('nearest_index', None)  # stale after a rebuild
-            _GRAPH.pop('edge_index', None)
-            _GRAPH.update(built)
+            fresh = _build_route_graph(debug=debug, rows=rows)
             info(
-                f"Routing graph: {len(built['nodes'])} nodes, "
-                f"{sum(len(v) for v in built['adj'].values()) // 2} edges."
+                f"Routing graph: {_node_count(fresh)} nodes, "
+                f"{len(fresh['nbr']) // 2} edges in "
+                f"{fresh['build']['seconds']:.1f} s "
+                f"({_slowest_phases(fresh['build'])})."
             )
-    return _GRAPH
+    finally:
+        _BUILD_LOG.reset(token)
+    fresh['sync_time'] = sync_time
+    return fresh
+
+
+def _category_totals(graph: dict) -> tuple[dict[str, int], dict[str, float]]:
+    """(edge count, metres) per category for route-stats.json, each
+    undirected edge once; rows with no category count as 'unknown'."""
+    import numpy as np
+    categories = graph['categories']
+    fwd = ~graph['rev']
+    cat_counts = np.bincount(graph['cat'][fwd], minlength=len(categories)).tolist()
+    cat_lengths = np.bincount(
+        graph['cat'][fwd], weights=graph['length'][fwd], minlength=len(categories),
+    ).tolist()
+    counts: dict[str, int] = {}
+    length_m: dict[str, float] = {}
+    for code, category in enumerate(categories):
+        if cat_counts[code]:
+            key = 'unknown' if category is None else str(category)
+            counts[key] = counts.get(key, 0) + cat_counts[code]
+            length_m[key] = length_m.get(key, 0.0) + cat_lengths[code]
+    return counts, length_m
+
+
+def _build_summary(graph: dict) -> dict[str, Any] | None:
+    """`graph['build']` for route-stats.json: timestamps as ISO 8601 (UTC),
+    alongside the sync time of the sources the graph was built from."""
+    import datetime
+    build = graph.get('build')
+    if build is None:
+        return None
 
+    def _iso(ts):
+        if ts is None:
+            return None
+        return datetime.datetime.fromtimestamp(
+            ts, tz=datetime.timezone.utc,
+        ).isoformat(timespec='seconds')
+
+    summary = dict(build)
+    for key in ('built_at', 'built_from', 'mapped_at'):
+        if key in summary:
+            summary[key] = _iso(summary[key])
+    summary['sync_time'] = _iso(graph.get('sync_time'))
+    return summary
+
+
+def _slowest_phases(build: dict, count: int = 3) -> str:
+    """The `count` slowest phases of a `build` report, for the log line."""
+    phases = sorted(build['phases'], key=lambda p: p['seconds'], reverse=True)
+    return ', '.join(f"{p['phase']} {p['seconds']:.1f} s" for p in phases[:count])
+
+
+def _refresh_route_graph(graph: dict, debug: bool = False):
+    """Replace `graph` if the source pipes have synced since it was built.
+    Runs off `_GRAPH_LOCK`; the swap itself is a single rebinding, after the
+    new graph's indexes and landmark tables are warm, so no request stalls
+    on the rebuild or on a cold graph."""
+    global _GRAPH
+    try:
+        sync_time = _route_source_sync_time(debug=debug)
+        if sync_time is None:
+            if time.time() - graph['epoch'] <= _GRAPH_TTL_SECONDS:
+                return
+        elif (graph.get('sync_time') or 0.0) >= sync_time:
+            return
+        fresh = _next_route_graph(graph, sync_time, debug=debug)
+        if fresh is graph:
+            return
+        _warm_route_graph(fresh, graph)
+        fresh['checked'] = time.time()
+        with _GRAPH_LOCK:
+            _GRAPH = fresh
+    except Exception as e:
+        warn(f"Could not refresh the routing graph; keeping the current one ({e})")
+    finally:
+        _GRAPH_REFRESHING.clear()
+
+
+def _warm_route_graph(graph: dict, previous: dict):
+    """Build the landmark tables `previous` had for `graph`."""
+    for table in list((previous.get('landmarks') or {}).values()):
+        _build_route_landmarks(graph, table['profile'])
+
+
+#: Fan-out of the packed R-trees (`_pack_rtree`): a few levels span every
+#: node and segment in the county, and a node's children fit one heap push
+#: loop.
+RTREE_NODE_SIZE = 16
+
+
+def _local_xy(lat, lon):
+    """(x, y) in the metric frame `_equirect_m` measures in: distances
+    between these are its distances."""
+    return lon * (M_PER_DEG_LAT * _COSLAT), lat * M_PER_DEG_LAT
+
+
+def _str_groups(boxes):
+    """Sort-Tile-Recursive grouping of `boxes` into runs of RTREE_NODE_SIZE:
+    (order, run sizes). Centres are cut into vertical slices of about
+    sqrt(runs) runs each, and each slice is run off bottom to top."""
+    import numpy as np
+    n = len(boxes)
+    size = RTREE_NODE_SIZE
+    cx = boxes[:, 0] + boxes[:, 2]
+    cy = boxes[:, 1] + boxes[:, 3]
+    per_slice = int(math.ceil(math.sqrt(math.ceil(n / size)))) * size
+    slice_of = np.empty(n, dtype=np.int64)
+    slice_of[np.argsort(cx, kind='stable')] = np.arange(n) // per_slice
+    order = np.lexsort((cy, slice_of))
+    slice_of = slice_of[order]
+    run = slice_of * per_slice + (np.arange(n) - slice_of * per_slice) // size
+    _runs, sizes = np.unique(run, return_counts=True)
+    return order, sizes
+
+
+def _pack_rtree(boxes) -> dict[str, Any]:
+    """A static R-tree over `boxes` ((n, 4): min x, min y, max x, max y in
+    `_local_xy` metres), bulk-loaded level by level with `_str_groups` and
+    packed into three flat arrays, leaves first and the root last:
+
+      box   -- each entry's bounds;
+      ptr   -- for a leaf, the index of its item in `boxes`; otherwise the
+               position of its first child (its children are contiguous);
+      count -- how many children it has (0 for a leaf).
+
+    Plain arrays, so the trees ride along with the graph into its snapshot
+    and every worker maps them instead of building its own."""
+    import numpy as np
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    box = boxes
+    ptr = np.arange(len(boxes), dtype=np.int64)
+    count = np.zeros(len(boxes), dtype=np.int32)
+    levels: list = []
+    placed = 0
+    while len(box):
+        order, sizes = _str_groups(box)
+        box, ptr, count = box[order], ptr[order], count[order]
+        levels.append((box, ptr, count))
+        base, placed = placed, placed + len(box)
+        if len(box) == 1:
+            break
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        box = np.column_stack([
+            np.minimum.reduceat(box[:, 0], starts),
+            np.minimum.reduceat(box[:, 1], starts),
+            np.maximum.reduceat(box[:, 2], starts),
+            np.maximum.reduceat(box[:, 3], starts),
+        ])
+        ptr = base + starts
+        count = sizes.astype(np.int32)
+    if not levels:
+        levels.append((box, ptr, count))
+    return {
+        'box': np.concatenate([b for b, _p, _c in levels]),
+        'ptr': np.concatenate([p for _b, p, _c in levels]).astype(np.int32),
+        'count': np.concatenate([c for _b, _p, c in levels]).astype(np.uint8),
+    }
 
-#: Node lookup grid, ~250 m cells. A linear scan over 37k nodes is 20 ms and
-#: the multi-modal planner does a dozen lookups per request.
-_NEAREST_GRID_M = 250.0
 
+def _rtree_nearest(
+    tree: dict,
+    x: float,
+    y: float,
+    k: int = 1,
+    max_m: float = float('inf'),
+    exact=None,
+    want=None,
+) -> list[tuple[float, int]]:
+    """The `k` items nearest (x, y), as (metres, item) nearest first, none
+    farther than `max_m`. Best-first: entries come off one heap in order of
+    their box's distance, so a far-off point costs a few more pops, not a
+    scan. `exact(item)` measures an item whose box is only a bound (a
+    segment); `want(item)` skips items that don't qualify."""
+    import heapq
+    box = _flat(tree['box'])
+    ptr = memoryview(tree['ptr'])
+    count = memoryview(tree['count'])
+    found: list = []
+    if not len(ptr):
+        return found
+    # Distances are squared until they're popped. Nothing farther than the
+    # k-th nearest item measured so far can be in the answer, so it's never
+    # pushed.
+    measured: list = []
+    bound = max_m * max_m
+    heap: list = []
+
+    def _push(first, n):
+        for c in range(first, first + n):
+            b = 4 * c
+            dx = box[b] - x
+            if dx < 0.0:
+                dx = x - box[b + 2]
+                if dx < 0.0:
+                    dx = 0.0
+            dy = box[b + 1] - y
+            if dy < 0.0:
+                dy = y - box[b + 3]
+                if dy < 0.0:
+                    dy = 0.0
+            c2 = dx * dx + dy * dy
+            if c2 <= bound:
+                heapq.heappush(heap, (c2, 0, c))
+
+    _push(len(ptr) - 1, 1)
+    while heap:
+        d2, done, i = heapq.heappop(heap)
+        if d2 > bound:
+            break
+        if done:
+            found.append((d2 ** 0.5, i))
+            if len(found) >= k:
+                break
+            continue
+        n = count[i]
+        if n == 0:
+            item = ptr[i]
+            if want is not None and not want(item):
+                continue
+            if exact is not None:
+                d2 = exact(item) ** 2
+                if d2 > bound:
+                    continue
+            heapq.heappush(heap, (d2, 1, item))
+            heapq.heappush(measured, -d2)
+            if len(measured) > k:
+                heapq.heappop(measured)
+            if len(measured) == k:
+                bound = min(bound, -measured[0])
+            continue
+        _push(ptr[i], n)
+    return found
+
+
+def _flat(array):
+    """A flat float64 memoryview over `array` (a C-contiguous ndarray, mapped
+    or not): plain indexing, no per-element NumPy scalars."""
+    return memoryview(array.reshape(-1))
+
+
+def _rtree_within(tree: dict, x: float, y: float, radius_m: float) -> list[int]:
+    """Every item whose box comes within `radius_m` of (x, y)."""
+    box = _flat(tree['box'])
+    ptr = memoryview(tree['ptr'])
+    count = memoryview(tree['count'])
+    items: list = []
+    stack = [len(ptr) - 1] if len(ptr) else []
+    r2 = radius_m * radius_m
+    while stack:
+        i = stack.pop()
+        dx = max(box[4 * i] - x, 0.0, x - box[4 * i + 2])
+        dy = max(box[4 * i + 1] - y, 0.0, y - box[4 * i + 3])
+        if dx * dx + dy * dy > r2:
+            continue
+        n = count[i]
+        if n == 0:
+            items.append(ptr[i])
+        else:
+            stack.extend(range(ptr[i], ptr[i] + n))
+    return items
+
+
+def _attach_spatial_index(graph: dict):
+    """Packed R-trees over the graph's nodes (`node_rtree_*`; a patch's dead
+    ones stay in, masked at query time, so they can come back) and over
+    every segment of its real, non-connector edges (`seg_rtree_*`; an item
+    is the `geom_xy` row the segment starts at), plus `geom_edge`: each
+    geometry row's canonical edge -- the copy with `rev` false -- or -1 for
+    connectors, which nothing snaps onto, and rows no edge uses any more.
+    Replaces any overlays `_patch_spatial_index` added."""
+    import numpy as np
+    graph['geom_edge'] = _geom_edges(graph)
+    for key, value in _node_rtree(graph, np.arange(_node_count(graph))).items():
+        graph[f'node_rtree_{key}'] = value
+    for key, value in _seg_rtree(graph, 0).items():
+        graph[f'seg_rtree_{key}'] = value
+    for key in [k for k in graph if k.startswith(('node_patch_', 'seg_patch_'))]:
+        del graph[key]
+    graph.pop('seg_dead', None)
+    graph.pop('rtree_base', None)
+
+
+def _geom_edges(graph: dict):
+    """Each geometry row's canonical edge (see `_attach_spatial_index`)."""
+    import numpy as np
+    connector = graph['categories'].index('connector')
+    canonical = np.flatnonzero(~graph['rev'] & (graph['cat'] != connector))
+    geom_edge = np.full(len(graph['geom_off']) - 1, -1, dtype=np.int32)
+    geom_edge[graph['geom'][canonical]] = canonical
+    return geom_edge
+
+
+def _node_rtree(graph: dict, nodes) -> dict:
+    """R-tree over the given node ids."""
+    import numpy as np
+    x, y = _local_xy(graph['lat'][nodes], graph['lon'][nodes])
+    tree = _pack_rtree(np.column_stack([x, y, x, y]))
+    leaves = tree['count'] == 0
+    tree['ptr'][leaves] = nodes[tree['ptr'][leaves]]
+    return tree
+
+
+def _seg_rtree(graph: dict, first_row: int) -> dict:
+    """R-tree over the segments of geometry rows `first_row` on that have a
+    canonical edge (`geom_edge`)."""
+    import numpy as np
+    geom_off, geom_edge = graph['geom_off'], graph['geom_edge']
+    base = int(geom_off[first_row])
+    xy = graph['geom_xy'][base:]
+    row_of = np.repeat(
+        np.arange(first_row, len(geom_off) - 1), np.diff(geom_off[first_row:]),
+    )
+    starts = np.flatnonzero(
+        (row_of[:-1] == row_of[1:]) & (geom_edge[row_of[:-1]] >= 0)
+    )
+    sx, sy = _local_xy(xy[:, 1], xy[:, 0])
+    tree = _pack_rtree(np.column_stack([
+        np.minimum(sx[starts], sx[starts + 1]),
+        np.minimum(sy[starts], sy[starts + 1]),
+        np.maximum(sx[starts], sx[starts + 1]),
+        np.maximum(sy[starts], sy[starts + 1]),
+    ]))
+    leaves = tree['count'] == 0
+    tree['ptr'][leaves] = base + starts[tree['ptr'][leaves]]
+    return tree
+
+
+def _patch_spatial_index(graph: dict, n_before: int, rows_before: int):
+    """Bring a patched graph's spatial index up to date without repacking
+    it: nodes appended since the last full pack go in a small overlay tree
+    (`node_patch_rtree_*`), geometry rows in another (`seg_patch_rtree_*`),
+    and what the patch killed is masked out at query time (`node_dead`, and
+    `seg_dead` per `geom_xy` row). Repacks whole once the overlays pass
+    ROUTE_PATCH_REINDEX_SHARE of the graph."""
+    import numpy as np
+    n_base, rows_base = graph.get('rtree_base', (n_before, rows_before))
+    n = _node_count(graph)
+    if n - n_base > ROUTE_PATCH_REINDEX_SHARE * n:
+        _attach_spatial_index(graph)
+        return
+    graph['geom_edge'] = _geom_edges(graph)
+    appended = np.arange(n_base, n)
+    appended = appended[~graph['node_dead'][appended]]
+    for key, value in _node_rtree(graph, appended).items():
+        graph[f'node_patch_rtree_{key}'] = value
+    for key, value in _seg_rtree(graph, rows_base).items():
+        graph[f'seg_patch_rtree_{key}'] = value
+    graph['seg_dead'] = np.repeat(
+        graph['geom_edge'] < 0, np.diff(graph['geom_off']),
+    )
+    graph['rtree_base'] = (n_base, rows_base)
 
-def _nearest_index(graph: dict) -> dict:
-    """Bucket every node into a coarse grid, memoized on the graph dict."""
-    index = graph.get('nearest_index')
-    if index is not None:
-        return index
-    cell_lat = _NEAREST_GRID_M / M_PER_DEG_LAT
-    cell_lon = cell_lat / _COSLAT
-    buckets: dict = {}
-    for cell, (nlat, nlon) in graph['nodes'].items():
-        buckets.setdefault(
-            (int(nlat / cell_lat), int(nlon / cell_lon)), [],
-        ).append(cell)
-    index = {'buckets': buckets, 'cell_lat': cell_lat, 'cell_lon': cell_lon}
-    graph['nearest_index'] = index
-    return index
+
+def _graph_rtree(graph: dict, kind: str) -> dict:
+    """The graph's `node` or `seg` R-tree (see `_attach_spatial_index`);
+    `node_patch` or `seg_patch` for a patch's overlay."""
+    return {
+        key: graph[f'{kind}_rtree_{key}'] for key in ('box', 'ptr', 'count')
+    }
+
+
+def _graph_nearest(graph: dict, kind: str, x: float, y: float, exact=None):
+    """The nearest (metres, item) to (x, y) in the graph's `node` or `seg`
+    index, overlay included, or None. Items a patch killed are skipped."""
+    dead = graph.get('node_dead' if kind == 'node' else 'seg_dead')
+    want = None if dead is None else (lambda item: not dead[item])
+    hits = _rtree_nearest(_graph_rtree(graph, kind), x, y, exact=exact, want=want)
+    if f'{kind}_patch_rtree_box' in graph:
+        hits += _rtree_nearest(
+            _graph_rtree(graph, f'{kind}_patch'), x, y, exact=exact, want=want,
+        )
+    return min(hits) if hits else None
 
 
 def _nearest_node(graph: dict, lat: float, lon: float):
-    """(node, meters) nearest to (lat, lon). Searches outward in grid rings and
-    stops as soon as the next ring can't beat the best hit."""
-    if not graph.get('nodes'):
+    """(node, meters) nearest to (lat, lon)."""
+    if not _node_count(graph):
         return None, None
-    index = _nearest_index(graph)
-    buckets = index['buckets']
-    cell_lat, cell_lon = index['cell_lat'], index['cell_lon']
-    home = (int(lat / cell_lat), int(lon / cell_lon))
-    best, best_d = None, None
-    for ring in range(0, 40):
-        # Everything outside this ring is at least (ring-1) cells away.
-        if best_d is not None and best_d <= (ring - 1) * _NEAREST_GRID_M:
-            break
-        for dy in range(-ring, ring + 1):
-            for dx in range(-ring, ring + 1):
-                if ring and max(abs(dy), abs(dx)) != ring:
-                    continue  # interior already searched
-                for cell in buckets.get((home[0] + dy, home[1] + dx), []):
-                    d = _equirect_m(lat, lon, *graph['nodes'][cell])
-                    if best_d is None or d < best_d:
-                        best, best_d = cell, d
-    return best, best_d
-
-
-def _edge_index(graph: dict) -> dict:
-    """Spatial index of real (non-connector) edges, memoized on the graph.
-
-    `edges[i]` is `(u, forward_edge_tuple)` — the canonical copy stored under
-    `u` with `is_reversed=False`. Every ~250 m cell an edge segment's bbox
-    overlaps maps to that edge's index, so a nearest-edge query only has to
-    project onto a handful of candidates.
-    """
-    index = graph.get('edge_index')
-    if index is not None:
-        return index
-    cell_lat = _NEAREST_GRID_M / M_PER_DEG_LAT
-    cell_lon = cell_lat / _COSLAT
-    edges: list = []
-    buckets: dict = {}
-    for u, lst in graph['adj'].items():
-        for e in lst:
-            if e[5] or e[3] == 'connector':
-                continue
-            ei = len(edges)
-            edges.append((u, e))
-            cells: set = set()
-            coords = e[4]
-            for a, b in zip(coords, coords[1:]):
-                r0 = int(min(a[1], b[1]) / cell_lat)
-                r1 = int(max(a[1], b[1]) / cell_lat)
-                c0 = int(min(a[0], b[0]) / cell_lon)
-                c1 = int(max(a[0], b[0]) / cell_lon)
-                for r in range(r0, r1 + 1):
-                    for c in range(c0, c1 + 1):
-                        cells.add((r, c))
-            for cell in cells:
-                buckets.setdefault(cell, []).append(ei)
-    index = {
-        'buckets': buckets, 'edges': edges,
-        'cell_lat': cell_lat, 'cell_lon': cell_lon,
-    }
-    graph['edge_index'] = index
-    return index
+    hit = _graph_nearest(graph, 'node', *_local_xy(lat, lon))
+    if hit is None:
+        return None, None
+    d, u = hit
+    return u, d
+
+
+def _edge_source(graph: dict, k: int) -> int:
+    """The node edge `k` leaves from."""
+    import numpy as np
+    return int(np.searchsorted(graph['offsets'], k, 'right')) - 1
 
 
 def _project_seg(lat: float, lon: float, a: list, b: list):
@@ -2461,33 +4773,24 @@ def _poly_len_m(coords: list) -> float:
 
 def _snap_edge(graph: dict, lat: float, lon: float):
     """Nearest point on any real edge to (lat, lon), or None.
-    Returns (edge_i, seg_i, t, [lon, lat], meters)."""
-    index = _edge_index(graph)
-    if not index['edges']:
+    Returns (edge k, seg_i, t, [lon, lat], meters): `k` is the edge's
+    canonical copy (`rev` false, so `coords` run from its source node)."""
+    import numpy as np
+    xy = _flat(graph['geom_xy'])
+
+    def _segment(j):
+        return (xy[2 * j], xy[2 * j + 1]), (xy[2 * j + 2], xy[2 * j + 3])
+
+    hit = _graph_nearest(
+        graph, 'seg', *_local_xy(lat, lon),
+        exact=lambda j: _project_seg(lat, lon, *_segment(j))[0],
+    )
+    if hit is None:
         return None
-    buckets = index['buckets']
-    edges = index['edges']
-    cell_lat, cell_lon = index['cell_lat'], index['cell_lon']
-    home = (int(lat / cell_lat), int(lon / cell_lon))
-    best = None
-    seen: set = set()
-    for ring in range(0, 40):
-        if best is not None and best[4] <= (ring - 1) * _NEAREST_GRID_M:
-            break
-        for dy in range(-ring, ring + 1):
-            for dx in range(-ring, ring + 1):
-                if ring and max(abs(dy), abs(dx)) != ring:
-                    continue
-                for ei in buckets.get((home[0] + dy, home[1] + dx), []):
-                    if ei in seen:
-                        continue
-                    seen.add(ei)
-                    coords = edges[ei][1][4]
-                    for si, (a, b) in enumerate(zip(coords, coords[1:])):
-                        d, t, pt = _project_seg(lat, lon, a, b)
-                        if best is None or d < best[4]:
-                            best = (ei, si, t, pt, d)
-    return best
+    d, j = hit
+    _d, t, pt = _project_seg(lat, lon, *_segment(j))
+    g = int(np.searchsorted(graph['geom_off'], j, 'right')) - 1
+    return int(graph['geom_edge'][g]), j - int(graph['geom_off'][g]), t, pt, d
 
 
 def _snap_terminus(graph: dict, lat: float, lon: float, tag: str) -> dict:
@@ -2500,18 +4803,18 @@ def _snap_terminus(graph: dict, lat: float, lon: float, tag: str) -> dict:
     hit = _snap_edge(graph, lat, lon)
     if hit is None or (node_d is not None and node_d <= hit[4] + 0.01):
         return {'node': node, 'dist': node_d, 'virtual': None}
-    ei, seg_i, t, pt, d = hit
-    u, edge = _edge_index(graph)['edges'][ei]
-    coords = edge[4]
+    k, seg_i, t, pt, d = hit
+    u = _edge_source(graph, k)
+    coords = _edge_coords(graph, k)
     # Landing on (or a hair from) a chunk endpoint IS that node.
     if _equirect_m(pt[1], pt[0], coords[0][1], coords[0][0]) < 0.5:
         return {'node': u, 'dist': d, 'virtual': None}
     if _equirect_m(pt[1], pt[0], coords[-1][1], coords[-1][0]) < 0.5:
-        return {'node': edge[0], 'dist': d, 'virtual': None}
+        return {'node': int(graph['nbr'][k]), 'dist': d, 'virtual': None}
     return {
         'node': ('virt', tag),
         'dist': d,
-        'virtual': {'ei': ei, 'seg_i': seg_i, 't': t, 'pt': pt},
+        'virtual': {'k': k, 'seg_i': seg_i, 't': t, 'pt': pt},
     }
 
 
@@ -2532,7 +4835,6 @@ def _register_virtual(
     snap: dict,
     extra_adj: dict,
     extra_nodes: dict,
-    extra_elev: dict | None = None,
 ):
     """Split the snapped edge at the projection point: partial edges from the
     virtual node to both real endpoints (and back), overlaid per-request."""
@@ -2540,11 +4842,13 @@ def _register_virtual(
         return
     v_info = snap['virtual']
     vid = snap['node']
-    u, edge = _edge_index(graph)['edges'][v_info['ei']]
+    k = v_info['k']
+    u = _edge_source(graph, k)
+    edge = _edge_tuple(graph, k)
     v, w, total, category, coords, _rev, name, hs = (
         edge[0], edge[1], edge[2], edge[3], edge[4], edge[5], edge[6], edge[7],
     )
-    extras = edge[8] if len(edge) > 8 else (1.0, True)
+    extras = edge[8]
     seg_i, pt = v_info['seg_i'], v_info['pt']
     part_a = coords[:seg_i + 1] + [pt]      # u -> virtual, forward
     part_b = [pt] + coords[seg_i + 1:]      # virtual -> v, forward
@@ -2553,21 +4857,27 @@ def _register_virtual(
     fa = len_a / total if total > 0 else 0.5
     fb = len_b / total if total > 0 else 0.5
     extra_nodes[vid] = (pt[1], pt[0])
-    # Give the virtual node an elevation interpolated along the edge it splits,
-    # or a terminus would read as a cliff against its own street.
-    if extra_elev is not None:
-        elev = graph.get('elev') or {}
-        eu, ev = elev.get(u), elev.get(v)
-        if eu is not None and ev is not None:
-            extra_elev[vid] = eu + (ev - eu) * min(max(fa, 0.0), 1.0)
+    # Each part climbs its own share of the split edge's profile, so a
+    # terminus on a hillside neither reads as a cliff against its own street
+    # nor gets half the hill for free.
+    at = min(max(fa, 0.0), 1.0)
+    profile = _row_profile(graph, k)
+    into_a, out_of_a = (
+        _relief(_profile_slice(profile, at, 0.0, len_a)),
+        _relief(_profile_slice(profile, 0.0, at, len_a)),
+    )
+    into_b, out_of_b = (
+        _relief(_profile_slice(profile, at, 1.0, len_b)),
+        _relief(_profile_slice(profile, 1.0, at, len_b)),
+    )
     extra_adj.setdefault(vid, []).extend((
-        (u, w * fa, len_a, category, part_a, True, name, hs, extras),
-        (v, w * fb, len_b, category, part_b, False, name, hs, extras),
+        (u, w * fa, len_a, category, part_a, True, name, hs, extras, into_a),
+        (v, w * fb, len_b, category, part_b, False, name, hs, extras, into_b),
     ))
     extra_adj.setdefault(u, []).append(
-        (vid, w * fa, len_a, category, part_a, False, name, hs, extras))
+        (vid, w * fa, len_a, category, part_a, False, name, hs, extras, out_of_a))
     extra_adj.setdefault(v, []).append(
-        (vid, w * fb, len_b, category, part_b, True, name, hs, extras))
+        (vid, w * fb, len_b, category, part_b, True, name, hs, extras, out_of_b))
 
 
 def _bridge_same_edge(
@@ -2579,13 +4889,14 @@ def _bridge_same_edge(
     """Both termini split the SAME edge: connect them directly along it, or the
     only path between them would detour to an endpoint and double back."""
     va, vb = snap_a.get('virtual'), snap_b.get('virtual')
-    if not va or not vb or va['ei'] != vb['ei']:
+    if not va or not vb or va['k'] != vb['k']:
         return
-    _u, edge = _edge_index(graph)['edges'][va['ei']]
+    k = va['k']
+    edge = _edge_tuple(graph, k)
     w, total, category, coords, name, hs = (
         edge[1], edge[2], edge[3], edge[4], edge[6], edge[7],
     )
-    extras = edge[8] if len(edge) > 8 else (1.0, True)
+    extras = edge[8]
     pos_a = _chunk_pos_m(coords, va['seg_i'], va['t'])
     pos_b = _chunk_pos_m(coords, vb['seg_i'], vb['t'])
     lo, hi = (snap_a, snap_b) if pos_a <= pos_b else (snap_b, snap_a)
@@ -2594,10 +4905,17 @@ def _bridge_same_edge(
     bridge = [lo_v['pt']] + mid + [hi_v['pt']]
     blen = max(abs(pos_b - pos_a), 0.1)
     bw = w * (blen / total) if total > 0 else blen
+    profile = _row_profile(graph, k)
+    f_lo, f_hi = (
+        min(max(pos / total, 0.0), 1.0) if total > 0 else 0.5
+        for pos in sorted((pos_a, pos_b))
+    )
     extra_adj.setdefault(lo['node'], []).append(
-        (hi['node'], bw, blen, category, bridge, False, name, hs, extras))
+        (hi['node'], bw, blen, category, bridge, False, name, hs, extras,
+         _relief(_profile_slice(profile, f_lo, f_hi, blen))))
     extra_adj.setdefault(hi['node'], []).append(
-        (lo['node'], bw, blen, category, bridge, True, name, hs, extras))
+        (lo['node'], bw, blen, category, bridge, True, name, hs, extras,
+         _relief(_profile_slice(profile, f_hi, f_lo, blen))))
 
 
 def _edge_deficiency(edge, mode: str) -> str | None:
@@ -2626,12 +4944,333 @@ def _edge_deficiency(edge, mode: str) -> str | None:
     return None
 
 
-def _climb_m(from_elev: float | None, to_elev: float | None) -> float:
-    """Metres of RISE between two node elevations (feet), 0 for a descent or
-    when either end is off the contour coverage."""
-    if from_elev is None or to_elev is None or to_elev <= from_elev:
-        return 0.0
-    return (to_elev - from_elev) / FT_PER_M
+def _weight_profile(mode: str, climb_mode: str | None = None) -> dict:
+    """Everything an edge's cost depends on besides the edge itself, for this
+    request. `key` identifies the profile: two requests with the same key
+    price every edge identically, so they share one weight vector."""
+    base = _base_mode(mode)
+    factors = MODE_FACTORS[mode]
+    # "Prefer the trail" off (`?trail=0`): the SRT prices like a plain calm
+    # street — still routable, just no longer magnetic.
+    trail = bool(_TRAIL_PREF.get())
+    if not trail and factors.get('srt'):
+        factors = {**factors, 'srt': max(factors['srt'], 1.0)}
+    # Hills are priced for whoever is actually travelling, which is not always
+    # the mode being routed: the street fallback routes with flat `street`
+    # weights, but the rider is still in a wheelchair and the hill is still
+    # there. Traffic tolerance is a preference; a grade is physics.
+    climb_factor = CLIMB_FACTOR.get(_mode_family(climb_mode or mode), 0.0)
+    night_factor = NIGHT_UNLIT_FACTOR.get(base, 1.0) if _is_night() else 1.0
+    return {
+        'key': (mode, climb_factor, night_factor, trail),
+        'mode': mode,
+        'base': base,
+        'factors': factors,
+        'default_factor': MODE_DEFAULT_FACTOR[mode],
+        'no_sidewalk_factor': NO_SIDEWALK_FACTOR.get(base, 1.0),
+        'climb_factor': climb_factor,
+        'night_factor': night_factor,
+    }
+
+
+def _edge_cost(edge, profile: dict) -> float:
+    """Cost of one adjacency tuple under `profile`, climb excluded (added from
+    the edge's relief: `_edge_ascent_m`)."""
+    category = edge[3]
+    if category == 'connector':
+        return edge[2]
+    factors = profile['factors']
+    weight = edge[2] * factors.get(category, profile['default_factor'])
+    # (danger multiplier, lit?, lane_stress) — crash history, streetlight
+    # coverage and the stress rating under a painted lane, baked in at
+    # graph build. Danger is 1.0 on car-free surfaces. The lane-stress
+    # penalty is priced HERE, against this rider's own factors: a fixed
+    # build-time penalty read as cheap precisely to the quiet riders who
+    # most wanted away from streets like Church St.
+    extras = edge[8] if len(edge) > 8 else None
+    if extras is not None:
+        if extras[0] != 1.0:
+            weight *= extras[0]
+        if profile['night_factor'] != 1.0 and not extras[1]:
+            weight *= profile['night_factor']
+        if category == 'bike-lane' and len(extras) > 2 and extras[2]:
+            weight *= _lane_stress_multiplier(factors, extras[2])
+    if (
+        profile['no_sidewalk_factor'] != 1.0
+        and _edge_deficiency(edge, profile['mode']) == 'no_sidewalk'
+    ):
+        weight *= profile['no_sidewalk_factor']
+    return weight
+
+
+def _edge_weights(graph: dict, profile: dict):
+    """Cost of every edge of the compact graph under `profile`, climb
+    included: `_edge_cost` plus the climb term, vectorized in the same order
+    so both agree to the last bit.
+
+    There are only a few dozen profiles (mode x night x trail), so each
+    vector is built once per graph, on first use, and kept under
+    `graph['weights']` (dropped with the graph on a rebuild). A* then pays
+    one array index per relaxed edge.
+    """
+    cache = graph.setdefault('weights', {})
+    weights = cache.get(profile['key'])
+    if weights is not None:
+        return weights
+
+    import numpy as np
+    factors = profile['factors']
+    categories = graph['categories']
+    cat = graph['cat']
+    is_connector = cat == categories.index('connector')
+    weights = graph['length'] * np.array(
+        [
+            1.0 if c == 'connector'
+            else factors.get(c, profile['default_factor'])
+            for c in categories
+        ],
+        dtype=np.float64,
+    )[cat]
+    weights *= np.where(is_connector, 1.0, graph['danger'])
+    if profile['night_factor'] != 1.0:
+        weights *= np.where(
+            is_connector | graph['lit'], 1.0, profile['night_factor'],
+        )
+    if 'bike-lane' in categories:
+        lane_mult = np.array(
+            [_lane_stress_multiplier(factors, s) for s in STRESS_ORDER] + [1.0],
+            dtype=np.float64,
+        )
+        on_lane = cat == categories.index('bike-lane')
+        weights *= np.where(on_lane, lane_mult[graph['lane_stress']], 1.0)
+    if profile['no_sidewalk_factor'] != 1.0 and profile['base'] in ('walk', 'roll'):
+        exposed = np.array(
+            [
+                c != 'connector' and c not in OWN_SURFACE_CATEGORIES
+                for c in categories
+            ],
+            dtype=bool,
+        )[cat] & (graph['sidewalk'] == 0)
+        weights *= np.where(exposed, profile['no_sidewalk_factor'], 1.0)
+    if profile['climb_factor']:
+        # Every metre climbed along the edge's profile, not just the rise
+        # between its ends (see `_attach_relief`).
+        weights += graph['ascent'] * profile['climb_factor']
+    weights.flags.writeable = False
+    cache[profile['key']] = weights
+    return weights
+
+
+#: A* lower bounds from landmark distance tables (ALT: A*, landmarks,
+#: triangle inequality). The straight-line bound is scaled by the cheapest
+#: factor (the SRT's ~0.15), so on its own it barely steers a long trip and
+#: A* settles most of the county. `ROUTE_LANDMARK_COUNT` nodes spread to the
+#: edges of the network each get exact shortest-path distances to and from
+#: every node, per weight profile; the bound they give is usually within a
+#: few % of the true cost. (Not the Trail Landmarks layer's LANDMARKS.)
+#: ~4.7 MB and a few seconds of CPU per profile at 37k nodes, so tables are
+#: built in the background on a profile's first use (the search falls back
+#: to the straight-line bound meanwhile), at most
+#: `ROUTE_LANDMARK_MAX_PROFILES` of them per graph.
+ROUTE_LANDMARK_COUNT = 8
+ROUTE_LANDMARK_MAX_PROFILES = 16
+_ROUTE_LANDMARK_LOCK = threading.Lock()
+_ROUTE_LANDMARK_BUILDING: set = set()
+
+
+def _reverse_csr(graph: dict) -> dict:
+    """In-edges of every node, memoized on the graph: node v's are
+    `edge[offsets[v]:offsets[v + 1]]` (forward edge ids, so the weight of
+    each is the forward one) arriving from `src[...]`."""
+    import numpy as np
+    reverse = graph.get('reverse_csr')
+    if reverse is not None:
+        return reverse
+    n = _node_count(graph)
+    offsets, nbr = graph['offsets'], graph['nbr']
+    src = np.repeat(np.arange(n, dtype=np.int32), np.diff(offsets))
+    order = np.argsort(nbr, kind='stable')
+    reverse = {
+        'offsets': np.concatenate((
+            [0], np.cumsum(np.bincount(nbr, minlength=n)),
+        )).astype(np.int64),
+        'src': np.ascontiguousarray(src[order]),
+        'edge': order.astype(np.int64),
+    }
+    graph['reverse_csr'] = reverse
+    return reverse
+
+
+def _dijkstra_all(offsets, nbrs, weights, source: int, n: int) -> list[float]:
+    """Shortest distance from `source` to every node over CSR arrays
+    (memoryviews); unreachable nodes stay at infinity."""
+    import heapq
+    inf = float('inf')
+    dist = [inf] * n
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(offsets[u], offsets[u + 1]):
+            v = nbrs[k]
+            nd = d + weights[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def _build_route_landmarks(graph: dict, profile: dict) -> dict | None:
+    """Pick landmarks by farthest-point selection under `profile`'s weights
+    and tabulate `fwd[l, v]` = d(landmark l, v) and `bwd[l, v]` = d(v, l).
+    Stored under `graph['landmarks']` unless the graph was rebuilt
+    meanwhile."""
+    import numpy as np
+
+    n = _node_count(graph)
+    if n < 2:
+        return None
+    epoch = graph['epoch']
+    weights = _edge_weights(graph, profile)
+    reverse = _reverse_csr(graph)
+    fwd_csr = (
+        memoryview(graph['offsets']), memoryview(graph['nbr']), memoryview(weights),
+    )
+    bwd_csr = (
+        memoryview(reverse['offsets']),
+        memoryview(reverse['src']),
+        memoryview(np.ascontiguousarray(weights[reverse['edge']])),
+    )
+
+    count = min(ROUTE_LANDMARK_COUNT, n)
+    ids: list[int] = []
+    fwd = np.empty((count, n), dtype=np.float64)
+    bwd = np.empty((count, n), dtype=np.float64)
+    # Seed from the node farthest (by crow-fly) from the network's centroid,
+    # then keep adding whichever node is farthest from every landmark so far.
+    # A node a patch left dead can't seed (nothing reaches it after that).
+    lat, lon = graph['lat'], graph['lon']
+    far = np.abs(lat - lat.mean()) + np.abs(lon - lon.mean()) * _COSLAT
+    if 'node_dead' in graph:
+        far[graph['node_dead']] = -1.0
+    nxt = int(np.argmax(far))
+    nearest = np.full(n, np.inf)
+    for i in range(count):
+        ids.append(nxt)
+        fwd[i] = _dijkstra_all(*fwd_csr, nxt, n)
+        bwd[i] = _dijkstra_all(*bwd_csr, nxt, n)
+        nearest = np.minimum(nearest, np.where(np.isfinite(fwd[i]), fwd[i], 0.0))
+        nxt = int(np.argmax(nearest))
+    table = {'ids': ids, 'fwd': fwd, 'bwd': bwd, 'profile': profile}
+    with _ROUTE_LANDMARK_LOCK:
+        if graph.get('epoch') != epoch:
+            return None
+        tables = graph.setdefault('landmarks', {})
+        if len(tables) < ROUTE_LANDMARK_MAX_PROFILES or profile['key'] in tables:
+            tables[profile['key']] = table
+    return table
+
+
+def _route_landmarks(graph: dict, profile: dict) -> dict | None:
+    """`profile`'s landmark table, or None while it hasn't been built (the
+    first call starts a background build)."""
+    table = (graph.get('landmarks') or {}).get(profile['key'])
+    if table is not None:
+        return table
+    token = (graph.get('epoch'), profile['key'])
+    with _ROUTE_LANDMARK_LOCK:
+        if (
+            token in _ROUTE_LANDMARK_BUILDING
+            or len(graph.get('landmarks') or {}) >= ROUTE_LANDMARK_MAX_PROFILES
+        ):
+            return None
+        _ROUTE_LANDMARK_BUILDING.add(token)
+
+    def _build():
+        try:
+            _build_route_landmarks(graph, profile)
+        except Exception as e:
+            warn(f"Landmark build failed: routing falls back to plain A* ({e})")
+        finally:
+            with _ROUTE_LANDMARK_LOCK:
+                _ROUTE_LANDMARK_BUILDING.discard(token)
+
+    threading.Thread(target=_build, daemon=True).start()
+    return None
+
+
+def _landmark_bounds(table: dict, anchors: list):
+    """Lower bound on the cost from every node to the goal, where reaching
+    the goal means reaching anchor node t and then paying c, for (t, c) in
+    `anchors`: min over anchors of c + max over landmarks of the triangle
+    bounds d(l, t) - d(l, v) and d(v, l) - d(t, l)."""
+    import numpy as np
+    fwd, bwd = table['fwd'], table['bwd']
+    bound = None
+    for t, cost in anchors:
+        lb = np.maximum(fwd[:, [t]] - fwd, bwd - bwd[:, [t]]).max(axis=0)
+        lb = np.nan_to_num(lb, nan=0.0, posinf=0.0, neginf=0.0)
+        # Table sums and search sums round differently; stay a hair under.
+        lb = np.maximum(lb - 1e-6, 0.0) + cost
+        bound = lb if bound is None else np.minimum(bound, lb)
+    return bound
+
+
+def _cost_bound(
+    graph: dict,
+    goal,
+    profile: dict,
+    extra_adj: dict,
+    extra_nodes: dict,
+):
+    """The A* heuristic toward `goal` under `profile`: (h, bounds) where h(node)
+    is a lower bound on the cost from node to the goal -- the straight-line
+    bound, tightened by the profile's landmark table once one exists -- and
+    `bounds` the landmark bounds per real node (None without a table)."""
+    lat_mv, lon_mv = memoryview(graph['lat']), memoryview(graph['lon'])
+
+    def _pos(node):
+        if isinstance(node, int):
+            return lat_mv[node], lon_mv[node]
+        return extra_nodes[node]
+
+    glat, glon = _pos(goal)
+    climb_factor = profile['climb_factor']
+    # Connectors weigh 1.0, so the heuristic can never assume better than that.
+    # The climb, danger and night terms only ADD cost (all multipliers >= 1),
+    # so the heuristic stays admissible.
+    min_factor = min(list(profile['factors'].values()) + [1.0])
+
+    # Landmark bounds need the goal in terms of real nodes: a virtual goal is
+    # reached from the endpoints of the edge it splits, at the overlay cost.
+    # Alternate-route penalties only raise costs, so the bounds still hold.
+    bounds = None
+    table = _route_landmarks(graph, profile)
+    if table is not None:
+        if isinstance(goal, int):
+            anchors = [(goal, 0.0)]
+        else:
+            anchors = [
+                (u, _edge_cost(e, profile) + (
+                    _edge_ascent_m(graph, e) * climb_factor
+                    if climb_factor else 0.0
+                ))
+                for u, lst in extra_adj.items() if isinstance(u, int)
+                for e in lst if e[0] == goal
+            ]
+        if anchors:
+            bounds = memoryview(_landmark_bounds(table, anchors))
+
+    def h(node):
+        lat, lon = _pos(node)
+        crow = _equirect_m(lat, lon, glat, glon) * min_factor
+        if bounds is not None and isinstance(node, int):
+            return max(crow, bounds[node])
+        return crow
+
+    return h, bounds
 
 
 def _astar(
@@ -2641,87 +5280,54 @@ def _astar(
     mode: str = 'bike',
     extra_adj: dict | None = None,
     extra_nodes: dict | None = None,
-    extra_elev: dict | None = None,
     climb_mode: str | None = None,
     avoid_pairs: set | None = None,
+    stats: dict | None = None,
+    bidirectional: bool | None = None,
 ):
     """Returns list of (node, edge) from start to goal, or None. edge is the
     adjacency tuple taken to arrive at node (None for start). Edge weights are
-    recomputed per mode from length x category factor x missing-sidewalk
+    priced per mode from length x category factor x missing-sidewalk
     penalty (the stored weight is the bike one, kept for stats/dedup), plus the
-    cost of any climbing between the edge's two nodes.
+    cost of the climbing along the edge (see `_edge_weights`).
+
+    `extra_adj` / `extra_nodes` overlay per-request virtual nodes
+    (termini snapped mid-edge) without mutating the shared graph.
+
+    The heuristic is the straight-line bound, tightened by the profile's
+    landmark table once one exists (see `_route_landmarks`). `stats`, when given,
+    gets the settled-node and heap-push counts and whether landmarks were used.
 
-    `extra_adj` / `extra_nodes` / `extra_elev` overlay per-request virtual nodes
-    (termini snapped mid-edge) without mutating the shared graph."""
+    `bidirectional` (default `ROUTE_BIDIRECTIONAL`) searches from both ends
+    at once instead; see `_bidirectional_astar`. Same result, same path
+    format."""
     import heapq
     import itertools
 
-    nodes = graph['nodes']
-    adj = graph['adj']
     extra_adj = extra_adj or {}
     extra_nodes = extra_nodes or {}
-    elev = graph.get('elev') or {}
-    extra_elev = extra_elev or {}
-
-    def _pos(cell):
-        return extra_nodes.get(cell) or nodes[cell]
-
-    def _elev(cell):
-        value = extra_elev.get(cell)
-        return elev.get(cell) if value is None else value
-
-    glat, glon = _pos(goal)
-    base = _base_mode(mode)
-    factors = MODE_FACTORS[mode]
-    # "Prefer the trail" off (`?trail=0`): the SRT prices like a plain calm
-    # street — still routable, just no longer magnetic.
-    if not _TRAIL_PREF.get() and factors.get('srt'):
-        factors = {**factors, 'srt': max(factors['srt'], 1.0)}
-    default_factor = MODE_DEFAULT_FACTOR[mode]
-    no_sidewalk_factor = NO_SIDEWALK_FACTOR.get(base, 1.0)
-    # Hills are priced for whoever is actually travelling, which is not always
-    # the mode being routed: the street fallback routes with flat `street`
-    # weights, but the rider is still in a wheelchair and the hill is still
-    # there. Traffic tolerance is a preference; a grade is physics.
-    climb_factor = CLIMB_FACTOR.get(_mode_family(climb_mode or mode), 0.0)
-    night = _is_night()
-    night_factor = NIGHT_UNLIT_FACTOR.get(base, 1.0) if night else 1.0
-    # Connectors weigh 1.0, so the heuristic can never assume better than that.
-    # The climb, danger and night terms only ADD cost (all multipliers >= 1),
-    # so the heuristic stays admissible.
-    min_factor = min(list(factors.values()) + [1.0])
+    if bidirectional is None:
+        bidirectional = ROUTE_BIDIRECTIONAL
+    if bidirectional and start != goal:
+        return _bidirectional_astar(
+            graph, start, goal, _weight_profile(mode, climb_mode),
+            extra_adj, extra_nodes,
+            avoid_pairs=avoid_pairs, stats=stats,
+        )
+    profile = _weight_profile(mode, climb_mode)
+    climb_factor = profile['climb_factor']
+    h, bounds = _cost_bound(graph, goal, profile, extra_adj, extra_nodes)
 
-    def h(cell):
-        lat, lon = _pos(cell)
-        return _equirect_m(lat, lon, glat, glon) * min_factor
+    offsets = memoryview(graph['offsets'])
+    nbrs = memoryview(graph['nbr'])
+    weights = memoryview(_edge_weights(graph, profile))
 
-    def edge_weight(edge) -> float:
-        category = edge[3]
-        if category == 'connector':
-            return edge[2]
-        weight = edge[2] * factors.get(category, default_factor)
-        # (danger multiplier, lit?, lane_stress) — crash history, streetlight
-        # coverage and the stress rating under a painted lane, baked in at
-        # graph build. Danger is 1.0 on car-free surfaces. The lane-stress
-        # penalty is priced HERE, against this rider's own factors: a fixed
-        # build-time penalty read as cheap precisely to the quiet riders who
-        # most wanted away from streets like Church St.
-        extras = edge[8] if len(edge) > 8 else None
-        if extras is not None:
-            if extras[0] != 1.0:
-                weight *= extras[0]
-            if night_factor != 1.0 and not extras[1]:
-                weight *= night_factor
-            if category == 'bike-lane' and len(extras) > 2 and extras[2]:
-                weight *= _lane_stress_multiplier(factors, extras[2])
-        if no_sidewalk_factor != 1.0 and _edge_deficiency(edge, mode) == 'no_sidewalk':
-            weight *= no_sidewalk_factor
-        return weight
-
-    # Tiebreaker: virtual-node ids aren't comparable with grid cells, so the
+    # Tiebreaker: virtual-node ids aren't comparable with node ids, so the
     # heap must never fall through to comparing nodes.
     seq = itertools.count()
     dist = {start: 0.0}
+    # prev[node] = (parent, edge): an edge id of the compact graph, or an
+    # overlay tuple; only the winning path is materialized into tuples.
     prev: dict = {start: (None, None)}
     heap = [(h(start), 0.0, next(seq), start)]
     visited: set = set()
@@ -2730,18 +5336,35 @@ def _astar(
         if cur in visited:
             continue
         visited.add(cur)
+        if not len(visited) % ROUTE_BUDGET_STRIDE:
+            _route_charge(ROUTE_BUDGET_STRIDE)
         if cur == goal:
+            if stats is not None:
+                stats.update(
+                    settled=len(visited), pushed=next(seq),
+                    landmarks=bounds is not None,
+                )
             path = []
             node = goal
             while node is not None:
                 parent, edge = prev[node]
+                if isinstance(edge, int):
+                    edge = _edge_tuple(graph, edge)
                 path.append((node, edge))
                 node = parent
             return list(reversed(path))
-        for edge in itertools.chain(adj.get(cur, ()), extra_adj.get(cur, ())):
-            nbr, weight = edge[0], edge_weight(edge)
+        steps: list = []
+        if isinstance(cur, int):
+            steps = [
+                (nbrs[k], weights[k], k)
+                for k in range(offsets[cur], offsets[cur + 1])
+            ]
+        for edge in extra_adj.get(cur, ()):
+            weight = _edge_cost(edge, profile)
             if climb_factor:
-                weight += _climb_m(_elev(cur), _elev(nbr)) * climb_factor
+                weight += _edge_ascent_m(graph, edge) * climb_factor
+            steps.append((edge[0], weight, edge))
+        for nbr, weight, edge in steps:
             # Alternate routes: edges the previous route used cost extra, so
             # the search prefers a genuinely different way when one exists.
             # The penalty only ever ADDS cost, so `h` stays admissible.
@@ -2752,9 +5375,336 @@ def _astar(
                 dist[nbr] = ng
                 prev[nbr] = (cur, edge)
                 heapq.heappush(heap, (ng + h(nbr), ng, next(seq), nbr))
+    if stats is not None:
+        stats.update(
+            settled=len(visited), pushed=next(seq),
+            landmarks=bounds is not None,
+        )
     return None
 
 
+#: Route with `_bidirectional_astar` unless a caller asks otherwise. A
+#: cross-town trip (Travelers Rest to Mauldin) grows one frontier to the
+#: size of the county; two frontiers meeting in the middle each stay around
+#: a quarter of that.
+ROUTE_BIDIRECTIONAL = True
+
+
+def _overlay_landmark_columns(table: dict, overlay: list) -> dict:
+    """Landmark distances to and from each virtual node, relaxed over the
+    overlay edges (u, v, cost) from the real nodes' table columns: virtual
+    node -> (d(l, node), d(node, l)) per landmark. Overlay edges only split
+    real ones, so real columns stay exact and the bounds stay consistent."""
+    import numpy as np
+    fwd, bwd = table['fwd'], table['bwd']
+    inf = np.full(len(table['ids']), np.inf)
+    cols: dict = {}
+    for u, v, _cost in overlay:
+        for node in (u, v):
+            if not isinstance(node, int):
+                cols.setdefault(node, (inf.copy(), inf.copy()))
+
+    def _col(node, which):
+        if isinstance(node, int):
+            return (fwd if which == 0 else bwd)[:, node]
+        return cols[node][which]
+
+    for _ in range(len(cols) + 1):
+        changed = False
+        for u, v, cost in overlay:
+            if not isinstance(v, int):
+                best = np.minimum(cols[v][0], _col(u, 0) + cost)
+                if (best < cols[v][0]).any():
+                    cols[v] = (best, cols[v][1])
+                    changed = True
+            if not isinstance(u, int):
+                best = np.minimum(cols[u][1], _col(v, 1) + cost)
+                if (best < cols[u][1]).any():
+                    cols[u] = (cols[u][0], best)
+                    changed = True
+        if not changed:
+            break
+    return cols
+
+
+def _price_overlay(graph: dict, extra_adj: dict, profile: dict):
+    """The per-request overlay edges priced under `profile`, climb included:
+    (u, v, cost) for each, plus the same edges as (v, cost, edge) keyed by
+    tail for forward searches and (u, cost, edge) keyed by head for backward
+    ones."""
+    climb_factor = profile['climb_factor']
+
+    overlay: list = []
+    overlay_out: dict = {}
+    overlay_in: dict = {}
+    for u, lst in extra_adj.items():
+        for edge in lst:
+            weight = _edge_cost(edge, profile)
+            if climb_factor:
+                weight += _edge_ascent_m(graph, edge) * climb_factor
+            overlay.append((u, edge[0], weight))
+            overlay_out.setdefault(u, []).append((edge[0], weight, edge))
+            overlay_in.setdefault(edge[0], []).append((u, weight, edge))
+    return overlay, overlay_out, overlay_in
+
+
+def _dijkstra_targets(
+    graph: dict,
+    source,
+    targets: set,
+    profile: dict,
+    overlay_out: dict,
+    overlay_in: dict,
+    backward: bool = False,
+    max_cost: float | None = None,
+) -> tuple[dict, dict]:
+    """Dijkstra from `source` until every reachable node of `targets` is
+    settled: (dist, link), where link[node] = (neighbor, edge) with `edge`
+    an edge id or overlay tuple in its forward sense (neighbor -> node, or
+    node -> neighbor when `backward`, which walks in-edges toward `source`
+    instead of out-edges away from it).
+
+    With `max_cost`, nothing costlier is labelled, so a target that's
+    unreachable (or only reachable the long way round) ends the search at
+    that radius instead of after the whole graph; it's simply absent from
+    `dist`."""
+    import heapq
+    import itertools
+
+    weights = memoryview(_edge_weights(graph, profile))
+    if backward:
+        reverse = _reverse_csr(graph)
+        offsets = memoryview(reverse['offsets'])
+        ends = memoryview(reverse['src'])
+        ids = memoryview(reverse['edge'])
+        overlay = overlay_in
+    else:
+        offsets = memoryview(graph['offsets'])
+        ends = memoryview(graph['nbr'])
+        ids = None
+        overlay = overlay_out
+
+    seq = itertools.count()
+    dist = {source: 0.0}
+    link: dict = {source: (None, None)}
+    heap = [(0.0, next(seq), source)]
+    done: set = set()
+    remaining = set(targets)
+    while heap and remaining:
+        g, _seq, cur = heapq.heappop(heap)
+        if cur in done:
+            continue
+        done.add(cur)
+        if not len(done) % ROUTE_BUDGET_STRIDE:
+            _route_charge(ROUTE_BUDGET_STRIDE)
+        remaining.discard(cur)
+        steps: list = []
+        if isinstance(cur, int):
+            steps = [
+                (ends[i], weights[ids[i] if ids is not None else i],
+                 ids[i] if ids is not None else i)
+                for i in range(offsets[cur], offsets[cur + 1])
+            ]
+        steps.extend(overlay.get(cur, ()))
+        for nbr, weight, edge in steps:
+            ng = g + weight
+            if max_cost is not None and ng > max_cost:
+                continue
+            if nbr not in dist or ng < dist[nbr]:
+                dist[nbr] = ng
+                link[nbr] = (cur, edge)
+                heapq.heappush(heap, (ng, next(seq), nbr))
+    return dist, link
+
+
+def _bidirectional_astar(
+    graph: dict,
+    start,
+    goal,
+    profile: dict,
+    extra_adj: dict,
+    extra_nodes: dict,
+    avoid_pairs: set | None = None,
+    stats: dict | None = None,
+):
+    """`_astar` from both ends: forward from `start` over out-edges, backward
+    from `goal` over in-edges at their FORWARD weights (climb is charged on
+    ascent only, so an edge and its reverse twin generally differ).
+
+    Both searches share the average potential p(v) = (h_goal(v) -
+    h_start(v)) / 2 (forward keys g + p, backward keys g - p), which keeps
+    every reduced edge cost non-negative on both sides however asymmetric
+    the costs. The best meeting cost `mu` is then final as soon as the two
+    queues' minimum keys sum to `mu` or more. The h terms are the
+    straight-line bound and, once the profile has one, the landmark bounds,
+    extended over the virtual-node overlay by `_overlay_landmark_columns`."""
+    import heapq
+    import itertools
+    import numpy as np
+
+    lat_mv, lon_mv = memoryview(graph['lat']), memoryview(graph['lon'])
+
+    def _pos(node):
+        if isinstance(node, int):
+            return lat_mv[node], lon_mv[node]
+        return extra_nodes[node]
+
+    overlay, overlay_out, overlay_in = _price_overlay(
+        graph, extra_adj, profile,
+    )
+
+    slat, slon = _pos(start)
+    glat, glon = _pos(goal)
+    min_factor = min(list(profile['factors'].values()) + [1.0])
+
+    # h_goal / h_start for every real node at once (the search reads one
+    # array slot per relaxed edge): the straight-line bounds, then the
+    # landmark bounds -- max over landmarks l of d(l, t) - d(l, v) and
+    # d(v, l) - d(t, l) toward the goal, mirrored from the start.
+    lat, lon = graph['lat'], graph['lon']
+    h_goal = np.hypot(
+        (glon - lon) * (M_PER_DEG_LAT * _COSLAT), (glat - lat) * M_PER_DEG_LAT,
+    ) * min_factor
+    h_start = np.hypot(
+        (lon - slon) * (M_PER_DEG_LAT * _COSLAT), (lat - slat) * M_PER_DEG_LAT,
+    ) * min_factor
+    virtual = {node for edge in overlay for node in edge[:2] if not isinstance(node, int)}
+    virtual_h = {
+        node: (
+            _equirect_m(*_pos(node), glat, glon) * min_factor,
+            _equirect_m(slat, slon, *_pos(node)) * min_factor,
+        )
+        for node in virtual
+    }
+    table = _route_landmarks(graph, profile)
+    if table is not None:
+        cols = _overlay_landmark_columns(table, overlay)
+        fwd, bwd = table['fwd'], table['bwd']
+
+        def _cols(node):
+            if isinstance(node, int):
+                return fwd[:, node], bwd[:, node]
+            return cols[node]
+
+        def _bound(a_fwd, a_bwd, b_fwd, b_bwd):
+            # Lower bound on d(a, b); a hair under, as in `_landmark_bounds`.
+            with np.errstate(invalid='ignore'):
+                lb = np.maximum(b_fwd - a_fwd, a_bwd - b_bwd).max(axis=0)
+            lb = np.nan_to_num(lb, nan=0.0, posinf=0.0, neginf=0.0)
+            return np.maximum(lb - 1e-6, 0.0)
+
+        s_fwd, s_bwd = _cols(start)
+        t_fwd, t_bwd = _cols(goal)
+        h_goal = np.maximum(h_goal, _bound(fwd, bwd, t_fwd[:, None], t_bwd[:, None]))
+        h_start = np.maximum(h_start, _bound(s_fwd[:, None], s_bwd[:, None], fwd, bwd))
+        for node in virtual:
+            n_fwd, n_bwd = cols[node]
+            virtual_h[node] = (
+                max(virtual_h[node][0], float(_bound(n_fwd, n_bwd, t_fwd, t_bwd))),
+                max(virtual_h[node][1], float(_bound(s_fwd, s_bwd, n_fwd, n_bwd))),
+            )
+    potential = memoryview((h_goal - h_start) / 2.0)
+    virtual_potential = {
+        node: (hg - hs) / 2.0 for node, (hg, hs) in virtual_h.items()
+    }
+
+    def p(node):
+        if isinstance(node, int):
+            return potential[node]
+        return virtual_potential[node]
+
+    offsets = memoryview(graph['offsets'])
+    nbrs = memoryview(graph['nbr'])
+    weights = memoryview(_edge_weights(graph, profile))
+    reverse = _reverse_csr(graph)
+    r_offsets = memoryview(reverse['offsets'])
+    r_src = memoryview(reverse['src'])
+    r_edge = memoryview(reverse['edge'])
+
+    seq = itertools.count()
+    # Per side: distance, the (neighbor, edge) it was reached through (the
+    # edge always in its forward sense: parent -> node forward, node ->
+    # child backward), its queue and its settled set.
+    dist_f, dist_b = {start: 0.0}, {goal: 0.0}
+    link_f, link_b = {start: (None, None)}, {goal: (None, None)}
+    heap_f = [(p(start), 0.0, next(seq), start)]
+    heap_b = [(-p(goal), 0.0, next(seq), goal)]
+    done_f: set = set()
+    done_b: set = set()
+    mu = float('inf')
+    meet = None
+    while heap_f and heap_b:
+        if heap_f[0][0] + heap_b[0][0] >= mu:
+            break
+        forward = len(heap_f) <= len(heap_b)
+        heap, dist, link, done, other = (
+            (heap_f, dist_f, link_f, done_f, dist_b) if forward
+            else (heap_b, dist_b, link_b, done_b, dist_f)
+        )
+        _k, g, _seq, cur = heapq.heappop(heap)
+        if cur in done:
+            continue
+        done.add(cur)
+        if not len(done) % ROUTE_BUDGET_STRIDE:
+            _route_charge(ROUTE_BUDGET_STRIDE)
+        steps: list = []
+        if forward:
+            if isinstance(cur, int):
+                steps = [
+                    (nbrs[k], weights[k], k)
+                    for k in range(offsets[cur], offsets[cur + 1])
+                ]
+            steps.extend(overlay_out.get(cur, ()))
+        else:
+            if isinstance(cur, int):
+                steps = [
+                    (r_src[i], weights[r_edge[i]], r_edge[i])
+                    for i in range(r_offsets[cur], r_offsets[cur + 1])
+                ]
+            steps.extend(overlay_in.get(cur, ()))
+        for nbr, weight, edge in steps:
+            if avoid_pairs and (
+                ((cur, nbr) if forward else (nbr, cur)) in avoid_pairs
+            ):
+                weight *= ALT_AVOID_FACTOR
+            ng = g + weight
+            if nbr not in dist or ng < dist[nbr]:
+                dist[nbr] = ng
+                link[nbr] = (cur, edge)
+                key = ng + p(nbr) if forward else ng - p(nbr)
+                heapq.heappush(heap, (key, ng, next(seq), nbr))
+                through = other.get(nbr)
+                if through is not None and ng + through < mu:
+                    mu, meet = ng + through, nbr
+
+    if stats is not None:
+        stats.update(
+            settled=len(done_f) + len(done_b), pushed=next(seq),
+            landmarks=table is not None,
+        )
+    if meet is None:
+        return None
+
+    def _materialize(edge):
+        return _edge_tuple(graph, edge) if isinstance(edge, int) else edge
+
+    path = []
+    node = meet
+    while node is not None:
+        parent, edge = link_f[node]
+        path.append((node, _materialize(edge)))
+        node = parent
+    path.reverse()
+    node = meet
+    while True:
+        child, edge = link_b[node]
+        if child is None:
+            break
+        path.append((child, _materialize(edge)))
+        node = child
+    return path
+
+
 #: Bearing change (degrees) at a junction -> maneuver type. Ordered by the
 #: upper bound of |delta|; the sign picks left vs. right.
 TURN_BANDS = (
@@ -2917,6 +5867,8 @@ def _build_steps(
         if steps and continues and abs(delta) < limit:
             steps[-1]['distance_m'] += leg['length_m']
             steps[-1]['climb_m'] += leg.get('climb_m') or 0.0
+            steps[-1]['descent_m'] += leg.get('descent_m') or 0.0
+            steps[-1]['grade'] = max(steps[-1]['grade'], leg.get('grade') or 0.0)
             if warn:
                 steps[-1]['warn'] = steps[-1].get('warn') or warn
                 steps[-1]['warn_m'] += leg['length_m']
@@ -2931,6 +5883,8 @@ def _build_steps(
                 ),
                 'distance_m': leg['length_m'],
                 'climb_m': leg.get('climb_m') or 0.0,
+                'descent_m': leg.get('descent_m') or 0.0,
+                'grade': leg.get('grade') or 0.0,
                 'start_index': leg['start_index'],
                 'location': list(coords[0]),
                 'bearing': round(in_bearing, 1),
@@ -2948,6 +5902,8 @@ def _build_steps(
             merged[-1]['climb_m'] = (
                 merged[-1].get('climb_m', 0.0) + step.get('climb_m', 0.0)
             )
+            merged[-1]['descent_m'] += step['descent_m']
+            merged[-1]['grade'] = max(merged[-1]['grade'], step['grade'])
             merged[-1]['warn_m'] = merged[-1].get('warn_m', 0.0) + step.get('warn_m', 0.0)
             merged[-1]['warn'] = merged[-1].get('warn') or step.get('warn')
             continue
@@ -2964,6 +5920,8 @@ def _build_steps(
         head, nxt = steps.pop(0), steps[0]
         nxt['distance_m'] += head['distance_m']
         nxt['climb_m'] += head.get('climb_m') or 0.0
+        nxt['descent_m'] += head['descent_m']
+        nxt['grade'] = max(nxt['grade'], head['grade'])
         nxt['start_index'] = head['start_index']
         nxt['location'] = head['location']
         nxt['maneuver'] = 'depart'
@@ -2977,6 +5935,8 @@ def _build_steps(
             'instruction': _instruction('arrive', None, 0.0),
             'distance_m': 0.0,
             'climb_m': 0.0,
+            'descent_m': 0.0,
+            'grade': 0.0,
             'start_index': len(coordinates) - 1,
             'location': list(coordinates[-1]),
         })
@@ -2984,6 +5944,9 @@ def _build_steps(
         step['distance_m'] = round(step['distance_m'], 1)
         climb = step.pop('climb_m', 0.0) or 0.0
         step['climb_ft'] = round(climb * FT_PER_M)
+        step['descent_ft'] = round(step.pop('descent_m') * FT_PER_M)
+        # Steepest sustained grade along the step (see `_attach_relief`).
+        step['max_grade_pct'] = round(step.pop('grade') * 100, 1)
         step['duration_min'] = round(
             (step['distance_m'] / speed_m_s + climb * climb_sec_per_m) / 60, 2
         )
@@ -3073,6 +6036,7 @@ def _route_core(
     warn_mode: str | None = None,
     avoid_pairs: set | None = None,
     pairs_out: set | None = None,
+    stats: dict | None = None,
 ) -> dict[str, Any]:
     """One A* pass with `mode`'s weights; raises ValueError with a user-facing
     message when no route is possible.
@@ -3083,12 +6047,45 @@ def _route_core(
 
     `avoid_pairs` penalizes directed node pairs the previous route used (the
     alternate-route mechanism); `pairs_out`, when given, collects this route's
-    own pairs (both directions, real nodes only) for the next pass.
+    own pairs (both directions, real nodes only) for the next pass. `stats`
+    collects the search's settled-node count (see `_astar`).
     """
     graph = _get_route_graph()
-    if not graph['nodes']:
-        raise ValueError("Routing network is unavailable.")
     warn_mode = warn_mode or mode
+    termini = _route_termini(
+        graph, from_lat, from_lon, to_lat, to_lon, snap_max_m, warn_mode,
+    )
+    path = None
+    if termini['start'] != termini['goal']:
+        path = _astar(
+            graph, termini['start'], termini['goal'], mode=mode,
+            extra_adj=termini['extra_adj'], extra_nodes=termini['extra_nodes'],
+            climb_mode=warn_mode,
+            avoid_pairs=avoid_pairs, stats=stats,
+        )
+        if path is None:
+            raise ValueError("Couldn't find a connected route.")
+    return _route_feature(
+        graph, path, termini, from_lat, from_lon, to_lat, to_lon, warn_mode,
+        pairs_out=pairs_out,
+    )
+
+
+def _route_termini(
+    graph: dict,
+    from_lat: float,
+    from_lon: float,
+    to_lat: float,
+    to_lon: float,
+    snap_max_m: float,
+    warn_mode: str,
+) -> dict[str, Any]:
+    """Both ends of a trip snapped onto the graph: `start` / `goal` node ids
+    (or per-request virtual nodes mid-edge), their snap distances
+    `start_d` / `goal_d`, and the `extra_adj` / `extra_nodes` overlay the
+    searches route over. Raises ValueError when either end is off-network."""
+    if not _node_count(graph):
+        raise ValueError("Routing network is unavailable.")
 
     snap_s = _snap_terminus(graph, from_lat, from_lon, 'start')
     snap_g = _snap_terminus(graph, to_lat, to_lon, 'goal')
@@ -3104,25 +6101,48 @@ def _route_core(
     # from the snapped point itself instead of the nearest endpoint.
     extra_adj: dict = {}
     extra_nodes: dict = {}
-    extra_elev: dict = {}
-    _register_virtual(graph, snap_s, extra_adj, extra_nodes, extra_elev)
-    _register_virtual(graph, snap_g, extra_adj, extra_nodes, extra_elev)
+    _register_virtual(graph, snap_s, extra_adj, extra_nodes)
+    _register_virtual(graph, snap_g, extra_adj, extra_nodes)
     _bridge_same_edge(graph, snap_s, snap_g, extra_adj)
+    return {
+        'start': start,
+        'start_d': start_d,
+        'goal': goal,
+        'goal_d': goal_d,
+        'extra_adj': extra_adj,
+        'extra_nodes': extra_nodes,
+    }
 
-    elev = graph.get('elev') or {}
-
-    def _node_elev(cell):
-        value = extra_elev.get(cell)
-        return elev.get(cell) if value is None else value
 
+def _route_feature(
+    graph: dict,
+    path: list | None,
+    termini: dict,
+    from_lat: float,
+    from_lon: float,
+    to_lat: float,
+    to_lon: float,
+    warn_mode: str,
+    pairs_out: set | None = None,
+) -> dict[str, Any]:
+    """The route Feature for a searched `path` (`_astar`'s format; None when
+    both ends snapped to the same node) between `termini`: geometry, legs,
+    climb, warnings and steps, disclosed for `warn_mode`. `pairs_out` as in
+    `_route_core`."""
+    start, start_d = termini['start'], termini['start_d']
+    goal_d = termini['goal_d']
+    extra_nodes = termini['extra_nodes']
     legs: list[dict] = []
     climb_m = 0.0
-    #: [distance_from_start_m, elevation_ft] at each leg boundary with a known
-    #: elevation — the app's elevation-preview sparkline.
+    #: [distance_from_start_m, elevation_ft] at every known sample of the
+    #: legs' stored profiles — the app's elevation-preview sparkline.
     profile: list[list[float]] = []
     profile_dist = 0.0
-    if start == goal:
-        nlat, nlon = graph['nodes'][start]
+    if path is None:
+        nlat, nlon = (
+            _node_latlon(graph, start) if isinstance(start, int)
+            else extra_nodes[start]
+        )
         coordinates = [[from_lon, from_lat], [nlon, nlat], [to_lon, to_lat]]
         distance_m = start_d + goal_d
         breakdown: dict[str, float] = {}
@@ -3136,19 +6156,13 @@ def _route_core(
             'climb_m': 0.0,
         })
     else:
-        path = _astar(
-            graph, start, goal, mode=mode,
-            extra_adj=extra_adj, extra_nodes=extra_nodes,
-            extra_elev=extra_elev, climb_mode=warn_mode,
-            avoid_pairs=avoid_pairs,
-        )
-        if path is None:
-            raise ValueError("Couldn't find a connected route.")
         coordinates = [[from_lon, from_lat]]
         distance_m = start_d + goal_d
         breakdown = {}
         prev_node = start
         profile_dist = start_d
+        # Climb, grade and the chart all read the relief stored on each edge
+        # (`_attach_relief`; split edges carry their share of it).
         for _node, edge in path:
             if edge is None:
                 continue
@@ -3163,29 +6177,19 @@ def _route_core(
             distance_m += length_m
             key = str(category or 'unknown')
             breakdown[key] = breakdown.get(key, 0.0) + length_m
-            from_elev, to_elev = _node_elev(prev_node), _node_elev(_node)
-            rise_m = _climb_m(from_elev, to_elev)
+            rise_m, fall_m, grade, points = edge[9]
             climb_m += rise_m
-            if from_elev is not None and not profile:
-                profile.append([profile_dist, from_elev])
+            for d, feet in points:
+                if not profile or profile[-1][0] < profile_dist + d:
+                    profile.append([profile_dist + d, feet])
             profile_dist += length_m
-            if to_elev is not None:
-                profile.append([profile_dist, to_elev])
-            # For the disclosure, what matters is how steep the ground is, not
-            # which way the rider is pointed: rolling DOWN a 12% grade is its
-            # own hazard.
-            grade_m = (
-                abs(to_elev - from_elev) / FT_PER_M
-                if from_elev is not None and to_elev is not None
-                else 0.0
-            )
             # Virtual (per-request) nodes are excluded: penalizing the only
             # edges that reach a terminus would just shove the next pass onto
             # a worse snap, not a different street.
             if (
                 pairs_out is not None
-                and prev_node in graph['nodes']
-                and _node in graph['nodes']
+                and isinstance(prev_node, int)
+                and isinstance(_node, int)
             ):
                 pairs_out.add((prev_node, _node))
                 pairs_out.add((_node, prev_node))
@@ -3200,9 +6204,9 @@ def _route_core(
                 # A connector is a synthetic straight line between two nodes,
                 # not a surface anyone walks; its "grade" means nothing.
                 and category != 'connector'
-                and length_m >= STEEP_MIN_RUN_M
-                and grade_m * FT_PER_M >= STEEP_MIN_RISE_FT
-                and grade_m / length_m > STEEP_GRADE
+                # Steepness either way: rolling DOWN a 12% grade is its own
+                # hazard. The noise gates are part of how `grade` is taken.
+                and grade > STEEP_GRADE
             ):
                 leg_warn = 'steep'
             legs.append({
@@ -3213,6 +6217,8 @@ def _route_core(
                 'start_index': start_index,
                 'warn': leg_warn,
                 'climb_m': rise_m,
+                'descent_m': fall_m,
+                'grade': grade,
             })
         coordinates.append([to_lon, to_lat])
 
@@ -3252,66 +6258,1452 @@ def _route_core(
     }
 
 
-def _route(
-    from_lat: float,
-    from_lon: float,
-    to_lat: float,
-    to_lon: float,
-    mode: str = 'bike',
-    street_fallback: bool = True,
-    avoid_pairs: set | None = None,
-    pairs_out: set | None = None,
-) -> dict[str, Any]:
-    """A bike / walk / roll route, falling back to plain streets when the
-    mode's own network can't get there.
+def _route(
+    from_lat: float,
+    from_lon: float,
+    to_lat: float,
+    to_lon: float,
+    mode: str = 'bike',
+    street_fallback: bool = True,
+    avoid_pairs: set | None = None,
+    pairs_out: set | None = None,
+) -> dict[str, Any]:
+    """A bike / walk / roll route, falling back to plain streets when the
+    mode's own network can't get there.
+
+    The graph is the street grid plus the trail and bike lanes, so the fallback
+    isn't a different network -- it's the same one with the mode's preferences
+    switched off and the snap radius widened. What makes it honest is that the
+    disclosure stays in the requested mode: the response still marks every
+    stretch missing a sidewalk (walk/roll) or a bike facility (bike), and says
+    `fallback: 'street'` so the app can lead with the caveat.
+    """
+    try:
+        return _route_core(
+            from_lat, from_lon, to_lat, to_lon, mode=mode,
+            avoid_pairs=avoid_pairs, pairs_out=pairs_out,
+        )
+    except ValueError as first_error:
+        if not street_fallback or mode == 'street':
+            raise
+        feature = _route_core(
+            from_lat, from_lon, to_lat, to_lon,
+            mode='street',
+            snap_max_m=ROUTE_SNAP_RELAXED_M,
+            warn_mode=mode,
+            avoid_pairs=avoid_pairs,
+            pairs_out=pairs_out,
+        )
+        props = feature['properties']
+        props['fallback'] = 'street'
+        props['fallback_reason'] = str(first_error)
+        noun = MODE_NETWORK_NOUN.get(mode, 'routable')
+        props['fallback_note'] = (
+            f"No {noun} route was available, so this follows regular streets. "
+            "Check the highlighted stretches before you go."
+        )
+        return feature
+
+
+def _pareto_paths(
+    graph: dict,
+    termini: dict,
+    profile: dict,
+    stats: dict | None = None,
+) -> list[tuple[tuple, list]]:
+    """Routes between `termini` worth offering, in one multi-criteria
+    label-setting search: [((cost, distance_m, climb_m), path), ...] in
+    `_astar`'s path format, cheapest first, traded off on cost (`profile`'s
+    weights, climb included), distance and climb.
+
+    This is a bounded approximation of the Pareto front, not the front: the
+    epsilon merging and per-node cap below, and stopping after
+    PARETO_MAX_POPS pops, can each miss a route that's better on distance or
+    climb, or offer one that's narrowly beaten.
+
+    Labels are popped in order of cost plus the A* bound, so the first one
+    to reach the goal is the recommended route and fixes the
+    PARETO_COST_SLACK cutoff that ends the search. A label is dropped when
+    another at its node is no costlier and (PARETO_EPSILON) no longer and
+    no hillier, or when a finished route already beats the best it could
+    still become; each node keeps PARETO_NODE_LABELS at most. Cost is never
+    relaxed, so the cheapest label at every node survives and the first
+    finished route costs what `_astar` finds. `stats` gets the labels
+    created and popped."""
+    import heapq
+    import itertools
+
+    start, goal = termini['start'], termini['goal']
+    extra_nodes = termini['extra_nodes']
+    h, _bounds = _cost_bound(
+        graph, goal, profile, termini['extra_adj'], extra_nodes,
+    )
+    _overlay, overlay_out, _overlay_in = _price_overlay(
+        graph, termini['extra_adj'], profile,
+    )
+    lat_mv, lon_mv = memoryview(graph['lat']), memoryview(graph['lon'])
+    glat, glon = (
+        (lat_mv[goal], lon_mv[goal]) if isinstance(goal, int)
+        else extra_nodes[goal]
+    )
+    offsets = memoryview(graph['offsets'])
+    nbrs = memoryview(graph['nbr'])
+    lengths = memoryview(graph['length'])
+    ascents = memoryview(graph['ascent'])
+    weights = memoryview(_edge_weights(graph, profile))
+    eps = 1.0 + PARETO_EPSILON
+    tol = PARETO_CLIMB_TOL_M
+
+    def _covers(a, b):
+        return a[0] <= b[0] and a[1] <= b[1] * eps and a[2] <= b[2] * eps + tol
+
+    # Both bounds per node, computed once: every node is reached by several
+    # labels, each over several edges.
+    bounds: dict = {}
+
+    def _bound(node):
+        pair = bounds.get(node)
+        if pair is None:
+            lat, lon = (
+                (lat_mv[node], lon_mv[node]) if isinstance(node, int)
+                else extra_nodes[node]
+            )
+            pair = bounds[node] = (h(node), _equirect_m(lat, lon, glat, glon))
+        return pair
+
+    # labels[i] = (node, parent label, edge, (cost, distance_m, climb_m)),
+    # the edge an edge id of the compact graph or an overlay tuple.
+    labels: list = [(start, None, None, (0.0, 0.0, 0.0))]
+    front: dict = {start: [0]}
+    dead: set = set()
+    done: list[int] = []
+    seq = itertools.count()
+    heap = [(_bound(start)[0], next(seq), 0)]
+    cutoff = float('inf')
+    popped = 0
+    while heap and popped < PARETO_MAX_POPS:
+        f, _seq, lid = heapq.heappop(heap)
+        if f > cutoff:
+            break
+        if lid in dead:
+            continue
+        popped += 1
+        if not popped % ROUTE_BUDGET_STRIDE:
+            _route_charge(ROUTE_BUDGET_STRIDE)
+        cur, _parent, _edge, g = labels[lid]
+        if cur == goal:
+            if not done:
+                cutoff = g[0] * PARETO_COST_SLACK
+            done.append(lid)
+            continue
+        if done:
+            best_case = (f, g[1] + _bound(cur)[1], g[2])
+            if any(_covers(labels[d][3], best_case) for d in done):
+                continue
+        steps: list = []
+        if isinstance(cur, int):
+            steps = [
+                (nbrs[k], weights[k], lengths[k], ascents[k], k)
+                for k in range(offsets[cur], offsets[cur + 1])
+            ]
+        for nbr, weight, edge in overlay_out.get(cur, ()):
+            steps.append((nbr, weight, edge[2], _edge_ascent_m(graph, edge), edge))
+        for nbr, weight, length_m, rise_m, edge in steps:
+            cost, dist, climb = ng = (g[0] + weight, g[1] + length_m, g[2] + rise_m)
+            nf = cost + _bound(nbr)[0]
+            if nf > cutoff:
+                continue
+            here = front.get(nbr, ())
+            if any(
+                c <= cost and d <= dist * eps and r <= climb * eps + tol
+                for c, d, r in (labels[o][3] for o in here)
+            ):
+                continue
+            kept = [o for o in here if not _covers(ng, labels[o][3])]
+            if len(kept) < len(here):
+                dead.update(o for o in here if o not in kept)
+            if len(kept) >= PARETO_NODE_LABELS:
+                costliest = max(kept, key=lambda o: labels[o][3][0])
+                if ng[0] >= labels[costliest][3][0]:
+                    continue
+                kept.remove(costliest)
+                dead.add(costliest)
+            kept.append(len(labels))
+            front[nbr] = kept
+            heapq.heappush(heap, (nf, next(seq), len(labels)))
+            labels.append((nbr, lid, edge, ng))
+    if stats is not None:
+        stats.update(labels=len(labels), popped=popped)
+
+    found = []
+    for lid in done:
+        criteria = labels[lid][3]
+        path = []
+        while lid is not None:
+            node, parent, edge, _g = labels[lid]
+            if isinstance(edge, int):
+                edge = _edge_tuple(graph, edge)
+            path.append((node, edge))
+            lid = parent
+        found.append((criteria, list(reversed(path))))
+    return found
+
+
+def _pick_route_options(found: list, count: int) -> list[tuple[tuple, list]]:
+    """Up to `count` of `_pareto_paths`' routes, the recommended (cheapest)
+    one first, then the shortest, the flattest and the rest by cost, each
+    kept only if it shares at most PARETO_MAX_OVERLAP of its length with
+    every route already picked."""
+    if not found:
+        return []
+
+    def _shares(path):
+        shares: dict = {}
+        prev = None
+        for node, edge in path:
+            if edge is not None and isinstance(prev, int) and isinstance(node, int):
+                shares[frozenset((prev, node))] = edge[2]
+            prev = node
+        return shares
+
+    by_cost = sorted(found, key=lambda r: r[0][0])
+    order = (
+        [by_cost[0]]
+        + [min(by_cost, key=lambda r: r[0][1]), min(by_cost, key=lambda r: r[0][2])]
+        + by_cost[1:]
+    )
+    picked: list = []
+    picked_shares: list[dict] = []
+    for route in order:
+        if len(picked) >= count:
+            break
+        if any(route is p for p in picked):
+            continue
+        shares = _shares(route[1])
+        total = sum(shares.values())
+        if total > 0 and any(
+            sum(v for pair, v in shares.items() if pair in other)
+            > total * PARETO_MAX_OVERLAP
+            for other in picked_shares
+        ):
+            continue
+        picked.append(route)
+        picked_shares.append(shares)
+    return picked
+
+
+def _route_options(
+    from_lat: float,
+    from_lon: float,
+    to_lat: float,
+    to_lon: float,
+    mode: str = 'bike',
+    count: int = PARETO_MAX_OPTIONS,
+    stats: dict | None = None,
+) -> list[dict[str, Any]]:
+    """Route Features for up to `count - 1` options besides the recommended
+    route, from one `_pareto_paths` search. Each is tagged
+    `option: shorter | flatter | different` by what it trades the
+    recommended route's comfort for, and carries `option_cost` relative to
+    it (1.0 = as good). Raises ValueError like `_route_core`."""
+    graph = _get_route_graph()
+    termini = _route_termini(
+        graph, from_lat, from_lon, to_lat, to_lon, ROUTE_SNAP_MAX_M, mode,
+    )
+    if termini['start'] == termini['goal']:
+        return []
+    found = _pareto_paths(graph, termini, _weight_profile(mode), stats=stats)
+    picked = _pick_route_options(found, count)
+    if not picked:
+        return []
+    base = picked[0][0]
+    options = []
+    for (cost, distance_m, climb_m), path in picked[1:]:
+        gains = {
+            'shorter': (base[1] - distance_m) / max(base[1], 1.0),
+            'flatter': (base[2] - climb_m) / max(base[2], PARETO_CLIMB_TOL_M),
+        }
+        tag = max(gains, key=gains.get)
+        feature = _route_feature(
+            graph, path, termini, from_lat, from_lon, to_lat, to_lon, mode,
+        )
+        feature['properties']['option'] = tag if gains[tag] > 0 else 'different'
+        feature['properties']['option_cost'] = round(cost / max(base[0], 1e-9), 2)
+        options.append(feature)
+    return options
+
+
+# ------------------------------------------------------------ request budget
+
+
+class _RouteAborted(RuntimeError):
+    """A request's `_RouteBudget` ran out or was cancelled. Not a ValueError
+    on purpose: nothing downstream may mistake it for "no route here" and go
+    on to try the street fallback or the next plan."""
+
+
+class _RouteBudget:
+    """What one route request may still spend: a wall-clock deadline and a
+    count of settled nodes/labels, plus a cancel flag for a client that
+    disconnected. Searches charge it through `_route_charge`."""
+
+    def __init__(
+        self,
+        seconds: float = ROUTE_DEADLINE_S,
+        expansions: int = ROUTE_MAX_EXPANSIONS,
+    ):
+        self.deadline = time.monotonic() + seconds
+        self.remaining = expansions
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def charge(self, expansions: int):
+        self.remaining -= expansions
+        if self.cancelled:
+            raise _RouteAborted("The request was cancelled.")
+        if self.remaining < 0 or time.monotonic() > self.deadline:
+            raise _RouteAborted("That trip took too long to work out.")
+
+
+def _route_charge(expansions: int):
+    """Charge the current request's budget (a no-op without one)."""
+    budget = _ROUTE_BUDGET.get()
+    if budget is not None:
+        budget.charge(expansions)
+
+
+_ROUTE_POOL = None
+_ROUTE_POOL_INFLIGHT = 0
+_ROUTE_POOL_LOCK = threading.Lock()
+
+
+def _route_submit(fn, *args):
+    """Run `fn(*args)` on the route pool: its Future, or None when
+    ROUTE_WORKERS are busy and ROUTE_QUEUE_MAX more are already waiting."""
+    global _ROUTE_POOL, _ROUTE_POOL_INFLIGHT
+    from concurrent.futures import ThreadPoolExecutor
+    with _ROUTE_POOL_LOCK:
+        if _ROUTE_POOL_INFLIGHT >= ROUTE_WORKERS + ROUTE_QUEUE_MAX:
+            return None
+        if _ROUTE_POOL is None:
+            _ROUTE_POOL = ThreadPoolExecutor(
+                max_workers=ROUTE_WORKERS, thread_name_prefix='bwg-route',
+            )
+        _ROUTE_POOL_INFLIGHT += 1
+
+    def _release(_future):
+        global _ROUTE_POOL_INFLIGHT
+        with _ROUTE_POOL_LOCK:
+            _ROUTE_POOL_INFLIGHT -= 1
+
+    try:
+        future = _ROUTE_POOL.submit(fn, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+async def _route_await(request, budget: _RouteBudget, fn):
+    """`fn()`'s result, computed on the route pool with `budget` as its
+    `_ROUTE_BUDGET`, without holding up the event loop. Raises _RouteAborted
+    when the pool is full, when the budget runs out, and when the client
+    disconnects (polled every ROUTE_DISCONNECT_POLL_S): a queued `fn` then
+    never starts, a running one stops at its next budget charge, and
+    whatever it ends with is dropped."""
+    import asyncio
+
+    def _run():
+        token = _ROUTE_BUDGET.set(budget)
+        try:
+            return fn()
+        finally:
+            _ROUTE_BUDGET.reset(token)
+
+    future = _route_submit(_run)
+    if future is None:
+        raise _RouteAborted("Routing is busy right now. Try again in a moment.")
+    pending = asyncio.wrap_future(future)
+    try:
+        while True:
+            done, _waiting = await asyncio.wait(
+                {pending}, timeout=ROUTE_DISCONNECT_POLL_S,
+            )
+            if done:
+                return pending.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        future.cancel()
+        budget.cancel()
+        raise
+    future.cancel()
+    budget.cancel()
+    pending.add_done_callback(
+        lambda done: done.cancelled() or done.exception()
+    )
+    raise _RouteAborted("The request was cancelled.")
+
+
+_PREFETCH_POOL = None
+
+
+def _prefetch_pool():
+    """The prefetch pool (ROUTE_PREFETCH_WORKERS threads), started on first
+    use."""
+    global _PREFETCH_POOL
+    from concurrent.futures import ThreadPoolExecutor
+    with _ROUTE_POOL_LOCK:
+        if _PREFETCH_POOL is None:
+            _PREFETCH_POOL = ThreadPoolExecutor(
+                max_workers=ROUTE_PREFETCH_WORKERS,
+                thread_name_prefix='bwg-prefetch',
+            )
+        return _PREFETCH_POOL
+
+
+def _prefetch_result(future, fn, *args):
+    """`future`'s result, or `fn(*args)` computed right here if the prefetch
+    pool hadn't started it yet."""
+    if future.cancel():
+        return fn(*args)
+    return future.result()
+
+
+# ------------------------------------------------------------------- caches
+
+
+class _LRUCache:
+    """Least-recently-used cache of JSON-able results with a per-entry TTL
+    and a byte budget (each entry is charged its compact-JSON size, which
+    is about what it costs to hold and exactly what it costs to send; bytes
+    values, their length).
+
+    Thread-safe: the sync endpoints run in FastAPI's threadpool. Counters
+    (`stats()`) are cumulative since startup; an eviction is an entry pushed
+    out for room, an expiry one found stale on lookup."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        from collections import OrderedDict
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires, nbytes, value)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        """The live value under `key` (now most recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                self._drop(key)
+                self._counts['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._counts['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts['hits'] += 1
+            return entry[2]
+
+    def put(self, key, value, ttl_seconds: float | None = None):
+        """Store `value`, evicting least-recently-used entries until it fits.
+        A value bigger than the whole budget isn't kept."""
+        import json
+        nbytes = (
+            len(value) if isinstance(value, bytes)
+            else len(json.dumps(value, separators=(',', ':'), default=str))
+        )
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                return
+            while self._entries and self._bytes + nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counts['evictions'] += 1
+            self._entries[key] = (time.time() + ttl, nbytes, value)
+            self._bytes += nbytes
+
+    def _drop(self, key):
+        _expires, nbytes, _value = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._counts['hits'] + self._counts['misses']
+            return {
+                **self._counts,
+                'hit_rate': round(self._counts['hits'] / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+            }
+
+
+# ------------------------------------------------------------- vector tiles
+
+#: Vector tiles (`/map-layers/tiles/{layer}/{z}/{x}/{y}.mvt`): units per
+#: tile side, and the margin (in those units) geometry is clipped with so
+#: lines and strokes don't seam at tile edges.
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+#: Zooms `mrsm export map_tiles` pre-seeds into `<layer>.mbtiles`. Tiles
+#: outside the range (or of a layer with no file yet) render on request.
+TILE_MIN_ZOOM = 10
+TILE_MAX_ZOOM = 16
+#: Deepest zoom rendered at all; past it the app overzooms z20 tiles.
+TILE_SERVE_MAX_ZOOM = 20
+#: Cache-Control max-age of seeded tiles (they change with the nightly
+#: export at most) and of ones rendered on request.
+TILE_MAX_AGE_S = 12 * 60 * 60
+TILE_LIVE_MAX_AGE_S = 10 * 60
+MVT_MEDIA_TYPE = 'application/vnd.mapbox-vector-tile'
+
+#: Half the width of the Web Mercator (EPSG:3857) world, in meters.
+_MERC_HALF = 20037508.342789244
+
+#: Tiles rendered on request: (layer id, z, x, y) -> gzipped MVT (b'' for
+#: an empty tile). Seeded tiles are read from their MBTiles file instead.
+_TILE_CACHE = _LRUCache(max_bytes=64 * 1024 * 1024, ttl_seconds=TILE_LIVE_MAX_AGE_S)
+#: Builder layers' features in Web Mercator with an STRtree over them
+#: (`_tile_source`): layer id -> (epoch, source).
+_TILE_SOURCES: dict[str, tuple[float, dict]] = {}
+
+
+def _tiles_dir():
+    return _output_dir().parent.parent / 'tiles'
+
+
+def _tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """(minx, miny, maxx, maxy) of tile z/x/y in Web Mercator meters."""
+    size = 2 * _MERC_HALF / (1 << z)
+    minx = -_MERC_HALF + x * size
+    maxy = _MERC_HALF - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def _tile_range(
+    z: int,
+    minlon: float,
+    minlat: float,
+    maxlon: float,
+    maxlat: float,
+) -> tuple[int, int, int, int]:
+    """(x0, y0, x1, y1), inclusive: the zoom-`z` tiles covering the bounds."""
+    n = 1 << z
+
+    def _x(lon):
+        return min(max(int((lon + 180.0) / 360.0 * n), 0), n - 1)
+
+    def _y(lat):
+        merc = math.asinh(math.tan(math.radians(lat)))
+        return min(max(int((1.0 - merc / math.pi) / 2.0 * n), 0), n - 1)
+
+    return _x(minlon), _y(maxlat), _x(maxlon), _y(minlat)
+
+
+def _gzip(data: bytes) -> bytes:
+    import gzip
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _etag(data: bytes) -> str:
+    """A strong ETag (quoted) for a response body."""
+    import hashlib
+    return '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+
+
+def _encoded_etag(etag: str, encoding: str | None) -> str:
+    """`etag` for the `encoding` (Content-Encoding) form of the same
+    content. A strong ETag names one exact byte sequence, so the br, gzip
+    and identity bodies each get their own: `"<hash>-br"`, `"<hash>-gzip"`
+    and `"<hash>"`."""
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header names `etag` (weak comparison, as
+    RFC 9110 asks for If-None-Match)."""
+    if not if_none_match:
+        return False
+    wanted = etag.removeprefix('W/')
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == wanted:
+            return True
+    return False
+
+
+def _layer_tile(layer_id: str, z: int, x: int, y: int) -> tuple[bytes, bool]:
+    """(gzipped tile, whether it was seeded) for tile z/x/y of a layer; b''
+    is an empty tile. Seeded zooms read the layer's MBTiles file; the rest
+    render (`_render_tile`) through `_TILE_CACHE`."""
+    if TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM:
+        seeded = _seeded_tile(layer_id, z, x, y)
+        if seeded is not None:
+            return seeded, True
+    key = (layer_id, z, x, y)
+    data = _TILE_CACHE.get(key)
+    if data is None:
+        raw = _render_tile(layer_id, z, x, y)
+        data = _gzip(raw) if raw else b''
+        _TILE_CACHE.put(key, data)
+    return data, False
+
+
+#: Open read-only MBTiles connections, by path: (mtime_ns, connection, lock).
+_MBTILES: dict[str, tuple[int, Any, threading.Lock]] = {}
+_MBTILES_LOCK = threading.Lock()
+
+
+def _mbtiles_db(path):
+    """(connection, lock) for the MBTiles file at `path`, or None when there
+    is no file. One read-only connection per file, reopened when a new seed
+    replaces it (a new mtime); queries hold the lock."""
+    import sqlite3
+    key = str(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    with _MBTILES_LOCK:
+        cached = _MBTILES.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+        if cached is not None:
+            del _MBTILES[key]
+            with cached[2]:
+                cached[1].close()
+        if mtime is None:
+            return None
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        lock = threading.Lock()
+        _MBTILES[key] = (mtime, db, lock)
+        return db, lock
+
+
+def _seeded_tile(layer_id: str, z: int, x: int, y: int, root=None) -> bytes | None:
+    """Tile z/x/y from the layer's MBTiles file (b'' when the seed found it
+    empty), or None when there is no file."""
+    import sqlite3
+    from pathlib import Path
+
+    path = Path(root or _tiles_dir()) / f'{layer_id}.mbtiles'
+    try:
+        opened = _mbtiles_db(path)
+        if opened is None:
+            return None
+        db, lock = opened
+        with lock:
+            row = db.execute(
+                'SELECT tile_data FROM tiles '
+                'WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+                (z, x, (1 << z) - 1 - y),   # MBTiles rows count from the south
+            ).fetchone()
+    except sqlite3.Error as e:
+        warn(f"Could not read tile {z}/{x}/{y} from '{path}': {e}")
+        return None
+    return bytes(row[0]) if row is not None else b''
+
+
+def _render_tile(layer_id: str, z: int, x: int, y: int) -> bytes:
+    """Uncompressed MVT bytes for tile z/x/y of a layer (b'' when nothing
+    falls in it): ST_AsMVT over the layer's table, or, for builder layers
+    (which have no single source table), cut from their GeoJSON here."""
+    if LAYERS[layer_id].get('builder'):
+        return _python_tile(layer_id, z, x, y)
+    return _postgis_tile(layer_id, z, x, y)
+
+
+def _postgis_tile(layer_id: str, z: int, x: int, y: int) -> bytes:
+    """ST_AsMVT over the layer's table. The tile envelope is transformed to
+    the table's native SRID, so the filter is a plain index probe, and only
+    the rows that pass are simplified (in native units, as the bbox query
+    does) and reprojected to Web Mercator."""
+    layer = LAYERS[layer_id]
+    pipe = _layer_pipe(layer)
+    conn = pipe.instance_connector
+    schema = pipe.parameters.get('schema') or 'public'
+    target = pipe.target
+    z, x, y = int(z), int(x), int(y)
+    srid = _layer_srid(layer_id, conn, schema, target)
+
+    props = {**layer.get('props', {}), **layer.get('detail_props', {})}
+    prop_cols = ''.join(
+        f', "{db_col}" AS "{out_name}"'
+        for out_name, db_col in props.items()
+    )
+    geometry = '"geometry"'
+    if layer['kind'] in ('line', 'fill'):
+        geometry = f'ST_SimplifyPreserveTopology("geometry", {_zoom_tolerance(srid, z)})'
+    envelope = f'ST_TileEnvelope({z}, {x}, {y})'
+    margin = TILE_BUFFER / TILE_EXTENT
+    query = f'''
+    SELECT ST_AsMVT("t", '{layer_id}', {TILE_EXTENT}, 'geom') AS "mvt"
+    FROM (
+        SELECT
+            ST_AsMVTGeom(
+                ST_Transform(ST_Force2D({geometry}), 3857),
+                {envelope}, {TILE_EXTENT}, {TILE_BUFFER}, true
+            ) AS "geom"
+            {prop_cols}
+        FROM "{schema}"."{target}"
+        WHERE "geometry" && ST_Transform(
+            ST_TileEnvelope({z}, {x}, {y}, margin => {margin}), {srid}
+        )
+    ) AS "t"
+    WHERE "geom" IS NOT NULL
+    '''
+    df = conn.read(query)
+    if df is None or len(df) == 0 or df['mvt'][0] is None:
+        return b''
+    return bytes(df['mvt'][0])
+
+
+def _layer_geojson_text(layer_id: str) -> str | None:
+    """The layer's full GeoJSON: the pregenerated file, else the on-demand
+    cache, else built (and cached) here."""
+    pregenerated = _output_dir() / f'{layer_id}.geojson'
+    if pregenerated.exists():
+        return pregenerated.read_text()
+    cached = _CACHE.get(layer_id)
+    if cached and (time.time() - cached[0]) < _CACHE_TTL_SECONDS:
+        return cached[1]
+    json_str = _build_layer_geojson(layer_id)
+    if json_str is not None:
+        _CACHE[layer_id] = (time.time(), json_str)
+    return json_str
+
+
+def _tile_source(layer_id: str) -> dict[str, Any] | None:
+    """A builder layer's features ready to cut tiles from: Web Mercator
+    geometries, their properties and an STRtree over them. Rebuilt with
+    the layer's GeoJSON (`_CACHE_TTL_SECONDS`)."""
+    import json
+    import numpy as np
+    shapely = mrsm.attempt_import('shapely', lazy=False)
+
+    cached = _TILE_SOURCES.get(layer_id)
+    if cached and (time.time() - cached[0]) < _CACHE_TTL_SECONDS:
+        return cached[1]
+    json_str = _layer_geojson_text(layer_id)
+    if json_str is None:
+        return None
+    features = [
+        f for f in json.loads(json_str).get('features', [])
+        if f.get('geometry')
+    ]
+    geoms = shapely.from_geojson([json.dumps(f['geometry']) for f in features])
+
+    def _to_mercator(coords):
+        lon, lat = coords[:, 0], np.clip(coords[:, 1], -85.0511, 85.0511)
+        return np.column_stack((
+            np.radians(lon) * (_MERC_HALF / math.pi),
+            np.log(np.tan(math.pi / 4 + np.radians(lat) / 2)) * (_MERC_HALF / math.pi),
+        ))
+
+    geoms = shapely.transform(shapely.force_2d(geoms), _to_mercator)
+    source = {
+        'geoms': geoms,
+        'props': [f.get('properties') or {} for f in features],
+        'tree': shapely.STRtree(geoms),
+    }
+    _TILE_SOURCES[layer_id] = (time.time(), source)
+    return source
+
+
+def _python_tile(layer_id: str, z: int, x: int, y: int) -> bytes:
+    """Tile z/x/y of a builder layer, clipped, simplified to a tile unit
+    and quantized as ST_AsMVTGeom would, then encoded by `_encode_mvt`."""
+    import numpy as np
+    shapely = mrsm.attempt_import('shapely', lazy=False)
+
+    source = _tile_source(layer_id)
+    if source is None:
+        return b''
+    minx, miny, maxx, maxy = _tile_bounds(z, x, y)
+    unit = (maxx - minx) / TILE_EXTENT
+    pad = TILE_BUFFER * unit
+    hits = source['tree'].query(shapely.box(minx - pad, miny - pad, maxx + pad, maxy + pad))
+    if not len(hits):
+        return b''
+    hits = np.sort(hits)
+
+    def _to_tile(coords):
+        return np.column_stack((
+            (coords[:, 0] - minx) / unit,
+            (maxy - coords[:, 1]) / unit,   # tile y runs south
+        ))
+
+    clipped = shapely.clip_by_rect(
+        source['geoms'][hits], minx - pad, miny - pad, maxx + pad, maxy + pad,
+    )
+    clipped = shapely.simplify(clipped, unit, preserve_topology=True)
+    clipped = shapely.transform(clipped, _to_tile)
+    features = []
+    for geom, i in zip(clipped, hits.tolist()):
+        encoded = _mvt_parts(geom, shapely)
+        if encoded is not None:
+            features.append((*encoded, source['props'][i]))
+    return _encode_mvt(layer_id, features)
+
+
+def _mvt_parts(geom, shapely) -> tuple[int, list] | None:
+    """(MVT geometry type, parts) for a geometry in tile units: points,
+    line strings or polygon rings as integer (x, y) lists, exterior rings
+    with positive area in tile space (clockwise on screen) and holes
+    negative, as the spec asks. None when nothing survives quantizing."""
+    polygon = mrsm.attempt_import('shapely.geometry.polygon', lazy=False)
+
+    def _quantize(coords, closed=False):
+        points = []
+        for px, py in coords:
+            point = (int(round(px)), int(round(py)))
+            if not points or point != points[-1]:
+                points.append(point)
+        if closed and len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        return points
+
+    def _area(ring):
+        return sum(
+            ax * by - bx * ay
+            for (ax, ay), (bx, by) in zip(ring, ring[1:] + ring[:1])
+        )
+
+    if geom is None or geom.is_empty:
+        return None
+    # Twice: a clipped collection can hold multi-part geometries.
+    singles = shapely.get_parts(shapely.get_parts(geom))
+    points, lines, rings = [], [], []
+    for single in singles:
+        single_kind = shapely.get_type_id(single)
+        if single_kind == 0:
+            points.append(_quantize(single.coords))
+        elif single_kind in (1, 2):
+            line = _quantize(single.coords)
+            if len(line) >= 2:
+                lines.append(line)
+        elif single_kind == 3:
+            single = polygon.orient(single, sign=1.0)
+            exterior = _quantize(single.exterior.coords, closed=True)
+            if len(exterior) < 3 or _area(exterior) <= 0:
+                continue
+            rings.append(exterior)
+            for interior in single.interiors:
+                hole = _quantize(interior.coords, closed=True)
+                if len(hole) >= 3 and _area(hole) < 0:
+                    rings.append(hole)
+    # A clipped geometry collection keeps its dominant dimension.
+    if rings:
+        return 3, rings
+    if lines:
+        return 2, lines
+    if points:
+        return 1, points
+    return None
+
+
+def _pb_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _pb_bytes(field: int, payload: bytes) -> bytes:
+    """A length-delimited protobuf field."""
+    return _pb_varint(field << 3 | 2) + _pb_varint(len(payload)) + payload
+
+
+def _pb_packed(field: int, values: list[int]) -> bytes:
+    return _pb_bytes(field, b''.join(_pb_varint(v) for v in values))
+
+
+def _zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def _mvt_geometry(kind: int, parts: list) -> list[int]:
+    """The MVT command stream for `parts` (see `_mvt_parts`): MoveTo and
+    LineTo with zigzagged deltas, ClosePath after each polygon ring."""
+    commands = []
+    cx = cy = 0
+
+    def _move(points):
+        nonlocal cx, cy
+        for px, py in points:
+            commands.extend((_zigzag(px - cx), _zigzag(py - cy)))
+            cx, cy = px, py
+
+    if kind == 1:
+        commands.append(1 | len(parts) << 3)
+        _move([part[0] for part in parts])
+        return commands
+    for part in parts:
+        commands.append(1 | 1 << 3)
+        _move(part[:1])
+        commands.append(2 | (len(part) - 1) << 3)
+        _move(part[1:])
+        if kind == 3:
+            commands.append(7 | 1 << 3)
+    return commands
+
+
+def _mvt_value(value) -> bytes:
+    """A Tile.Value message: bool, (s)int, double or string."""
+    import struct
+    if isinstance(value, bool):
+        return _pb_varint(7 << 3) + _pb_varint(int(value))
+    if isinstance(value, int) and -(1 << 63) <= value < (1 << 64):
+        if value >= 0:
+            return _pb_varint(5 << 3) + _pb_varint(value)
+        return _pb_varint(6 << 3) + _pb_varint(_zigzag(value))
+    if isinstance(value, float):
+        return _pb_varint(3 << 3 | 1) + struct.pack('<d', value)
+    return _pb_bytes(1, str(value).encode())
+
+
+def _encode_mvt(name: str, features: list) -> bytes:
+    """One-layer MVT (spec v2) from (type, parts, properties) features, in
+    tile units of TILE_EXTENT; b'' for no features. Null properties are
+    left out, as ST_AsMVT does."""
+    import json
+    if not features:
+        return b''
+    keys: dict[str, int] = {}
+    values: dict[tuple, int] = {}
+    body = bytearray()
+    for kind, parts, props in features:
+        tags = []
+        for key, value in props.items():
+            if value is None or (isinstance(value, float) and value != value):
+                continue
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            value_key = (type(value).__name__, value)
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(value_key, len(values)))
+        feature = _pb_packed(2, tags) if tags else b''
+        feature += _pb_varint(3 << 3) + _pb_varint(kind)
+        feature += _pb_packed(4, _mvt_geometry(kind, parts))
+        body += _pb_bytes(2, feature)
+    layer = _pb_varint(15 << 3) + _pb_varint(2) + _pb_bytes(1, name.encode())
+    layer += bytes(body)
+    layer += b''.join(_pb_bytes(3, key.encode()) for key in keys)
+    layer += b''.join(_pb_bytes(4, _mvt_value(value)) for _t, value in values)
+    layer += _pb_varint(5 << 3) + _pb_varint(TILE_EXTENT)
+    return _pb_bytes(3, layer)
+
+
+def _write_mbtiles(
+    layer_id: str,
+    root=None,
+    min_zoom: int = TILE_MIN_ZOOM,
+    max_zoom: int = TILE_MAX_ZOOM,
+):
+    """Seed tiles `min_zoom`..`max_zoom` of a layer into `<layer>.mbtiles`
+    under `root`, gzipped as MBTiles expects. Tiles are walked from the
+    county's `min_zoom` tiles down, and only a tile with features has its
+    children rendered, so empty countryside costs one query per branch.
+    Written to a temporary file and renamed into place, so the API never
+    reads half a file. Returns (path, tiles written)."""
+    import json
+    import os
+    import sqlite3
+    from contextlib import closing
+    from pathlib import Path
+
+    root = Path(root) if root is not None else _tiles_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / f'{layer_id}.mbtiles'
+    tmp = root / f'{layer_id}.mbtiles.{os.getpid()}'
+    tmp.unlink(missing_ok=True)
+    layer = LAYERS[layer_id]
+    fields = {
+        name: 'String'
+        for name in (*layer.get('props', {}), *layer.get('detail_props', {}))
+    }
+    written = 0
+    with closing(sqlite3.connect(tmp)) as db:
+        db.executescript('''
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (
+                zoom_level INTEGER, tile_column INTEGER,
+                tile_row INTEGER, tile_data BLOB
+            );
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+        ''')
+        x0, y0, x1, y1 = _tile_range(min_zoom, *SEARCH_BOUNDS)
+        stack = [(min_zoom, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+        while stack:
+            z, x, y = stack.pop()
+            raw = _render_tile(layer_id, z, x, y)
+            if not raw:
+                continue
+            db.execute(
+                'INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                (z, x, (1 << z) - 1 - y, _gzip(raw)),
+            )
+            written += 1
+            if z < max_zoom:
+                stack.extend(
+                    (z + 1, 2 * x + dx, 2 * y + dy)
+                    for dx in (0, 1) for dy in (0, 1)
+                )
+        minlon, minlat, maxlon, maxlat = SEARCH_BOUNDS
+        db.executemany('INSERT INTO metadata VALUES (?, ?)', [
+            ('name', layer_id),
+            ('description', layer['label']),
+            ('format', 'pbf'),
+            ('type', 'overlay'),
+            ('version', __version__),
+            ('minzoom', str(min_zoom)),
+            ('maxzoom', str(max_zoom)),
+            ('bounds', f'{minlon},{minlat},{maxlon},{maxlat}'),
+            ('generated', str(int(time.time()))),
+            ('json', json.dumps({'vector_layers': [{
+                'id': layer_id,
+                'fields': fields,
+                'minzoom': min_zoom,
+                'maxzoom': max_zoom,
+            }]})),
+        ])
+        db.commit()
+    os.replace(tmp, path)
+    return path, written
+
+
+# ------------------------------------------------------------------- matrix
+
+#: Most origin x destination cells one `/map-layers/matrix` request may ask
+#: for. Each origin (or destination, whichever side is smaller) is one
+#: search, so this bounds a request at ~50 searches.
+ROUTE_MATRIX_MAX_CELLS = 2500
+
+
+def _route_matrix(
+    origins: list,
+    destinations: list,
+    mode: str = 'walk',
+    snap_max_m: float = ROUTE_SNAP_MAX_M,
+    max_cost: float | None = None,
+) -> dict[str, list]:
+    """Network cost, distance and travel time from every origin to every
+    destination ((lat, lon) pairs), as `[origin][destination]` grids under
+    `cost`, `distance_m` and `duration_min`.
+
+    One multi-target Dijkstra per origin settles every destination at once;
+    when there are fewer destinations than origins, it's one backward search
+    per destination instead. Distance and duration are measured the way
+    `_route_core` measures a route (snap distances included, climb priced at
+    the mode's `CLIMB_SEC_PER_M`). A cell is None when either point is off
+    the network or there's no connection (costlier than `max_cost`, when
+    given, counts as none). No street fallback: this ranks candidates, it
+    doesn't promise a route."""
+    graph = _get_route_graph()
+    if not _node_count(graph):
+        raise ValueError("Routing network is unavailable.")
+    profile = _weight_profile(mode)
+    speed = MODE_SPEED_M_S[mode]
+    climb_sec_per_m = CLIMB_SEC_PER_M.get(_mode_family(mode), 0.0)
+    length = memoryview(graph['length'])
+    backward = len(destinations) < len(origins)
+    sources, targets = (
+        (destinations, origins) if backward else (origins, destinations)
+    )
+
+    def _snap(lat, lon, tag):
+        snap = _snap_terminus(graph, lat, lon, tag)
+        if snap['node'] is None or snap['dist'] > snap_max_m:
+            return None
+        return snap
+
+    base_adj: dict = {}
+    base_nodes: dict = {}
+    target_snaps = []
+    for j, (lat, lon) in enumerate(targets):
+        snap = _snap(lat, lon, f'matrix-{j}')
+        target_snaps.append(snap)
+        if snap is not None:
+            _register_virtual(graph, snap, base_adj, base_nodes)
+    target_nodes = {snap['node'] for snap in target_snaps if snap is not None}
+
+    grids: dict[str, list] = {
+        key: [[None] * len(destinations) for _ in origins]
+        for key in ('cost', 'distance_m', 'duration_min')
+    }
+    for i, (lat, lon) in enumerate(sources):
+        source_snap = _snap(lat, lon, 'matrix-source')
+        if source_snap is None:
+            continue
+        extra_adj = {u: list(lst) for u, lst in base_adj.items()}
+        extra_nodes = dict(base_nodes)
+        _register_virtual(graph, source_snap, extra_adj, extra_nodes)
+        for snap in target_snaps:
+            if snap is not None:
+                _bridge_same_edge(graph, source_snap, snap, extra_adj)
+        _overlay, overlay_out, overlay_in = _price_overlay(
+            graph, extra_adj, profile,
+        )
+        dist, link = _dijkstra_targets(
+            graph, source_snap['node'], target_nodes, profile,
+            overlay_out, overlay_in, backward=backward, max_cost=max_cost,
+        )
+
+        for j, snap in enumerate(target_snaps):
+            if snap is None or snap['node'] not in dist:
+                continue
+            walked, climbed = 0.0, 0.0
+            node = snap['node']
+            while True:
+                nbr, edge = link[node]
+                if nbr is None:
+                    break
+                walked += length[edge] if isinstance(edge, int) else edge[2]
+                climbed += _edge_ascent_m(graph, edge)
+                node = nbr
+            distance_m = walked + source_snap['dist'] + snap['dist']
+            o, d = (j, i) if backward else (i, j)
+            grids['cost'][o][d] = dist[snap['node']]
+            grids['distance_m'][o][d] = distance_m
+            grids['duration_min'][o][d] = (
+                distance_m / speed + climbed * climb_sec_per_m
+            ) / 60
+    return grids
+
+
+#: How far an access search (`_access_seconds`) may go, in route cost per
+#: metre of straight line to the farthest candidate: room for a 2x detour
+#: over streets priced at 8x (a quiet rider's default factor). Past it the
+#: place counts as off the network and the straight line stands in.
+ROUTE_ACCESS_COST_PER_M = 16.0
+
+
+def _access_seconds(
+    lat: float,
+    lon: float,
+    places: list[dict],
+    mode: str,
+    outbound: bool = True,
+) -> list[float]:
+    """Travel time (seconds) over the network from (lat, lon) to each of
+    `places` ({'lat', 'lon', ...}), or from each of them to it when not
+    `outbound`. One search either way. Where the network can't say (off it,
+    or the graph is down), the straight line at the mode's pace stands in,
+    which is what the access leg falls back to as well (`_walk_or_direct`).
+
+    The search stops at ROUTE_ACCESS_COST_PER_M times the farthest place's
+    straight-line distance, so a stop across a river doesn't send it over the
+    whole county first."""
+    speed = MODE_SPEED_M_S.get(mode, MODE_SPEED_M_S['walk'])
+    crow_m = [_equirect_m(lat, lon, p['lat'], p['lon']) for p in places]
+    crow = [m / speed for m in crow_m]
+    if not places:
+        return crow
+    points = [(p['lat'], p['lon']) for p in places]
+    max_cost = ROUTE_ACCESS_COST_PER_M * max(max(crow_m), ROUTE_SNAP_MAX_M)
+    try:
+        if outbound:
+            minutes = _route_matrix(
+                [(lat, lon)], points, mode=mode, max_cost=max_cost,
+            )['duration_min'][0]
+        else:
+            minutes = [
+                row[0] for row in _route_matrix(
+                    points, [(lat, lon)], mode=mode, max_cost=max_cost,
+                )['duration_min']
+            ]
+    except ValueError:
+        return crow
+    return [
+        fallback if value is None else value * 60
+        for value, fallback in zip(minutes, crow)
+    ]
+
+
+# ---------------------------------------------------------------- isochrone
+
+#: Time bands an isochrone request may ask for, and how long the longest
+#: may be: 60 minutes of riding covers most of the county already.
+ISOCHRONE_MAX_MIN = 60
+ISOCHRONE_MAX_BANDS = 6
+#: Reachable edges are buffered this far (m) into the area polygon: what's
+#: a short walk off the street you can reach counts as reachable too.
+ISOCHRONE_BUFFER_M = 60.0
+#: Douglas-Peucker tolerance (m) on the band polygons; the buffer's round
+#: caps are otherwise most of the payload.
+ISOCHRONE_SIMPLIFY_M = 10.0
+#: Computed isochrones by snapped origin and profile, so dragging the origin
+#: along a street or toggling a band redraws without re-searching.
+_ISOCHRONE_CACHE = _LRUCache(max_bytes=32 * 1024 * 1024, ttl_seconds=10 * 60)
+
+
+def _line_prefix(coords: list, frac: float) -> list:
+    """The first `frac` (0..1, by length) of the [lon, lat] line `coords`."""
+    if frac >= 1.0:
+        return list(coords)
+    seg = [
+        _equirect_m(a[1], a[0], b[1], b[0]) for a, b in zip(coords, coords[1:])
+    ]
+    want = sum(seg) * max(frac, 0.0)
+    out = [coords[0]]
+    for (a, b), d in zip(zip(coords, coords[1:]), seg):
+        if d >= want:
+            t = want / d if d > 0 else 0.0
+            out.append([a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t])
+            return out
+        want -= d
+        out.append(b)
+    return out
 
-    The graph is the street grid plus the trail and bike lanes, so the fallback
-    isn't a different network -- it's the same one with the mode's preferences
-    switched off and the snap radius widened. What makes it honest is that the
-    disclosure stays in the requested mode: the response still marks every
-    stretch missing a sidewalk (walk/roll) or a bike facility (bike), and says
-    `fallback: 'street'` so the app can lead with the caveat.
-    """
-    try:
-        return _route_core(
-            from_lat, from_lon, to_lat, to_lon, mode=mode,
-            avoid_pairs=avoid_pairs, pairs_out=pairs_out,
+
+def _isochrone_search(
+    graph: dict,
+    snap: dict,
+    mode: str,
+    max_seconds: float,
+) -> tuple[dict, list]:
+    """Dijkstra from the snapped origin under `mode`'s weights, timed at its
+    pace (`MODE_SPEED_M_S`, plus `CLIMB_SEC_PER_M` for every metre of rise)
+    and cut off at `max_seconds`.
+
+    The search follows the cheapest ways under the mode's weights -- the ones
+    `_route` would pick -- so a quiet rider's 15 minutes don't include the
+    arterial a fast rider would take. Returns (seconds per reached node,
+    [(seconds at u, edge seconds, edge, reversed?)] for every edge leaving a
+    reached node, `edge` an edge id or overlay tuple), which is what
+    `_isochrone_bands` cuts into bands."""
+    import heapq
+    import itertools
+
+    profile = _weight_profile(mode)
+    speed = MODE_SPEED_M_S[mode]
+    climb_sec_per_m = CLIMB_SEC_PER_M.get(_mode_family(mode), 0.0)
+    extra_adj: dict = {}
+    extra_nodes: dict = {}
+    _register_virtual(graph, snap, extra_adj, extra_nodes)
+    _overlay, overlay_out, _overlay_in = _price_overlay(
+        graph, extra_adj, profile,
+    )
+
+    offsets = memoryview(graph['offsets'])
+    nbrs = memoryview(graph['nbr'])
+    weights = memoryview(_edge_weights(graph, profile))
+    length = memoryview(graph['length'])
+    rev = memoryview(graph['rev'])
+
+    seq = itertools.count()
+    source = snap['node']
+    start_s = snap['dist'] / speed
+    cost = {source: 0.0}
+    heap = [(0.0, start_s, next(seq), source)]
+    done: set = set()
+    reached: dict = {}
+    edges: list = []
+    while heap:
+        g, t, _seq, cur = heapq.heappop(heap)
+        if cur in done:
+            continue
+        done.add(cur)
+        if not len(done) % ROUTE_BUDGET_STRIDE:
+            _route_charge(ROUTE_BUDGET_STRIDE)
+        if t > max_seconds:
+            continue
+        reached[cur] = t
+        steps: list = []
+        if isinstance(cur, int):
+            steps = [
+                (nbrs[k], weights[k], length[k], k)
+                for k in range(offsets[cur], offsets[cur + 1])
+            ]
+        steps.extend(
+            (nbr, weight, edge[2], edge)
+            for nbr, weight, edge in overlay_out.get(cur, ())
         )
-    except ValueError as first_error:
-        if not street_fallback or mode == 'street':
-            raise
-        feature = _route_core(
-            from_lat, from_lon, to_lat, to_lon,
-            mode='street',
-            snap_max_m=ROUTE_SNAP_RELAXED_M,
-            warn_mode=mode,
-            avoid_pairs=avoid_pairs,
-            pairs_out=pairs_out,
+        for nbr, weight, length_m, edge in steps:
+            edge_s = (
+                length_m / speed
+                + _edge_ascent_m(graph, edge) * climb_sec_per_m
+            )
+            edges.append((
+                t, edge_s, edge,
+                bool(rev[edge]) if isinstance(edge, int) else edge[5],
+            ))
+            ng = g + weight
+            if nbr not in cost or ng < cost[nbr]:
+                cost[nbr] = ng
+                heapq.heappush(heap, (ng, t + edge_s, next(seq), nbr))
+    return reached, edges
+
+
+def _isochrone_bands(graph: dict, edges: list, band_seconds: list[float]) -> list:
+    """One buffered-edge polygon per band: the part of every edge out of a
+    reached node that's reachable within the band, buffered by
+    ISOCHRONE_BUFFER_M and unioned (shapely, in a local metric frame).
+    Returns GeoJSON geometry dicts (None for an empty band).
+
+    An edge and its reverse twin share one geometry, so each is cut once:
+    whole when the reachable stretches from its two ends meet, else the
+    one or two stretches themselves. Buffering is most of the time, and
+    this halves the lines it sees."""
+    shapely = mrsm.attempt_import('shapely', lazy=False)
+    shapely_geometry = mrsm.attempt_import('shapely.geometry', lazy=False)
+    shapely_affinity = mrsm.attempt_import('shapely.affinity', lazy=False)
+    if not edges:
+        return [None for _ in band_seconds]
+    # Both directions of a compact-graph edge share its `geom` row; overlay
+    # edges share the coords list they were split into.
+    geom = graph['geom']
+    coords_of: dict = {}
+
+    def _key(edge):
+        return ('g', int(geom[edge])) if isinstance(edge, int) else id(edge[4])
+
+    def _coords(key, edge):
+        coords = coords_of.get(key)
+        if coords is None:
+            coords = _edge_coords(graph, edge) if isinstance(edge, int) else edge[4]
+            coords_of[key] = coords
+        return coords
+
+    lon0, lat0 = float(graph['lon'][0]), float(graph['lat'][0])
+    mx, my = M_PER_DEG_LAT * _COSLAT, M_PER_DEG_LAT
+    out = []
+    for limit in band_seconds:
+        # key -> [reachable fraction from the first vertex, from the last]
+        reach: dict = {}
+        for t, edge_s, edge, reversed_ in edges:
+            if t > limit:
+                continue
+            frac = 1.0 if edge_s <= 0 else min((limit - t) / edge_s, 1.0)
+            key = _key(edge)
+            _coords(key, edge)
+            ends = reach.setdefault(key, [0.0, 0.0])
+            side = 1 if reversed_ else 0
+            ends[side] = max(ends[side], frac)
+        lines = []
+        for key, (head, tail) in reach.items():
+            coords = coords_of[key]
+            if head + tail >= 1.0:
+                pieces = [coords]
+            else:
+                pieces = [
+                    piece for piece in (
+                        _line_prefix(coords, head) if head > 0 else None,
+                        _line_prefix(coords[::-1], tail) if tail > 0 else None,
+                    ) if piece is not None and len(piece) >= 2
+                ]
+            for piece in pieces:
+                lines.append([((x - lon0) * mx, (y - lat0) * my) for x, y in piece])
+        if not lines:
+            out.append(None)
+            continue
+        area = shapely.union_all(shapely.buffer(
+            [shapely_geometry.LineString(line) for line in lines],
+            ISOCHRONE_BUFFER_M, quad_segs=2,
+        )).simplify(ISOCHRONE_SIMPLIFY_M)
+        area = shapely_affinity.affine_transform(
+            area, [1 / mx, 0.0, 0.0, 1 / my, lon0, lat0],
         )
-        props = feature['properties']
-        props['fallback'] = 'street'
-        props['fallback_reason'] = str(first_error)
+        out.append(shapely_geometry.mapping(area))
+    return out
+
+
+def _isochrone(
+    lat: float,
+    lon: float,
+    mode: str = 'bike',
+    minutes: float = 15.0,
+    bands: int = 3,
+) -> dict[str, Any]:
+    """Where `mode` gets you from (lat, lon) within `minutes`, as a
+    FeatureCollection of `bands` nested polygons (every minutes/bands, the
+    outermost first so it draws underneath). Cached by snapped origin and
+    weight profile; `origin` and `snap_m` are this request's own, so they're
+    stamped on after the cache (the cached bands are shared)."""
+    graph = _get_route_graph()
+    if not _node_count(graph):
+        raise ValueError("Routing network is unavailable.")
+    snap = _snap_terminus(graph, lat, lon, 'isochrone')
+    if snap['node'] is None or snap['dist'] > ROUTE_SNAP_MAX_M:
         noun = MODE_NETWORK_NOUN.get(mode, 'routable')
-        props['fallback_note'] = (
-            f"No {noun} route was available, so this follows regular streets. "
-            "Check the highlighted stretches before you go."
-        )
-        return feature
+        raise ValueError(f"No {noun} network near that point.")
+    # The origin node stands for every point that snaps to it; mid-edge
+    # origins are keyed by where on the edge (to ~1% of its length).
+    virtual = snap['virtual']
+    origin_key = (
+        snap['node'] if virtual is None
+        else (virtual['k'], virtual['seg_i'], round(virtual['t'], 2))
+    )
+    key = (
+        graph['epoch'], origin_key, _weight_profile(mode)['key'],
+        float(minutes), int(bands),
+    )
+    stamp = {'origin': [lon, lat], 'snap_m': round(snap['dist'], 1)}
+    hit = _ISOCHRONE_CACHE.get(key)
+    if hit is not None:
+        return {**hit, 'properties': {**hit['properties'], **stamp}}
+
+    band_minutes = [minutes * (i + 1) / bands for i in range(bands)]
+    _reached, edges = _isochrone_search(graph, snap, mode, minutes * 60)
+    geometries = _isochrone_bands(graph, edges, [m * 60 for m in band_minutes])
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': geometry,
+            'properties': {
+                'minutes': round(band, 2),
+                'mode': _base_mode(mode),
+                'ebike': _mode_family(mode) == 'ebike',
+                'stress': _stress_level(mode),
+            },
+        }
+        for band, geometry in reversed(list(zip(band_minutes, geometries)))
+        if geometry is not None
+    ]
+    collection = {
+        'type': 'FeatureCollection',
+        'features': features,
+        'properties': {'minutes': minutes},
+    }
+    _ISOCHRONE_CACHE.put(key, collection)
+    return {**collection, 'properties': {**collection['properties'], **stamp}}
 
 
 # ------------------------------------------------------------------ transit
 
-_TRANSIT: dict[str, Any] = {'epoch': 0.0, 'stops': None, 'shapes': None}
+_TRANSIT: dict[str, Any] = {
+    'epoch': 0.0, 'stops': None, 'shapes': None, 'timetable': None,
+}
 _TRANSIT_LOCK = threading.Lock()
 _TRANSIT_TTL_SECONDS = 24 * 60 * 60
 
 
 def _get_transit_data() -> dict[str, Any]:
-    """Greenlink stops + route shapes, cached in-process.
+    """Greenlink stops + route shapes + timetable, cached in-process.
 
-    stops: list of {name, lat, lon, routes: set of short names}
-    shapes: list of {route, long_name, color, coords: [[lon,lat],...],
-                     cumulative: [m from start]}
+    stops: list of {stop_id, name, lat, lon, routes: set of short names}
+    shapes: list of {shape_id, route, long_name, color,
+                     coords: [[lon,lat],...], cumulative: [m from start]}
+    timetable: `_build_timetable` of the schedule pipes, or None when they
+               haven't synced (transit then falls back to flat estimates)
     """
     with _TRANSIT_LOCK:
         if (
@@ -3323,7 +7715,9 @@ def _get_transit_data() -> dict[str, Any]:
 
         conn = mrsm.get_connector('sql:bwg')
         stops = []
-        df = conn.read('SELECT "name", "lat", "lon", "routes" FROM "transit"."stops"')
+        df = conn.read(
+            'SELECT "stop_id", "name", "lat", "lon", "routes" FROM "transit"."stops"'
+        )
         for rec in df.to_dict(orient='records'):
             routes = {
                 r.strip()
@@ -3333,6 +7727,7 @@ def _get_transit_data() -> dict[str, Any]:
             if not routes:
                 continue
             stops.append({
+                'stop_id': str(rec['stop_id']),
                 'name': rec['name'],
                 'lat': float(rec['lat']),
                 'lon': float(rec['lon']),
@@ -3341,7 +7736,7 @@ def _get_transit_data() -> dict[str, Any]:
 
         shapes = []
         df = conn.read('''
-            SELECT "short_name", "long_name", "color",
+            SELECT "shape_id", "short_name", "long_name", "color",
                    ST_AsGeoJSON("geometry", 5) AS "gj"
             FROM "transit"."route_shapes"
         ''')
@@ -3358,35 +7753,527 @@ def _get_transit_data() -> dict[str, Any]:
                     cumulative[-1] + _equirect_m(a[1], a[0], b[1], b[0])
                 )
             shapes.append({
+                'shape_id': str(rec.get('shape_id') or ''),
                 'route': str(rec.get('short_name') or ''),
                 'long_name': str(rec.get('long_name') or ''),
                 'color': rec.get('color'),
                 'coords': coords,
                 'cumulative': cumulative,
             })
-        _TRANSIT.update({'epoch': time.time(), 'stops': stops, 'shapes': shapes})
+
+        try:
+            timetable = _build_timetable(stops, *(
+                conn.read(f'SELECT * FROM "transit"."{table}"').to_dict(orient='records')
+                for table in ('routes', 'trips', 'stop_times', 'calendar', 'calendar_dates')
+            ))
+        except Exception as e:
+            warn(f"Transit schedules unavailable; estimating waits instead: {e}")
+            timetable = None
+        _TRANSIT.update(_transit_data(stops, shapes, timetable))
         return _TRANSIT
 
 
+def _transit_data(stops: list[dict], shapes: list[dict], timetable) -> dict[str, Any]:
+    """The `_TRANSIT` entries for a feed load: the data plus its indexes."""
+    return {
+        'epoch': time.time(),
+        'stops': stops,
+        'shapes': shapes,
+        'shapes_by_id': {sh['shape_id']: sh for sh in shapes},
+        'timetable': timetable,
+        **_index_transit(stops, shapes),
+    }
+
+
+def _json_list(value) -> list:
+    """A `json` pipe column as read back: already a list, or its JSON text."""
+    if isinstance(value, str):
+        import json
+        return json.loads(value)
+    return list(value)
+
+
+def _gtfs_date(value):
+    from datetime import date
+    value = str(value)
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+
+
+def _build_timetable(
+    stops: list[dict],
+    routes: list[dict],
+    trips: list[dict],
+    stop_times: list[dict],
+    calendar: list[dict],
+    calendar_dates: list[dict],
+) -> dict[str, Any] | None:
+    """The schedule, as RAPTOR wants it: built once per feed load.
+
+    Trips of a route that visit the same stops in the same order form a
+    pattern; each pattern keeps its trips' arrival and departure seconds
+    as (trips x stops) int32 arrays, sorted by first departure. A pattern
+    whose trips overtake one another is split until none do, so the first
+    catchable trip at any stop is a binary search away. Stops are indexed
+    by their position in `stops`; footpath transfers join stops within
+    TRANSIT_TRANSFER_MAX_M. Returns None when no trip survives (no schedule).
+    """
+    from collections import OrderedDict
+    import numpy as np
+
+    stop_index = {s['stop_id']: i for i, s in enumerate(stops)}
+    route_info = {str(r['route_id']): r for r in routes}
+    trip_info = {str(t['trip_id']): t for t in trips}
+    services: dict[str, int] = {}
+    groups: dict[tuple, list] = {}
+    for rec in stop_times:
+        trip = trip_info.get(str(rec['trip_id']))
+        ids = _json_list(rec['stop_ids'])
+        if trip is None or len(ids) < 2 or any(s not in stop_index for s in ids):
+            continue
+        key = (str(trip['route_id']), tuple(stop_index[s] for s in ids))
+        groups.setdefault(key, []).append((
+            _json_list(rec['arrivals']), _json_list(rec['departures']), trip,
+        ))
+
+    patterns = []
+    for (route_id, seq), members in groups.items():
+        members.sort(key=lambda m: m[1][0])
+        lanes: list[list] = []
+        for member in members:
+            for lane in lanes:
+                arr, dep, _trip = lane[-1]
+                if (
+                    all(a >= b for a, b in zip(member[0], arr))
+                    and all(a >= b for a, b in zip(member[1], dep))
+                ):
+                    lane.append(member)
+                    break
+            else:
+                lanes.append([member])
+        info = route_info.get(route_id, {})
+        for lane in lanes:
+            patterns.append({
+                'route': str(info.get('short_name') or route_id),
+                'long_name': str(info.get('long_name') or ''),
+                'color': info.get('color'),
+                'stops': np.array(seq, dtype=np.int32),
+                'arr': np.array([m[0] for m in lane], dtype=np.int32),
+                'dep': np.array([m[1] for m in lane], dtype=np.int32),
+                'service': np.array(
+                    [services.setdefault(str(m[2]['service_id']), len(services))
+                     for m in lane],
+                    dtype=np.int32,
+                ),
+                'trip_ids': [str(m[2]['trip_id']) for m in lane],
+                'shape_ids': [str(m[2].get('shape_id') or '') for m in lane],
+            })
+    if not patterns:
+        return None
+
+    days = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+    weekly = {}
+    for c in calendar:
+        if str(c['service_id']) in services:
+            weekly[services[str(c['service_id'])]] = (
+                tuple(bool(int(c[day] or 0)) for day in days),
+                _gtfs_date(c['start_date']),
+                _gtfs_date(c['end_date']),
+            )
+    exceptions: dict = {}
+    for c in calendar_dates:
+        if str(c['service_id']) in services:
+            exceptions.setdefault(_gtfs_date(c['date']), {})[
+                services[str(c['service_id'])]
+            ] = int(c['exception_type'])
+
+    lat = np.array([s['lat'] for s in stops])
+    lon = np.array([s['lon'] for s in stops])
+    walk = MODE_SPEED_M_S['walk']
+    transfers = []
+    for i in range(len(stops)):
+        d = np.hypot((lat - lat[i]) * M_PER_DEG_LAT, (lon - lon[i]) * M_PER_DEG_LAT * _COSLAT)
+        near = np.flatnonzero(d <= TRANSIT_TRANSFER_MAX_M)
+        transfers.append([
+            (int(j), int(d[j] * TRANSIT_TRANSFER_DETOUR / walk))
+            for j in near.tolist() if j != i
+        ])
+    return {
+        'stops': stops,
+        'patterns': patterns,
+        'services': list(services),
+        'weekly': weekly,
+        'exceptions': exceptions,
+        'transfers': transfers,
+        'days': OrderedDict(),
+        'days_lock': threading.Lock(),
+    }
+
+
+def _active_services(timetable: dict, day):
+    """Bool per service: does it run on `day` (calendar + calendar_dates)?"""
+    import numpy as np
+    active = np.zeros(len(timetable['services']), dtype=bool)
+    for service, (weekdays, start, end) in timetable['weekly'].items():
+        active[service] = weekdays[day.weekday()] and start <= day <= end
+    for service, kind in timetable['exceptions'].get(day, {}).items():
+        active[service] = kind == 1
+    return active
+
+
+def _timetable_day(timetable: dict, day, backward: bool = False) -> dict[str, Any]:
+    """The patterns as they run on service day `day`, ready to scan.
+
+    Only that day's trips are kept, plus the previous day's trips still
+    running after midnight (their times shifted back a day). Times are
+    per-stop Python lists (columns), so boarding is a `bisect`. The
+    `backward` view reverses every pattern and negates its times, which
+    turns the latest-departure (arrive-by) search into the same
+    earliest-arrival scan. Memoized per day on the timetable (the last
+    TRANSIT_DAY_VIEWS used); requests on the threadpool share the memo, so it's
+    read and written under the timetable's lock. Two requests that miss at
+    once both build the view, and the second one's is kept.
+    """
+    key = (day, backward)
+    days = timetable['days']
+    with timetable['days_lock']:
+        view = days.get(key)
+        if view is not None:
+            days.move_to_end(key)
+            return view
+    import numpy as np
+    from datetime import timedelta
+
+    today = _active_services(timetable, day)
+    yesterday = _active_services(timetable, day - timedelta(days=1))
+    patterns = []
+    stop_patterns: list[list] = [[] for _ in timetable['stops']]
+    for source, pat in enumerate(timetable['patterns']):
+        keep = today[pat['service']]
+        late = yesterday[pat['service']] & (pat['arr'][:, -1] >= 86400)
+        rows = np.concatenate([np.flatnonzero(late), np.flatnonzero(keep)])
+        if not len(rows):
+            continue
+        shift = np.where(np.arange(len(rows)) < late.sum(), 86400, 0)[:, None]
+        arr = pat['arr'][rows] - shift
+        dep = pat['dep'][rows] - shift
+        order = np.argsort(dep[:, 0], kind='stable')
+        rows, arr, dep = rows[order], arr[order], dep[order]
+        if len(rows) > 1 and (
+            (np.diff(arr, axis=0) < 0).any() or (np.diff(dep, axis=0) < 0).any()
+        ):
+            # Yesterday's stragglers overtaking today's first trips: rare
+            # enough to drop rather than split the pattern again.
+            rows = np.flatnonzero(keep)
+            if not len(rows):
+                continue
+            arr, dep = pat['arr'][rows], pat['dep'][rows]
+        stops = pat['stops']
+        if backward:
+            stops = stops[::-1]
+            rows = rows[::-1]
+            arr, dep = -dep[::-1, ::-1], -arr[::-1, ::-1]
+        for pos, stop in enumerate(stops.tolist()):
+            stop_patterns[stop].append((len(patterns), pos))
+        patterns.append({
+            'source': source,
+            'stops': stops.tolist(),
+            'rows': rows.tolist(),
+            'arr': arr.T.tolist(),
+            'dep': dep.T.tolist(),
+        })
+    view = {'patterns': patterns, 'stop_patterns': stop_patterns}
+    with timetable['days_lock']:
+        days[key] = view
+        days.move_to_end(key)
+        while len(days) > TRANSIT_DAY_VIEWS:
+            days.popitem(last=False)
+    return view
+
+
+def _raptor(
+    timetable: dict,
+    view: dict,
+    sources: dict[int, float],
+    targets: dict[int, float],
+    max_rides: int = TRANSIT_MAX_RIDES,
+) -> tuple[list, list]:
+    """Round-based earliest arrival (RAPTOR) over a `_timetable_day` view.
+
+    `sources` maps stop -> time the rider is there, `targets` stop ->
+    seconds still to go from it. Round k scans every pattern serving a
+    stop improved in round k-1, riding the earliest trip catchable there
+    (TRANSIT_BOARD_SLACK_S after arriving), then relaxes footpaths. Labels
+    are pruned against the best arrival at the destination so far.
+
+    Returns (labels, parents): per round, the earliest time at each stop
+    using at most k buses, and how each stop improved in that round
+    (`('ride', pattern, row, board_pos, alight_pos)`, or `('walk', stop,
+    ride)` for a footpath from a stop reached by that ride).
+    """
+    from bisect import bisect_left
+    inf = float('inf')
+    slack = TRANSIT_BOARD_SLACK_S
+    best = [inf] * len(timetable['stops'])
+    prev = list(best)
+    for stop, t in sources.items():
+        prev[stop] = best[stop] = min(prev[stop], t)
+    labels, parents = [prev], [{stop: None for stop in sources}]
+    bound = min((prev[s] + secs for s, secs in targets.items()), default=inf)
+    marked = set(sources)
+    for _round in range(max_rides):
+        queue: dict[int, int] = {}
+        for stop in marked:
+            for p, pos in view['stop_patterns'][stop]:
+                if pos < queue.get(p, inf):
+                    queue[p] = pos
+        _route_charge(len(queue))
+        cur = list(prev)
+        parent: dict = {}
+        for p, first in queue.items():
+            pattern = view['patterns'][p]
+            stops, arr, dep = pattern['stops'], pattern['arr'], pattern['dep']
+            row = board = None
+            for pos in range(first, len(stops)):
+                stop = stops[pos]
+                if row is not None:
+                    t = arr[pos][row]
+                    if t < best[stop] and t < bound:
+                        cur[stop] = best[stop] = t
+                        parent[stop] = ('ride', p, row, board, pos)
+                ready = prev[stop]
+                if ready < inf and (row is None or ready + slack <= dep[pos][row]):
+                    catch = bisect_left(dep[pos], ready + slack)
+                    if catch < len(dep[pos]) and (row is None or catch < row):
+                        row, board = catch, pos
+        arrived = {stop: cur[stop] for stop in parent}
+        for stop, ride in list(parent.items()):
+            for other, secs in timetable['transfers'][stop]:
+                t = arrived[stop] + secs
+                if t < best[other] and t < bound:
+                    cur[other] = best[other] = t
+                    parent[other] = ('walk', stop, ride)
+        labels.append(cur)
+        parents.append(parent)
+        for stop in parent:
+            if stop in targets:
+                bound = min(bound, cur[stop] + targets[stop])
+        marked = set(parent)
+        prev = cur
+        if not marked:
+            break
+    return labels, parents
+
+
+def _raptor_rides(view: dict, parents: list, rides: int, stop: int) -> list[tuple]:
+    """The rides, first to last, behind the round-`rides` label at `stop`:
+    (pattern, row, board_pos, alight_pos) in `view` terms."""
+    out = []
+    while rides > 0:
+        record = parents[rides].get(stop)
+        if record is None:  # carried over unchanged from fewer rides
+            rides -= 1
+            continue
+        if record[0] == 'walk':
+            record = record[2]
+        _kind, p, row, board, alight = record
+        out.append((p, row, board, alight))
+        stop = view['patterns'][p]['stops'][board]
+        rides -= 1
+    out.reverse()
+    return out
+
+
+def _service_time(day, seconds: float):
+    """Seconds after midnight of service day `day` -> local datetime."""
+    from datetime import datetime, timedelta
+    from zoneinfo import ZoneInfo
+    midnight = datetime(day.year, day.month, day.day, tzinfo=ZoneInfo('America/New_York'))
+    return midnight + timedelta(seconds=seconds)
+
+
+def _scheduled_rides(
+    timetable: dict,
+    near_from: list[tuple],
+    near_to: list[tuple],
+    when,
+    arrive_by: bool = False,
+) -> list[dict] | None:
+    """The bus rides (one per vehicle, in order) of the best scheduled
+    journey: leaving at `when`, or when `arrive_by`, getting there by it.
+    `near_from`/`near_to` are (access seconds, stop) candidates. "Best" is
+    the earliest arrival (latest departure for `arrive_by`) with every
+    transfer charged TRANSIT_TRANSFER_PENALTY_MIN. None when nothing runs.
+    """
+    index = {s['stop_id']: i for i, s in enumerate(timetable['stops'])}
+    day = when.date()
+    now_s = when.hour * 3600 + when.minute * 60 + when.second
+    origin = {index[s['stop_id']]: t for t, s in near_from if s['stop_id'] in index}
+    destination = {index[s['stop_id']]: t for t, s in near_to if s['stop_id'] in index}
+    if arrive_by:
+        # Backward: from the destination stops, in negated time.
+        sources = {stop: -(now_s - secs) for stop, secs in destination.items()}
+        targets = origin
+    else:
+        sources = {stop: now_s + secs for stop, secs in origin.items()}
+        targets = destination
+    if not sources or not targets:
+        return None
+    view = _timetable_day(timetable, day, backward=arrive_by)
+    labels, parents = _raptor(timetable, view, sources, targets)
+
+    choice = None
+    penalty = TRANSIT_TRANSFER_PENALTY_MIN * 60
+    for rides in range(1, len(labels)):
+        for stop, secs in targets.items():
+            score = labels[rides][stop] + secs + (rides - 1) * penalty
+            if score < float('inf') and (choice is None or score < choice[0]):
+                choice = (score, rides, stop)
+    if choice is None:
+        return None
+
+    out = []
+    for p, row, board, alight in _raptor_rides(view, parents, choice[1], choice[2]):
+        pattern = view['patterns'][p]
+        source = timetable['patterns'][pattern['source']]
+        trip = pattern['rows'][row]
+        stops = pattern['stops'][board:alight + 1]
+        board_s, alight_s = pattern['dep'][board][row], pattern['arr'][alight][row]
+        if arrive_by:
+            stops = stops[::-1]
+            board_s, alight_s = -alight_s, -board_s
+        out.append({
+            'route': source['route'],
+            'long_name': source['long_name'],
+            'color': source['color'],
+            'trip_id': source['trip_ids'][trip],
+            'shape_id': source['shape_ids'][trip],
+            'board': timetable['stops'][stops[0]],
+            'alight': timetable['stops'][stops[-1]],
+            'via': [timetable['stops'][stop] for stop in stops],
+            'board_at': _service_time(day, board_s),
+            'alight_at': _service_time(day, alight_s),
+        })
+    if arrive_by:
+        out.reverse()
+    return out
+
+
+def _shape_segments(shape: dict) -> dict:
+    """The shape's segments as NumPy arrays in metres (start point, delta,
+    squared length, distance along at the start), memoized on the shape."""
+    segments = shape.get('segments')
+    if segments is not None:
+        return segments
+    import numpy as np
+    coords = np.asarray(shape['coords'], dtype=np.float64)
+    x = coords[:, 0] * (M_PER_DEG_LAT * _COSLAT)
+    y = coords[:, 1] * M_PER_DEG_LAT
+    dx, dy = np.diff(x), np.diff(y)
+    segments = {
+        'ax': x[:-1], 'ay': y[:-1], 'dx': dx, 'dy': dy,
+        'l2': dx * dx + dy * dy,
+        'along': np.asarray(shape['cumulative'][:-1], dtype=np.float64),
+        'length': np.diff(np.asarray(shape['cumulative'], dtype=np.float64)),
+    }
+    shape['segments'] = segments
+    return segments
+
+
+def _project_many(shape: dict, lats, lons) -> tuple:
+    """`_project_on_shape` for many points at once (arrays in, arrays out):
+    every point against every segment in one broadcast."""
+    import numpy as np
+    seg = _shape_segments(shape)
+    px = np.asarray(lons, dtype=np.float64)[:, None] * (M_PER_DEG_LAT * _COSLAT)
+    py = np.asarray(lats, dtype=np.float64)[:, None] * M_PER_DEG_LAT
+    ox, oy = px - seg['ax'], py - seg['ay']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(seg['l2'] > 0, (ox * seg['dx'] + oy * seg['dy']) / seg['l2'], 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    off = np.hypot(seg['dx'] * t - ox, seg['dy'] * t - oy)
+    best = off.argmin(axis=1)
+    rows = np.arange(len(best))
+    t = t[rows, best]
+    return seg['along'][best] + seg['length'][best] * t, off[rows, best], best, t
+
+
 def _project_on_shape(shape: dict, lat: float, lon: float) -> tuple[float, float, int, float]:
     """(meters along shape, offset meters, segment index, t) of the closest
     point on the shape to (lat, lon)."""
-    coords = shape['coords']
-    best = (0.0, float('inf'), 0, 0.0)
-    for i in range(len(coords) - 1):
-        ax, ay = coords[i][0] * _COSLAT, coords[i][1]
-        bx, by = coords[i + 1][0] * _COSLAT, coords[i + 1][1]
-        px, py = lon * _COSLAT, lat
-        dx, dy = bx - ax, by - ay
-        denom = dx * dx + dy * dy
-        t = 0.0 if denom == 0 else ((px - ax) * dx + (py - ay) * dy) / denom
-        t = max(0.0, min(1.0, t))
-        cx, cy = ax + dx * t, ay + dy * t
-        off = ((px - cx) ** 2 + (py - cy) ** 2) ** 0.5 * M_PER_DEG_LAT
-        if off < best[1]:
-            seg_len = shape['cumulative'][i + 1] - shape['cumulative'][i]
-            best = (shape['cumulative'][i] + seg_len * t, off, i, t)
-    return best
+    along, off, seg, t = _project_many(shape, [lat], [lon])
+    return float(along[0]), float(off[0]), int(seg[0]), float(t[0])
+
+
+#: Stop lookup grid cell for the transit candidate search.
+_TRANSIT_GRID_M = 500.0
+
+
+def _index_transit(stops: list[dict], shapes: list[dict]) -> dict[str, Any]:
+    """Spatial lookups over the transit data, built with it once per load:
+    a grid over the stops (`_stops_within`), and every stop's projection
+    onto each shape of a route it serves, keyed (shape_id, stop_id), so a
+    plan never projects a stop itself."""
+    import numpy as np
+    lat = np.array([s['lat'] for s in stops], dtype=np.float64)
+    lon = np.array([s['lon'] for s in stops], dtype=np.float64)
+    cell_lat = _TRANSIT_GRID_M / M_PER_DEG_LAT
+    cell_lon = cell_lat / _COSLAT
+    buckets: dict = {}
+    for i, (slat, slon) in enumerate(zip(lat.tolist(), lon.tolist())):
+        buckets.setdefault((int(slat / cell_lat), int(slon / cell_lon)), []).append(i)
+
+    by_route: dict[str, list] = {}
+    for i, s in enumerate(stops):
+        for route in s['routes']:
+            by_route.setdefault(route, []).append(i)
+    stop_proj = {}
+    for shape in shapes:
+        members = by_route.get(shape['route'])
+        if not members:
+            continue
+        along, off, seg, t = _project_many(shape, lat[members], lon[members])
+        for k, i in enumerate(members):
+            stop_proj[(shape['shape_id'], stops[i]['stop_id'])] = (
+                float(along[k]), float(off[k]), int(seg[k]), float(t[k]),
+            )
+    return {
+        'stop_grid': {
+            'buckets': buckets, 'cell_lat': cell_lat, 'cell_lon': cell_lon,
+            'lat': lat, 'lon': lon,
+        },
+        'stop_proj': stop_proj,
+    }
+
+
+def _stops_within(data: dict, lat: float, lon: float, radius_m: float) -> list[dict]:
+    """Stops within `radius_m` (straight line) of (lat, lon), in feed order."""
+    import numpy as np
+    grid = data['stop_grid']
+    cell_lat, cell_lon = grid['cell_lat'], grid['cell_lon']
+    home = (int(lat / cell_lat), int(lon / cell_lon))
+    reach = int(radius_m // _TRANSIT_GRID_M) + 1
+    found = [
+        i
+        for dy in range(-reach, reach + 1)
+        for dx in range(-reach, reach + 1)
+        for i in grid['buckets'].get((home[0] + dy, home[1] + dx), ())
+    ]
+    if not found:
+        return []
+    found = np.array(sorted(found))
+    d = np.hypot(
+        (grid['lon'][found] - lon) * (M_PER_DEG_LAT * _COSLAT),
+        (grid['lat'][found] - lat) * M_PER_DEG_LAT,
+    )
+    return [data['stops'][i] for i in found[d <= radius_m].tolist()]
+
+
+def _stop_on_shape(data: dict, shape: dict, stop: dict) -> tuple[float, float, int, float]:
+    """A stop's precomputed projection onto a shape (`_project_on_shape`)."""
+    proj = data['stop_proj'].get((shape['shape_id'], stop['stop_id']))
+    if proj is None:
+        proj = _project_on_shape(shape, stop['lat'], stop['lon'])
+    return proj
 
 
 def _shape_slice(shape: dict, a: tuple, b: tuple) -> list[list]:
@@ -3449,6 +8336,28 @@ def _walk_or_direct(
         }
 
 
+def _ride_geometry(data: dict, ride: dict) -> tuple[list, float]:
+    """(coords, metres) of a ride: its trip's shape between the boarding and
+    alighting stops, or, without a usable shape, a line through the stops."""
+    shape = data.get('shapes_by_id', {}).get(ride.get('shape_id'))
+    if shape is not None:
+        board, alight = ride['board'], ride['alight']
+        p1 = _stop_on_shape(data, shape, board)
+        p2 = _stop_on_shape(data, shape, alight)
+        if (
+            p2[0] > p1[0]
+            and p1[1] <= TRANSIT_STOP_SNAP_M and p2[1] <= TRANSIT_STOP_SNAP_M
+        ):
+            return _shape_slice(shape, p1, p2), p2[0] - p1[0]
+    coords = [[s['lon'], s['lat']] for s in ride['via']]
+    return coords, _poly_len_m(coords)
+
+
+def _clock(moment) -> str:
+    """A clock time the way the steps read it: `7:42 AM`."""
+    return moment.strftime('%I:%M %p').lstrip('0')
+
+
 def _route_transit(
     from_lat: float,
     from_lon: float,
@@ -3456,9 +8365,13 @@ def _route_transit(
     to_lon: float,
     access_mode: str = 'walk',
 ) -> dict[str, Any]:
-    """Access leg -> ride a Greenlink route -> egress leg. No schedules yet
-    (stop_times isn't ingested), so the wait is a flat estimate and the ride
-    follows the route shape between the boarding and alighting stops.
+    """Access leg -> ride one or more Greenlink buses -> egress leg.
+
+    With the schedule loaded, the rides are the best RAPTOR journey
+    (`_scheduled_rides`, transfers allowed) for the request's time
+    (`_TRANSIT_WHEN`: leave now by default, or `depart_at`/`arrive_by`).
+    Without it, a one-seat ride along the route shape with a flat wait
+    estimate, as before schedules were ingested.
 
     `access_mode` is how the rider gets to and from the stops. Greenlink buses
     carry front-load racks, so `bike` both widens the catchment around a stop
@@ -3472,86 +8385,124 @@ def _route_transit(
         TRANSIT_BIKE_MAX_M if _base_mode(access_mode) == 'bike'
         else TRANSIT_WALK_MAX_M
     )
-    access_speed = MODE_SPEED_M_S.get(access_mode, MODE_SPEED_M_S['walk'])
 
-    def _near(lat, lon):
-        """Candidate stops within reach — the nearest few PER ROUTE, not
+    def _near(lat, lon, outbound: bool):
+        """Candidate stops within reach, as (access seconds, stop) — the
+        quickest few to get to (or from) over the network PER ROUTE, not
         overall (downtown the 25 nearest stops are all trolley stops and the
         transit center never makes the cut)."""
-        ranked = []
-        for s in stops:
-            d = _equirect_m(lat, lon, s['lat'], s['lon'])
-            if d <= access_max_m:
-                ranked.append((d, s))
-        ranked.sort(key=lambda x: x[0])
+        in_reach = _stops_within(data, lat, lon, access_max_m)
+        seconds = _access_seconds(lat, lon, in_reach, access_mode, outbound=outbound)
+        ranked = sorted(zip(seconds, in_reach), key=lambda x: x[0])
         out = []
         per_route: dict[str, int] = {}
-        for d, s in ranked:
+        for t, s in ranked:
             if any(per_route.get(r, 0) < 3 for r in s['routes']):
-                out.append((d, s))
+                out.append((t, s))
                 for r in s['routes']:
                     per_route[r] = per_route.get(r, 0) + 1
         return out
 
-    near_from = _near(from_lat, from_lon)
-    near_to = _near(to_lat, to_lon)
+    near_from = _near(from_lat, from_lon, outbound=True)
+    near_to = _near(to_lat, to_lon, outbound=False)
     if not near_from or not near_to:
         reach = 'biking' if _base_mode(access_mode) == 'bike' else 'walking'
         raise ValueError(f"No bus stops within {reach} distance.")
 
-    shapes_by_route: dict[str, list] = {}
-    for sh in shapes:
-        shapes_by_route.setdefault(sh['route'], []).append(sh)
+    if data.get('timetable') is not None:
+        when, arrive_by = _transit_when()
+        rides = _scheduled_rides(
+            data['timetable'], near_from, near_to, when, arrive_by=arrive_by,
+        )
+        if not rides:
+            raise ValueError(
+                "No bus gets you there around then — try another time, walk or bike."
+            )
+        for ride in rides:
+            ride['coords'], ride['ride_m'] = _ride_geometry(data, ride)
+    else:
+        rides = _estimated_ride(data, near_from, near_to)
+    return _transit_feature(
+        from_lat, from_lon, to_lat, to_lon, rides, access_mode=access_mode,
+    )
 
-    proj_cache: dict = {}
 
-    def _proj(shape_i, s):
-        key = (shape_i, id(s))
-        if key not in proj_cache:
-            proj_cache[key] = _project_on_shape(shapes[shape_i], s['lat'], s['lon'])
-        return proj_cache[key]
+def _estimated_ride(data: dict, near_from: list, near_to: list) -> list[dict]:
+    """The one-seat ride that looks quickest without a schedule: any route
+    serving a stop near each end, at TRANSIT_BUS_SPEED_M_S along its shape
+    plus TRANSIT_WAIT_MIN."""
+    shapes_by_route: dict[str, list] = {}
+    for sh in data['shapes']:
+        shapes_by_route.setdefault(sh['route'], []).append(sh)
 
-    shape_index = {id(sh): i for i, sh in enumerate(shapes)}
-    walk_speed = access_speed
-    best = None  # (total_s, d1, s1, d2, s2, shape, p1, p2)
-    for d1, s1 in near_from:
-        for d2, s2 in near_to:
+    best = None  # (total_s, t1, s1, t2, s2, shape, p1, p2)
+    for t1, s1 in near_from:
+        for t2, s2 in near_to:
             shared = s1['routes'] & s2['routes']
             if not shared or s1 is s2:
                 continue
             for route in shared:
                 for sh in shapes_by_route.get(route, []):
-                    i = shape_index[id(sh)]
-                    p1 = _proj(i, s1)
-                    p2 = _proj(i, s2)
+                    p1 = _stop_on_shape(data, sh, s1)
+                    p2 = _stop_on_shape(data, sh, s2)
                     if p1[1] > TRANSIT_STOP_SNAP_M or p2[1] > TRANSIT_STOP_SNAP_M:
                         continue
                     ride_m = p2[0] - p1[0]
                     if ride_m < TRANSIT_MIN_RIDE_M:
                         continue
                     total_s = (
-                        (d1 + d2) / walk_speed
+                        t1 + t2
                         + ride_m / TRANSIT_BUS_SPEED_M_S
                         + TRANSIT_WAIT_MIN * 60
                     )
                     if best is None or total_s < best[0]:
-                        best = (total_s, d1, s1, d2, s2, sh, p1, p2)
+                        best = (total_s, t1, s1, t2, s2, sh, p1, p2)
 
     if best is None:
         raise ValueError(
             "No direct bus route between those points — try walk or bike."
         )
-    _total_s, _d1, s1, _d2, s2, shape, p1, p2 = best
-
-    walk1 = _walk_or_direct(
-        from_lat, from_lon, s1['lat'], s1['lon'], mode=access_mode,
-    )
-    walk2 = _walk_or_direct(
-        s2['lat'], s2['lon'], to_lat, to_lon,
+    _total_s, _t1, s1, _t2, s2, shape, p1, p2 = best
+    return [{
+        'route': shape['route'],
+        'long_name': shape['long_name'],
+        'color': shape.get('color'),
+        'board': s1,
+        'alight': s2,
+        'coords': _shape_slice(shape, p1, p2),
+        'ride_m': p2[0] - p1[0],
+        'board_at': None,
+        'alight_at': None,
+    }]
+
+
+def _transit_feature(
+    from_lat: float,
+    from_lon: float,
+    to_lat: float,
+    to_lon: float,
+    rides: list[dict],
+    access_mode: str = 'walk',
+) -> dict[str, Any]:
+    """Stitch the access leg, each ride (with the walk between stops at a
+    transfer) and the egress leg into one itinerary. Scheduled rides carry
+    `board_at`/`alight_at`; estimated ones (None) ride at
+    TRANSIT_BUS_SPEED_M_S after a TRANSIT_WAIT_MIN wait."""
+    scheduled = rides[0]['board_at'] is not None
+    first, last = rides[0]['board'], rides[-1]['alight']
+    walks = [_walk_or_direct(
+        from_lat, from_lon, first['lat'], first['lon'], mode=access_mode,
+    )]
+    for before, after in zip(rides, rides[1:]):
+        a, b = before['alight'], after['board']
+        walks.append(None if a is b else _walk_or_direct(
+            a['lat'], a['lon'], b['lat'], b['lon'],
+            toward=b['name'], mode=access_mode,
+        ))
+    walks.append(_walk_or_direct(
+        last['lat'], last['lon'], to_lat, to_lon,
         toward='your destination', mode=access_mode,
-    )
-    ride_coords = _shape_slice(shape, p1, p2)
-    ride_m = p2[0] - p1[0]
+    ))
 
     coordinates: list = []
     steps: list[dict] = []
@@ -3580,63 +8531,90 @@ def _route_transit(
                 'end': r['end'] + offset,
             })
 
-    _append_leg(walk1, drop_arrive=True)
-
-    route_name = f"Route {shape['route']}".strip()
-    long_name = _titleize(shape['long_name'])
-    board_index = max(len(coordinates) - 1, 0)
-    steps.append({
-        'maneuver': 'board',
-        'name': route_name,
-        'category': 'transit',
-        'instruction': (
-            f"Board Greenlink {route_name}"
-            + (f' ({long_name})' if long_name else '')
-            + f" at {s1['name']}"
-            + (' — load your bike on the front rack'
-               if _base_mode(access_mode) == 'bike' else '')
-        ),
-        'distance_m': 0.0,
-        'duration_min': round(TRANSIT_WAIT_MIN, 1),
-        'start_index': board_index,
-        'location': [s1['lon'], s1['lat']],
-        'bearing': 0.0,
-        'warn': None,
-        'warn_m': 0.0,
-    })
-    ride_start_index = len(coordinates) - 1 if coordinates else 0
-    if coordinates and coordinates[-1] == ride_coords[0]:
-        coordinates.extend(ride_coords[1:])
-    else:
-        ride_start_index = len(coordinates)
-        coordinates.extend(ride_coords)
-    steps.append({
-        'maneuver': 'ride',
-        'name': route_name,
-        'category': 'transit',
-        'instruction': f"Ride {route_name} to {s2['name']}",
-        'distance_m': round(ride_m, 1),
-        'duration_min': round(ride_m / TRANSIT_BUS_SPEED_M_S / 60, 1),
-        'start_index': ride_start_index,
-        'location': [s1['lon'], s1['lat']],
-        'bearing': 0.0,
-        'warn': None,
-        'warn_m': 0.0,
-    })
-    steps.append({
-        'maneuver': 'alight',
-        'name': s2['name'],
-        'category': 'transit',
-        'instruction': f"Get off at {s2['name']}",
-        'distance_m': 0.0,
-        'duration_min': 0.0,
-        'start_index': max(len(coordinates) - 1, 0),
-        'location': [s2['lon'], s2['lat']],
-        'bearing': 0.0,
-        'warn': None,
-        'warn_m': 0.0,
-    })
-    _append_leg(walk2, drop_arrive=False)
+    def _leg_s(feature) -> float:
+        return feature['properties']['duration_min'] * 60 if feature else 0.0
+
+    wait_s = 0.0 if scheduled else TRANSIT_WAIT_MIN * 60
+    ready = None
+    for i, ride in enumerate(rides):
+        if walks[i] is not None:
+            _append_leg(walks[i], drop_arrive=True)
+        board, alight = ride['board'], ride['alight']
+        route_name = f"Route {ride['route']}".strip()
+        long_name = _titleize(ride['long_name'])
+        if scheduled:
+            # Be at the first stop a minute early; after that, whatever the
+            # connection leaves.
+            ready = (
+                ride['board_at'].timestamp() - TRANSIT_BOARD_SLACK_S if ready is None
+                else ready + _leg_s(walks[i])
+            )
+            wait = ride['board_at'].timestamp() - ready
+            wait_s += wait
+            ride_s = (ride['alight_at'] - ride['board_at']).total_seconds()
+            ready = ride['alight_at'].timestamp()
+            at = f" at {_clock(ride['board_at'])}"
+        else:
+            wait = TRANSIT_WAIT_MIN * 60
+            ride_s = ride['ride_m'] / TRANSIT_BUS_SPEED_M_S
+            at = ''
+        ride['ride_s'] = ride_s
+        steps.append({
+            'maneuver': 'board',
+            'name': route_name,
+            'category': 'transit',
+            'instruction': (
+                f"Board Greenlink {route_name}"
+                + (f' ({long_name})' if long_name else '')
+                + f" at {board['name']}{at}"
+                + (' — load your bike on the front rack'
+                   if _base_mode(access_mode) == 'bike' else '')
+            ),
+            'distance_m': 0.0,
+            'duration_min': round(wait / 60, 1),
+            'start_index': max(len(coordinates) - 1, 0),
+            'location': [board['lon'], board['lat']],
+            'bearing': 0.0,
+            'warn': None,
+            'warn_m': 0.0,
+        })
+        ride_coords = ride['coords']
+        ride_start_index = len(coordinates) - 1 if coordinates else 0
+        if coordinates and coordinates[-1] == ride_coords[0]:
+            coordinates.extend(ride_coords[1:])
+        else:
+            ride_start_index = len(coordinates)
+            coordinates.extend(ride_coords)
+        steps.append({
+            'maneuver': 'ride',
+            'name': route_name,
+            'category': 'transit',
+            'instruction': f"Ride {route_name} to {alight['name']}",
+            'distance_m': round(ride['ride_m'], 1),
+            'duration_min': round(ride_s / 60, 1),
+            'start_index': ride_start_index,
+            'location': [board['lon'], board['lat']],
+            'bearing': 0.0,
+            'warn': None,
+            'warn_m': 0.0,
+        })
+        steps.append({
+            'maneuver': 'alight',
+            'name': alight['name'],
+            'category': 'transit',
+            'instruction': (
+                f"Get off at {alight['name']}"
+                + (f" at {_clock(ride['alight_at'])}" if scheduled else '')
+            ),
+            'distance_m': 0.0,
+            'duration_min': 0.0,
+            'start_index': max(len(coordinates) - 1, 0),
+            'location': [alight['lon'], alight['lat']],
+            'bearing': 0.0,
+            'warn': None,
+            'warn_m': 0.0,
+        })
+    _append_leg(walks[-1], drop_arrive=False)
     if not steps or steps[-1]['maneuver'] != 'arrive':
         steps.append({
             'maneuver': 'arrive',
@@ -3651,42 +8629,59 @@ def _route_transit(
             'warn_m': 0.0,
         })
 
-    walk_m = (
-        walk1['properties']['distance_m'] + walk2['properties']['distance_m']
-    )
-    duration_min = (
-        walk1['properties']['duration_min']
-        + walk2['properties']['duration_min']
-        + ride_m / TRANSIT_BUS_SPEED_M_S / 60
-        + TRANSIT_WAIT_MIN
+    walk_m = sum(w['properties']['distance_m'] for w in walks if w)
+    ride_m = sum(ride['ride_m'] for ride in rides)
+    duration_s = (
+        sum(_leg_s(w) for w in walks) + sum(ride['ride_s'] for ride in rides) + wait_s
     )
     distance_m = walk_m + ride_m
+    properties = {
+        'mode': 'transit',
+        'access_mode': _base_mode(access_mode),
+        'distance_m': round(distance_m, 1),
+        'distance_mi': round(distance_m / 1609.344, 2),
+        'duration_min': round(duration_s / 60, 1),
+        # The bus does its own climbing; this is what the rider does.
+        'climb_ft': sum(w['properties'].get('climb_ft', 0) for w in walks if w),
+        'walk_m': round(walk_m, 1),
+        'ride_m': round(ride_m, 1),
+        'route': rides[0]['route'],
+        'route_long_name': rides[0]['long_name'],
+        'route_color': rides[0].get('color'),
+        'board_stop': first['name'],
+        'alight_stop': last['name'],
+        'wait_min': round(wait_s / 60, 1),
+        'scheduled': scheduled,
+        'transfers': len(rides) - 1,
+        'rides': [
+            {
+                'route': ride['route'],
+                'route_color': ride.get('color'),
+                'board_stop': ride['board']['name'],
+                'alight_stop': ride['alight']['name'],
+                'ride_m': round(ride['ride_m'], 1),
+                'board_at': ride['board_at'] and ride['board_at'].isoformat(),
+                'alight_at': ride['alight_at'] and ride['alight_at'].isoformat(),
+            }
+            for ride in rides
+        ],
+        'warn_ranges': ranges,
+        'warnings': _summarize_warnings(ranges),
+        'steps': steps,
+    }
+    if scheduled:
+        from datetime import timedelta
+        properties['depart_at'] = (
+            rides[0]['board_at']
+            - timedelta(seconds=TRANSIT_BOARD_SLACK_S + _leg_s(walks[0]))
+        ).isoformat()
+        properties['arrive_at'] = (
+            rides[-1]['alight_at'] + timedelta(seconds=_leg_s(walks[-1]))
+        ).isoformat()
     return {
         'type': 'Feature',
         'geometry': {'type': 'LineString', 'coordinates': coordinates},
-        'properties': {
-            'mode': 'transit',
-            'access_mode': _base_mode(access_mode),
-            'distance_m': round(distance_m, 1),
-            'distance_mi': round(distance_m / 1609.344, 2),
-            'duration_min': round(duration_min, 1),
-            # The bus does its own climbing; this is what the rider does.
-            'climb_ft': (
-                walk1['properties'].get('climb_ft', 0)
-                + walk2['properties'].get('climb_ft', 0)
-            ),
-            'walk_m': round(walk_m, 1),
-            'ride_m': round(ride_m, 1),
-            'route': shape['route'],
-            'route_long_name': shape['long_name'],
-            'route_color': shape.get('color'),
-            'board_stop': s1['name'],
-            'alight_stop': s2['name'],
-            'wait_min': TRANSIT_WAIT_MIN,
-            'warn_ranges': ranges,
-            'warnings': _summarize_warnings(ranges),
-            'steps': steps,
-        },
+        'properties': properties,
     }
 
 
@@ -3694,9 +8689,18 @@ def _route_transit(
 
 
 def _bcycle_stations() -> list[dict[str, Any]]:
-    """Greenville BCycle docks with live availability, via `plugins/bcycle.py`.
-    Returns [] if the plugin or the GBFS feed is unavailable -- bike share is
-    an option, never a dependency."""
+    """Greenville BCycle docks with live availability: this request's
+    prefetch when `_route_multimodal` started one, else a fetch now."""
+    prefetched = _BCYCLE_PREFETCH.get()
+    if prefetched is not None:
+        return _prefetch_result(prefetched, _fetch_bcycle_stations)
+    return _fetch_bcycle_stations()
+
+
+def _fetch_bcycle_stations() -> list[dict[str, Any]]:
+    """The docks via `plugins/bcycle.py`. Returns [] if the plugin or the
+    GBFS feed is unavailable -- bike share is an option, never a
+    dependency."""
     try:
         module = mrsm.Plugin('bcycle').module
         return module.get_stations()
@@ -3728,6 +8732,8 @@ def _route_bikeshare(
         raise ValueError("Bike share availability is unavailable right now.")
 
     def _reachable(lat, lon, want: str):
+        """The four docks quickest to walk to (or from) with a bike (or a
+        free dock) right now, as (walk seconds, station)."""
         out = []
         for st in stations:
             # A count of None means station_status didn't load; don't refuse
@@ -3744,11 +8750,10 @@ def _route_bikeshare(
                 docks = st.get('docks')
                 if docks is not None and docks < 1:
                     continue
-            d = _equirect_m(lat, lon, st['lat'], st['lon'])
-            if d <= BIKESHARE_WALK_MAX_M:
-                out.append((d, st))
-        out.sort(key=lambda x: x[0])
-        return out[:4]
+            if _equirect_m(lat, lon, st['lat'], st['lon']) <= BIKESHARE_WALK_MAX_M:
+                out.append(st)
+        seconds = _access_seconds(lat, lon, out, foot_mode, outbound=want == 'bikes')
+        return sorted(zip(seconds, out), key=lambda x: x[0])[:4]
 
     from_docks = _reachable(from_lat, from_lon, 'bikes')
     to_docks = _reachable(to_lat, to_lon, 'docks')
@@ -3757,20 +8762,29 @@ def _route_bikeshare(
     if not to_docks:
         raise ValueError("No open BCycle dock near your destination.")
 
-    foot_speed = MODE_SPEED_M_S.get(foot_mode, MODE_SPEED_M_S['walk'])
+    # Every rent -> dock ride over the network, in one search per dock.
+    try:
+        rides = _route_matrix(
+            [(st['lat'], st['lon']) for _t, st in from_docks],
+            [(st['lat'], st['lon']) for _t, st in to_docks],
+            mode=bike_mode,
+        )
+    except ValueError:
+        rides = None
     best = None
-    for d1, rent in from_docks:
-        for d2, dock in to_docks:
+    for i, (t1, rent) in enumerate(from_docks):
+        for j, (t2, dock) in enumerate(to_docks):
             if rent['id'] == dock['id']:
                 continue
-            ride_m = _equirect_m(rent['lat'], rent['lon'], dock['lat'], dock['lon'])
+            ride_m = rides['distance_m'][i][j] if rides else None
+            if ride_m is None:
+                ride_m = _equirect_m(rent['lat'], rent['lon'], dock['lat'], dock['lon'])
+                ride_s = ride_m / MODE_SPEED_M_S['bike']
+            else:
+                ride_s = rides['duration_min'][i][j] * 60
             if ride_m < BIKESHARE_MIN_RIDE_M:
                 continue
-            total_s = (
-                (d1 + d2) / foot_speed
-                + ride_m / MODE_SPEED_M_S['bike']
-                + BIKESHARE_UNLOCK_MIN * 60
-            )
+            total_s = t1 + t2 + ride_s + BIKESHARE_UNLOCK_MIN * 60
             if best is None or total_s < best[0]:
                 best = (total_s, rent, dock)
     if best is None:
@@ -3923,10 +8937,72 @@ PLAN_LABELS = {
 #: A trip this short isn't worth waiting for a bus, whatever the math says.
 TRANSIT_MIN_TRIP_M = 1200.0
 
-#: Recently computed plans, so flipping between them in the app is instant.
-_ROUTE_CACHE: dict[tuple, tuple[float, dict]] = {}
-_ROUTE_CACHE_TTL_SECONDS = 120
-_ROUTE_CACHE_MAX = 256
+#: Recently computed plans, so flipping between them in the app (or tapping
+#: the same corner twice) is instant. Keyed by where the termini snap, not
+#: the raw taps (see `_plan_cache_point`). Street plans only change with the
+#: graph (whose epoch is in the key); bike share reads live dock counts and
+#: transit the clock, so those go stale sooner.
+_ROUTE_CACHE = _LRUCache(max_bytes=64 * 1024 * 1024, ttl_seconds=15 * 60)
+_ROUTE_CACHE_LIVE_TTL_SECONDS = {'bcycle': 60, 'transit': 120}
+#: Taps share a cached plan when they snap to the same node, or to the same
+#: stretch of this many metres of one edge, from about as far off the network.
+_ROUTE_CACHE_BUCKET_M = 10.0
+
+
+def _plan_cache_point(graph: dict, lat: float, lon: float) -> tuple:
+    """A terminus as the plan cache sees it: the node it snaps to (or the
+    bucketed position along the snapped edge) and the bucketed snap distance.
+    Raw coordinates when there's no graph to snap to."""
+    if _node_count(graph):
+        snap = _snap_terminus(graph, lat, lon, 'cache')
+        if snap['node'] is not None:
+            virtual = snap['virtual']
+            if virtual is None:
+                spot = snap['node']
+            else:
+                k = virtual['k']
+                pos = _chunk_pos_m(_edge_coords(graph, k), virtual['seg_i'], virtual['t'])
+                spot = ('edge', k, int(pos // _ROUTE_CACHE_BUCKET_M))
+            return spot, int(snap['dist'] // _ROUTE_CACHE_BUCKET_M)
+    return round(lat, 5), round(lon, 5)
+
+
+def _restamp_termini(
+    feature: dict,
+    from_lat: float,
+    from_lon: float,
+    to_lat: float,
+    to_lon: float,
+) -> dict[str, Any]:
+    """A cached plan, drawn from this request's own taps: the line's ends and
+    the depart/arrive steps move to them (copies; the cached plan is shared).
+    The rest is the shared route, metres off at most."""
+    coords = list(feature['geometry']['coordinates'])
+    props = dict(feature['properties'])
+    if coords:
+        coords[0] = [from_lon, from_lat]
+        coords[-1] = [to_lon, to_lat]
+    steps = list(props.get('steps') or [])
+    for i in (0, len(steps) - 1) if steps else ():
+        maneuver = steps[i].get('maneuver')
+        if maneuver in ('depart', 'arrive'):
+            steps[i] = {
+                **steps[i],
+                'location': (
+                    [from_lon, from_lat] if maneuver == 'depart' else [to_lon, to_lat]
+                ),
+            }
+    props['steps'] = steps
+    if props.get('route_options'):
+        props['route_options'] = [
+            _restamp_termini(option, from_lat, from_lon, to_lat, to_lon)
+            for option in props['route_options']
+        ]
+    return {
+        **feature,
+        'geometry': {**feature['geometry'], 'coordinates': coords},
+        'properties': props,
+    }
 
 
 def _plan_keys(modes: set[str], roll: bool, bcycle: bool) -> list[str]:
@@ -3958,6 +9034,7 @@ def _compute_plan(
     to_lon: float,
     bike_mode: str = 'bike',
     alt: int = 0,
+    alternatives: int = 0,
 ) -> dict[str, Any]:
     """One itinerary, memoized briefly. Raises ValueError when impossible.
 
@@ -3973,17 +9050,25 @@ def _compute_plan(
     whether it actually differs from the base route. Composite plans
     (transit, bike share) ignore `alt` — their shape is fixed by the stop
     and dock locations, not the street choice.
+
+    `alternatives=k` (k > 1, plain plans, no `alt`) adds up to k - 1 other
+    ways to the base route in `properties.route_options` (`_route_options`),
+    none of them worse than the base route on distance and climb both.
     """
     if plan.endswith('-transit') or plan == 'bcycle':
         alt = 0
+    if plan.endswith('-transit') or plan == 'bcycle' or alt > 0 or alternatives < 2:
+        alternatives = 0
+    graph = _get_route_graph()
     key = (
-        plan, bike_mode, alt, _is_night(), _TRAIL_PREF.get(),
-        round(from_lat, 5), round(from_lon, 5),
-        round(to_lat, 5), round(to_lon, 5),
+        plan, bike_mode, alt, alternatives, _is_night(), _TRAIL_PREF.get(), graph['epoch'],
+        _TRANSIT_WHEN.get() if plan.endswith('-transit') else None,
+        _plan_cache_point(graph, from_lat, from_lon),
+        _plan_cache_point(graph, to_lat, to_lon),
     )
     hit = _ROUTE_CACHE.get(key)
-    if hit is not None and (time.time() - hit[0]) < _ROUTE_CACHE_TTL_SECONDS:
-        return hit[1]
+    if hit is not None:
+        return _restamp_termini(hit, from_lat, from_lon, to_lat, to_lon)
 
     if plan.endswith('-transit'):
         access = plan.split('-', 1)[0]
@@ -4004,7 +9089,21 @@ def _compute_plan(
         )
     else:
         route_mode = bike_mode if plan == 'bike' else plan
-        if alt <= 0:
+        if alternatives:
+            # The base route is the plain plan's own (usually cached); the
+            # options come from one search, and none exist off the street
+            # fallback -- that route is already the only way.
+            base = _compute_plan(
+                plan, from_lat, from_lon, to_lat, to_lon, bike_mode=bike_mode,
+            )
+            feature = {**base, 'properties': dict(base['properties'])}
+            feature['properties']['route_options'] = (
+                [] if base['properties'].get('fallback') else _route_options(
+                    from_lat, from_lon, to_lat, to_lon,
+                    mode=route_mode, count=alternatives,
+                )
+            )
+        elif alt <= 0:
             feature = _route(from_lat, from_lon, to_lat, to_lon, mode=route_mode)
         else:
             avoid: set = set()
@@ -4027,10 +9126,9 @@ def _compute_plan(
     feature['properties']['plan'] = plan
     feature['properties']['plan_label'] = label
     feature['properties']['icon_mode'] = icon_mode
-    if len(_ROUTE_CACHE) > _ROUTE_CACHE_MAX:
-        _ROUTE_CACHE.clear()
-    _ROUTE_CACHE[key] = (time.time(), feature)
-    return feature
+    kind = 'transit' if plan.endswith('-transit') else plan
+    _ROUTE_CACHE.put(key, feature, _ROUTE_CACHE_LIVE_TTL_SECONDS.get(kind))
+    return _restamp_termini(feature, from_lat, from_lon, to_lat, to_lon)
 
 
 def _route_multimodal(
@@ -4045,6 +9143,7 @@ def _route_multimodal(
     ebike: bool = False,
     stress: str = DEFAULT_STRESS,
     alt: int = 0,
+    alternatives: int = 0,
 ) -> dict[str, Any]:
     """Pick the best itinerary across everything the rider is willing to use.
 
@@ -4059,15 +9158,16 @@ def _route_multimodal(
 
     `alt=N` (with a pinned `plan`) swaps in that plan's Nth alternate route;
     the other plans in `alternatives` stay their base selves.
+
+    `alternatives=k` adds the chosen plan's route options (see
+    `_compute_plan`); the other plans are not searched for theirs.
     """
     bike_mode = _bike_mode(ebike, stress)
     keys = _plan_keys(modes, roll, bcycle)
     if plan and plan not in keys:
         keys = keys + [plan]
 
-    computed: dict[str, dict] = {}
-    failures: list[dict[str, str]] = []
-    for key in keys:
+    def _collect(key: str):
         try:
             computed[key] = _compute_plan(
                 key, from_lat, from_lon, to_lat, to_lon,
@@ -4076,10 +9176,34 @@ def _route_multimodal(
             )
         except ValueError as e:
             failures.append({'plan': key, 'reason': str(e)})
+        except _RouteAborted:
+            raise
         except Exception as e:
             warn(f"Plan {key} failed: {e}")
             failures.append({'plan': key, 'reason': 'Routing failed.'})
 
+    computed: dict[str, dict] = {}
+    failures: list[dict[str, str]] = []
+    # The GBFS fetch is most of the bike-share plan's latency and needs
+    # nothing from the other plans, so it starts ahead of them all and the
+    # bike-share plan goes last, giving the round trip the others to hide in.
+    prefetch = (
+        _prefetch_pool().submit(_fetch_bcycle_stations)
+        if len(keys) > 1 and 'bcycle' in keys else None
+    )
+    prefetch_token = _BCYCLE_PREFETCH.set(prefetch)
+    try:
+        for key in sorted(keys, key=lambda k: k == 'bcycle'):
+            _collect(key)
+    finally:
+        _BCYCLE_PREFETCH.reset(prefetch_token)
+        # A fetch still queued isn't wanted any more (a cached bike-share
+        # plan never asks for its stations; an aborted request for nothing).
+        if prefetch is not None:
+            prefetch.cancel()
+    computed = {key: computed[key] for key in keys if key in computed}
+    failures.sort(key=lambda f: keys.index(f['plan']))
+
     if not computed:
         # Lead with a reason that isn't "the bus doesn't go there".
         reason = next(
@@ -4106,6 +9230,19 @@ def _route_multimodal(
             best_combined = min(combined, key=_duration)
             if _duration(best_combined) <= _duration(fastest_key) * MULTIMODAL_MAX_SLOWDOWN:
                 chosen_key = best_combined
+    if alternatives > 1:
+        try:
+            computed[chosen_key] = _compute_plan(
+                chosen_key, from_lat, from_lon, to_lat, to_lon,
+                bike_mode=bike_mode,
+                alt=(alt if chosen_key == plan else 0),
+                alternatives=alternatives,
+            )
+        except _RouteAborted:
+            raise
+        except Exception as e:
+            # The route itself is in hand; only the extra options are lost.
+            warn(f"Route options for {chosen_key} failed: {e}")
     # The plans are cached and shared; annotate a copy so a later request
     # doesn't inherit this one's alternatives list.
     feature = dict(computed[chosen_key])
@@ -4228,55 +9365,581 @@ def _photos_dir():
     return photos_dir
 
 
-def _layer_index() -> list[dict[str, Any]]:
+def _layer_index(artifacts: dict[str, dict] | None = None) -> list[dict[str, Any]]:
+    """The layer catalog, with each exported layer's `hash`, `bytes` and
+    precompressed `encodings` (see `_write_layer_artifacts`) when known."""
+    artifacts = artifacts or {}
     return [
         {
             'id': layer_id,
             'label': layer['label'],
             'kind': layer['kind'],
             'url': f'/map-layers/{layer_id}.geojson',
+            'tiles': f'/map-layers/tiles/{layer_id}/{{z}}/{{x}}/{{y}}.mvt',
             'props': list(layer.get('props', {})),
             **{
                 key: layer[key]
                 for key in ('color', 'color_by', 'icon')
                 if key in layer
             },
+            **_artifact_index(layer_id, artifacts.get(layer_id)),
         }
         for layer_id, layer in LAYERS.items()
     ]
 
 
+def _artifact_index(layer_id: str, artifact: dict | None) -> dict[str, Any]:
+    """An exported layer's `index.json` fields: which formats it has, with
+    the hash, size and precompressed encodings of each."""
+    if not artifact:
+        return {}
+    out = {**artifact, 'formats': ['geojson']}
+    if artifact.get('binary'):
+        out['binary'] = {**artifact['binary'], 'url': f'/map-layers/{layer_id}.bin'}
+        out['formats'].append('bin')
+    return out
+
+
+#: Precompressed siblings `export map_layers` writes next to each layer
+#: file, by Content-Encoding, in the order the endpoint prefers them.
+LAYER_ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+#: `index.json`'s artifact entries, reloaded when the file changes.
+_ARTIFACTS: dict[str, Any] = {'mtime': None, 'layers': {}}
+
+
+def _brotli():
+    """The brotli module, or None where it isn't installed (no .br files)."""
+    return mrsm.attempt_import('brotli', lazy=False, install=False, warn=False)
+
+
+def _write_layer_artifacts(output_dir, layer_id: str, json_str: str) -> dict[str, Any]:
+    """Write a layer's `.geojson` and its binary twin `.bin` (see
+    `_encode_layer_binary`), each with `.gz` and `.br` siblings (compressed
+    once here at maximum effort, so the API serves them without touching
+    the CPU). Returns its `index.json` entry: the GeoJSON's content hash
+    (the ETag), size and encoded sizes, and the same under `binary`."""
+    entry = _write_encoded(output_dir / f'{layer_id}.geojson', json_str.encode())
+    entry['binary'] = _write_encoded(
+        output_dir / f'{layer_id}.bin', _encode_layer_binary(json_str),
+    )
+    return entry
+
+
+#: The binary layer format (`.bin`, `_encode_layer_binary`): magic, the
+#: coordinate quantum (degrees; the GeoJSON export rounds to the same 1e-5
+#: grid) and the geometry type codes.
+LAYER_BINARY_MAGIC = b'BWGL'
+LAYER_BINARY_VERSION = 1
+LAYER_BINARY_SCALE = 1e-5
+LAYER_BINARY_TYPES = {'Point': 1, 'LineString': 2, 'Polygon': 3}
+LAYER_BINARY_MEDIA_TYPE = 'application/vnd.bwg.layer'
+
+
+def _encode_layer_binary(json_str: str) -> bytes:
+    """A FeatureCollection in the app's binary layout, columnar in the
+    manner of GeoArrow, so a client decodes coordinates with one
+    `array.frombytes` instead of parsing a JSON token per number:
+
+        b'BWGL', u8 version, 3 pad bytes, u32 header length, header (JSON:
+            scale, features, parts, rings, coords, props as columns),
+            padded to 4 bytes
+        u8[features]        geometry type (1 point, 2 line, 3 polygon),
+                            padded to 4 bytes
+        u32[features + 1]   feature -> part offsets
+        u32[parts + 1]      part -> ring offsets
+        u32[rings + 1]      ring -> coordinate offsets
+        i32[coords * 2]     lon, lat pairs, in units of `scale` degrees
+
+    Little-endian throughout. A point is a part with one one-coordinate
+    ring, a line a part with one ring, a polygon a part with its rings;
+    multi-geometries are several parts. Other geometries are dropped."""
+    import json
+    import struct
+    import sys
+    from array import array
+
+    types = array('B')
+    part_offsets, ring_offsets, coord_offsets = array('I', [0]), array('I', [0]), array('I', [0])
+    coords = array('i')
+    columns: dict[str, list] = {}
+
+    def _ring(points):
+        for lon, lat, *_z in points:
+            coords.append(round(lon / LAYER_BINARY_SCALE))
+            coords.append(round(lat / LAYER_BINARY_SCALE))
+        coord_offsets.append(len(coords) // 2)
+
+    def _part(rings):
+        for ring in rings:
+            _ring(ring)
+        ring_offsets.append(len(coord_offsets) - 1)
+
+    features = [
+        f for f in json.loads(json_str).get('features', [])
+        if (f.get('geometry') or {}).get('type', '').removeprefix('Multi')
+        in LAYER_BINARY_TYPES
+    ]
+    for i, feature in enumerate(features):
+        geometry = feature['geometry']
+        kind = geometry['type']
+        parts = geometry['coordinates'] if kind.startswith('Multi') else [geometry['coordinates']]
+        kind = kind.removeprefix('Multi')
+        types.append(LAYER_BINARY_TYPES[kind])
+        for part in parts:
+            _part({'Point': [[part]], 'LineString': [part], 'Polygon': part}[kind])
+        part_offsets.append(len(ring_offsets) - 1)
+        for key, value in (feature.get('properties') or {}).items():
+            columns.setdefault(key, [None] * i).append(value)
+        for column in columns.values():
+            if len(column) <= i:
+                column.append(None)
+
+    header = json.dumps({
+        'scale': LAYER_BINARY_SCALE,
+        'features': len(types),
+        'parts': len(ring_offsets) - 1,
+        'rings': len(coord_offsets) - 1,
+        'coords': len(coords) // 2,
+        'props': columns,
+    }, separators=(',', ':')).encode()
+
+    def _padded(data: bytes) -> bytes:
+        return data + b'\0' * (-len(data) % 4)
+
+    out = [
+        LAYER_BINARY_MAGIC,
+        struct.pack('<B3xI', LAYER_BINARY_VERSION, len(header)),
+        _padded(header),
+        _padded(types.tobytes()),
+    ]
+    for values in (part_offsets, ring_offsets, coord_offsets, coords):
+        if sys.byteorder != 'little':
+            values.byteswap()
+        out.append(values.tobytes())
+    return b''.join(out)
+
+
+def _decode_layer_binary(data: bytes) -> dict[str, Any]:
+    """The FeatureCollection `_encode_layer_binary` encoded (coordinates on
+    its grid). The app has its own decoder; this one is the reference."""
+    import json
+    import struct
+    import sys
+    from array import array
+
+    if data[:4] != LAYER_BINARY_MAGIC:
+        raise ValueError('Not a binary layer.')
+    version, header_len = struct.unpack_from('<B3xI', data, 4)
+    if version != LAYER_BINARY_VERSION:
+        raise ValueError(f'Unsupported binary layer version {version}.')
+    pos = 12
+    header = json.loads(data[pos:pos + header_len])
+    pos += header_len + (-header_len % 4)
+
+    def _take(code: str, count: int):
+        nonlocal pos
+        values = array(code)
+        values.frombytes(data[pos:pos + count * values.itemsize])
+        pos += count * values.itemsize
+        if code != 'B' and sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    n = header['features']
+    types = _take('B', n)
+    pos += -n % 4
+    part_offsets = _take('I', n + 1)
+    ring_offsets = _take('I', header['parts'] + 1)
+    coord_offsets = _take('I', header['rings'] + 1)
+    coords = _take('i', header['coords'] * 2)
+    scale = header['scale']
+    names = {code: name for name, code in LAYER_BINARY_TYPES.items()}
+
+    def _ring(r):
+        return [
+            [coords[k] * scale, coords[k + 1] * scale]
+            for k in range(2 * coord_offsets[r], 2 * coord_offsets[r + 1], 2)
+        ]
+
+    features = []
+    for i in range(n):
+        kind = names[types[i]]
+        parts = []
+        for p in range(part_offsets[i], part_offsets[i + 1]):
+            rings = [_ring(r) for r in range(ring_offsets[p], ring_offsets[p + 1])]
+            parts.append({'Point': rings[0][0], 'LineString': rings[0], 'Polygon': rings}[kind])
+        geometry = (
+            {'type': kind, 'coordinates': parts[0]} if len(parts) == 1
+            else {'type': f'Multi{kind}', 'coordinates': parts}
+        )
+        features.append({
+            'type': 'Feature',
+            'geometry': geometry,
+            'properties': {
+                key: column[i]
+                for key, column in header['props'].items()
+                if column[i] is not None
+            },
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _write_encoded(path, data: bytes) -> dict[str, Any]:
+    """Write `data` to `path` with its precompressed siblings; its hash,
+    size and the size of each encoding, and the `mtime_ns` each file was
+    written with (what `_layer_artifact` checks the files against)."""
+    import gzip
+    import hashlib
+
+    encoded = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    brotli = _brotli()
+    if brotli is not None:
+        encoded['br'] = brotli.compress(data, quality=11)
+    for encoding, suffix in LAYER_ENCODINGS.items():
+        sibling = path.with_name(path.name + suffix)
+        if encoding in encoded:
+            _atomic_write(sibling, encoded[encoding])
+        else:
+            sibling.unlink(missing_ok=True)
+    _atomic_write(path, data)
+    return {
+        'hash': hashlib.sha256(data).hexdigest()[:20],
+        'bytes': len(data),
+        'mtime_ns': path.stat().st_mtime_ns,
+        'encodings': {encoding: len(body) for encoding, body in encoded.items()},
+        'encoded_mtime_ns': {
+            encoding: path.with_name(path.name + LAYER_ENCODINGS[encoding]).stat().st_mtime_ns
+            for encoding in encoded
+        },
+    }
+
+
+def _atomic_write(path, data: bytes):
+    """Write `path` through a temporary sibling and a rename, so readers
+    see the old file or the new one, never half of one."""
+    import os
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _layer_fingerprint(layer_id: str, debug: bool = False) -> str | None:
+    """A hash of everything a layer's export depends on: its LAYERS entry,
+    the plugin version, the curated list it serves, and the sync time of
+    each pipe it reads (its own, or those of the layers in `depends_on`).
+    None when that can't be known (a builder reading plain tables, a pipe
+    without a sync time), which means always rebuild."""
+    import hashlib
+    import json
+
+    layer = LAYERS[layer_id]
+    parts = [__version__, layer]
+    if layer.get('curated'):
+        parts.append(globals()[layer['curated']])
+    elif layer.get('builder') and not layer.get('depends_on'):
+        return None
+    sources = [layer_id] if not layer.get('builder') else layer.get('depends_on', [])
+    for source in sources:
+        stamp = _pipe_sync_time(_layer_pipe(LAYERS[source]), debug=debug)
+        if stamp is None:
+            return None
+        parts.append(stamp)
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode()
+    ).hexdigest()[:20]
+
+
+def _layer_artifacts(root=None) -> dict[str, dict]:
+    """Layer id -> artifact entry (hash, bytes, encodings, fingerprint,
+    binary) from the exported `index.json`, or {} before the first export."""
+    import json
+    from pathlib import Path
+
+    path = Path(root or _output_dir()) / 'index.json'
+    try:
+        mtime = (str(path), path.stat().st_mtime_ns)
+        if _ARTIFACTS['mtime'] != mtime:
+            with open(path) as f:
+                layers = json.load(f).get('layers', [])
+            _ARTIFACTS['layers'] = {
+                entry['id']: {
+                    key: entry[key]
+                    for key in (
+                        'hash', 'bytes', 'mtime_ns', 'encodings', 'encoded_mtime_ns',
+                        'fingerprint', 'binary',
+                    )
+                    if key in entry
+                }
+                for entry in layers
+                if 'hash' in entry
+            }
+            _ARTIFACTS['mtime'] = mtime
+    except (OSError, ValueError, KeyError):
+        return {}
+    return _ARTIFACTS['layers']
+
+
+def _file_matches(path, size: int, mtime_ns: int | None) -> bool:
+    """Is `path` still the file `index.json` recorded: the same size and
+    modification time? An entry from before mtimes were recorded never is."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return False
+    return mtime_ns is not None and (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns)
+
+
+def _layer_artifact(
+    layer_id: str,
+    root=None,
+    suffix: str = '.geojson',
+) -> dict[str, Any] | None:
+    """The exported file of a layer (`suffix` '.bin' for the binary one)
+    with its ETag and the precompressed siblings on disk, or None without a
+    hash for it. Each file's size and mtime_ns are checked against
+    `index.json`, so a file rewritten since (an export in progress, or by
+    hand at the same size) serves without an ETag rather than under the
+    wrong one, and a stale sibling is never sent."""
+    from pathlib import Path
+
+    root = Path(root or _output_dir())
+    entry = _layer_artifacts(root).get(layer_id)
+    if entry is not None and suffix == '.bin':
+        entry = entry.get('binary')
+    path = root / f'{layer_id}{suffix}'
+    if entry is None or not _file_matches(path, entry['bytes'], entry.get('mtime_ns')):
+        return None
+    encodings = {}
+    for encoding, size in entry['encodings'].items():
+        sibling = path.with_name(path.name + LAYER_ENCODINGS[encoding])
+        if _file_matches(sibling, size, entry.get('encoded_mtime_ns', {}).get(encoding)):
+            encodings[encoding] = sibling
+    return {'path': path, 'etag': f'"{entry["hash"]}"', 'encodings': encodings}
+
+
+def _negotiate_encoding(accept_encoding: str | None, available) -> str | None:
+    """The LAYER_ENCODINGS entry to answer with, among `available`, given an
+    Accept-Encoding header (q=0 refuses one; `*` accepts any)."""
+    accepted: dict[str, float] = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in LAYER_ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+#: Processes `export map_layers` builds layers in (dissolve and simplify are
+#: CPU-bound GEOS work, so threads would queue on the GIL).
+EXPORT_WORKERS = 4
+
+
+def _export_layer(layer_id: str, output_dir: str, debug: bool = False) -> dict | None:
+    """Build one layer and write its files; its `index.json` entry, or None
+    when the layer has no data. Runs in an export worker process."""
+    from pathlib import Path
+    json_str = _build_layer_geojson(layer_id, debug=debug)
+    if json_str is None:
+        return None
+    return _write_layer_artifacts(Path(output_dir), layer_id, json_str)
+
+
+def _export_worker_init():
+    """Start-up of a forked export worker: drop the SQL pools inherited from
+    the parent without closing them (`dispose(close=False)`). The pooled
+    connections' sockets are the parent's too, so closing them here (as a
+    plain `dispose()` would) could cut the parent's sessions, and using
+    them would interleave two processes on one socket. The worker opens
+    its own on first use."""
+    import os
+    from meerschaum.connectors import connectors
+    for conn in list(connectors.get('sql', {}).values()):
+        engine = conn.__dict__.get('_engine')
+        if engine is None:
+            continue
+        engine.dispose(close=False)
+        # Already handled: Meerschaum would otherwise dispose (and close)
+        # them itself on first use from the new PID.
+        conn._pid = os.getpid()
+
+
+def _export_executor(workers: int):
+    """A process pool for the export, forked so the workers share this
+    module as loaded, each starting with `_export_worker_init`; threads
+    where fork isn't available."""
+    import multiprocessing
+    import sys
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    if 'fork' in multiprocessing.get_all_start_methods() and sys.modules.get(__name__):
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_export_worker_init,
+        )
+    return ThreadPoolExecutor(max_workers=workers)
+
+
 @make_action
-def export_map_layers(debug: bool = False, **kwargs) -> mrsm.SuccessTuple:
-    """Run `mrsm export map_layers` to pregenerate the app layer files."""
+def export_map_layers(
+    debug: bool = False,
+    force: bool = False,
+    **kwargs
+) -> mrsm.SuccessTuple:
+    """Run `mrsm export map_layers` to pregenerate the app layer files.
+
+    Layers build concurrently (EXPORT_WORKERS processes). A layer whose
+    fingerprint (`_layer_fingerprint`: its config and its sources' sync
+    times) matches the last export's is skipped unless `--force` is given.
+    Files are replaced atomically, so the API never serves a partial one,
+    and `index.json` is rewritten as each layer lands, so a finished layer
+    is served under its new hash without waiting for the slowest one."""
     import json
+    from concurrent.futures import as_completed
 
     output_dir = _output_dir()
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    previous = _layer_artifacts(output_dir)
+    fingerprints = {
+        layer_id: _layer_fingerprint(layer_id, debug=debug)
+        for layer_id in LAYERS
+    }
+    artifacts = {}
+    todo = []
+    for layer_id, fingerprint in fingerprints.items():
+        last = previous.get(layer_id, {})
+        if (
+            not force
+            and fingerprint is not None
+            and last.get('fingerprint') == fingerprint
+            and _layer_artifact(layer_id, output_dir) is not None
+        ):
+            info(f"Layer '{layer_id}' is unchanged since the last export.")
+            artifacts[layer_id] = last
+        else:
+            todo.append(layer_id)
+
+    def _write_index():
+        # Layers not (yet) rewritten keep their previous files and entries.
+        _atomic_write(
+            output_dir / 'index.json',
+            json.dumps({'layers': _layer_index({**previous, **artifacts})}).encode(),
+        )
+
+    num_successes = 0
+    failures = []
+    if todo:
+        with _export_executor(min(EXPORT_WORKERS, len(todo))) as pool:
+            futures = {
+                pool.submit(_export_layer, layer_id, str(output_dir), debug): layer_id
+                for layer_id in todo
+            }
+            info(f"Exporting {len(todo)} layers: {', '.join(todo)}...")
+            for future in as_completed(futures):
+                layer_id = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    failures.append(f"'{layer_id}': {e}")
+                    continue
+                if entry is None:
+                    continue
+                if fingerprints[layer_id] is not None:
+                    entry['fingerprint'] = fingerprints[layer_id]
+                artifacts[layer_id] = entry
+                _write_index()
+                mrsm.pprint((True, f"Wrote file '{output_dir / f'{layer_id}.geojson'}'."))
+                num_successes += 1
+    _write_index()
+
+    if failures:
+        return False, "Failed to export layers:\n" + '\n'.join(failures)
+    skipped = len(LAYERS) - len(todo)
+    if num_successes == 0 and skipped == 0:
+        return False, "Did not export any layers."
+
+    return True, (
+        f"Exported {num_successes} of {len(LAYERS)} layers "
+        f"({skipped} unchanged)."
+    )
+
+
+@make_action
+def export_map_tiles(debug: bool = False, **kwargs) -> mrsm.SuccessTuple:
+    """Run `mrsm export map_tiles` (after `export map_layers`, whose files
+    the builder layers are cut from) to pre-seed every layer's vector tiles,
+    zooms TILE_MIN_ZOOM..TILE_MAX_ZOOM, into `<data>/output/tiles/`."""
     num_successes = 0
     for layer_id in LAYERS:
-        info(f"Exporting layer '{layer_id}'...")
+        info(f"Seeding tiles for layer '{layer_id}'...")
         try:
-            json_str = _build_layer_geojson(layer_id, debug=debug)
+            path, count = _write_mbtiles(layer_id)
         except Exception as e:
-            return False, f"Failed to export layer '{layer_id}':\n{e}"
-        if json_str is None:
-            continue
-
-        layer_path = output_dir / f'{layer_id}.geojson'
-        with open(layer_path, 'w+') as f:
-            f.write(json_str)
-        mrsm.pprint((True, f"Wrote file '{layer_path}'."))
+            return False, f"Failed to seed tiles for layer '{layer_id}':\n{e}"
+        mrsm.pprint((True, f"Wrote {count} tiles to '{path}'."))
         num_successes += 1
+    return True, f"Seeded tiles for {num_successes} of {len(LAYERS)} layers."
 
-    with open(output_dir / 'index.json', 'w+') as f:
-        json.dump({'layers': _layer_index()}, f)
 
-    if num_successes == 0:
-        return False, "Did not export any layers."
+@make_action
+def export_route_context(debug: bool = False, **kwargs) -> mrsm.SuccessTuple:
+    """Run `mrsm export route_context` after the street, crash, light or
+    sidewalk pipes sync, to bring the routing graph's segment context up to
+    date (see `_route_context_script`). Graph builds only read it."""
+    if not _refresh_route_context(debug=debug):
+        return False, "Failed to refresh the route context."
+    return True, f"Refreshed the route context table '{ROUTE_CONTEXT_TABLE}'."
+
+
+@make_action
+def export_route_graph(debug: bool = False, **kwargs) -> mrsm.SuccessTuple:
+    """Run `mrsm export route_graph` to snapshot the routing graph for the API
+    workers (see `_write_route_snapshot`). Refreshes the route context first."""
+    # Read before building: a sync landing mid-build leaves the snapshot
+    # looking older than the sources, so workers rebuild rather than trust it.
+    sync_time = _route_source_sync_time(debug=debug)
+    _refresh_route_context(debug=debug)
+    info("Building routing graph...")
+    try:
+        graph = _build_route_graph(debug=debug)
+    except Exception as e:
+        return False, f"Failed to build the routing graph:\n{e}"
+    if not _node_count(graph):
+        return False, "The routing graph is empty; not replacing the snapshot."
+    path = _write_route_snapshot(graph, sync_time)
+    return True, (
+        f"Wrote routing graph snapshot '{path}' "
+        f"({_node_count(graph)} nodes, {len(graph['nbr']) // 2} edges)."
+    )
+
 
-    return True, f"Successfully exported {num_successes} of {len(LAYERS)} layers."
+@make_action
+def export_elevation_grid(debug: bool = False, **kwargs) -> mrsm.SuccessTuple:
+    """Run `mrsm export elevation_grid` to rasterize the county contours into
+    the elevation grid the routing graph samples (see `_build_elevation_grid`).
+    The next graph build picks it up."""
+    try:
+        feet, meta = _build_elevation_grid(debug=debug)
+    except Exception as e:
+        return False, f"Failed to build the elevation grid:\n{e}"
+    path = _write_elevation_grid(feet, meta)
+    return True, (
+        f"Wrote elevation grid '{path}' ({feet.shape[0]} x {feet.shape[1]} "
+        f"at {ELEVATION_GRID_M:g} m)."
+    )
 
 
 @api_plugin
@@ -4286,28 +9949,34 @@ def init_app(app):
     import shutil
     from pathlib import Path
     from fastapi import Form, File, UploadFile, Request, Query
-    from fastapi.responses import JSONResponse, FileResponse, Response
+    from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
     from starlette.middleware.gzip import GZipMiddleware
+    from starlette.background import BackgroundTask
 
     # App-wide (all bwg.mrsm.io routes): geojson payloads gzip ~8-10x.
     if not any(m.cls is GZipMiddleware for m in app.user_middleware):
         app.add_middleware(GZipMiddleware, minimum_size=2048)
 
-    # Warm the routing graph, its lookup indexes and the transit data in the
+    # Warm the routing graph, its landmark tables and the transit data in the
     # background so the first route request doesn't pay the ~6 s build.
     def _warm_routing():
         try:
             graph = _get_route_graph()
-            _nearest_index(graph)
-            _edge_index(graph)
-            _get_transit_data()
+            timetable = _get_transit_data()['timetable']
+            if timetable is not None:
+                _timetable_day(timetable, _transit_when()[0].date())
+            for mode in ('bike', 'walk'):
+                _build_route_landmarks(graph, _weight_profile(mode))
         except Exception as e:
             warn(f"Routing warm-up failed: {e}")
     threading.Thread(target=_warm_routing, daemon=True).start()
 
     @app.get('/map-layers/index.json')
     def map_layers_index():
-        return JSONResponse({'layers': _layer_index()})
+        return JSONResponse(
+            {'layers': _layer_index(_layer_artifacts())},
+            headers={'Cache-Control': 'no-cache'},
+        )
 
     #: Live-ish garage occupancy cache (the pipe is synced by the parking job;
     #: this only avoids hammering Postgres from every map pan).
@@ -4405,8 +10074,46 @@ def init_app(app):
             headers={'Cache-Control': 'no-store'},
         )
 
+    def _artifact_response(request, artifact: dict, media_type: str):
+        """An exported layer file, revalidated against its content hash,
+        as its precompressed bytes where the client accepts them (each
+        encoding under its own ETag)."""
+        encoding = _negotiate_encoding(
+            request.headers.get('accept-encoding'), artifact['encodings'],
+        )
+        etag = _encoded_etag(artifact['etag'], encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+        if _etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return FileResponse(artifact['path'], media_type=media_type, headers=headers)
+        return FileResponse(
+            artifact['encodings'][encoding],
+            media_type=media_type,
+            headers={**headers, 'Content-Encoding': encoding},
+        )
+
+    @app.get('/map-layers/{layer_id}.bin')
+    def map_layer_binary(request: Request, layer_id: str):
+        """The exported layer in the binary format (`_encode_layer_binary`);
+        404 until `export map_layers` has written it (clients fall back to
+        the `.geojson`)."""
+        if layer_id not in LAYERS:
+            return JSONResponse({'error': f"Unknown layer '{layer_id}'."}, status_code=404)
+        artifact = _layer_artifact(layer_id, suffix='.bin')
+        if artifact is None:
+            return JSONResponse(
+                {'error': f"Layer '{layer_id}' has no binary export."}, status_code=404,
+            )
+        return _artifact_response(request, artifact, LAYER_BINARY_MEDIA_TYPE)
+
     @app.get('/map-layers/{layer_id}.geojson')
     def map_layer_geojson(
+        request: Request,
         layer_id: str,
         bbox: str = None,
         zoom: int = 13,
@@ -4422,12 +10129,22 @@ def init_app(app):
             except Exception:
                 return JSONResponse({'error': 'Invalid bbox.'}, status_code=400)
             try:
-                json_str = _build_bbox_geojson(
+                chunks = _build_bbox_geojson(
                     layer_id, minlon, minlat, maxlon, maxlat, zoom,
                 )
             except Exception as e:
                 return JSONResponse({'error': str(e)}, status_code=500)
-            return Response(json_str, media_type='application/geo+json')
+            return StreamingResponse(
+                chunks, media_type='application/geo+json',
+                background=BackgroundTask(chunks.close),
+            )
+
+        # Exported with a content hash: revalidate against it, and send the
+        # precompressed bytes as they are (GZipMiddleware leaves responses
+        # that already carry a Content-Encoding alone).
+        artifact = _layer_artifact(layer_id)
+        if artifact is not None:
+            return _artifact_response(request, artifact, 'application/geo+json')
 
         pregenerated = _output_dir() / f'{layer_id}.geojson'
         if pregenerated.exists():
@@ -4447,6 +10164,44 @@ def init_app(app):
         _CACHE[layer_id] = (time.time(), json_str)
         return Response(json_str, media_type='application/geo+json')
 
+    @app.get('/map-layers/tiles/{layer_id}/{z}/{x}/{y}.mvt')
+    def map_layer_tile(request: Request, layer_id: str, z: int, x: int, y: int):
+        """Vector tile z/x/y of a layer: seeded zooms are one MBTiles read,
+        the rest render on request (`_layer_tile`). Empty tiles are 204s."""
+        import gzip
+        if layer_id not in LAYERS:
+            return JSONResponse({'error': f"Unknown layer '{layer_id}'."}, status_code=404)
+        if not (0 <= z <= TILE_SERVE_MAX_ZOOM and 0 <= x < 1 << z and 0 <= y < 1 << z):
+            return JSONResponse({'error': 'Invalid tile.'}, status_code=400)
+        try:
+            data, seeded = _layer_tile(layer_id, z, x, y)
+        except Exception as e:
+            return JSONResponse({'error': str(e)}, status_code=500)
+        # Stored gzipped: sent as is (GZipMiddleware leaves encoded bodies
+        # alone), or inflated for the rare client that can't take gzip. The
+        # two bodies differ, so they're tagged apart.
+        encoding = (
+            _negotiate_encoding(request.headers.get('accept-encoding'), ('gzip',))
+            if data else None
+        )
+        etag = _encoded_etag(_etag(data), encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': (
+                f'public, max-age={TILE_MAX_AGE_S if seeded else TILE_LIVE_MAX_AGE_S}'
+            ),
+            'Vary': 'Accept-Encoding',
+        }
+        if _etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        if not data:
+            return Response(status_code=204, headers=headers)
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        else:
+            data = gzip.decompress(data)
+        return Response(data, media_type=MVT_MEDIA_TYPE, headers=headers)
+
     @app.post('/map-layers/submit-point')
     async def submit_point(
         request: Request,
@@ -4519,7 +10274,8 @@ def init_app(app):
         return JSONResponse({'ok': True, 'id': rec_id})
 
     @app.get('/map-layers/route')
-    def map_layers_route(
+    async def map_layers_route(
+        request: Request,
         to: str = '',
         from_: str = Query('', alias='from'),
         mode: str = 'bike',
@@ -4530,8 +10286,11 @@ def init_app(app):
         ebike: bool = False,
         stress: str = '',
         alt: int = 0,
+        alternatives: int = 0,
         night: int = -1,
         trail: int = 1,
+        depart_at: str = '',
+        arrive_by: str = '',
     ):
         """Multi-modal directions.
 
@@ -4549,15 +10308,28 @@ def init_app(app):
         returns that plan's Nth alternate route; `alt_distinct: false` in the
         response means no genuinely different way exists.
 
+        `alternatives=k` (2–4) returns up to k - 1 other ways for the chosen
+        plain plan in `properties.route_options`, each a full route tagged
+        `option` (`shorter`, `flatter`, `different`) with `option_cost`
+        relative to the main one. One search, not k; ignored with `alt`.
+
         After dark (Greenville local time), unlit street stretches cost
         extra (Duke streetlight coverage, NIGHT_UNLIT_FACTOR). `night=0/1`
         overrides the clock; the response reports the flag used.
 
         `trail=0` turns off the Swamp Rabbit Trail bias: the trail prices
         like a plain calm street instead of the heavily-discounted backbone.
+
+        `depart_at=` or `arrive_by=` (ISO 8601 or `HH:MM`, Greenville time)
+        schedules the transit plans: leave then, or get there by then.
+        Without either, transit leaves now. The night flag follows the
+        given time unless `night` is set.
+
+        The computation runs on the route pool (ROUTE_WORKERS) under a
+        `_RouteBudget`: 503 with Retry-After when the pool is saturated or
+        the trip blows its budget, and the search stops as soon as the
+        client disconnects.
         """
-        # Sync def on purpose: FastAPI runs it in the threadpool, so the
-        # multi-second first-call graph build never blocks the event loop.
         def _parse_latlon(value: str):
             lat_s, lon_s = value.split(',', 1)
             return float(lat_s), float(lon_s)
@@ -4594,35 +10366,253 @@ def init_app(app):
                 {'error': "Start and destination are the same point."},
                 status_code=400,
             )
-        # Request-scoped: _astar and the plan cache read the contextvar, so
-        # no signature threading through the seven plan/transit/bcycle layers.
-        night_token = _NIGHT_OVERRIDE.set(
-            None if night not in (0, 1) else bool(night)
-        )
-        trail_token = _TRAIL_PREF.set(bool(trail))
+        if depart_at and arrive_by:
+            return JSONResponse(
+                {'error': "Give depart_at or arrive_by, not both."},
+                status_code=400,
+            )
         try:
-            feature = _route_multimodal(
-                from_lat, from_lon, to_lat, to_lon,
-                modes=selected,
-                roll=roll,
-                bcycle=bcycle,
-                plan=(plan or '').strip().lower() or None,
-                ebike=ebike,
-                stress=level,
-                alt=max(0, min(alt, ALT_MAX)),
+            when = (
+                (_parse_when(depart_at), False) if depart_at
+                else (_parse_when(arrive_by), True) if arrive_by
+                else None
+            )
+        except ValueError:
+            return JSONResponse(
+                {'error': "Expected depart_at/arrive_by as ISO 8601 or HH:MM."},
+                status_code=400,
             )
-            feature['properties']['night'] = _is_night()
-            feature['properties']['trail'] = bool(trail)
+        # Off the event loop and off FastAPI's shared threadpool: the route
+        # pool bounds what routing can take (the multi-second first-call
+        # graph build included), and the budget stops a runaway search.
+        def _compute():
+            # Request-scoped: _astar and the plan cache read the contextvar,
+            # so no signature threading through the seven plan/transit/bcycle
+            # layers. Set here, in the worker thread that reads them.
+            night_token = _NIGHT_OVERRIDE.set(
+                bool(night) if night in (0, 1)
+                else None if when is None
+                else _is_night(when[0])
+            )
+            trail_token = _TRAIL_PREF.set(bool(trail))
+            when_token = _TRANSIT_WHEN.set(when)
+            try:
+                feature = _route_multimodal(
+                    from_lat, from_lon, to_lat, to_lon,
+                    modes=selected,
+                    roll=roll,
+                    bcycle=bcycle,
+                    plan=(plan or '').strip().lower() or None,
+                    ebike=ebike,
+                    stress=level,
+                    alt=max(0, min(alt, ALT_MAX)),
+                    alternatives=max(0, min(alternatives, PARETO_MAX_OPTIONS)),
+                )
+                feature['properties']['night'] = _is_night()
+                feature['properties']['trail'] = bool(trail)
+                return feature
+            finally:
+                _NIGHT_OVERRIDE.reset(night_token)
+                _TRAIL_PREF.reset(trail_token)
+                _TRANSIT_WHEN.reset(when_token)
+
+        try:
+            feature = await _route_await(request, _RouteBudget(), _compute)
         except ValueError as e:
             return JSONResponse({'error': str(e)}, status_code=422)
+        except _RouteAborted as e:
+            return JSONResponse(
+                {'error': str(e)}, status_code=503,
+                headers={'Retry-After': str(ROUTE_RETRY_AFTER_S)},
+            )
         except Exception as e:
             warn(f"Routing failed: {e}")
             return JSONResponse({'error': 'Routing failed.'}, status_code=500)
-        finally:
-            _NIGHT_OVERRIDE.reset(night_token)
-            _TRAIL_PREF.reset(trail_token)
         return JSONResponse(feature)
 
+    @app.get('/map-layers/matrix')
+    async def map_layers_matrix(
+        request: Request,
+        origins: str = '',
+        destinations: str = '',
+        mode: str = 'walk',
+        ebike: bool = False,
+        stress: str = '',
+        night: int = -1,
+        trail: int = 1,
+    ):
+        """Travel time, distance and routing cost between every origin and
+        every destination: `?origins=lat,lon;lat,lon&destinations=...`.
+
+        `mode` is `bike`, `walk` or `roll`, with the route endpoint's
+        `ebike`, `stress`, `night` and `trail` knobs. Grids are indexed
+        `[origin][destination]`; a cell is null when either point is off
+        the network or there's no connection. At most
+        ROUTE_MATRIX_MAX_CELLS cells per request, computed on the route pool
+        under a `_RouteBudget` like a route.
+        """
+        def _parse_points(value: str):
+            points = []
+            for part in value.split(';'):
+                if part.strip():
+                    lat_s, lon_s = part.split(',', 1)
+                    points.append((float(lat_s), float(lon_s)))
+            return points
+
+        try:
+            origin_points = _parse_points(origins)
+            destination_points = _parse_points(destinations)
+        except Exception:
+            origin_points = destination_points = []
+        if not origin_points or not destination_points:
+            return JSONResponse(
+                {'error': "Expected ?origins=lat,lon;...&destinations=lat,lon;..."},
+                status_code=400,
+            )
+        if len(origin_points) * len(destination_points) > ROUTE_MATRIX_MAX_CELLS:
+            return JSONResponse(
+                {'error': f"At most {ROUTE_MATRIX_MAX_CELLS} origin x destination pairs."},
+                status_code=400,
+            )
+        mode = (mode or 'walk').strip().lower()
+        level = (stress or DEFAULT_STRESS).strip().lower()
+        if mode not in ('bike', 'walk', 'roll'):
+            return JSONResponse(
+                {'error': "Expected mode from bike, walk, roll."},
+                status_code=400,
+            )
+        if level not in STRESS_LEVELS:
+            return JSONResponse(
+                {'error': f"Expected stress from {', '.join(STRESS_LEVELS)}."},
+                status_code=400,
+            )
+        mode_key = _bike_mode(ebike, level) if mode == 'bike' else mode
+
+        def _compute():
+            night_token = _NIGHT_OVERRIDE.set(
+                None if night not in (0, 1) else bool(night)
+            )
+            trail_token = _TRAIL_PREF.set(bool(trail))
+            try:
+                return (
+                    _route_matrix(origin_points, destination_points, mode=mode_key),
+                    _is_night(),
+                )
+            finally:
+                _NIGHT_OVERRIDE.reset(night_token)
+                _TRAIL_PREF.reset(trail_token)
+
+        try:
+            grids, night_used = await _route_await(request, _RouteBudget(), _compute)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=422)
+        except _RouteAborted as e:
+            return JSONResponse(
+                {'error': str(e)}, status_code=503,
+                headers={'Retry-After': str(ROUTE_RETRY_AFTER_S)},
+            )
+        except Exception as e:
+            warn(f"Matrix failed: {e}")
+            return JSONResponse({'error': 'Matrix failed.'}, status_code=500)
+
+        def _rounded(grid, digits):
+            return [
+                [None if v is None else round(v, digits) for v in row]
+                for row in grid
+            ]
+
+        return JSONResponse({
+            'mode': _base_mode(mode_key),
+            'ebike': _mode_family(mode_key) == 'ebike',
+            'stress': _stress_level(mode_key),
+            'night': night_used,
+            'trail': bool(trail),
+            'origins': [[lat, lon] for lat, lon in origin_points],
+            'destinations': [[lat, lon] for lat, lon in destination_points],
+            'duration_min': _rounded(grids['duration_min'], 2),
+            'distance_m': _rounded(grids['distance_m'], 1),
+            'cost': _rounded(grids['cost'], 1),
+        })
+
+    @app.get('/map-layers/isochrone')
+    async def map_layers_isochrone(
+        request: Request,
+        lat: float,
+        lon: float,
+        mode: str = 'bike',
+        minutes: float = 15.0,
+        bands: int = 3,
+        ebike: bool = False,
+        stress: str = '',
+        night: int = -1,
+        trail: int = 1,
+    ):
+        """What you can reach from `lat,lon` within `minutes`: a GeoJSON
+        FeatureCollection of `bands` nested polygons (outermost first),
+        each with its `minutes`.
+
+        `mode` is `bike`, `walk` or `roll`, with the route endpoint's
+        `ebike`, `stress`, `night` and `trail` knobs: `?mode=bike&stress=quiet`
+        is the low-stress network. Computed on the route pool under a
+        `_RouteBudget` like a route.
+        """
+        mode = (mode or 'bike').strip().lower()
+        level = (stress or DEFAULT_STRESS).strip().lower()
+        if mode not in ('bike', 'walk', 'roll'):
+            return JSONResponse(
+                {'error': "Expected mode from bike, walk, roll."},
+                status_code=400,
+            )
+        if level not in STRESS_LEVELS:
+            return JSONResponse(
+                {'error': f"Expected stress from {', '.join(STRESS_LEVELS)}."},
+                status_code=400,
+            )
+        if not 0 < minutes <= ISOCHRONE_MAX_MIN or not 1 <= bands <= ISOCHRONE_MAX_BANDS:
+            return JSONResponse(
+                {'error': (
+                    f"Expected minutes up to {ISOCHRONE_MAX_MIN} and "
+                    f"1-{ISOCHRONE_MAX_BANDS} bands."
+                )},
+                status_code=400,
+            )
+        mode_key = _bike_mode(ebike, level) if mode == 'bike' else mode
+
+        def _compute():
+            night_token = _NIGHT_OVERRIDE.set(
+                None if night not in (0, 1) else bool(night)
+            )
+            trail_token = _TRAIL_PREF.set(bool(trail))
+            try:
+                collection = _isochrone(
+                    lat, lon, mode=mode_key, minutes=minutes, bands=bands,
+                )
+                return {
+                    **collection,
+                    'properties': {
+                        **collection['properties'],
+                        'night': _is_night(),
+                        'trail': bool(trail),
+                    },
+                }
+            finally:
+                _NIGHT_OVERRIDE.reset(night_token)
+                _TRAIL_PREF.reset(trail_token)
+
+        try:
+            collection = await _route_await(request, _RouteBudget(), _compute)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=422)
+        except _RouteAborted as e:
+            return JSONResponse(
+                {'error': str(e)}, status_code=503,
+                headers={'Retry-After': str(ROUTE_RETRY_AFTER_S)},
+            )
+        except Exception as e:
+            warn(f"Isochrone failed: {e}")
+            return JSONResponse({'error': 'Isochrone failed.'}, status_code=500)
+        return JSONResponse(collection)
+
     def _srt_gaps(graph, srt_adj):
         """Min pairwise distance (m) between srt-only components."""
         seen: set = set()
@@ -4648,7 +10638,9 @@ def init_app(app):
                 best = None
                 for u in comps[i]:
                     for v in comps[j]:
-                        d = _equirect_m(*graph['nodes'][u], *graph['nodes'][v])
+                        d = _equirect_m(
+                            *_node_latlon(graph, u), *_node_latlon(graph, v),
+                        )
                         if best is None or d < best:
                             best = d
                 gaps.append({
@@ -4661,22 +10653,17 @@ def init_app(app):
 
     @app.get('/map-layers/route-stats.json')
     def map_layers_route_stats():
+        import numpy as np
         graph = _get_route_graph()
-        counts: dict = {}
-        length_m: dict = {}
-        for edges in graph['adj'].values():
-            for e in edges:
-                if e[5]:  # count each undirected edge once
-                    continue
-                cat = str(e[3] or 'unknown')
-                counts[cat] = counts.get(cat, 0) + 1
-                length_m[cat] = length_m.get(cat, 0.0) + e[2]
+        categories = graph['categories']
+        counts, length_m = _category_totals(graph)
         # Continuity check: components of the srt-only subgraph.
         srt_adj: dict = {}
-        for u, edges in graph['adj'].items():
-            for e in edges:
-                if e[3] == 'srt':
-                    srt_adj.setdefault(u, []).append(e[0])
+        offsets = graph['offsets']
+        src = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        on_srt = graph['cat'] == categories.index('srt')
+        for u, v in zip(src[on_srt].tolist(), graph['nbr'][on_srt].tolist()):
+            srt_adj.setdefault(u, []).append(v)
         seen: set = set()
         srt_comps = []
         for start in srt_adj:
@@ -4694,13 +10681,23 @@ def init_app(app):
                         queue.append(nbr)
             srt_comps.append(len(comp))
         return JSONResponse({
-            'nodes': len(graph['nodes']),
+            'nodes': _node_count(graph),
             'edges': sum(counts.values()),
             'edges_by_category': counts,
             'km_by_category': {k: round(v / 1000, 1) for k, v in length_m.items()},
             'srt_components': sorted(srt_comps, reverse=True)[:20],
             'srt_component_count': len(srt_comps),
             'srt_gaps_m': _srt_gaps(graph, srt_adj),
+            'build': _build_summary(graph),
+        })
+
+    @app.get('/map-layers/cache-stats.json')
+    def map_layers_cache_stats():
+        """Hit, miss, eviction and byte counters of this worker's result caches."""
+        return JSONResponse({
+            'route': _ROUTE_CACHE.stats(),
+            'isochrone': _ISOCHRONE_CACHE.stats(),
+            'tile': _TILE_CACHE.stats(),
         })
 
     @app.get('/map-layers/search')
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Routing-graph benchmark: memory held by the built graph and A* latency,
+on a synthetic street lattice so it runs anywhere (no database).
+
+    python3 scripts/graph_bench.py [SIDE] [N_TRIPS] [PLUGIN_PATH]
+
+Builds a SIDE x SIDE grid of ~100 m blocks (default 120, ~15k nodes) with a
+mix of street categories, measures what the built graph keeps alive (tracemalloc, after the
+build's temporaries are gone), then routes N_TRIPS seeded node-pair trips
+(default 200) per mode and prints latency percentiles and settled-node
+counts, once with the plain A* heuristic and once with landmark bounds,
+each one-directional and bidirectional. Then the same trips ask for route
+options (`_route_options`): latency, labels popped, and how many searches
+ran into PARETO_MAX_POPS and settled for the options they had.
+
+PLUGIN_PATH benchmarks another copy of `map-layers.py`, e.g. an older
+revision pulled out with `git show <rev>:plugins/map-layers.py > /tmp/old.py`,
+so before/after numbers come from the same lattice and the same trips.
+"""
+
+import gc
+import importlib.util
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+PLUGIN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'plugins', 'map-layers.py',
+)
+
+BLOCK_DEG = 0.0009          # ~100 m of latitude
+ORIGIN = (34.80, -82.45)
+CATEGORIES = ('L', 'L', 'ML', 'M', 'bike-lane', 'MH', 'path')
+MODES = ('bike', 'walk')
+SEED = 20260807
+
+
+def _load(path):
+    spec = importlib.util.spec_from_file_location('bwg_map_layers_bench', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['bwg_map_layers_bench'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _lattice_rows(side: int) -> list:
+    """One row per block face, with a vertex every ~20 m."""
+    rng = random.Random(SEED)
+    rows = []
+    lat0, lon0 = ORIGIN
+    step = BLOCK_DEG / 5
+    for i in range(side + 1):
+        for j in range(side):
+            # East-west face along row i, north-south face along column i.
+            ew = [[lon0 + (j * 5 + k) * step, lat0 + i * BLOCK_DEG] for k in range(6)]
+            ns = [[lon0 + i * BLOCK_DEG, lat0 + (j * 5 + k) * step] for k in range(6)]
+            rows.append((ew, rng.choice(CATEGORIES), f'{i} ST', rng.random() < 0.7))
+            rows.append((ns, rng.choice(CATEGORIES), f'{i} AVE', rng.random() < 0.7))
+    return rows
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    n_trips = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ml = _load(sys.argv[3] if len(sys.argv) > 3 else PLUGIN)
+
+    rows = _lattice_rows(side)
+    ml._route_source_rows = lambda debug=False: rows
+    ml._node_elevations = lambda nodes, debug=False: {}
+
+    import numpy  # noqa: F401 -- keep the import itself out of the measurement
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    graph = ml._build_route_graph()
+    build_s = time.perf_counter() - started
+    gc.collect()
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ml._get_route_graph = lambda debug=False: graph
+    if 'lat' in graph:
+        points = list(zip(graph['lat'].tolist(), graph['lon'].tolist()))
+    else:
+        points = list(graph['nodes'].values())
+    print(
+        f'{len(points)} nodes, graph retains {retained / 1e6:.1f} MB '
+        f'(built in {build_s:.1f} s)'
+    )
+
+    rng = random.Random(SEED)
+    pairs = [tuple(rng.sample(points, 2)) for _ in range(n_trips)]
+    has_landmarks = hasattr(ml, '_build_route_landmarks')
+    has_bidirectional = hasattr(ml, 'ROUTE_BIDIRECTIONAL')
+    token = ml._NIGHT_OVERRIDE.set(False)
+    try:
+        for mode in MODES:
+            if not has_landmarks:
+                _sweeps(ml, pairs, mode, 'plain', has_bidirectional)
+                continue
+            max_profiles = ml.ROUTE_LANDMARK_MAX_PROFILES
+            ml.ROUTE_LANDMARK_MAX_PROFILES = 0   # no background builds: plain A*
+            try:
+                _sweeps(ml, pairs, mode, 'plain', has_bidirectional)
+            finally:
+                ml.ROUTE_LANDMARK_MAX_PROFILES = max_profiles
+            started = time.perf_counter()
+            ml._build_route_landmarks(graph, ml._weight_profile(mode))
+            print(f'  {mode:5} landmarks built in {time.perf_counter() - started:.1f} s')
+            _sweeps(ml, pairs, mode, 'landmarks', has_bidirectional)
+        if hasattr(ml, '_pareto_paths'):
+            for mode in MODES:
+                _options_sweep(ml, pairs, mode)
+    finally:
+        ml._NIGHT_OVERRIDE.reset(token)
+
+
+def _sweeps(ml, pairs: list, mode: str, label: str, has_bidirectional: bool):
+    if not has_bidirectional:
+        _sweep(ml, pairs, mode, label)
+        return
+    default = ml.ROUTE_BIDIRECTIONAL
+    try:
+        for bidirectional in (False, True):
+            ml.ROUTE_BIDIRECTIONAL = bidirectional
+            _sweep(ml, pairs, mode, label + ('/bidi' if bidirectional else '/uni'))
+    finally:
+        ml.ROUTE_BIDIRECTIONAL = default
+
+
+def _sweep(ml, pairs: list, mode: str, label: str):
+    timings, settled = [], []
+    for (alat, alon), (blat, blon) in pairs:
+        stats: dict = {}
+        kwargs = {'stats': stats} if hasattr(ml, '_route_landmarks') else {}
+        started = time.perf_counter()
+        try:
+            ml._route_core(alat, alon, blat, blon, mode=mode, **kwargs)
+        except ValueError:
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+        if 'settled' in stats:
+            settled.append(stats['settled'])
+    line = (
+        f'  {mode:5} {label:14} {len(timings)} routes  '
+        f'p50 {_percentile(timings, 0.5):.1f} ms  '
+        f'p90 {_percentile(timings, 0.9):.1f} ms  '
+        f'p99 {_percentile(timings, 0.99):.1f} ms'
+    )
+    if settled:
+        line += f'  settled p50 {_percentile(settled, 0.5)}'
+    print(line)
+
+
+def _options_sweep(ml, pairs: list, mode: str):
+    timings, popped, options = [], [], []
+    for (alat, alon), (blat, blon) in pairs:
+        stats: dict = {}
+        started = time.perf_counter()
+        try:
+            found = ml._route_options(alat, alon, blat, blon, mode=mode, stats=stats)
+        except ValueError:
+            continue
+        timings.append((time.perf_counter() - started) * 1000)
+        popped.append(stats.get('popped', 0))
+        options.append(len(found))
+    if not timings:
+        return
+    capped = sum(1 for n in popped if n >= ml.PARETO_MAX_POPS)
+    print(
+        f'  {mode:5} {"options":14} {len(timings)} searches  '
+        f'p50 {_percentile(timings, 0.5):.1f} ms  '
+        f'p90 {_percentile(timings, 0.9):.1f} ms  '
+        f'p99 {_percentile(timings, 0.99):.1f} ms  '
+        f'popped p50 {_percentile(popped, 0.5)} p99 {_percentile(popped, 0.99)} '
+        f'max {max(popped)}  capped {capped} (at {ml.PARETO_MAX_POPS})  '
+        f'options/search {sum(options) / len(options):.2f}'
+    )
+
+if __name__ == '__main__':
+    main()
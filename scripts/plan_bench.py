@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Multi-modal benchmark: end-to-end `_route_multimodal` latency with a
+GBFS round trip versus an instant feed, on the synthetic lattice of
+`graph_bench.py` so it runs anywhere. The difference is how much of the
+round trip the prefetch (started ahead of the plans) leaves on the
+request's critical path.
+
+    python3 scripts/plan_bench.py [SIDE] [N_TRIPS] [GBFS_MS]
+
+Each trip asks for bike + walk + bike share, with a dock every ~600 m. The
+GBFS feed is simulated: `_fetch_bcycle_stations` sleeps GBFS_MS (default
+250, about the live feed's round trip) before answering, the way a network
+wait would.
+The plan cache is cleared before every trip so each one is computed cold,
+and landmark tables are built up front as they would be in production.
+Transit is left out: it needs the GTFS feed from the database.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import graph_bench  # noqa: E402
+
+DOCK_EVERY = 6       # blocks (~100 m each) between docks, both ways
+
+
+def _stations(ml, side: int, delay_s: float) -> list:
+    lat0, lon0 = graph_bench.ORIGIN
+    docks = [
+        {
+            'id': f'{i}-{j}',
+            'name': f'Dock {i}-{j}',
+            'lat': lat0 + i * graph_bench.BLOCK_DEG,
+            'lon': lon0 + j * graph_bench.BLOCK_DEG,
+            'bikes': 5,
+            'docks': 5,
+            'is_renting': True,
+            'is_returning': True,
+        }
+        for i in range(0, side + 1, DOCK_EVERY)
+        for j in range(0, side + 1, DOCK_EVERY)
+    ]
+
+    def _fetch():
+        time.sleep(delay_s)
+        return docks
+
+    return _fetch
+
+
+def main():
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    n_trips = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    delay_s = (float(sys.argv[3]) if len(sys.argv) > 3 else 250.0) / 1000
+    ml = graph_bench._load(graph_bench.PLUGIN)
+
+    rows = graph_bench._lattice_rows(side)
+    ml._route_source_rows = lambda debug=False: rows
+    ml._node_elevations = lambda nodes, debug=False: {}
+    graph = ml._build_route_graph()
+    ml._get_route_graph = lambda debug=False: graph
+    for mode in ('bike', 'walk'):
+        ml._build_route_landmarks(graph, ml._weight_profile(mode))
+
+    rng = random.Random(graph_bench.SEED)
+    points = list(zip(graph['lat'].tolist(), graph['lon'].tolist()))
+    pairs = [tuple(rng.sample(points, 2)) for _ in range(n_trips)]
+    print(
+        f'{len(points)} nodes, {n_trips} trips, bike + walk + bcycle, '
+        f'GBFS {delay_s * 1000:.0f} ms'
+    )
+    token = ml._NIGHT_OVERRIDE.set(False)
+    try:
+        for wait_s in (0.0, delay_s):
+            ml._fetch_bcycle_stations = _stations(ml, side, wait_s)
+            timings = []
+            for (alat, alon), (blat, blon) in pairs:
+                ml._ROUTE_CACHE.clear()
+                started = time.perf_counter()
+                try:
+                    ml._route_multimodal(
+                        alat, alon, blat, blon,
+                        modes={'bike', 'walk'}, bcycle=True,
+                    )
+                except ValueError:
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f'  GBFS {wait_s * 1000:3.0f} ms {len(timings)} trips  '
+                f'p50 {graph_bench._percentile(timings, 0.5):.0f} ms  '
+                f'p90 {graph_bench._percentile(timings, 0.9):.0f} ms  '
+                f'mean {sum(timings) / max(len(timings), 1):.0f} ms'
+            )
+    finally:
+        ml._NIGHT_OVERRIDE.reset(token)
+
+
+if __name__ == '__main__':
+    main()
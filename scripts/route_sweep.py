@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
-"""Routing health sweep: sample many trips over the real graph and flag the
-ones that look broken, so bad routing surfaces before a rider finds it.
+"""Routing health and performance sweep: sample many trips, flag the ones
+that look broken, and measure the searches, so bad routing and slow routing
+both surface before a rider finds them.
 
-    python3 scripts/route_sweep.py [N_TRIPS] [MODE ...]
+    python3 scripts/route_sweep.py [N_TRIPS] [MODE ...] [--graph SOURCE]
+        [--freeze DIR] [--json OUT] [--baseline FILE] [--tolerance FRACTION]
 
-Builds the graph from the live sql:bwg data (~25 s), routes N sampled
-node-pair trips (default 150) per mode (default bike + walk), and reports
-anomalies:
+`--graph` picks what to route on:
+
+  * live            — built from the sql:bwg data (~25 s), or the export's
+                      snapshot when current (the default)
+  * lattice[:SIDE]  — the synthetic street lattice of `graph_bench.py`
+                      (default 80 x 80 blocks, flat): no database, frozen
+  * snapshot:DIR    — a graph snapshot directory (`current.json` + arrays),
+                      e.g. one frozen with `--freeze DIR`: no database
+
+It routes N sampled node-pair trips (default 150) per mode (default bike +
+walk), and reports anomalies:
 
   * uturns   — more than one U-turn maneuver in a single route
   * unnamed  — >40% of the distance narrated with no street name
@@ -15,13 +25,27 @@ anomalies:
   * error    — no route at all / street fallback
 
 Sampling is seeded, so two runs (e.g. before and after a weights change)
-flag comparable trips. Exit code 1 when anomaly share exceeds 10%.
+flag comparable trips. Performance is measured on the same trips: latency
+percentiles and A* settled / pushed counts per mode, once for the default
+(bidirectional) search and once more for the one-directional one, with a
+count of trips where the two disagree on distance; graph build time per
+phase and landmark builds; the graph's resident memory and the peak RSS.
+
+`--json OUT` writes all of it as JSON. `--baseline FILE` compares against
+such a file and lists every metric that got worse by more than
+`--tolerance` (default 0.25 for times, see TOLERANCE) -- counts and memory
+are deterministic on a frozen graph, so they are held tighter. Exit code 1
+when the anomaly share exceeds 10% or anything regressed.
 """
 
+import argparse
 import importlib.util
+import json
+import os
 import random
+import resource
 import sys
-import os
+import time
 
 PLUGIN = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
@@ -39,6 +63,12 @@ RATIO = 2.6
 MIN_TRIP_M = 800.0   # crow-fly; sub-kilometre trips make ratios meaningless
 SEED = 20260807
 
+#: Allowed worsening per metric kind before `--baseline` calls it a
+#: regression, as a fraction of the baseline (`--tolerance` scales the time
+#: ones), and the absolute change under which it is noise regardless.
+TOLERANCE = {'ms': 0.25, 's': 0.25, 'count': 0.05, 'mb': 0.15}
+NOISE_FLOOR = {'ms': 1.0, 's': 0.05, 'count': 5, 'mb': 2.0}
+
 
 def _load():
     spec = importlib.util.spec_from_file_location('bwg_map_layers_sweep', PLUGIN)
@@ -48,13 +78,152 @@ def _load():
     return module
 
 
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _rss_mb() -> float | None:
+    """Current resident set size (Linux), or None where /proc isn't there."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1e6 if sys.platform == 'darwin' else 1e3)
+
+
+def _build_phases(graph: dict, phases: dict):
+    """Add the seconds of each phase the graph's build log recorded (see
+    `_build_lap`) to `phases`. A mapped snapshot logged its phases on the
+    machine that built it, so those don't count here."""
+    build = graph.get('build') or {}
+    if build.get('source') == 'snapshot':
+        return
+    for lap in build.get('phases', []):
+        phases[lap['phase']] = phases.get(lap['phase'], 0.0) + lap['seconds']
+
+
+def _graph(ml, source: str, phases: dict):
+    """(graph, seconds to build or map it) for `--graph source`; routing is
+    pointed at it."""
+    kind, _, arg = source.partition(':')
+    started = time.perf_counter()
+    if kind == 'lattice':
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import graph_bench
+        rows = graph_bench._lattice_rows(int(arg or 80))
+        ml._route_source_rows = lambda debug=False: rows
+        ml._node_elevations = lambda nodes, debug=False: {}
+        # Frozen means frozen: no elevation export from this machine.
+        ml._elevation_grid = lambda: None
+        graph = ml._build_route_graph()
+    elif kind == 'snapshot':
+        graph = ml._load_route_snapshot(root=arg)
+        if graph is None:
+            sys.exit(f"No current routing graph snapshot under '{arg}'.")
+    elif kind == 'live':
+        graph = ml._get_route_graph()
+    else:
+        sys.exit(f"Unknown --graph '{source}': live, lattice[:SIDE] or snapshot:DIR.")
+    seconds = time.perf_counter() - started
+    _build_phases(graph, phases)
+    ml._get_route_graph = lambda debug=False: graph
+    return graph, seconds
+
+
+def _stats(timings: list, settled: list, pushed: list) -> dict:
+    out = {'trips': len(timings)}
+    if timings:
+        out.update({
+            'p50_ms': round(_pct(timings, 0.5), 2),
+            'p90_ms': round(_pct(timings, 0.9), 2),
+            'p99_ms': round(_pct(timings, 0.99), 2),
+        })
+    if settled:
+        out.update({
+            'settled_p50': _pct(settled, 0.5),
+            'settled_p99': _pct(settled, 0.99),
+        })
+    if pushed:
+        out.update({
+            'pushed_p50': _pct(pushed, 0.5),
+            'pushed_p99': _pct(pushed, 0.99),
+        })
+    return out
+
+
+def _kind(metric: str) -> str:
+    if metric.endswith('_ms'):
+        return 'ms'
+    if metric.endswith('_mb'):
+        return 'mb'
+    if metric.endswith('_s'):
+        return 's'
+    return 'count'
+
+
+def _compare(result: dict, baseline: dict, time_tolerance: float) -> list[str]:
+    """Every metric of `result` worse than `baseline`'s by more than its
+    tolerance (and the noise floor), as printable lines."""
+    regressions = []
+
+    def _check(label, metric, new, old, kind=None):
+        if new is None or old is None:
+            return
+        kind = kind or _kind(metric)
+        tolerance = time_tolerance if kind in ('ms', 's') else TOLERANCE[kind]
+        if new - old > max(old * tolerance, NOISE_FLOOR[kind]):
+            regressions.append(f'{label} {metric}: {old} -> {new}')
+
+    for key, metrics in baseline.get('perf', {}).items():
+        for metric, old in metrics.items():
+            if metric != 'trips':
+                _check(key, metric, result['perf'].get(key, {}).get(metric), old)
+    old_graph, new_graph = baseline.get('graph', {}), result['graph']
+    for metric in ('build_s', 'graph_rss_mb'):
+        _check('graph', metric, new_graph.get(metric), old_graph.get(metric))
+    for phase, old in old_graph.get('phases', {}).items():
+        _check('graph', phase, new_graph['phases'].get(phase), old, kind='s')
+    _check('process', 'peak_rss_mb', result.get('peak_rss_mb'), baseline.get('peak_rss_mb'))
+    old_share = baseline.get('quality', {}).get('flagged_share')
+    new_share = result['quality']['flagged_share']
+    if old_share is not None and new_share > old_share + 0.02:
+        regressions.append(f'quality flagged_share: {old_share} -> {new_share}')
+    return regressions
+
+
 def main():
-    n_trips = int(sys.argv[1]) if len(sys.argv) > 1 else 150
-    modes = sys.argv[2:] or ['bike', 'walk']
+    parser = argparse.ArgumentParser(
+        description="Routing health and performance sweep.",
+    )
+    parser.add_argument('n_trips', nargs='?', type=int, default=150)
+    parser.add_argument('modes', nargs='*')
+    parser.add_argument('--graph', default='live')
+    parser.add_argument('--freeze', metavar='DIR',
+                        help="write the graph as a snapshot under DIR, for "
+                             "later runs with --graph snapshot:DIR")
+    parser.add_argument('--json', metavar='OUT')
+    parser.add_argument('--baseline', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE['ms'])
+    args = parser.parse_args()
+    n_trips = args.n_trips
+    modes = args.modes or ['bike', 'walk']
 
     ml = _load()
-    graph = ml._get_route_graph()
-    nodes = list(graph['nodes'].values())
+    phases: dict = {}
+    rss_before = _rss_mb()
+    graph, build_s = _graph(ml, args.graph, phases)
+    rss_after = _rss_mb()
+    if args.freeze:
+        path = ml._write_route_snapshot(graph, graph.get('sync_time'), root=args.freeze)
+        print(f'Froze the graph to {path}')
+    nodes = list(zip(graph['lat'].tolist(), graph['lon'].tolist()))
     rng = random.Random(SEED)
 
     pairs = []
@@ -66,16 +235,30 @@ def main():
     token = ml._NIGHT_OVERRIDE.set(False)
     flagged = []
     ok = 0
+    perf = {}
+    distances = {}
     try:
         for mode in modes:
+            timings, settled, pushed = perf.setdefault((mode, 'bidi'), ([], [], []))
+            # Measure the steady state, not the trips before the background
+            # landmark build lands.
+            started = time.perf_counter()
+            ml._build_route_landmarks(graph, ml._weight_profile(mode))
+            phases[f'landmarks:{mode}'] = time.perf_counter() - started
             for (alat, alon), (blat, blon) in pairs:
                 crow = ml._equirect_m(alat, alon, blat, blon)
+                stats = {}
+                started = time.perf_counter()
                 try:
-                    f = ml._route_core(alat, alon, blat, blon, mode=mode)
+                    f = ml._route_core(alat, alon, blat, blon, mode=mode, stats=stats)
                 except ValueError as e:
                     flagged.append((mode, (alat, alon), (blat, blon), f'error: {e}'))
                     continue
+                timings.append((time.perf_counter() - started) * 1000)
+                settled.append(stats.get('settled', 0))
+                pushed.append(stats.get('pushed', 0))
                 p = f['properties']
+                distances[(mode, (alat, alon), (blat, blon))] = p['distance_m']
                 steps = p['steps']
                 problems = []
                 uturns = sum(1 for s in steps if s['maneuver'] == 'uturn')
@@ -99,6 +282,7 @@ def main():
                     flagged.append((mode, (alat, alon), (blat, blon), '; '.join(problems)))
                 else:
                     ok += 1
+        mismatched = _compare_unidirectional(ml, pairs, modes, perf, distances)
     finally:
         ml._NIGHT_OVERRIDE.reset(token)
 
@@ -107,7 +291,94 @@ def main():
           f'({len(flagged) / max(total, 1):.0%}).')
     for mode, a, b, why in flagged:
         print(f'  {mode:5} {a[0]:.5f},{a[1]:.5f} -> {b[0]:.5f},{b[1]:.5f}  {why}')
-    sys.exit(1 if len(flagged) > total * 0.10 else 0)
+    for (mode, search), (timings, settled, pushed) in perf.items():
+        if timings:
+            print(f'  {mode:5} {search:4} p50 {_pct(timings, 0.5):.1f} ms  '
+                  f'p99 {_pct(timings, 0.99):.1f} ms  '
+                  f'settled p50 {_pct(settled, 0.5)}  p99 {_pct(settled, 0.99)}  '
+                  f'pushed p50 {_pct(pushed, 0.5)}')
+    # Equal-cost ties aside, anything here is a search bug.
+    print(f'  {mismatched} trips where the two searches disagree on distance')
+    print(f'  graph ({args.graph}): {len(nodes)} nodes in {build_s:.2f} s; '
+          + ', '.join(f'{k} {v:.2f} s' for k, v in phases.items()))
+
+    result = {
+        'graph': {
+            'source': args.graph,
+            'nodes': len(nodes),
+            'edges': int(len(graph['nbr'])),
+            'build_s': round(build_s, 3),
+            'phases': {k: round(v, 3) for k, v in phases.items()},
+            'graph_rss_mb': (
+                round(rss_after - rss_before, 1)
+                if rss_before is not None and rss_after is not None else None
+            ),
+        },
+        'trips': n_trips,
+        'modes': modes,
+        'seed': SEED,
+        'quality': {
+            'routed': total,
+            'clean': ok,
+            'flagged_share': round(len(flagged) / max(total, 1), 4),
+            'flagged': [
+                {'mode': mode, 'from': list(a), 'to': list(b), 'why': why}
+                for mode, a, b, why in flagged
+            ],
+            'search_mismatches': mismatched,
+        },
+        'perf': {
+            f'{mode}/{search}': _stats(*series)
+            for (mode, search), series in perf.items()
+        },
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'  wrote {args.json}')
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline.get('graph', {}).get('source'), baseline.get('trips')) != (
+            args.graph, n_trips,
+        ):
+            print(f'  note: baseline is {baseline.get("graph", {}).get("source")} '
+                  f'x {baseline.get("trips")} trips; this run is {args.graph} '
+                  f'x {n_trips}, so the numbers may not be comparable')
+        regressions = _compare(result, baseline, args.tolerance)
+        print(f'\n{len(regressions)} regressions against {args.baseline}.')
+        for line in regressions:
+            print(f'  {line}')
+    sys.exit(1 if len(flagged) > total * 0.10 or regressions else 0)
+
+
+def _compare_unidirectional(ml, pairs, modes, perf, distances) -> int:
+    """Time the same trips on the one-directional search; returns how many
+    came out a different length than the bidirectional pass."""
+    mismatched = 0
+    default = ml.ROUTE_BIDIRECTIONAL
+    ml.ROUTE_BIDIRECTIONAL = False
+    try:
+        for mode in modes:
+            timings, settled, pushed = perf.setdefault((mode, 'uni'), ([], [], []))
+            for a, b in pairs:
+                expected = distances.get((mode, a, b))
+                if expected is None:
+                    continue
+                stats = {}
+                started = time.perf_counter()
+                f = ml._route_core(*a, *b, mode=mode, stats=stats)
+                timings.append((time.perf_counter() - started) * 1000)
+                settled.append(stats.get('settled', 0))
+                pushed.append(stats.get('pushed', 0))
+                if abs(f['properties']['distance_m'] - expected) > 0.5:
+                    mismatched += 1
+    finally:
+        ml.ROUTE_BIDIRECTIONAL = default
+    return mismatched
 
 
 if __name__ == '__main__':
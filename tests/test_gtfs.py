@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Schedule-folding tests for `plugins/gtfs.py`: GTFS times to seconds and
+`stop_times.txt` to one row per trip, as `map-layers` builds its RAPTOR
+timetable from. The fetch itself needs the network; these run on a feed
+built in memory.
+
+    python3 -m pytest tests/
+"""
+
+import importlib.util
+import io
+import os
+import sys
+import zipfile
+
+PLUGIN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'plugins', 'gtfs.py',
+)
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location('bwg_gtfs', PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['bwg_gtfs'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+gtfs = _load_module()
+
+
+def _feed(stop_times: list[tuple]) -> zipfile.ZipFile:
+    """A feed holding only stop_times.txt, rows as (trip_id, stop_sequence,
+    stop_id, arrival_time, departure_time)."""
+    lines = ['trip_id,arrival_time,departure_time,stop_id,stop_sequence']
+    lines += [
+        f'{trip},{arrival},{departure},{stop},{sequence}'
+        for trip, sequence, stop, arrival, departure in stop_times
+    ]
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        # Feeds are often saved with a byte-order mark; the reader drops it.
+        zf.writestr('stop_times.txt', '\ufeff' + '\n'.join(lines) + '\n')
+    return zipfile.ZipFile(io.BytesIO(buf.getvalue()))
+
+
+def test_seconds_runs_past_midnight():
+    assert gtfs._seconds('08:05:30') == 8 * 3600 + 5 * 60 + 30
+    assert gtfs._seconds('24:10:00') == 86400 + 600
+    assert gtfs._seconds(' 25:00:01 ') == 90001
+    assert gtfs._seconds('') is None
+    assert gtfs._seconds(None) is None
+
+
+def test_fill_times_interpolates_between_timepoints():
+    assert gtfs._fill_times([100, None, None, 400]) == [100, 200, 300, 400]
+    # Uneven gaps each interpolate on their own, by stop count.
+    assert gtfs._fill_times([0, None, 100, None, None, None, 500]) == [
+        0, 50, 100, 200, 300, 400, 500,
+    ]
+    # Untimed stops before the first timepoint or after the last hold it.
+    assert gtfs._fill_times([None, 60, None, 120, None]) == [60, 60, 90, 120, 120]
+    assert gtfs._fill_times([None, None]) == []
+    assert gtfs._fill_times([]) == []
+
+
+def test_trip_timetables_fold_stop_times_per_trip():
+    zf = _feed([
+        # Listed out of order; the folded trip follows stop_sequence.
+        ('late', 3, 'C', '24:20:00', '24:20:00'),
+        ('late', 1, 'A', '23:50:00', '23:51:00'),
+        ('late', 2, 'B', '', ''),
+        # Only the departure given at the first stop, only the arrival at
+        # the last: each stands in for the other.
+        ('edges', 1, 'A', '', '07:00:00'),
+        ('edges', 2, 'B', '07:10:00', ''),
+    ])
+    trips = {doc['trip_id']: doc for doc in gtfs._trip_timetables(zf)}
+    assert set(trips) == {'late', 'edges'}
+    late = trips['late']
+    assert late['stop_ids'] == ['A', 'B', 'C']
+    assert late['arrivals'] == [85800, 86700, 87600]
+    assert late['departures'] == [85860, 86730, 87600]
+    edges = trips['edges']
+    assert edges['arrivals'] == [25200, 25800]
+    assert edges['departures'] == [25200, 25800]
+
+
+def test_trip_timetables_skip_trips_with_no_timed_stop():
+    zf = _feed([
+        ('untimed', 1, 'A', '', ''),
+        ('untimed', 2, 'B', '', ''),
+        ('single', 1, 'A', '08:00:00', '08:00:00'),
+        ('timed', 1, 'A', '09:00:00', '09:00:00'),
+        ('timed', 2, 'B', '09:04:00', '09:05:00'),
+    ])
+    assert [doc['trip_id'] for doc in gtfs._trip_timetables(zf)] == ['timed']
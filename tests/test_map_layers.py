@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""Layer-serving tests for `plugins/map-layers.py` (the routing graph has
+its own file).
+
+Anything that runs SQL needs the database; these cover what runs here: the
+tile math, the MVT encoder builder layers are cut with (checked with a small
+protobuf reader below), MBTiles seeding and lookup, ETags, and how streamed
+viewport queries are stitched into one FeatureCollection.
+
+    python3 -m pytest tests/
+"""
+
+import gzip
+import importlib.util
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PLUGIN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'plugins', 'map-layers.py',
+)
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location('bwg_map_layers_serving', PLUGIN)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['bwg_map_layers_serving'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+ml = _load_module()
+
+#: Downtown Greenville, and a tile well away from it.
+DOWNTOWN = (34.8526, -82.3940)
+
+
+def _fields(data: bytes) -> list[tuple[int, object]]:
+    """(field number, value) pairs of one protobuf message: ints for
+    varints, bytes for length-delimited fields, floats for doubles."""
+    out, i = [], 0
+
+    def _varint():
+        nonlocal i
+        value = shift = 0
+        while True:
+            byte = data[i]
+            i += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                return value
+
+    while i < len(data):
+        key = _varint()
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            out.append((field, _varint()))
+        elif wire == 1:
+            out.append((field, struct.unpack('<d', data[i:i + 8])[0]))
+            i += 8
+        elif wire == 2:
+            size = _varint()
+            out.append((field, data[i:i + size]))
+            i += size
+        else:
+            raise ValueError(f'wire type {wire}')
+    return out
+
+
+def _packed(data: bytes) -> list[int]:
+    values, i = [], 0
+    while i < len(data):
+        value = shift = 0
+        while True:
+            byte = data[i]
+            i += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        values.append(value)
+    return values
+
+
+def _decode(tile: bytes) -> dict:
+    """The one layer of an MVT: name, extent, keys, values and features as
+    (type, geometry commands, {key: value})."""
+    (field, layer), = _fields(tile)
+    assert field == 3
+    layer = _fields(layer)
+    keys = [v.decode() for f, v in layer if f == 3]
+    values = []
+    for f, v in layer:
+        if f == 4:
+            (kind, value), = _fields(v)
+            values.append(value.decode() if kind == 1 else value)
+    features = []
+    for f, v in layer:
+        if f != 2:
+            continue
+        feature = dict(_fields(v))
+        tags = _packed(feature.get(2, b''))
+        props = {keys[tags[k]]: values[tags[k + 1]] for k in range(0, len(tags), 2)}
+        features.append((feature[3], _packed(feature[4]), props))
+    return {
+        'name': dict(layer)[1].decode(),
+        'version': dict(layer)[15],
+        'extent': dict(layer)[5],
+        'features': features,
+    }
+
+
+def _points(commands: list[int]) -> list[tuple[int, int]]:
+    """Absolute tile coordinates visited by a geometry command stream."""
+    cx = cy = 0
+    points, commands = [], list(commands)
+    while commands:
+        command = commands.pop(0)
+        if command & 7 == 7:
+            continue
+        for _ in range(command >> 3):
+            dx, dy = commands.pop(0), commands.pop(0)
+            cx += (dx >> 1) ^ -(dx & 1)
+            cy += (dy >> 1) ^ -(dy & 1)
+            points.append((cx, cy))
+    return points
+
+
+def _tile_of(z, lat, lon):
+    x0, y0, _x1, _y1 = ml._tile_range(z, lon, lat, lon, lat)
+    return x0, y0
+
+
+def test_tile_range_and_bounds_agree():
+    z = 14
+    x, y = _tile_of(z, *DOWNTOWN)
+    minx, miny, maxx, maxy = ml._tile_bounds(z, x, y)
+    lat, lon = DOWNTOWN
+    mx = lon * ml._MERC_HALF / 180
+    assert minx <= mx < maxx
+    assert abs((maxx - minx) - 2 * ml._MERC_HALF / 2 ** z) < 1e-6
+    x0, y0, x1, y1 = ml._tile_range(z, *ml.SEARCH_BOUNDS)
+    assert x0 <= x <= x1 and y0 <= y <= y1
+    assert ml._tile_range(0, -180, -85, 180, 85) == (0, 0, 0, 0)
+
+
+def test_mvt_geometry_commands_follow_the_spec():
+    # The spec's own examples: a point at (25, 17) and the line
+    # (2,2) -> (2,10) -> (10,10).
+    assert ml._mvt_geometry(1, [[(25, 17)]]) == [9, 50, 34]
+    assert ml._mvt_geometry(2, [[(2, 2), (2, 10), (10, 10)]]) == [9, 4, 4, 18, 0, 16, 16, 0]
+    # Polygon (3,6) (8,12) (20,34), closed.
+    assert ml._mvt_geometry(3, [[(3, 6), (8, 12), (20, 34)]]) == [
+        9, 6, 12, 18, 10, 12, 24, 44, 15,
+    ]
+
+
+def test_encoded_layer_decodes():
+    tile = ml._encode_mvt('landmarks', [
+        (1, [[(10, 20)]], {'name': 'The Paperclip', 'rank': 3, 'note': None}),
+        (2, [[(0, 0), (5, 5)]], {'name': 'Trail', 'lit': True, 'grade': -2.5}),
+    ])
+    layer = _decode(tile)
+    assert layer['name'] == 'landmarks'
+    assert layer['version'] == 2
+    assert layer['extent'] == ml.TILE_EXTENT
+    (k1, g1, p1), (k2, g2, p2) = layer['features']
+    assert (k1, g1, p1) == (1, [9, 20, 40], {'name': 'The Paperclip', 'rank': 3})
+    assert k2 == 2 and g2 == [9, 0, 0, 10, 10, 10]
+    assert p2 == {'name': 'Trail', 'lit': 1, 'grade': -2.5}
+    assert ml._encode_mvt('empty', []) == b''
+
+
+def test_builder_layer_tiles_clip_and_orient():
+    lat, lon = DOWNTOWN
+    square = [[lon, lat], [lon + 0.002, lat], [lon + 0.002, lat + 0.002],
+              [lon, lat + 0.002], [lon, lat]]
+    fc = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'name': 'Lot'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square]}},
+        {'type': 'Feature', 'properties': {'name': 'Path'},
+         'geometry': {'type': 'LineString',
+                      'coordinates': [[lon - 0.05, lat], [lon + 0.05, lat]]}},
+    ]}
+    original = ml._layer_geojson_text
+    ml._layer_geojson_text = lambda layer_id: json.dumps(fc)
+    ml._TILE_SOURCES.pop('parking-landuse', None)
+    try:
+        z = 16
+        x, y = _tile_of(z, lat + 0.001, lon + 0.001)
+        layer = _decode(ml._render_tile('parking-landuse', z, x, y))
+        kinds = {props['name']: (kind, geometry) for kind, geometry, props in layer['features']}
+        kind, geometry = kinds['Lot']
+        assert kind == 3 and geometry[-1] == 15
+        # Exterior ring: positive surveyor's area in tile space.
+        ring = _points(geometry)
+        area = sum(ax * by - bx * ay for (ax, ay), (bx, by) in zip(ring, ring[1:] + ring[:1]))
+        assert area > 0
+        # The 9 km path is clipped to the tile plus its buffer.
+        kind, geometry = kinds['Path']
+        assert kind == 2
+        xs = [px for px, _py in _points(geometry)]
+        assert min(xs) == -ml.TILE_BUFFER
+        assert max(xs) == ml.TILE_EXTENT + ml.TILE_BUFFER
+        far_x, far_y = _tile_of(z, lat + 0.2, lon + 0.2)
+        assert ml._render_tile('parking-landuse', z, far_x, far_y) == b''
+    finally:
+        ml._layer_geojson_text = original
+        ml._TILE_SOURCES.pop('parking-landuse', None)
+
+
+def test_mbtiles_seed_descends_only_into_tiles_with_features():
+    lat, lon = DOWNTOWN
+    z0, z1 = 12, 14
+    hit = (z1, *_tile_of(z1, lat, lon))
+    rendered = []
+
+    def _has_features(z, x, y):
+        # Downtown's column of tiles down to z13, then only downtown's tile.
+        minx, _miny, maxx, _maxy = ml._tile_bounds(z, x, y)
+        return minx <= lon * ml._MERC_HALF / 180 < maxx and z < z1 or (z, x, y) == hit
+
+    def _render(layer_id, z, x, y):
+        rendered.append((z, x, y))
+        return b'tile' if _has_features(z, x, y) else b''
+
+    original = ml._render_tile
+    ml._render_tile = _render
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            path, written = ml._write_mbtiles('landmarks', root, z0, z1)
+            assert path.name == 'landmarks.mbtiles'
+            assert os.listdir(root) == [path.name]
+            assert gzip.decompress(ml._seeded_tile('landmarks', *hit, root=root)) == b'tile'
+            # Rendered but empty, and never rendered, both read as empty.
+            assert ml._seeded_tile('landmarks', z1, hit[1] + 1, hit[2], root=root) == b''
+            assert ml._seeded_tile('landmarks', z1, hit[1] + 9, hit[2], root=root) == b''
+            assert ml._seeded_tile('other', *hit, root=root) is None
+            # One connection per file, reopened once a new seed replaces it.
+            db = ml._mbtiles_db(path)[0]
+            assert ml._mbtiles_db(path)[0] is db
+            ml._render_tile = lambda *args: b'tile'
+            os.utime(path, ns=(0, 0))
+            ml._write_mbtiles('landmarks', root, z1, z1)
+            assert ml._mbtiles_db(path)[0] is not db
+            assert ml._seeded_tile('landmarks', z1, hit[1] + 1, hit[2], root=root) != b''
+            path.unlink()
+            assert ml._seeded_tile('landmarks', *hit, root=root) is None
+            assert str(path) not in ml._MBTILES
+    finally:
+        ml._render_tile = original
+    assert written == sum(_has_features(*t) for t in rendered)
+    assert hit in rendered
+    for z, x, y in rendered:
+        if z > z0:
+            assert _has_features(z - 1, x // 2, y // 2)
+
+
+def test_etag_matching():
+    etag = ml._etag(b'tile')
+    assert ml._etag_matches(etag, etag)
+    assert ml._etag_matches(f'"other", W/{etag}', etag)
+    assert ml._etag_matches('*', etag)
+    assert not ml._etag_matches('"other"', etag)
+    assert not ml._etag_matches(None, etag)
+    assert ml._etag(b'tile') != ml._etag(b'tiles')
+
+
+def test_each_encoding_gets_its_own_etag():
+    etag = ml._etag(b'tile')
+    tags = {ml._encoded_etag(etag, encoding) for encoding in (None, 'gzip', 'br')}
+    assert len(tags) == 3
+    assert ml._encoded_etag(etag, None) == etag
+    assert ml._encoded_etag(etag, 'gzip') == etag[:-1] + '-gzip"'
+    # Revalidating one form never answers 304 for another.
+    assert not ml._etag_matches(etag, ml._encoded_etag(etag, 'gzip'))
+    assert not ml._etag_matches(ml._encoded_etag(etag, 'br'), ml._encoded_etag(etag, 'gzip'))
+
+
+class _FakePipe:
+    instance_connector = object()
+    parameters = {'schema': 'pcc'}
+    target = 'stress_levels'
+
+
+def _bbox_chunks(batches, queries=None, closed=None):
+    def _stream(conn, query, size):
+        if queries is not None:
+            queries.append(query)
+        try:
+            yield from batches
+        finally:
+            if closed is not None:
+                closed.append(True)
+
+    originals = ml._layer_pipe, ml._layer_srid, ml._stream_rows
+    ml._layer_pipe = lambda layer: _FakePipe()
+    ml._layer_srid = lambda layer_id, conn, schema, target: 6570
+    ml._stream_rows = _stream
+    try:
+        return ml._build_bbox_geojson('bike-stress', -82.41, 34.84, -82.39, 34.86, 15)
+    finally:
+        ml._layer_pipe, ml._layer_srid, ml._stream_rows = originals
+
+
+def test_bbox_rows_stream_into_one_feature_collection():
+    feature = '{"type":"Feature","geometry":null,"properties":{"stress_level":"%s"}}'
+    queries = []
+    chunks = _bbox_chunks(
+        [[feature % 'H', feature % 'L'], [], [feature % 'M']], queries,
+    )
+    body = ''.join(chunks)
+    assert [f['properties']['stress_level'] for f in json.loads(body)['features']] == [
+        'H', 'L', 'M',
+    ]
+    (query,) = queries
+    assert "'street_name', \"street_name\"" in query
+    assert 'LIMIT 4000' in query
+    # Rows without a geometry are dropped, and NaN properties go out as null.
+    assert 'WHERE "gj" IS NOT NULL' in query
+    assert '"street_name"::text = \'NaN\' THEN NULL ELSE "street_name" END' in query
+    assert json.loads(''.join(_bbox_chunks([]))) == {
+        'type': 'FeatureCollection', 'features': [],
+    }
+
+
+def test_closing_a_bbox_stream_releases_its_cursor():
+    feature = '{"type":"Feature","geometry":null,"properties":{}}'
+    closed = []
+    chunks = _bbox_chunks([[feature], [feature]], closed=closed)
+    next(chunks)
+    next(chunks)
+    # The client went away mid-stream: the endpoint closes the iterator.
+    chunks.close()
+    assert closed == [True]
+
+
+def test_bbox_query_errors_raise_before_streaming():
+    def _failing():
+        raise RuntimeError('relation does not exist')
+        yield
+
+    try:
+        _bbox_chunks(_failing())
+    except RuntimeError:
+        return
+    raise AssertionError('expected the query error before streaming')
+
+
+def test_layer_artifacts_are_precompressed_and_hashed():
+    body = json.dumps({'type': 'FeatureCollection', 'features': []})
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        entry = ml._write_layer_artifacts(root, 'srt', body)
+        with open(root / 'index.json', 'w') as f:
+            json.dump({'layers': ml._layer_index({'srt': entry})}, f)
+        assert (root / 'srt.geojson').read_text() == body
+        assert gzip.decompress((root / 'srt.geojson.gz').read_bytes()).decode() == body
+        assert entry['bytes'] == len(body)
+        assert entry['encodings']['gzip'] == (root / 'srt.geojson.gz').stat().st_size
+        assert ('br' in entry['encodings']) == (ml._brotli() is not None)
+
+        artifact = ml._layer_artifact('srt', root)
+        assert artifact['etag'] == f'"{entry["hash"]}"'
+        assert artifact['encodings']['gzip'] == root / 'srt.geojson.gz'
+        assert ml._layer_artifact('bike-lanes', root) is None
+
+        # A new export with the same content keeps the hash; different
+        # content under an old index.json gets no ETag at all.
+        assert ml._write_layer_artifacts(root, 'srt', body)['hash'] == entry['hash']
+        ml._write_layer_artifacts(root, 'srt', body + ' ')
+        assert ml._layer_artifact('srt', root) is None
+
+
+def test_layer_artifacts_rewritten_at_the_same_size_lose_their_etag():
+    body = json.dumps({'type': 'FeatureCollection', 'features': []})
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        entry = ml._write_layer_artifacts(root, 'srt', body)
+        with open(root / 'index.json', 'w') as f:
+            json.dump({'layers': ml._layer_index({'srt': entry})}, f)
+        assert ml._layer_artifact('srt', root) is not None
+
+        # A sibling replaced by another of the same size is never sent.
+        gz = root / 'srt.geojson.gz'
+        os.utime(gz, ns=(entry['encoded_mtime_ns']['gzip'] + 10**9,) * 2)
+        assert 'gzip' not in ml._layer_artifact('srt', root)['encodings']
+
+        # Same length, different content: the old hash no longer applies.
+        path = root / 'srt.geojson'
+        path.write_text(body.replace('[]', '{}'))
+        os.utime(path, ns=(entry['mtime_ns'] + 10**9,) * 2)
+        assert path.stat().st_size == entry['bytes']
+        assert ml._layer_artifact('srt', root) is None
+
+        # An index.json from before mtimes were recorded validates nothing.
+        legacy = {k: v for k, v in entry.items() if k not in ('mtime_ns', 'encoded_mtime_ns')}
+        ml._write_layer_artifacts(root, 'srt', body)
+        with open(root / 'index.json', 'w') as f:
+            json.dump({'layers': ml._layer_index({'srt': legacy})}, f)
+        assert ml._layer_artifact('srt', root) is None
+
+
+def test_binary_layer_round_trips():
+    features = [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-82.394, 34.8526]},
+         'properties': {'name': 'Falls Park', 'bikes': 4}},
+        {'type': 'Feature', 'geometry': {'type': 'MultiLineString', 'coordinates': [
+            [[-82.4, 34.85], [-82.39, 34.86], [-82.38, 34.86]],
+            [[-82.37, 34.84], [-82.36, 34.83]],
+        ]}, 'properties': {'category': 'L'}},
+        {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [
+            [[-82.4, 34.8], [-82.3, 34.8], [-82.3, 34.9], [-82.4, 34.8]],
+            [[-82.38, 34.82], [-82.36, 34.82], [-82.36, 34.84], [-82.38, 34.82]],
+        ]}, 'properties': {'name': None}},
+        {'type': 'Feature', 'geometry': {'type': 'GeometryCollection', 'geometries': []},
+         'properties': {}},
+    ]
+    body = json.dumps({'type': 'FeatureCollection', 'features': features})
+    data = ml._encode_layer_binary(body)
+    assert data[:4] == ml.LAYER_BINARY_MAGIC and len(data) < len(body)
+
+    decoded = ml._decode_layer_binary(data)['features']
+    assert len(decoded) == 3   # the collection is dropped
+    for got, want in zip(decoded, features):
+        assert got['geometry']['type'] == want['geometry']['type']
+        assert got['properties'] == {
+            k: v for k, v in want['properties'].items() if v is not None
+        }
+        flat_got = json.dumps(got['geometry']['coordinates'])
+        assert flat_got.count('[') == json.dumps(want['geometry']['coordinates']).count('[')
+    assert decoded[0]['geometry']['coordinates'] == [
+        round(c / ml.LAYER_BINARY_SCALE) * ml.LAYER_BINARY_SCALE
+        for c in features[0]['geometry']['coordinates']
+    ]
+    hole = decoded[2]['geometry']['coordinates'][1]
+    assert abs(hole[1][0] - -82.36) < 1e-9 and abs(hole[2][1] - 34.84) < 1e-9
+
+
+def test_binary_layer_artifact_is_indexed_and_served():
+    body = json.dumps({'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [[-82.4, 34.85], [-82.39, 34.86]]},
+         'properties': {}},
+    ]})
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        entry = ml._write_layer_artifacts(root, 'srt', body)
+        index = ml._layer_index({'srt': entry})
+        with open(root / 'index.json', 'w') as f:
+            json.dump({'layers': index}, f)
+        data = (root / 'srt.bin').read_bytes()
+        assert gzip.decompress((root / 'srt.bin.gz').read_bytes()) == data
+        assert ml._decode_layer_binary(data)['features'][0]['geometry']['type'] == 'LineString'
+
+        srt = next(layer for layer in index if layer['id'] == 'srt')
+        assert srt['formats'] == ['geojson', 'bin']
+        assert srt['binary']['url'] == '/map-layers/srt.bin'
+        assert 'formats' not in next(layer for layer in index if layer['id'] == 'bike-lanes')
+
+        artifact = ml._layer_artifact('srt', root, suffix='.bin')
+        assert artifact['path'] == root / 'srt.bin'
+        assert artifact['etag'] == f'"{entry["binary"]["hash"]}"'
+        assert artifact['etag'] != ml._layer_artifact('srt', root)['etag']
+        assert ml._layer_artifact('bike-lanes', root, suffix='.bin') is None
+
+
+def test_encoding_negotiation():
+    available = {'gzip': None, 'br': None}
+    assert ml._negotiate_encoding('gzip, deflate, br', available) == 'br'
+    assert ml._negotiate_encoding('gzip, br;q=0', available) == 'gzip'
+    assert ml._negotiate_encoding('br', {'gzip': None}) is None
+    assert ml._negotiate_encoding('*', {'gzip': None}) == 'gzip'
+    assert ml._negotiate_encoding('identity', available) is None
+    assert ml._negotiate_encoding(None, available) is None
+
+
+def test_export_skips_unchanged_layers_and_follows_dependencies():
+    synced = {layer_id: 1000.0 for layer_id in ml.LAYERS}
+
+    class _Pipe:
+        def __init__(self, layer_id):
+            self.layer_id = layer_id
+
+    def _build(layer_id, debug=False):
+        if layer_id == 'vulnerable-crashes':
+            return None   # no data: skipped, not a failure
+        return json.dumps({
+            'type': 'FeatureCollection', 'features': [],
+            'synced': [synced[d] for d in ml.LAYERS[layer_id].get('depends_on', [layer_id])],
+        })
+
+    names = ('_output_dir', '_build_layer_geojson', '_layer_pipe', '_pipe_sync_time')
+    originals = {name: getattr(ml, name) for name in names}
+    with tempfile.TemporaryDirectory() as root:
+        ml._output_dir = lambda: Path(root)
+        ml._build_layer_geojson = _build
+        ml._layer_pipe = lambda layer: _Pipe(
+            next(k for k, v in ml.LAYERS.items() if v is layer)
+        )
+        ml._pipe_sync_time = lambda pipe, debug=False: synced[pipe.layer_id]
+        try:
+            success, message = ml.export_map_layers()
+            assert success, message
+            assert '(0 unchanged)' in message
+            first = ml._layer_artifacts(root)
+            assert 'vulnerable-crashes' not in first
+            assert 'fingerprint' not in first['parking-landuse']   # plain tables: always rebuilt
+            assert not [p for p in os.listdir(root) if p.endswith('.tmp')]
+
+            success, message = ml.export_map_layers()
+            assert success, message
+            # Everything but parking-landuse (and the empty layer) is skipped.
+            assert f'({len(ml.LAYERS) - 2} unchanged)' in message
+
+            synced['sidewalks-city'] = 2000.0
+            success, message = ml.export_map_layers()
+            assert f'({len(ml.LAYERS) - 4} unchanged)' in message
+            after = ml._layer_artifacts(root)
+            assert after['sidewalks']['hash'] != first['sidewalks']['hash']
+            assert after['sidewalks-county'] == first['sidewalks-county']
+
+            success, message = ml.export_map_layers(force=True)
+            assert '(0 unchanged)' in message
+        finally:
+            for name, value in originals.items():
+                setattr(ml, name, value)
+
+
+def test_export_rewrites_the_index_as_each_layer_lands():
+    from concurrent.futures import ThreadPoolExecutor
+    order = list(ml.LAYERS)[:2]
+    seen = []
+
+    def _build(layer_id, debug=False):
+        if layer_id not in order:
+            return None
+        if layer_id == order[1]:
+            # The first layer is in index.json before the second finishes.
+            deadline = time.monotonic() + 5
+            while order[0] not in ml._layer_artifacts(ml._output_dir()):
+                assert time.monotonic() < deadline, 'index.json not rewritten yet'
+                time.sleep(0.01)
+            seen.append(order[0])
+        return json.dumps({'type': 'FeatureCollection', 'features': []})
+
+    names = ('_output_dir', '_build_layer_geojson', '_layer_fingerprint', '_export_executor')
+    originals = {name: getattr(ml, name) for name in names}
+    with tempfile.TemporaryDirectory() as root:
+        ml._output_dir = lambda: Path(root)
+        ml._build_layer_geojson = _build
+        ml._layer_fingerprint = lambda layer_id, debug=False: None
+        # One worker, in order: the second layer builds only after the first.
+        ml._export_executor = lambda workers: ThreadPoolExecutor(max_workers=1)
+        try:
+            success, message = ml.export_map_layers()
+            assert success, message
+        finally:
+            for name, value in originals.items():
+                setattr(ml, name, value)
+    assert seen == [order[0]]
+
+
+def test_export_workers_drop_inherited_pools_without_closing_them():
+    from meerschaum.connectors import connectors
+
+    class _Engine:
+        def __init__(self):
+            self.disposed = []
+
+        def dispose(self, close=True):
+            self.disposed.append(close)
+
+    class _Conn:
+        def __init__(self, engine=None):
+            if engine is not None:
+                self._engine = engine
+            self._pid = -1
+
+    engine = _Engine()
+    conns = {'fake-export-a': _Conn(engine), 'fake-export-b': _Conn()}
+    connectors.setdefault('sql', {}).update(conns)
+    try:
+        ml._export_worker_init()
+    finally:
+        for label in conns:
+            connectors['sql'].pop(label, None)
+    assert engine.disposed == [False]
+    assert conns['fake-export-a']._pid == os.getpid()
+
@@ -38,6 +38,58 @@ def _line(*points) -> list:
     return [[lon, lat] for lat, lon in points]
 
 
+def _adjacency(graph) -> tuple[dict, dict]:
+    """The compact graph as (cell -> (lat, lon), cell -> [edge tuple, ...])
+    with neighbours as grid cells too, for assertions phrased in places."""
+    cells = {i: c for c, i in ml._cell_index(graph).items()}
+    nodes = {c: ml._node_latlon(graph, i) for i, c in cells.items()}
+    adj = {
+        c: [(cells[e[0]],) + e[1:] for e in ml._node_edges(graph, i)]
+        for i, c in cells.items()
+    }
+    return nodes, adj
+
+
+#: Corners of `_triangle_rows`.
+TRIANGLE_A = (34.8500, -82.4000)
+TRIANGLE_B = (34.8530, -82.4025)
+TRIANGLE_C = (34.8560, -82.4000)
+
+
+def _triangle_rows(danger=1.4, lit=True, stress='H') -> list:
+    """Three rows around a triangle: a dark street (A-C), a lit bike lane
+    on an H street (A-B) and the trail (B-C)."""
+    a, b, c = TRIANGLE_A, TRIANGLE_B, TRIANGLE_C
+    return [
+        (_line(a, c), 'M', 'DARK ST', False, danger, False),
+        (_line(a, b), 'bike-lane', 'LIT AVE', True, 1.0, lit, stress),
+        (_line(b, c), 'srt', 'SWAMP RABBIT TRAIL', None, 1.0, True),
+    ]
+
+
+def _block_grid_rows() -> list:
+    """A 4 x 4 block grid of mixed streets."""
+    rows = []
+    cats = ('L', 'M', 'bike-lane', 'MH', 'path')
+    for i in range(4):
+        for j in range(3):
+            lat, lon = 34.850 + i * 0.002, -82.400 + j * 0.002
+            rows.append((_line((lat, lon), (lat, lon + 0.002)),
+                         cats[(i + j) % 5], f'{i} ST', True))
+            lat, lon = 34.850 + j * 0.002, -82.400 + i * 0.002
+            rows.append((_line((lat, lon), (lat + 0.002, lon)),
+                         cats[(i * 2 + j) % 5], f'{i} AVE', (i + j) % 2 == 0))
+    return rows
+
+
+#: Elevations for `_block_grid_rows`: a ridge along the middle avenues, so
+#: the climb only costs going up.
+BLOCK_GRID_ELEV = {
+    (34.850 + i * 0.002, -82.400 + j * 0.002): 900.0 + 120.0 * (j in (1, 2)) + 10.0 * i
+    for i in range(4) for j in range(4)
+}
+
+
 class RouteGraphTestCase(unittest.TestCase):
     """Common plumbing: build a graph from synthetic rows and route on it."""
 
@@ -107,7 +159,7 @@ class TestJunctionConnectors(RouteGraphTestCase):
 
     def test_lane_endpoint_connects_to_the_nearest_junction(self):
         graph = self._graph(self._rows())
-        nodes, adj = graph['nodes'], graph['adj']
+        nodes, adj = _adjacency(graph)
         a_cell = ml._grid_node(*self.A)
         b_cell = ml._grid_node(*self.B)
         self.assertIn(a_cell, adj, "the Pearl/Jones junction should be in the graph")
@@ -161,7 +213,7 @@ class TestConnectorSanity(RouteGraphTestCase):
             (_line((34.8506, -82.3990), (34.8512, -82.3985)), 'M', 'B ST', True),
         ]
         graph = self._graph(rows)
-        for cell, edges in graph['adj'].items():
+        for cell, edges in _adjacency(graph)[1].items():
             targets = [e[0] for e in edges]
             self.assertEqual(
                 len(targets), len(set(targets)),
@@ -170,6 +222,20 @@ class TestConnectorSanity(RouteGraphTestCase):
             self.assertNotIn(cell, targets, f"node {cell} has a self-loop")
 
 
+class TestRouteStats(RouteGraphTestCase):
+    """route-stats.json's per-category breakdown."""
+
+    def test_rows_with_no_category_count_as_unknown(self):
+        rows = [
+            (_line((34.8500, -82.4000), (34.8510, -82.4000)), 'M', 'A ST', True),
+            (_line((34.8510, -82.4000), (34.8520, -82.4000)), None, 'A ST', True),
+        ]
+        counts, length_m = ml._category_totals(self._graph(rows))
+        self.assertEqual(counts, {'M': 1, 'unknown': 1})
+        self.assertNotIn('None', length_m)
+        self.assertAlmostEqual(length_m['unknown'], length_m['M'], delta=1.0)
+
+
 class TestStressTolerance(RouteGraphTestCase):
     """A rider picks how much traffic they will accept.
 
@@ -617,6 +683,293 @@ class TestAlternateRoutes(RouteGraphTestCase):
         )
 
 
+class TestRouteOptions(RouteGraphTestCase):
+    """`?alternatives=k`: one Pareto search over cost, distance and climb
+    offers the trade-offs the recommended route passed up, and nothing the
+    rider would never pick. Same terrain as `TestHills`."""
+
+    A, C, ELEV = TestHills.A, TestHills.C, TestHills.ELEV
+    _rows = TestHills._rows
+    HILL, WEST = TestHills.HILL, TestHills.WEST
+
+    def _options(self, graph, mode, **kwargs):
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        try:
+            return ml._route_options(*self.A, *self.C, mode=mode, **kwargs)
+        finally:
+            ml._get_route_graph = original
+
+    @staticmethod
+    def _street_names(feature):
+        return {s['name'] for s in feature['properties']['steps'] if s['name']}
+
+    def test_the_hill_is_offered_as_the_shorter_way(self):
+        graph = self._graph(self._rows(), elevation=self.ELEV)
+        stats = {}
+        options = self._options(graph, 'bike:balanced', stats=stats)
+        self.assertEqual(len(options), 1)
+        props = options[0]['properties']
+        self.assertEqual(props['option'], 'shorter')
+        self.assertIn('Hill St', self._street_names(options[0]))
+        self.assertGreater(props['option_cost'], 1.0)
+        base = self._route(graph, self.A, self.C, mode='bike:balanced')
+        self.assertLess(props['distance_m'], base['properties']['distance_m'])
+        self.assertLess(stats['popped'], 10)
+
+    def test_the_valley_is_offered_as_the_flatter_way(self):
+        graph = self._graph(self._rows(), elevation=self.ELEV)
+        options = self._options(graph, 'walk')
+        self.assertEqual([o['properties']['option'] for o in options], ['flatter'])
+        self.assertEqual(options[0]['properties']['climb_ft'], 0)
+
+    def test_no_costly_or_dominated_options(self):
+        # An 18% hill is far past PARETO_COST_SLACK for a wheelchair...
+        graph = self._graph(self._rows(), elevation=self.ELEV)
+        self.assertEqual(self._options(graph, 'roll'), [])
+        # ...and on flat ground the valley is just longer: never worth it.
+        flat = self._graph(self._rows())
+        self.assertEqual(self._options(flat, 'bike:balanced'), [])
+
+    def test_the_search_finds_the_astar_route_first(self):
+        graph = self._graph(self._rows(), elevation=self.ELEV)
+        termini = ml._route_termini(
+            graph, *self.A, *self.C, ml.ROUTE_SNAP_MAX_M, 'bike:balanced',
+        )
+        found = ml._pareto_paths(
+            graph, termini, ml._weight_profile('bike:balanced'),
+        )
+        best = ml._route_feature(
+            graph, found[0][1], termini, *self.A, *self.C, 'bike:balanced',
+        )
+        base = self._route(graph, self.A, self.C, mode='bike:balanced')
+        self.assertEqual(
+            best['geometry']['coordinates'], base['geometry']['coordinates'],
+        )
+
+    def test_compute_plan_attaches_the_options(self):
+        graph = self._graph(self._rows(), elevation=self.ELEV)
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        ml._ROUTE_CACHE.clear()
+        try:
+            base = ml._compute_plan('walk', *self.A, *self.C)
+            with_options = ml._compute_plan('walk', *self.A, *self.C, alternatives=3)
+        finally:
+            ml._get_route_graph = original
+            ml._ROUTE_CACHE.clear()
+        self.assertNotIn('route_options', base['properties'])
+        self.assertEqual(
+            with_options['geometry']['coordinates'], base['geometry']['coordinates'],
+        )
+        self.assertEqual(len(with_options['properties']['route_options']), 1)
+
+
+class TestRouteBudget(RouteGraphTestCase):
+    """A request's compute budget stops its searches, and the bounded route
+    pool turns work away instead of queueing without limit."""
+
+    W, E, N = TestAlternateRoutes.W, TestAlternateRoutes.E, TestAlternateRoutes.N
+    _rows = TestAlternateRoutes._rows
+
+    def _with_budget(self, budget, fn):
+        stride = ml.ROUTE_BUDGET_STRIDE
+        ml.ROUTE_BUDGET_STRIDE = 1
+        token = ml._ROUTE_BUDGET.set(budget)
+        try:
+            return fn()
+        finally:
+            ml._ROUTE_BUDGET.reset(token)
+            ml.ROUTE_BUDGET_STRIDE = stride
+
+    def test_expansion_cap_aborts_instead_of_falling_back(self):
+        graph = self._graph(self._rows())
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        try:
+            with self.assertRaises(ml._RouteAborted):
+                self._with_budget(
+                    ml._RouteBudget(expansions=1),
+                    lambda: ml._route(*self.W, *self.E, mode='bike'),
+                )
+            feature = self._with_budget(
+                ml._RouteBudget(),
+                lambda: ml._route(*self.W, *self.E, mode='bike'),
+            )
+        finally:
+            ml._get_route_graph = original
+        self.assertNotIn('fallback', feature['properties'])
+
+    def test_a_cancelled_request_stops_every_plan(self):
+        graph = self._graph(self._rows())
+        budget = ml._RouteBudget()
+        budget.cancel()
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        ml._ROUTE_CACHE.clear()
+        try:
+            with self.assertRaises(ml._RouteAborted):
+                self._with_budget(budget, lambda: ml._route_multimodal(
+                    *self.W, *self.E, modes={'bike', 'walk'},
+                ))
+        finally:
+            ml._get_route_graph = original
+            ml._ROUTE_CACHE.clear()
+
+    def test_deadline(self):
+        budget = ml._RouteBudget(seconds=-1.0)
+        with self.assertRaises(ml._RouteAborted):
+            budget.charge(1)
+
+    def test_saturated_pool_turns_work_away(self):
+        import threading
+        release = threading.Event()
+        saved = (ml.ROUTE_WORKERS, ml.ROUTE_QUEUE_MAX)
+        ml.ROUTE_WORKERS, ml.ROUTE_QUEUE_MAX = 1, 1
+        try:
+            # Both held, whether the pool started with one worker or more.
+            first = ml._route_submit(release.wait)
+            second = ml._route_submit(release.wait)
+            self.assertIsNotNone(first)
+            self.assertIsNotNone(second)
+            self.assertIsNone(ml._route_submit(lambda: 'refused'))
+            release.set()
+            self.assertTrue(first.result(timeout=5))
+            self.assertTrue(second.result(timeout=5))
+            third = ml._route_submit(lambda: 'again')
+            self.assertEqual(third.result(timeout=5), 'again')
+        finally:
+            release.set()
+            ml.ROUTE_WORKERS, ml.ROUTE_QUEUE_MAX = saved
+
+    class _Request:
+        def __init__(self, gone=False):
+            self.gone = gone
+
+        async def is_disconnected(self):
+            return self.gone
+
+    def test_awaited_work_runs_under_its_budget(self):
+        import asyncio
+        budget = ml._RouteBudget()
+        result = asyncio.run(ml._route_await(
+            self._Request(), budget, lambda: ml._ROUTE_BUDGET.get(),
+        ))
+        self.assertIs(result, budget)
+
+    def test_disconnect_cancels_and_drops_the_work(self):
+        import asyncio
+        import threading
+        import time
+        started, stopped = threading.Event(), threading.Event()
+
+        def _search():
+            started.set()
+            try:
+                while True:
+                    ml._route_charge(1)
+                    time.sleep(0.01)
+            finally:
+                stopped.set()
+
+        budget = ml._RouteBudget()
+        with self.assertRaises(ml._RouteAborted):
+            asyncio.run(ml._route_await(self._Request(gone=True), budget, _search))
+        self.assertTrue(started.wait(5))
+        self.assertTrue(stopped.wait(5), 'the search stops at its next charge')
+        self.assertTrue(budget.cancelled)
+
+    def test_busy_pool_is_an_abort(self):
+        import asyncio
+        import threading
+        release = threading.Event()
+        saved = (ml.ROUTE_WORKERS, ml.ROUTE_QUEUE_MAX)
+        ml.ROUTE_WORKERS, ml.ROUTE_QUEUE_MAX = 1, 0
+        try:
+            held = ml._route_submit(release.wait)
+            with self.assertRaises(ml._RouteAborted):
+                asyncio.run(ml._route_await(
+                    self._Request(), ml._RouteBudget(), lambda: 'refused',
+                ))
+        finally:
+            release.set()
+            held.result(timeout=5)
+            ml.ROUTE_WORKERS, ml.ROUTE_QUEUE_MAX = saved
+
+
+class TestGbfsPrefetch(RouteGraphTestCase):
+    """`_route_multimodal` starts the GBFS fetch ahead of its plans: the
+    bike-share plan uses that fetch rather than making its own, and a
+    prefetch pool too busy to start it leaves the fetch to the request."""
+
+    W, E, N = TestAlternateRoutes.W, TestAlternateRoutes.E, TestAlternateRoutes.N
+    _rows = TestAlternateRoutes._rows
+
+    def _multimodal(self, graph, **kwargs):
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        ml._ROUTE_CACHE.clear()
+        try:
+            return ml._route_multimodal(*self.W, *self.E, **kwargs)
+        finally:
+            ml._get_route_graph = original
+            ml._ROUTE_CACHE.clear()
+
+    def _stations(self, calls: list):
+        import threading
+
+        class _Module:
+            @staticmethod
+            def get_stations():
+                calls.append(threading.current_thread().name)
+                return []
+
+        class _Plugin:
+            def __init__(self, name):
+                self.module = _Module
+
+        return _Plugin
+
+    def test_bike_share_reuses_the_prefetched_stations(self):
+        graph = self._graph(self._rows())
+        calls = []
+        original = ml.mrsm.Plugin
+        ml.mrsm.Plugin = self._stations(calls)
+        try:
+            feature = self._multimodal(graph, modes={'bike', 'walk'}, bcycle=True)
+        finally:
+            ml.mrsm.Plugin = original
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].startswith('bwg-prefetch'), calls)
+        self.assertEqual(
+            [f['plan'] for f in feature['properties']['unavailable']],
+            ['bcycle'],
+        )
+
+    def test_a_busy_prefetch_pool_leaves_the_fetch_to_the_request(self):
+        import threading
+        graph = self._graph(self._rows())
+        calls = []
+        original = ml.mrsm.Plugin
+        ml.mrsm.Plugin = self._stations(calls)
+        release = threading.Event()
+        blockers = [
+            ml._prefetch_pool().submit(release.wait, 10)
+            for _ in range(ml.ROUTE_PREFETCH_WORKERS)
+        ]
+        try:
+            feature = self._multimodal(graph, modes={'bike', 'walk'}, bcycle=True)
+            self.assertFalse(any(b.done() for b in blockers))
+        finally:
+            release.set()
+            ml.mrsm.Plugin = original
+        self.assertEqual(calls, [threading.current_thread().name])
+        self.assertEqual(
+            [f['plan'] for f in feature['properties']['unavailable']],
+            ['bcycle'],
+        )
+
+
 class TestTurnDirectionLookahead(RouteGraphTestCase):
     """Regression: the Anderson St -> Dunbar St wrong-way announcement.
 
@@ -1029,7 +1382,7 @@ class TestTunnelNeverFusesWithTheStreetAbove(RouteGraphTestCase):
 
     def test_no_node_joins_the_tunnel_and_the_street_above(self):
         graph = self._graph(self._rows())
-        for lst in graph['adj'].values():
+        for lst in _adjacency(graph)[1].values():
             names = {e[6] for e in lst}
             self.assertFalse(
                 'Springer Street' in names and 'CHURCH ST' in names,
@@ -1105,7 +1458,7 @@ class TestTrailTierStreets(RouteGraphTestCase):
             (_line(b, (34.8449, -82.4000)), 'L', 'FURMAN ST', True),
         ])
         categories = {
-            e[6]: e[3] for lst in graph['adj'].values() for e in lst
+            e[6]: e[3] for lst in _adjacency(graph)[1].values() for e in lst
         }
         assert categories['FURMAN COLLEGE WAY'] == 'srt'
         assert categories['FURMAN ST'] == 'L'
@@ -1237,5 +1590,1179 @@ class TestNightLighting(RouteGraphTestCase):
         self.assertNotIn('Dark St', names)
 
 
+class TestEdgeWeightVectors(RouteGraphTestCase):
+    """Per-profile weight vectors are cached on the graph, and price every
+    edge exactly as the per-edge `_edge_cost` does."""
+
+    def test_vector_matches_the_per_edge_cost(self):
+        graph = self._graph(_triangle_rows())
+        for mode in ('bike:quiet', 'walk', 'roll', 'street'):
+            for night in (False, True):
+                token = ml._NIGHT_OVERRIDE.set(night)
+                try:
+                    profile = ml._weight_profile(mode)
+                finally:
+                    ml._NIGHT_OVERRIDE.reset(token)
+                weights = ml._edge_weights(graph, profile)
+                for k in range(len(weights)):
+                    self.assertEqual(
+                        weights[k], ml._edge_cost(ml._edge_tuple(graph, k), profile),
+                        f'{mode} night={night} edge {k}',
+                    )
+
+    def test_vectors_are_cached_per_profile(self):
+        graph = self._graph(_triangle_rows())
+        token = ml._NIGHT_OVERRIDE.set(False)
+        try:
+            day = ml._weight_profile('walk')
+        finally:
+            ml._NIGHT_OVERRIDE.reset(token)
+        token = ml._NIGHT_OVERRIDE.set(True)
+        try:
+            night = ml._weight_profile('walk')
+        finally:
+            ml._NIGHT_OVERRIDE.reset(token)
+        self.assertNotEqual(day['key'], night['key'])
+        self.assertIs(ml._edge_weights(graph, day), ml._edge_weights(graph, day))
+        self.assertIsNot(ml._edge_weights(graph, day), ml._edge_weights(graph, night))
+        self.assertEqual(set(graph['weights']), {day['key'], night['key']})
+
+
+def test_route_landmarks_leave_the_landmarks_layer_alone():
+    """The routing heuristic's landmarks must not shadow the Trail Landmarks
+    layer's builder."""
+    import json
+    layer = json.loads(getattr(ml, ml.LAYERS['landmarks']['builder'])())
+    assert layer['type'] == 'FeatureCollection'
+
+
+class TestLandmarkBounds(RouteGraphTestCase):
+    """Landmark (ALT) bounds only speed the search up: the route is the one
+    plain A* finds, virtual termini and hills included."""
+
+    def _rows(self):
+        rows = []
+        categories = ('L', 'M', 'bike-lane', 'srt', 'H')
+        for i in range(6):
+            for j in range(5):
+                lat, lon = 34.85 + i * 0.001, -82.40 + j * 0.001
+                rows.append((_line((lat, lon), (lat, lon + 0.001)),
+                             categories[(i + j) % 5], f'{i} ST', True))
+                rows.append((_line((34.85 + j * 0.001, -82.40 + i * 0.001),
+                                   (34.85 + (j + 1) * 0.001, -82.40 + i * 0.001)),
+                             categories[(i * j) % 5], f'{i} AVE', (i + j) % 2 == 0))
+        return rows
+
+    def _elevation(self):
+        return {
+            (34.85 + i * 0.001, -82.40 + j * 0.001): 900.0 + 7 * i * j
+            for i in range(6) for j in range(6)
+        }
+
+    def test_landmarks_find_the_same_route(self):
+        graph = self._graph(self._rows(), self._elevation())
+        trips = [
+            ((34.8502, -82.3996), (34.8548, -82.3954)),
+            ((34.8549, -82.3951), (34.8503, -82.3998)),
+            ((34.8500, -82.4000), (34.8550, -82.3950)),
+        ]
+        max_profiles = ml.ROUTE_LANDMARK_MAX_PROFILES
+        for mode in ('bike:quiet', 'walk', 'roll'):
+            ml.ROUTE_LANDMARK_MAX_PROFILES = 0
+            try:
+                plain = [self._route(graph, a, b, mode=mode) for a, b in trips]
+            finally:
+                ml.ROUTE_LANDMARK_MAX_PROFILES = max_profiles
+            self.assertIsNotNone(ml._build_route_landmarks(graph, ml._weight_profile(mode)))
+            for (a, b), expected in zip(trips, plain):
+                stats: dict = {}
+                feature = self._route(graph, a, b, mode=mode, stats=stats)
+                self.assertTrue(stats['landmarks'])
+                self.assertEqual(
+                    feature['geometry']['coordinates'],
+                    expected['geometry']['coordinates'],
+                )
+
+
+class TestRouteGraphSnapshot(RouteGraphTestCase):
+    """The exported snapshot maps back to the same graph, and a snapshot
+    older than the sources' last sync is refused."""
+
+    def test_snapshot_round_trips(self):
+        import tempfile
+        import numpy as np
+        graph = self._graph(_triangle_rows())
+        with tempfile.TemporaryDirectory() as root:
+            ml._write_route_snapshot(graph, 1000.0, root=root)
+            loaded = ml._load_route_snapshot(1000.0, root=root)
+            self.assertIsNotNone(loaded)
+            for key, value in graph.items():
+                if hasattr(value, 'dtype'):
+                    self.assertEqual(loaded[key].dtype, value.dtype, key)
+                    np.testing.assert_array_equal(loaded[key], value, key)
+            self.assertEqual(loaded['categories'], graph['categories'])
+            self.assertEqual(loaded['names'], graph['names'])
+            self.assertEqual(
+                self._route(loaded, TRIANGLE_A, TRIANGLE_C)['geometry'],
+                self._route(graph, TRIANGLE_A, TRIANGLE_C)['geometry'],
+            )
+
+    def test_stale_snapshot_is_refused(self):
+        import tempfile
+        graph = self._graph(_triangle_rows())
+        with tempfile.TemporaryDirectory() as root:
+            self.assertIsNone(ml._load_route_snapshot(None, root=root))
+            ml._write_route_snapshot(graph, 1000.0, root=root)
+            self.assertIsNone(ml._load_route_snapshot(2000.0, root=root))
+            self.assertIsNotNone(ml._load_route_snapshot(None, root=root))
+
+
+class _Frame:
+    """Just enough of a DataFrame for `_route_source_rows`."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, column):
+        return [rec[column] for rec in self.records]
+
+    def to_dict(self, orient='records'):
+        return self.records
+
+
+class _ContextConn:
+    """Records the queries a graph build reads with; it has no `exec` or
+    `engine`, so a build that tried to write would fail."""
+
+    def __init__(self, ready=True):
+        self.ready = ready
+        self.queries = []
+
+    def read(self, query, debug=False):
+        self.queries.append(query)
+        if 'to_regclass' in query:
+            return _Frame([{'ready': self.ready}])
+        return _Frame([])
+
+
+class TestRouteContext(unittest.TestCase):
+    """The context refresh is one locked transaction, and graph builds only
+    read the table it writes."""
+
+    def _sources(self, conn):
+        return [
+            ('bike-stress', 'pcc', 'stress_levels', 6570, 'src."street_name"', None),
+            ('bike-lanes', 'public', 'bike_lanes', 6570, 'src."STREET_NAM"', None),
+            ('gap', 'county', 'TRA_STREETCL', 6570, 'src."LABEL"', None),
+        ]
+
+    def _columns(self):
+        import re
+        original = ml._route_segment_sources
+        ml._route_segment_sources = self._sources
+        try:
+            statements = ml._route_context_script(None).split(';\n')
+        finally:
+            ml._route_segment_sources = original
+        create = next(
+            s for s in statements
+            if s.startswith(f'CREATE TABLE IF NOT EXISTS "public"."{ml.ROUTE_CONTEXT_TABLE}"')
+        )
+        return statements, set(re.findall(r'^\s*"(\w+)" ', create, re.M))
+
+    def test_script_runs_as_one_locked_transaction(self):
+        statements, _columns = self._columns()
+        self.assertIn('pg_advisory_xact_lock', statements[0])
+        for statement in statements:
+            self.assertNotRegex(statement.strip().upper(), r'^(BEGIN|COMMIT)')
+            if statement.startswith('CREATE TEMP TABLE'):
+                self.assertIn('ON COMMIT DROP', statement)
+
+    def _read_rows(self, conn):
+        names = ('_layer_pipe', '_layer_srid', '_route_segment_sources',
+                 '_osm_path_rows', '_refresh_route_context')
+        originals = {name: getattr(ml, name) for name in names}
+
+        class _Pipe:
+            instance_connector = conn
+            parameters = {}
+            target = 'srt'
+
+        def _refresh(debug=False):
+            raise AssertionError('a graph build refreshed the route context')
+
+        ml._layer_pipe = lambda layer: _Pipe()
+        ml._layer_srid = lambda layer_id, conn, schema, target: 6570
+        ml._route_segment_sources = self._sources
+        ml._osm_path_rows = lambda debug=False: []
+        ml._refresh_route_context = _refresh
+        try:
+            return ml._route_source_rows()
+        finally:
+            for name, value in originals.items():
+                setattr(ml, name, value)
+
+    def test_graph_build_reads_columns_the_script_creates(self):
+        import re
+        _statements, columns = self._columns()
+        conn = _ContextConn()
+        self._read_rows(conn)
+        read = {
+            col for query in conn.queries
+            for col in re.findall(r'ctx\."(\w+)"', query)
+        }
+        self.assertEqual(
+            read, {'seg_key', 'speed_mph', 'crash_score', 'lights',
+                   'lane_stress', 'has_sidewalk'},
+        )
+        self.assertLessEqual(read, columns)
+
+    def test_graph_build_without_the_table_skips_the_join(self):
+        conn = _ContextConn(ready=False)
+        with self.assertWarns(UserWarning):
+            self._read_rows(conn)
+        reads = [q for q in conn.queries if 'to_regclass' not in q]
+        self.assertEqual(len(reads), 4)
+        for query in reads:
+            self.assertNotIn(ml.ROUTE_CONTEXT_TABLE, query)
+
+
+class TestBuildLog(RouteGraphTestCase):
+    """Every graph carries the phases of the build that made it, and keeps
+    them through a snapshot."""
+
+    def _next(self, graph, rows):
+        original_rows = ml._route_source_rows
+        original_elev = ml._node_elevations
+        original_snapshot = ml._load_route_snapshot
+        ml._route_source_rows = lambda debug=False: rows
+        ml._node_elevations = lambda nodes, debug=False: {}
+        ml._load_route_snapshot = lambda sync_time=None, root=None: None
+        try:
+            return ml._next_route_graph(graph, 1000.0)
+        finally:
+            ml._route_source_rows = original_rows
+            ml._node_elevations = original_elev
+            ml._load_route_snapshot = original_snapshot
+
+    def test_build_logs_each_phase(self):
+        graph = self._graph(_triangle_rows())
+        build = graph['build']
+        self.assertEqual(build['source'], 'build')
+        phases = {p['phase']: p for p in build['phases']}
+        for phase in ('normalize', 'adjacency.subdivide', 'adjacency.components',
+                      'elevations', 'compact', 'spatial_index', 'provenance'):
+            self.assertIn(phase, phases)
+            self.assertGreaterEqual(phases[phase]['seconds'], 0.0)
+        self.assertEqual(phases['normalize']['rows'], 3)
+        self.assertEqual(phases['compact']['nodes'], ml._node_count(graph))
+        self.assertGreaterEqual(
+            build['seconds'], sum(p['seconds'] for p in build['phases']) - 0.01,
+        )
+        self.assertIsNone(ml._BUILD_LOG.get())
+
+    def test_patch_and_snapshot_say_where_the_graph_came_from(self):
+        import tempfile
+        graph = self._next({}, _triangle_rows())
+        self.assertEqual(graph['build']['source'], 'build')
+        patched = self._next(graph, _triangle_rows(danger=3.0))
+        self.assertEqual(patched['build']['source'], 'patch')
+        self.assertEqual(patched['build']['built_from'], graph['build']['built_at'])
+        with tempfile.TemporaryDirectory() as root:
+            path = ml._write_route_snapshot(graph, 1000.0, root=root)
+            loaded = ml._load_route_snapshot(1000.0, root=root)
+        self.assertEqual(loaded['build']['source'], 'snapshot')
+        self.assertEqual(loaded['build']['snapshot'], path.name)
+        self.assertEqual(loaded['build']['phases'], graph['build']['phases'])
+        summary = ml._build_summary(loaded)
+        self.assertEqual(summary['sync_time'][:4], '1970')
+        self.assertIsInstance(summary['built_at'], str)
+
+
+class TestIncrementalGraphUpdate(RouteGraphTestCase):
+    """A re-sync is patched onto a copy of the graph, matching what a full
+    rebuild would give: changed attributes in place, added and removed rows
+    by redoing the build's passes around them."""
+
+    def test_attribute_change_matches_a_rebuild(self):
+        import numpy as np
+        graph = self._graph(_triangle_rows())
+        ml._edge_weights(graph, ml._weight_profile('bike'))
+        rows = _triangle_rows(danger=3.0, lit=False, stress='M')
+        patched = ml._update_route_graph(graph, rows)
+        rebuilt = self._graph(rows)
+        self.assertIsNotNone(patched)
+        self.assertIsNot(patched, graph)
+        self.assertNotIn('weights', patched)
+        self.assertEqual(graph['danger'].max(), 1.4)   # the old graph is untouched
+        for key in ('offsets', 'nbr', 'length', 'weight', 'danger', 'lit',
+                    'lane_stress', 'sidewalk', 'edge_row', 'row_attr'):
+            np.testing.assert_array_equal(patched[key], rebuilt[key], key)
+        self.assertEqual(
+            [patched['categories'][c] for c in patched['cat'].tolist()],
+            [rebuilt['categories'][c] for c in rebuilt['cat'].tolist()],
+        )
+        self.assertEqual(
+            self._route(patched, TRIANGLE_A, TRIANGLE_C)['geometry'],
+            self._route(rebuilt, TRIANGLE_A, TRIANGLE_C)['geometry'],
+        )
+
+    def test_unchanged_rows_keep_the_graph(self):
+        graph = self._graph(_triangle_rows())
+        self.assertIs(ml._update_route_graph(graph, _triangle_rows()), graph)
+
+    @staticmethod
+    def _grid_rows(size=8, step=0.002):
+        """A `size` x `size` street grid, plus a trail fragment off the
+        south-west corner that only a later row connects."""
+        rows = []
+        for i in range(size):
+            for j in range(size - 1):
+                lat, lon = 34.840 + i * step, -82.410 + j * step
+                rows.append((_line((lat, lon), (lat, lon + step)),
+                             ('L', 'M', 'H')[(i + j) % 3], f'{i} ST', True))
+                lat, lon = 34.840 + j * step, -82.410 + i * step
+                rows.append((_line((lat, lon), (lat + step, lon)),
+                             ('M', 'L')[(i + j) % 2], f'{i} AVE', False))
+        rows.append((_line((34.8385, -82.4112), (34.8372, -82.4125)),
+                     'path', None, None))
+        return rows
+
+    #: Runs from the grid's south-west corner out to the trail fragment.
+    TRAIL = (
+        _line((34.8402, -82.4098), (34.8389, -82.4108)),
+        'srt', 'SWAMP RABBIT TRAIL', None,
+    )
+
+    #: A dead end off a grid corner: it meets the grid exactly where a grid
+    #: node sits, so it needs no connector.
+    SPUR = (
+        _line((34.840 + 3 * 0.002, -82.410 + 3 * 0.002),
+              (34.8466, -82.4033), (34.8471, -82.4031)),
+        'L', 'SPUR CT', True,
+    )
+
+    def _update(self, graph, rows, reindex_share=1.0):
+        """Patch without elevations; by default the index overlays never
+        grow big enough to repack."""
+        originals = ml._node_elevations, ml.ROUTE_PATCH_REINDEX_SHARE
+        ml._node_elevations = lambda nodes, debug=False: {}
+        ml.ROUTE_PATCH_REINDEX_SHARE = reindex_share
+        try:
+            return ml._update_route_graph(graph, rows)
+        finally:
+            ml._node_elevations, ml.ROUTE_PATCH_REINDEX_SHARE = originals
+
+    @staticmethod
+    def _edges(graph):
+        """Directed edges as (from, to, category, length), rounded, counted."""
+        import collections
+        import numpy as np
+        n = ml._node_count(graph)
+        src = np.repeat(np.arange(n), np.diff(graph['offsets']))
+        lat, lon = graph['lat'].round(5).tolist(), graph['lon'].round(5).tolist()
+        return collections.Counter(
+            ((lat[u], lon[u]), (lat[v], lon[v]),
+             graph['categories'][c], round(length, 1))
+            for u, v, c, length in zip(
+                src.tolist(), graph['nbr'].tolist(), graph['cat'].tolist(),
+                graph['length'].tolist(),
+            )
+        )
+
+    def _assert_matches_rebuild(self, patched, rows, trips):
+        rebuilt = self._graph(rows)
+        self.assertIsNotNone(patched)
+        self.assertEqual(self._edges(patched), self._edges(rebuilt))
+        for origin, destination in trips:
+            self.assertAlmostEqual(
+                self._route(patched, origin, destination)['properties']['distance_m'],
+                self._route(rebuilt, origin, destination)['properties']['distance_m'],
+                delta=0.1,
+            )
+
+    def test_added_row_matches_a_rebuild(self):
+        graph = self._graph(self._grid_rows())
+        rows = self._grid_rows() + [self.SPUR]
+        patched = self._update(graph, rows)
+        self.assertNotIn('reverse_csr', patched)
+        self._assert_matches_rebuild(patched, rows, [
+            ((34.8471, -82.4031), (34.8400, -82.4100)),
+            ((34.8450, -82.4050), (34.8468, -82.4032)),
+        ])
+        # The new geometry is found through the index overlay, or in the
+        # repacked index once the overlay would be too big.
+        repacked = self._update(graph, rows, reindex_share=0.0)
+        self.assertIn('seg_patch_rtree_box', patched)
+        self.assertNotIn('seg_patch_rtree_box', repacked)
+        for g in (patched, repacked):
+            hit = ml._snap_edge(g, 34.8469, -82.4032)
+            self.assertEqual(g['names'][g['name'][hit[0]]], 'SPUR CT')
+            self.assertLess(hit[4], 5.0)
+
+    def test_removed_row_matches_a_rebuild(self):
+        rows = self._grid_rows() + [self.SPUR]
+        graph = self._graph(rows)
+        patched = self._update(graph, rows[:-1])
+        self._assert_matches_rebuild(patched, rows[:-1], [
+            ((34.8400, -82.4100), (34.8500, -82.4000)),
+        ])
+        # The node at the spur's end is dead, never a snap target.
+        self.assertTrue(patched['node_dead'].any())
+        u, _d = ml._nearest_node(patched, 34.8471, -82.4031)
+        self.assertFalse(patched['node_dead'][u])
+        k = ml._snap_edge(patched, 34.8469, -82.4032)[0]
+        self.assertNotEqual(patched['names'][patched['name'][k]], 'SPUR CT')
+        # ...and a second patch puts the spur back as it was.
+        self.assertEqual(self._edges(self._update(patched, rows)), self._edges(graph))
+
+    def _next(self, graph, rows):
+        """`_next_route_graph` over `rows`, without elevations or a snapshot."""
+        names = ('_route_source_rows', '_node_elevations', '_load_route_snapshot')
+        originals = [getattr(ml, name) for name in names]
+        ml._route_source_rows = lambda debug=False: rows
+        ml._node_elevations = lambda nodes, debug=False: {}
+        ml._load_route_snapshot = lambda sync_time=None, root=None: None
+        try:
+            return ml._next_route_graph(graph, 1000.0)
+        finally:
+            for name, value in zip(names, originals):
+                setattr(ml, name, value)
+
+    def test_changes_a_patch_cannot_match_are_rebuilt(self):
+        grid = self._grid_rows()
+        chain = (_line((34.8471, -82.4031), (34.8478, -82.4024)), 'L', 'SPUR CT', True)
+        cases = [
+            # A junction onto the grid, joining the trail fragment to it.
+            (grid, grid + [self.TRAIL]),
+            # ...and taking it out again.
+            (grid + [self.TRAIL], grid),
+            # A street 30 m off the grid: the build stitches it on.
+            (grid, grid + [(_line((34.8403, -82.3960), (34.8403, -82.3950)),
+                            'L', 'OFF ST', True)]),
+            # Removing the spur cuts the row beyond it off the graph.
+            (grid + [self.SPUR, chain], grid + [chain]),
+            # An end 3 m from where a grid node sits.
+            (grid, grid + [(_line((34.84603, -82.40403), (34.8470, -82.4050)),
+                            'L', 'SPUR CT', True)]),
+        ]
+        for before, after in cases:
+            with self.subTest(rows=len(after)):
+                graph = self._graph(before)
+                self.assertIsNone(self._update(graph, after))
+                fresh = self._next(graph, after)
+                self.assertEqual(fresh['build']['source'], 'build')
+                self.assertEqual(self._edges(fresh), self._edges(self._graph(after)))
+
+    def test_falls_back_to_a_rebuild(self):
+        # A change reaching most of a small graph.
+        graph = self._graph(_triangle_rows())
+        moved = _triangle_rows()
+        moved[0] = (_line(TRIANGLE_A, (34.8561, -82.4001), TRIANGLE_C),) + moved[0][1:]
+        self.assertIsNone(ml._update_route_graph(graph, moved))
+        self.assertIsNone(ml._update_route_graph(graph, _triangle_rows()[:2]))
+        # Taking out a row that beat another to a node pair.
+        lane = (_line((34.8420, -82.4060), (34.8420, -82.4040)), 'bike-lane', '1 ST', True)
+        rows = self._grid_rows() + [lane]
+        graph = self._graph(rows)
+        self.assertTrue(graph['row_contested'][-1])
+        self.assertIsNone(self._update(graph, rows[:-1]))
+
+
+class TestBidirectionalSearch(RouteGraphTestCase):
+    """Searching from both ends finds the same routes as the one-directional
+    search, uphill and down (climb is charged on ascent only), from mid-edge
+    termini, with landmark bounds, and with alternate-route penalties."""
+
+    TRIPS = (
+        ((34.8500, -82.4000), (34.8560, -82.3940)),
+        ((34.8560, -82.3940), (34.8500, -82.4000)),
+        ((34.8507, -82.3980), (34.8553, -82.3951)),   # mid-edge, both ends
+        ((34.8540, -82.3999), (34.8500, -82.3940)),
+    )
+
+    def _both(self, graph, origin, destination, **kwargs):
+        routes = []
+        for bidirectional in (False, True):
+            original = ml.ROUTE_BIDIRECTIONAL
+            ml.ROUTE_BIDIRECTIONAL = bidirectional
+            try:
+                routes.append(self._route(graph, origin, destination, **kwargs))
+            finally:
+                ml.ROUTE_BIDIRECTIONAL = original
+        return routes
+
+    def test_matches_the_one_directional_search(self):
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        for mode in ('bike:balanced', 'walk', 'roll'):
+            for with_landmarks in (False, True):
+                if with_landmarks:
+                    ml._build_route_landmarks(graph, ml._weight_profile(mode))
+                for origin, destination in self.TRIPS:
+                    uni, bidi = self._both(graph, origin, destination, mode=mode)
+                    self.assertEqual(
+                        uni['geometry'], bidi['geometry'],
+                        f'{mode} landmarks={with_landmarks} {origin}->{destination}',
+                    )
+
+    def test_alternates_match_too(self):
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        origin, destination = self.TRIPS[0]
+        pairs = set()
+        self._route(graph, origin, destination, pairs_out=pairs)
+        uni, bidi = self._both(graph, origin, destination, avoid_pairs=pairs)
+        self.assertEqual(uni['geometry'], bidi['geometry'])
+
+    def test_reports_settled_nodes(self):
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        a = ml._nearest_node(graph, *self.TRIPS[0][0])[0]
+        b = ml._nearest_node(graph, *self.TRIPS[0][1])[0]
+        stats: dict = {}
+        path = ml._astar(graph, a, b, mode='bike', stats=stats, bidirectional=True)
+        self.assertEqual((path[0][0], path[-1][0]), (a, b))
+        self.assertIsNone(path[0][1])
+        self.assertGreater(stats['settled'], 0)
+
+
+class TestRouteMatrix(RouteGraphTestCase):
+    """One search per origin (or, with fewer destinations, one backward
+    search per destination) gives every cell what a full route would say."""
+
+
+    POINTS = (
+        (34.8500, -82.4000), (34.8507, -82.3980), (34.8553, -82.3951),
+        (34.8540, -82.3999), (34.8560, -82.3940),
+    )
+
+    def _matrix(self, graph, origins, destinations, mode):
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        try:
+            return ml._route_matrix(origins, destinations, mode=mode)
+        finally:
+            ml._get_route_graph = original
+
+    def test_cells_match_full_routes(self):
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        for mode in ('walk', 'bike:balanced'):
+            # 2 x 3 searches forward from the origins, 3 x 2 backward.
+            for origins, destinations in (
+                (self.POINTS[:2], self.POINTS[2:]),
+                (self.POINTS[2:], self.POINTS[:2]),
+            ):
+                grids = self._matrix(graph, origins, destinations, mode)
+                for i, origin in enumerate(origins):
+                    for j, destination in enumerate(destinations):
+                        props = self._route(graph, origin, destination, mode=mode)['properties']
+                        self.assertAlmostEqual(
+                            grids['distance_m'][i][j], props['distance_m'], delta=0.1,
+                        )
+                        self.assertAlmostEqual(
+                            grids['duration_min'][i][j], props['duration_min'], delta=0.05,
+                        )
+
+    def test_off_network_points_get_empty_cells(self):
+        graph = self._graph(_block_grid_rows())
+        far = (34.9500, -82.3000)
+        grids = self._matrix(graph, [self.POINTS[0], far], [self.POINTS[1]], 'walk')
+        self.assertIsNotNone(grids['duration_min'][0][0])
+        self.assertIsNone(grids['duration_min'][1][0])
+        self.assertIsNone(grids['cost'][1][0])
+
+    def test_cost_bound_stops_a_search_for_an_unreachable_target(self):
+        graph = self._graph(_block_grid_rows())
+        profile = ml._weight_profile('walk')
+        unreachable = {'nowhere'}
+        whole, _link = ml._dijkstra_targets(graph, 0, unreachable, profile, {}, {})
+        self.assertEqual(len(whole), ml._node_count(graph))
+        bound = sorted(whole.values())[len(whole) // 3]
+        dist, link = ml._dijkstra_targets(
+            graph, 0, unreachable, profile, {}, {}, max_cost=bound,
+        )
+        self.assertLess(len(dist), len(whole))
+        self.assertEqual(dist, {n: g for n, g in whole.items() if g <= bound})
+        self.assertEqual(set(link), set(dist))
+
+    def test_cost_bound_only_empties_costlier_cells(self):
+        graph = self._graph(_block_grid_rows())
+        full = self._matrix(graph, self.POINTS[:1], self.POINTS[1:], 'walk')
+        bound = sorted(full['cost'][0])[1]
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        try:
+            capped = ml._route_matrix(
+                self.POINTS[:1], self.POINTS[1:], mode='walk', max_cost=bound,
+            )
+        finally:
+            ml._get_route_graph = original
+        self.assertEqual(
+            capped['cost'][0],
+            [g if g <= bound else None for g in full['cost'][0]],
+        )
+
+
+class TestIsochrone(RouteGraphTestCase):
+    """The time-bounded search times every node the way a route to it would,
+    and the bands nest."""
+
+    ORIGIN = (34.8507, -82.3980)
+
+    def _with_graph(self, graph, fn, *args, **kwargs):
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            ml._get_route_graph = original
+
+    def test_node_times_match_routes(self):
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        for mode in ('walk', 'bike:quiet'):
+            snap = ml._snap_terminus(graph, *self.ORIGIN, 'isochrone')
+            reached, _edges = ml._isochrone_search(graph, snap, mode, 4 * 60)
+            real = [node for node in reached if isinstance(node, int)]
+            self.assertTrue(real)
+            self.assertLess(len(real), ml._node_count(graph), 'the cutoff bounds the search')
+            for node in real:
+                props = self._route(
+                    graph, self.ORIGIN, ml._node_latlon(graph, node), mode=mode,
+                )['properties']
+                self.assertAlmostEqual(reached[node] / 60, props['duration_min'], delta=0.05)
+                self.assertLessEqual(reached[node], 4 * 60)
+
+    @unittest.skipUnless(importlib.util.find_spec('shapely'), 'needs shapely')
+    def test_bands_nest_and_are_cached(self):
+        from shapely.geometry import shape
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        ml._ISOCHRONE_CACHE.clear()
+        collection = self._with_graph(
+            graph, ml._isochrone, *self.ORIGIN, mode='walk', minutes=6, bands=3,
+        )
+        minutes = [f['properties']['minutes'] for f in collection['features']]
+        self.assertEqual(minutes, [6.0, 4.0, 2.0])
+        areas = [shape(f['geometry']) for f in collection['features']]
+        for outer, inner in zip(areas, areas[1:]):
+            # Each band is simplified on its own, so edges wobble by metres.
+            self.assertLess(inner.difference(outer).area, inner.area * 0.01)
+            self.assertGreater(outer.area, inner.area)
+        again = self._with_graph(
+            graph, ml._isochrone, *self.ORIGIN, mode='walk', minutes=6, bands=3,
+        )
+        self.assertIs(again['features'], collection['features'])
+
+    @unittest.skipUnless(importlib.util.find_spec('shapely'), 'needs shapely')
+    def test_cache_hit_carries_this_requests_origin(self):
+        graph = self._graph(_block_grid_rows(), elevation=BLOCK_GRID_ELEV)
+        ml._ISOCHRONE_CACHE.clear()
+        first = self._with_graph(
+            graph, ml._isochrone, *self.ORIGIN, mode='walk', minutes=4, bands=2,
+        )
+        # A few metres off the same spot on the same street: same cache entry.
+        lat, lon = self.ORIGIN[0], self.ORIGIN[1] + 0.00004
+        second = self._with_graph(
+            graph, ml._isochrone, lat, lon, mode='walk', minutes=4, bands=2,
+        )
+        self.assertIs(second['features'], first['features'])
+        self.assertEqual(second['properties']['origin'], [lon, lat])
+        snap = ml._snap_terminus(graph, lat, lon, 'isochrone')
+        self.assertEqual(second['properties']['snap_m'], round(snap['dist'], 1))
+        self.assertNotEqual(second['properties']['snap_m'], first['properties']['snap_m'])
+        self.assertEqual(first['properties']['origin'], [self.ORIGIN[1], self.ORIGIN[0]])
+
+    def test_off_network_origin_is_refused(self):
+        graph = self._graph(_block_grid_rows())
+        with self.assertRaises(ValueError):
+            self._with_graph(graph, ml._isochrone, 34.9500, -82.3000, mode='walk')
+
+
+class TestRouteCache(RouteGraphTestCase):
+    """Plans are cached by where the taps snap, bounded by bytes (LRU), and
+    every lookup is counted."""
+
+    A = (34.8507, -82.3980)
+    B = (34.8553, -82.3951)
+
+    def test_lru_evicts_by_bytes_and_expires_by_ttl(self):
+        cache = ml._LRUCache(max_bytes=60, ttl_seconds=60)
+        cache.put('a', 'x' * 20)
+        cache.put('b', 'y' * 20)
+        self.assertIsNotNone(cache.get('a'))   # 'b' is now least recent
+        cache.put('c', 'z' * 20)   # 22 bytes apiece as JSON: one has to go
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('d', 'w' * 20, ttl_seconds=-1)
+        self.assertIsNone(cache.get('d'))
+        cache.put('huge', 'v' * 100)
+        self.assertIsNone(cache.get('huge'), 'bigger than the budget: not kept')
+        stats = cache.stats()
+        self.assertEqual(
+            (stats['hits'], stats['misses'], stats['evictions'], stats['expirations']),
+            (2, 3, 2, 1),
+        )
+        self.assertLessEqual(stats['bytes'], 60)
+
+    def test_nearby_taps_share_a_plan_restamped_to_their_own_ends(self):
+        graph = self._graph(_block_grid_rows())
+        original = ml._get_route_graph
+        ml._get_route_graph = lambda debug=False: graph
+        ml._ROUTE_CACHE.clear()
+        before = ml._ROUTE_CACHE.stats()
+        try:
+            first = ml._compute_plan('walk', *self.A, *self.B)
+            # A metre to the side of the same street: same snapped spot.
+            nudged = (self.A[0], self.A[1] + 0.00001)
+            second = ml._compute_plan('walk', *nudged, *self.B)
+        finally:
+            ml._get_route_graph = original
+            ml._ROUTE_CACHE.clear()
+        after = ml._ROUTE_CACHE.stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(second['geometry']['coordinates'][0], [nudged[1], nudged[0]])
+        self.assertEqual(first['geometry']['coordinates'][0], [self.A[1], self.A[0]])
+        self.assertEqual(
+            first['geometry']['coordinates'][1:-1], second['geometry']['coordinates'][1:-1],
+        )
+
+
+class TestScheduledTransit(RouteGraphTestCase):
+    """RAPTOR over a two-route timetable: transfers, arrive-by, the service
+    calendar and trips running past midnight."""
+
+
+    #: Route 1 runs A -> B -> C, route 2 from C2 (a short walk from C) to E.
+    STOPS = {
+        'A': (34.850, -82.400), 'B': (34.850, -82.398), 'C': (34.850, -82.396),
+        'C2': (34.8503, -82.396), 'D': (34.854, -82.396), 'E': (34.856, -82.396),
+    }
+
+    def _timetable(self, calendar_dates=()):
+        import json
+        stops = [
+            {'stop_id': sid, 'name': f'Stop {sid}', 'lat': lat, 'lon': lon,
+             'routes': {'1'} if sid in 'ABC' else {'2'}}
+            for sid, (lat, lon) in self.STOPS.items()
+        ]
+        routes = [
+            {'route_id': 'r1', 'short_name': '1', 'long_name': 'WEST', 'color': '#111111'},
+            {'route_id': 'r2', 'short_name': '2', 'long_name': 'NORTH', 'color': '#222222'},
+        ]
+        trips, stop_times = [], []
+
+        def _trip(trip_id, route_id, stop_ids, start_s, step_s):
+            trips.append({
+                'trip_id': trip_id, 'route_id': route_id, 'service_id': 'wk',
+                'shape_id': 's1' if route_id == 'r1' else None,
+            })
+            times = [start_s + k * step_s for k in range(len(stop_ids))]
+            stop_times.append({
+                'trip_id': trip_id, 'stop_ids': json.dumps(stop_ids),
+                'arrivals': json.dumps(times), 'departures': json.dumps(times),
+            })
+
+        # A minute between stops: quicker than walking the 200 m.
+        for n in range(8):   # 7:00, 7:15, ...
+            _trip(f'1-{n}', 'r1', ['A', 'B', 'C'], 7 * 3600 + n * 900, 60)
+        for n in range(5):   # 7:07, 7:27, ...
+            _trip(f'2-{n}', 'r2', ['C2', 'D', 'E'], 7 * 3600 + 420 + n * 1200, 60)
+        _trip('1-late', 'r1', ['A', 'B', 'C'], 24 * 3600 + 600, 60)   # 00:10
+        calendar = [{
+            'service_id': 'wk', 'monday': 1, 'tuesday': 1, 'wednesday': 1,
+            'thursday': 1, 'friday': 1, 'saturday': 0, 'sunday': 0,
+            'start_date': '20260101', 'end_date': '20261231',
+        }]
+        return ml._build_timetable(
+            stops, routes, trips, stop_times, calendar, list(calendar_dates),
+        )
+
+    def _near(self, timetable, *stop_ids, secs=120):
+        return [(secs, s) for s in timetable['stops'] if s['stop_id'] in stop_ids]
+
+    @staticmethod
+    def _at(day, hh, mm):
+        from datetime import datetime
+        from zoneinfo import ZoneInfo
+        return datetime(2026, 10, day, hh, mm, tzinfo=ZoneInfo('America/New_York'))
+
+    @staticmethod
+    def _hhmm(moment):
+        return moment.strftime('%H:%M')
+
+    def test_transfers_to_the_next_connection(self):
+        timetable = self._timetable()
+        rides = ml._scheduled_rides(
+            timetable, self._near(timetable, 'A'), self._near(timetable, 'E', secs=60),
+            self._at(19, 7, 0),   # a Monday
+        )
+        # At A by 7:02 (+1 min slack) misses the 7:00 bus; the 7:15 reaches C
+        # at 7:17, too late (after the walk to C2) for the 7:07 route 2 bus.
+        self.assertEqual(
+            [(r['route'], r['board']['stop_id'], self._hhmm(r['board_at']),
+              r['alight']['stop_id'], self._hhmm(r['alight_at'])) for r in rides],
+            [('1', 'A', '07:15', 'C', '07:17'), ('2', 'C2', '07:27', 'E', '07:29')],
+        )
+
+    def test_arrive_by_leaves_as_late_as_possible(self):
+        timetable = self._timetable()
+        rides = ml._scheduled_rides(
+            timetable, self._near(timetable, 'A'), self._near(timetable, 'E', secs=60),
+            self._at(19, 7, 45), arrive_by=True,
+        )
+        self.assertEqual(
+            [(self._hhmm(r['board_at']), self._hhmm(r['alight_at'])) for r in rides],
+            [('07:15', '07:17'), ('07:27', '07:29')],
+        )
+        rides = ml._scheduled_rides(
+            timetable, self._near(timetable, 'A'), self._near(timetable, 'E', secs=60),
+            self._at(19, 7, 28), arrive_by=True,
+        )
+        self.assertEqual(
+            [(self._hhmm(r['board_at']), self._hhmm(r['alight_at'])) for r in rides],
+            [('07:00', '07:02'), ('07:07', '07:09')],
+        )
+
+    def test_calendar_and_exceptions(self):
+        timetable = self._timetable()
+        args = (self._near(timetable, 'A'), self._near(timetable, 'C'))
+        self.assertIsNone(ml._scheduled_rides(timetable, *args, self._at(18, 7, 0)))
+        extra = self._timetable([{'service_id': 'wk', 'date': '20261018', 'exception_type': 1}])
+        self.assertIsNotNone(ml._scheduled_rides(extra, *args, self._at(18, 7, 0)))
+        cut = self._timetable([{'service_id': 'wk', 'date': '20261019', 'exception_type': 2}])
+        self.assertIsNone(ml._scheduled_rides(cut, *args, self._at(19, 7, 0)))
+
+    def test_after_midnight_trips_belong_to_the_day_before(self):
+        timetable = self._timetable()
+        near = (self._near(timetable, 'A', secs=0), self._near(timetable, 'C', secs=0))
+        # 00:05 on Tuesday catches Monday's 24:10 trip.
+        rides = ml._scheduled_rides(timetable, *near, self._at(20, 0, 5))
+        self.assertEqual(rides[0]['trip_id'], '1-late')
+        self.assertEqual(rides[0]['board_at'].day, 20)
+        self.assertEqual(self._hhmm(rides[0]['board_at']), '00:10')
+        # Monday's own early morning has no Sunday service to inherit: the
+        # first bus is the 7:00.
+        rides = ml._scheduled_rides(timetable, *near, self._at(19, 0, 5))
+        self.assertEqual(self._hhmm(rides[0]['board_at']), '07:00')
+
+    def test_day_views_are_shared_and_least_recent_dropped(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from datetime import date, timedelta
+        timetable = self._timetable()
+        monday = date(2026, 10, 19)
+        with ThreadPoolExecutor(4) as pool:
+            views = list(pool.map(
+                lambda _: ml._timetable_day(timetable, monday), range(8),
+            ))
+        # Requests that missed together may each have built one; they agree,
+        # and one of them is what's kept.
+        kept = ml._timetable_day(timetable, monday)
+        self.assertTrue(all(view == kept for view in views))
+        self.assertTrue(any(view is kept for view in views))
+        self.assertEqual(list(timetable['days']), [(monday, False)])
+        for n in range(1, ml.TRANSIT_DAY_VIEWS):
+            ml._timetable_day(timetable, monday + timedelta(days=n))
+        # Monday's view is used again, so the next day in pushes out Tuesday's.
+        self.assertIs(ml._timetable_day(timetable, monday), kept)
+        ml._timetable_day(timetable, monday + timedelta(days=ml.TRANSIT_DAY_VIEWS))
+        self.assertEqual(len(timetable['days']), ml.TRANSIT_DAY_VIEWS)
+        self.assertIn((monday, False), timetable['days'])
+        self.assertNotIn((monday + timedelta(days=1), False), timetable['days'])
+
+    def test_itinerary_times_add_up(self):
+        from datetime import datetime
+        timetable = self._timetable()
+        shapes = [{
+            'shape_id': 's1', 'route': '1', 'long_name': 'WEST', 'color': '#111111',
+            'coords': [[-82.400, 34.850], [-82.396, 34.850]],
+            'cumulative': [0.0, ml._equirect_m(34.850, -82.400, 34.850, -82.396)],
+        }]
+        data = ml._transit_data(timetable['stops'], shapes, timetable)
+        graph = self._graph(_block_grid_rows())
+        originals = ml._get_transit_data, ml._get_route_graph
+        ml._get_transit_data = lambda: data
+        ml._get_route_graph = lambda debug=False: graph
+        token = ml._TRANSIT_WHEN.set((self._at(19, 7, 0), False))
+        try:
+            feature = ml._route_transit(34.8501, -82.4001, 34.8559, -82.3961)
+        finally:
+            ml._get_transit_data, ml._get_route_graph = originals
+            ml._TRANSIT_WHEN.reset(token)
+        props = feature['properties']
+        self.assertTrue(props['scheduled'])
+        self.assertEqual(props['transfers'], len(props['rides']) - 1)
+        leave = datetime.fromisoformat(props['depart_at'])
+        arrive = datetime.fromisoformat(props['arrive_at'])
+        self.assertGreaterEqual(leave, self._at(19, 7, 0))
+        self.assertAlmostEqual(
+            (arrive - leave).total_seconds() / 60, props['duration_min'], delta=0.1,
+        )
+        boards = [s for s in props['steps'] if s['maneuver'] == 'board']
+        self.assertEqual(len(boards), len(props['rides']))
+        self.assertIn(' AM', boards[0]['instruction'])
+
+
+class TestTransitIndex(unittest.TestCase):
+    """The stop grid and the vectorized shape projection answer exactly what
+    the scans they replaced did."""
+
+    def _feed(self):
+        import random
+        rng = random.Random(7)
+        stops = [
+            {'stop_id': str(i), 'name': f'Stop {i}',
+             'lat': 34.80 + rng.random() * 0.1, 'lon': -82.45 + rng.random() * 0.1,
+             'routes': {rng.choice('ABC')}}
+            for i in range(300)
+        ]
+        shapes = []
+        for route in 'ABC':
+            coords = [[-82.45 + k * 0.001, 34.80 + rng.random() * 0.1] for k in range(100)]
+            cumulative = [0.0]
+            for p, q in zip(coords, coords[1:]):
+                cumulative.append(cumulative[-1] + ml._equirect_m(p[1], p[0], q[1], q[0]))
+            shapes.append({
+                'shape_id': route, 'route': route, 'long_name': '', 'color': None,
+                'coords': coords, 'cumulative': cumulative,
+            })
+        return ml._transit_data(stops, shapes, None)
+
+    @staticmethod
+    def _scan_projection(shape, lat, lon):
+        coords = shape['coords']
+        best = (0.0, float('inf'), 0, 0.0)
+        for i in range(len(coords) - 1):
+            ax, ay = coords[i][0] * ml._COSLAT, coords[i][1]
+            bx, by = coords[i + 1][0] * ml._COSLAT, coords[i + 1][1]
+            px, py = lon * ml._COSLAT, lat
+            dx, dy = bx - ax, by - ay
+            denom = dx * dx + dy * dy
+            t = 0.0 if denom == 0 else ((px - ax) * dx + (py - ay) * dy) / denom
+            t = max(0.0, min(1.0, t))
+            off = ((px - ax - dx * t) ** 2 + (py - ay - dy * t) ** 2) ** 0.5 * ml.M_PER_DEG_LAT
+            if off < best[1]:
+                seg_len = shape['cumulative'][i + 1] - shape['cumulative'][i]
+                best = (shape['cumulative'][i] + seg_len * t, off, i, t)
+        return best
+
+    def test_precomputed_projections_match_the_scan(self):
+        data = self._feed()
+        checked = 0
+        for shape in data['shapes']:
+            for stop in data['stops']:
+                if shape['route'] not in stop['routes']:
+                    continue
+                got = ml._stop_on_shape(data, shape, stop)
+                want = self._scan_projection(shape, stop['lat'], stop['lon'])
+                self.assertEqual(got[2], want[2])
+                for g, w in zip(got, want):
+                    self.assertAlmostEqual(g, w, places=4)
+                checked += 1
+        self.assertEqual(checked, len(data['stop_proj']))
+
+    def test_stops_within_matches_the_scan(self):
+        data = self._feed()
+        for lat, lon, radius in ((34.85, -82.40, 1500.0), (34.81, -82.44, 5000.0),
+                                 (34.95, -82.30, 800.0)):
+            want = [
+                s for s in data['stops']
+                if ml._equirect_m(lat, lon, s['lat'], s['lon']) <= radius
+            ]
+            self.assertEqual(ml._stops_within(data, lat, lon, radius), want)
+
+
+class TestElevationGrid(unittest.TestCase):
+    """Contours rasterized once, then sampled bilinearly: a plane comes back
+    as that plane, between the contours as well as on them."""
+
+    LAT0, LON0 = 34.80, -82.45
+
+    @staticmethod
+    def _plane(lat, lon):
+        return 900.0 + (lat - 34.80) * 20000.0 + (lon + 82.45) * 5000.0
+
+    def _grid(self, rows=60, cols=80):
+        import numpy as np
+        dlat = ml.ELEVATION_GRID_M / ml.M_PER_DEG_LAT
+        dlon = dlat / ml._COSLAT
+        lat = self.LAT0 + np.arange(rows)[:, None] * dlat
+        lon = self.LON0 + np.arange(cols)[None, :] * dlon
+        truth = self._plane(lat, lon)
+        # "Contours": every tenth row and column is known, nothing else.
+        known = np.zeros((rows, cols), dtype=bool)
+        known[::10, :] = True
+        known[:, ::10] = True
+        known[-1, :] = known[:, -1] = True
+        feet = ml._fill_grid(np.where(known, truth, 0.0), known, sweeps=400)
+        grid = {'lat0': self.LAT0, 'lon0': self.LON0, 'dlat': dlat, 'dlon': dlon}
+        return feet, grid, truth
+
+    def test_fill_recovers_the_surface_between_contours(self):
+        import numpy as np
+        feet, _grid, truth = self._grid()
+        self.assertLess(float(np.abs(feet - truth).max()), 0.05)
+
+    def test_bilinear_samples_and_round_trip(self):
+        import tempfile
+        feet, meta, _truth = self._grid()
+        with tempfile.TemporaryDirectory() as root:
+            ml._write_elevation_grid(feet, meta, root=root)
+            grid = ml._load_elevation_grid(root)
+            lats = [34.8013, 34.8051, 34.7990]
+            lons = [-82.4471, -82.4390, -82.4400]   # the last is south of the grid
+            sampled = ml._sample_elevation(grid, lats, lons)
+            for value, lat, lon in zip(sampled[:2], lats, lons):
+                self.assertAlmostEqual(value, self._plane(lat, lon), delta=0.05)
+            self.assertNotEqual(sampled[2], sampled[2])
+
+            original = ml._elevation_grid
+            ml._elevation_grid = lambda: grid
+            try:
+                elev = ml._node_elevations({'a': (lats[0], lons[0]), 'off': (lats[2], lons[2])})
+            finally:
+                ml._elevation_grid = original
+        self.assertEqual(set(elev), {'a'})
+        self.assertAlmostEqual(elev['a'], self._plane(lats[0], lons[0]), delta=0.05)
+
+
+class TestEdgeRelief(RouteGraphTestCase):
+    """Each edge carries its elevation profile from build time: a hill in the
+    middle of a chunk whose two ends sit at the same height is still climbed,
+    priced and charted."""
+
+    A = (34.8450, -82.4000)
+    B = (34.8477, -82.4000)         # 300 m due north: one straight chunk
+    MID = (34.84635, -82.4000)
+
+    def _relief_graph(self, bump_ft):
+        """A 300 m street over a grid with a `bump_ft` bump (a dip when
+        negative) halfway along it, flat 900 ft everywhere else."""
+        import numpy as np
+        dlat = ml.ELEVATION_GRID_M / ml.M_PER_DEG_LAT
+        dlon = dlat / ml._COSLAT
+        lat0, lon0 = self.A[0] - 20 * dlat, self.A[1] - 20 * dlon
+        lat = lat0 + np.arange(60)[:, None] * dlat
+        north_m = (lat - self.MID[0]) * ml.M_PER_DEG_LAT
+        feet = np.broadcast_to(
+            900.0 + bump_ft * np.exp(-north_m ** 2 / (2 * 40.0 ** 2)), (60, 40),
+        ).astype(np.float32)
+        grid = {'lat0': lat0, 'lon0': lon0, 'dlat': dlat, 'dlon': dlon, 'feet': feet}
+        original_rows, original_grid = ml._route_source_rows, ml._elevation_grid
+        ml._route_source_rows = lambda debug=False: [
+            (_line(self.A, self.B), 'L', 'HUMP ST', True),
+        ]
+        ml._elevation_grid = lambda: grid
+        try:
+            return ml._build_route_graph()
+        finally:
+            ml._route_source_rows, ml._elevation_grid = original_rows, original_grid
+
+    def test_a_hill_between_level_ends_is_climbed(self):
+        graph = self._relief_graph(40.0)
+        self.assertEqual(len(graph['geom_off']) - 1, 1)
+        ends = graph['elev'].tolist()
+        self.assertAlmostEqual(ends[0], ends[1], delta=0.5)
+        ascent = graph['ascent'].tolist()
+        self.assertEqual(len(ascent), 2)
+        for k in range(2):
+            self.assertAlmostEqual(ascent[k] * ml.FT_PER_M, 40.0, delta=2.0)
+            self.assertAlmostEqual(
+                graph['descent'][k] * ml.FT_PER_M, 40.0, delta=2.0,
+            )
+        flat = ml._weight_profile('street')
+        hilly = ml._weight_profile('walk')
+        self.assertGreater(
+            ml._edge_weights(graph, hilly)[0] - ml._edge_weights(graph, flat)[0],
+            0.9 * 40.0 / ml.FT_PER_M * hilly['climb_factor'],
+        )
+
+        feature = self._route(graph, self.A, self.B, mode='roll')
+        props = feature['properties']
+        self.assertAlmostEqual(props['climb_ft'], 40, delta=2)
+        peak = max(e for _d, e in props['elevation_profile'])
+        self.assertAlmostEqual(peak, 940, delta=2)
+        step = props['steps'][0]
+        self.assertAlmostEqual(step['descent_ft'], 40, delta=2)
+        self.assertGreater(step['max_grade_pct'], 100 * ml.STEEP_GRADE)
+        self.assertIn('steep', {w['kind'] for w in props['warn_ranges']})
+
+    def test_a_terminus_on_the_hillside_climbs_its_share(self):
+        graph = self._relief_graph(40.0)
+        feature = self._route(graph, self.MID, self.B, mode='walk')
+        self.assertEqual(feature['properties']['climb_ft'], 0)
+        feature = self._route(graph, self.A, self.MID, mode='walk')
+        self.assertAlmostEqual(feature['properties']['climb_ft'], 40, delta=2)
+
+    def test_a_bridge_over_a_gorge_reads_as_level(self):
+        graph = self._relief_graph(-60.0)
+        self.assertEqual(graph['prof_off'].tolist(), [0, 2])
+        self.assertLess(float(graph['ascent'].max()), 0.01)
+        feature = self._route(graph, self.A, self.B, mode='walk')
+        self.assertEqual(feature['properties']['climb_ft'], 0)
+        self.assertNotIn(
+            'steep', {w['kind'] for w in feature['properties']['warn_ranges']},
+        )
+
+
+class TestPackedRTree(unittest.TestCase):
+    """The packed STR tree answers nearest, k-nearest and radius queries
+    exactly as a linear scan would, however far the query point is."""
+
+    def _points(self, n=3000):
+        import random
+        import numpy as np
+        rng = random.Random(7)
+        points = np.array(
+            [(rng.uniform(0, 5000), rng.uniform(0, 5000)) for _ in range(n)],
+        )
+        return points, ml._pack_rtree(np.column_stack([points, points]))
+
+    @staticmethod
+    def _scan(points, x, y):
+        import numpy as np
+        d = np.hypot(points[:, 0] - x, points[:, 1] - y)
+        return d, np.argsort(d, kind='stable')
+
+    def test_k_nearest_matches_a_scan(self):
+        points, tree = self._points()
+        for x, y in ((2500.0, 2500.0), (10.0, 4990.0), (-40000.0, 90000.0)):
+            d, order = self._scan(points, x, y)
+            hits = ml._rtree_nearest(tree, x, y, k=7)
+            self.assertEqual([i for _d, i in hits], order[:7].tolist())
+            for (got, _i), want in zip(hits, d[order[:7]]):
+                self.assertAlmostEqual(got, want, places=6)
+
+    def test_radius_and_filters(self):
+        points, tree = self._points()
+        d, order = self._scan(points, 1200.0, 3300.0)
+        within = sorted(ml._rtree_within(tree, 1200.0, 3300.0, 150.0))
+        self.assertEqual(within, sorted(order[d[order] <= 150.0].tolist()))
+        capped = ml._rtree_nearest(tree, 1200.0, 3300.0, k=1000, max_m=150.0)
+        self.assertEqual(sorted(i for _d, i in capped), within)
+        odd = ml._rtree_nearest(tree, 1200.0, 3300.0, want=lambda i: i % 2 == 1)
+        self.assertEqual(odd[0][1], next(i for i in order.tolist() if i % 2 == 1))
+
+    def test_degenerate_trees(self):
+        import numpy as np
+        empty = ml._pack_rtree(np.zeros((0, 4)))
+        self.assertEqual(ml._rtree_nearest(empty, 0.0, 0.0), [])
+        self.assertEqual(ml._rtree_within(empty, 0.0, 0.0, 10.0), [])
+        one = ml._pack_rtree(np.array([[3.0, 4.0, 3.0, 4.0]]))
+        self.assertEqual(ml._rtree_nearest(one, 0.0, 0.0), [(5.0, 0)])
+
+    def test_a_terminus_far_off_the_network_still_snaps(self):
+        """The old ring scan gave up 40 rings (10 km) out."""
+        graph = RouteGraphTestCase._graph(
+            self, [(_line((34.85, -82.40), (34.853, -82.40)), 'L', 'LONE ST', True)],
+        )
+        node, d = ml._nearest_node(graph, 35.05, -82.40)
+        self.assertIsNotNone(node)
+        self.assertAlmostEqual(d, (35.05 - 34.853) * ml.M_PER_DEG_LAT, delta=20)
+        k, _seg_i, _t, _pt, d_edge = ml._snap_edge(graph, 35.05, -82.40)
+        self.assertFalse(graph['rev'][k])
+        self.assertAlmostEqual(d_edge, d, delta=20)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)